@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark: Supabase-Round-Trips pro Schatzkarten-Render
+========================================================
+
+Zaehlt die HTTP-Round-Trips (table()/rpc()-Aufrufe am Supabase-Client),
+die ein kalter Render der Schatzkarte ausloest — einmal mit der alten
+Einzel-Query-Kaskade ("vorher") und einmal mit get_map_bootstrap() ("nachher").
+
+"vorher" ist ein Nachbau der Queries von pages/1_🗺️_Schatzkarte.py vor dem
+Bootstrap (Baseline-Commit), nicht die heutigen Helfer: die nutzen inzwischen
+selbst RPCs bzw. Batch-Queries und wuerden die Kaskade schoenen.
+st.cache_data-Treffer innerhalb eines Renders werden wie damals mitgedacht.
+
+Auf dem lokalen Backend laeuft get_map_bootstrap ueber den Stand-in aus
+schatzkarte/map_db.py (1 Round-Trip wie in Postgres); Queries darin zaehlen
+nicht als eigene Round-Trips.
+
+Alle Caches werden vor jedem Render geleert (= Cold Load nach TTL-Ablauf).
+
+Verwendung (aus dem Projekt-Root, .streamlit/secrets.toml muss existieren):
+    python benchmarks/bench_map_roundtrips.py --user-id <user_id> [--repeat 3]
+
+Offline gegen das lokale SQLite-Backend (utils/db_local.py):
+    PULSE_DB_BACKEND=local PULSE_DB_LATENCY_MS=40 python benchmarks/bench_map_roundtrips.py --user-id <user_id>
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import streamlit as st
+
+from utils.database import get_db
+from utils.cache import clear_all
+
+
+# ============================================
+# ROUND-TRIP ZAEHLER
+# ============================================
+
+class RoundTripCounter:
+    """Zaehlt table()/rpc()-Aufrufe am (gecachten) Supabase-Client.
+
+    get_db() ist per @st.cache_resource ein Singleton — das Patchen der
+    Instanz wirkt daher auf alle Module, die get_db() nutzen.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = Counter()
+        self._orig_table = client.table
+        self._orig_rpc = client.rpc
+
+    def __enter__(self):
+        def counting_table(name, *args, **kwargs):
+            if not self._inside_rpc():
+                self.calls[f"table:{name}"] += 1
+            return self._orig_table(name, *args, **kwargs)
+
+        def counting_rpc(fn, *args, **kwargs):
+            if not self._inside_rpc():
+                self.calls[f"rpc:{fn}"] += 1
+            return self._orig_rpc(fn, *args, **kwargs)
+
+        self.client.table = counting_table
+        self.client.rpc = counting_rpc
+        return self
+
+    def _inside_rpc(self) -> bool:
+        """Query innerhalb eines lokalen RPC-Stand-ins (gehoert zum RPC-Round-Trip)."""
+        state = getattr(self.client, "_rpc_state", None)
+        return bool(getattr(state, "active", False))
+
+    def __exit__(self, *exc):
+        self.client.table = self._orig_table
+        self.client.rpc = self._orig_rpc
+        return False
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+def _clear_caches():
+    """Simuliert einen Cold Load (alle TTL-Caches abgelaufen)."""
+    st.cache_data.clear()
+    clear_all()
+    for key in ("_cached_user_role", "_cached_user_role_id"):
+        st.session_state.pop(key, None)
+
+
+# ============================================
+# RENDER-VARIANTEN
+# ============================================
+
+class LegacyRender:
+    """Queries der Schatzkarte vor dem Bootstrap, Aufruf fuer Aufruf.
+
+    Die damals per st.cache_data gecachten Funktionen liefern ab dem zweiten
+    Aufruf im selben Render aus `_memo` (kalter Render: vorher leer).
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.db = get_db()
+        self._memo = {}
+
+    def _cached(self, name: str, *args):
+        key = (name, args)
+        if key not in self._memo:
+            self._memo[key] = getattr(self, f"_{name}")(*args)
+        return self._memo[key]
+
+    # --- gamification_db / map_db ---
+
+    def _user_stats(self, user_id):
+        # get_or_create_user + abgeschlossene Challenges
+        self.db.table("users").select("*").eq("user_id", user_id).execute()
+        return self.db.table("challenges").select("subject, outcome, xp_earned") \
+            .eq("user_id", user_id).eq("completed", True).execute().data
+
+    def _collected_treasures(self, user_id):
+        return self.db.table("user_treasures").select("island_id, treasure_id") \
+            .eq("user_id", user_id).order("collected_at").execute().data
+
+    def _all_island_progress(self, user_id):
+        return self.db.table("island_progress").select("*").eq("user_id", user_id).execute().data
+
+    # --- lerngruppen_db / user_system ---
+
+    def _user_group(self, user_id):
+        member = self.db.table("group_members").select("group_id, joined_at") \
+            .eq("user_id", user_id).eq("status", "active").execute().data
+        if not member:
+            return None
+        group = self.db.table("learning_groups").select("*") \
+            .eq("group_id", member[0]["group_id"]).eq("is_active", 1).execute().data
+        return group[0] if group else None
+
+    def _coach_groups(self, coach_id):
+        groups = self.db.table("learning_groups").select("*").eq("coach_id", coach_id) \
+            .eq("is_active", 1).order("created_at", desc=True).execute().data
+        for group in groups:   # member_count: 1 Query pro Gruppe
+            self.db.table("group_members").select("id") \
+                .eq("group_id", group["group_id"]).eq("status", "active").execute()
+        return groups
+
+    def _group_members(self, group_id):
+        members = self.db.table("group_members").select("*") \
+            .eq("group_id", group_id).eq("status", "active").execute().data
+        if members:
+            self.db.table("users").select("user_id, display_name, age_group, level, xp_total, current_streak") \
+                .in_("user_id", [m["user_id"] for m in members]).execute()
+        return members
+
+    def _user_by_id(self, user_id):
+        rows = self.db.table("users").select("*").eq("user_id", user_id).execute().data
+        return rows[0] if rows else None
+
+    # --- nachrichten_db ---
+
+    def _group_chat(self, group, user_id):
+        group_id = group["group_id"]
+        # get_group_messages: Gruppe, DMs an mich, DMs von mir
+        self.db.table("group_messages").select("*").eq("group_id", group_id) \
+            .is_("recipient_id", "null").eq("is_deleted", False) \
+            .order("created_at", desc=True).limit(50).execute()
+        self.db.table("group_messages").select("*").eq("group_id", group_id) \
+            .eq("recipient_id", user_id).eq("is_deleted", False) \
+            .order("created_at", desc=True).limit(50).execute()
+        self.db.table("group_messages").select("*").eq("group_id", group_id) \
+            .eq("sender_id", user_id).neq("recipient_id", "null").eq("is_deleted", False) \
+            .order("created_at", desc=True).limit(50).execute()
+        members = self._cached("group_members", group_id)
+        coach_id = group.get("coach_id")
+        if coach_id and all(m["user_id"] != coach_id for m in members):
+            self._cached("user_by_id", coach_id)
+        # get_unread_count
+        self.db.table("group_members").select("last_seen_chat") \
+            .eq("group_id", group_id).eq("user_id", user_id).execute()
+        self.db.table("group_messages").select("id", count="exact").eq("group_id", group_id) \
+            .eq("is_deleted", False).neq("sender_id", user_id).execute()
+
+    def _chat_data(self, user_id, coach):
+        groups = (self._cached("coach_groups", user_id) or []) if coach else \
+            [g for g in [self._cached("user_group", user_id)] if g]
+        if not groups or not self._cached("user_by_id", user_id):
+            return None
+        self._group_chat(groups[0], user_id)
+        return True
+
+    # --- Seite ---
+
+    def render(self):
+        from schatzkarte.map_ships import get_polarstern_data
+        from utils.user_system import is_coach
+        from utils.lerngruppen_db import get_meeting_access
+
+        user_id = self.user_id
+
+        # load_user_data
+        self._cached("user_stats", user_id)
+        self._cached("collected_treasures", user_id)
+        self._cached("all_island_progress", user_id)
+
+        # get_unlocked_islands: Coach -> alles, sonst Gruppe + Woche + aktivierte Inseln
+        coach = is_coach(user_id)
+        if not coach:
+            group = self._cached("user_group", user_id)
+            if group:
+                self.db.table("learning_groups").select("*").eq("group_id", group["group_id"]).execute()
+                self.db.table("group_weekly_islands").select("*") \
+                    .eq("group_id", group["group_id"]).order("week_number").execute()
+
+        # Polarstern-Button (unveraendert)
+        get_polarstern_data(user_id)
+
+        # load_meeting_data
+        group_ids = [g["group_id"] for g in self._cached("coach_groups", user_id)] if coach else []
+        group = self._cached("user_group", user_id)
+        if group and group["group_id"] not in group_ids:
+            group_ids.append(group["group_id"])
+        for gid in group_ids:
+            get_meeting_access(gid, user_id, "coach" if coach else "kind")
+
+        # load_chat_data
+        self._cached("chat_data", user_id, coach)
+
+        # Arena-Lookup
+        self._cached("user_group", user_id)
+        if coach:
+            self.db.table("learning_groups").select("group_id") \
+                .eq("coach_id", user_id).eq("is_active", 1).execute()
+
+
+def render_legacy(user_id: str):
+    """Alte Kaskade wie in pages/1_🗺️_Schatzkarte.py vor dem Bootstrap."""
+    LegacyRender(user_id).render()
+
+
+def render_bootstrap(user_id: str):
+    """Neuer Pfad: get_map_bootstrap() + Meeting/Chat."""
+    from schatzkarte.map_db import get_map_bootstrap
+    from schatzkarte.map_progress import get_unlocked_islands
+    from utils.user_system import is_coach
+    from utils.lerngruppen_db import get_meeting_access
+    from utils.nachrichten_db import load_chat_data
+
+    bootstrap = get_map_bootstrap(user_id)
+    get_unlocked_islands(user_id, bootstrap=bootstrap)
+
+    coach = is_coach(user_id)
+    group_ids = list(bootstrap["coach_group_ids"]) if coach else []
+    group = bootstrap["group"]
+    if group and group["group_id"] not in group_ids:
+        group_ids.append(group["group_id"])
+    for gid in group_ids:
+        get_meeting_access(gid, user_id, "coach" if coach else "kind")
+
+    load_chat_data(user_id)
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def measure(render_fn, user_id: str, repeat: int):
+    """Fuehrt render_fn `repeat`-mal kalt aus. Returns: (Round-Trips, Zeiten, Aufschluesselung)."""
+    client = get_db()
+    totals, timings = [], []
+    breakdown = Counter()
+    for _ in range(repeat):
+        _clear_caches()
+        with RoundTripCounter(client) as counter:
+            t0 = time.perf_counter()
+            render_fn(user_id)
+            timings.append((time.perf_counter() - t0) * 1000)
+        totals.append(counter.total)
+        breakdown = counter.calls
+    return totals, timings, breakdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-Trips pro Schatzkarten-Render zaehlen")
+    parser.add_argument("--user-id", required=True, help="User-ID fuer den Render")
+    parser.add_argument("--repeat", type=int, default=3, help="Anzahl kalter Renders pro Variante")
+    args = parser.parse_args()
+
+    print(f"Schatzkarte Cold-Render fuer User {args.user_id} ({args.repeat}x)\n")
+    for label, fn in (("vorher (Einzel-Queries)", render_legacy),
+                      ("nachher (Bootstrap-RPC)", render_bootstrap)):
+        totals, timings, breakdown = measure(fn, args.user_id, args.repeat)
+        print(f"== {label}")
+        print(f"   Round-Trips/Render: {statistics.median(totals):.0f}")
+        print(f"   Wall-Time median:  {statistics.median(timings):.1f} ms")
+        for call, count in breakdown.most_common():
+            print(f"     {count:3d}x {call}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+# -*- coding: utf-8 -*-
+"""
+Lasttest: N gleichzeitige User auf Schatzkarte und Lerngruppen
+===============================================================
+
+Simuliert Schueler und Coaches headless mit streamlit.testing.v1.AppTest
+gegen das lokale SQLite-Backend (utils/db_local.py) — ein Prozess, wie in
+Produktion: gemeinsamer get_db()-Client, gemeinsame Caches.
+
+Jeder virtuelle User hat eine eigene Session (AppTest ab Home.py) und
+fuehrt nacheinander Aktionen aus:
+
+    Schueler:  Karte oeffnen, Quest abschliessen, Schatz sammeln,
+               Chat-Nachricht senden, Seite wechseln (Meine Lernreise)
+    Coaches:   Lerngruppen oeffnen, Chat-Nachricht senden, Seite wechseln
+
+Die React-Komponente rendert in AppTest nicht — ihre Rueckgabewerte
+(quest_completed, treasure_collected, message_send) werden pro Session
+vorgegeben.
+
+Report:
+    - Durchsatz (Aktionen/s) und Fehler
+    - Latenz pro Rerun (p50/p95/p99) je Aktion
+    - DB-Calls pro Aktion (table()/rpc() inkl. Worker-Threads)
+    - Timeouts je Aktion (nicht in Latenz und DB-Calls enthalten)
+    - Speicher (RSS) vor/nach dem Lauf, Cache-Eintraege
+
+Verwendung (aus dem Projekt-Root, braucht streamlit >= 1.34 fuer switch_page):
+    python benchmarks/loadtest_pages.py --users 20 --actions 15 --latency-ms 30
+    python benchmarks/loadtest_pages.py --users 50 --group-size 10 --json perf/loadtest.json
+
+    # Gegen realistisch gefuellte DB (benchmarks/synthetic_cohort.py)
+    python benchmarks/loadtest_pages.py --users 20 --cohort school
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Vor dem ersten get_db(): lokales Backend erzwingen
+os.environ["PULSE_DB_BACKEND"] = "local"
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+import components.rpg_schatzkarte as rpg_component
+from schatzkarte.map_data import ISLANDS
+from utils.cache import cache_stats
+from utils.database import get_db
+from utils.db_local import LocalClient, load_local_config
+from synthetic_cohort import PRESETS, load_cohort
+
+
+HOME = str(ROOT / "Home.py")
+PAGE_MAP = "pages/1_🗺️_Schatzkarte.py"
+PAGE_JOURNEY = "pages/9_🎒_Meine_Lernreise.py"
+PAGE_GROUPS = "pages/7_👥_Lerngruppen.py"
+
+RESULT_KEY = "_loadtest_component_result"
+
+STUDENT_MIX = {"quest": 35, "treasure": 25, "chat": 20, "switch_page": 20}
+COACH_MIX = {"open_groups": 50, "chat": 30, "switch_page": 20}
+
+QUEST_TYPES = ["wisdom", "scroll", "battle", "challenge"]
+
+# Altersstufe pro Rolle. Coaches sehen den Altersstufen-Wechsler
+# (user_system.render_age_switcher_overlay); steht ihre Altersstufe nicht in
+# dessen Optionen (derzeit nur "unterstufe"), ruft die Seite bei jedem Lauf
+# st.rerun() auf und der Rerun endet erst im Timeout.
+AGE_GROUPS = {"student": "grundschule", "coach": "unterstufe"}
+
+
+# ============================================
+# KOMPONENTEN-ERSATZ
+# ============================================
+
+def scripted_rpg_schatzkarte(*args, **kwargs):
+    """Liefert das fuer diese Session vorgegebene Komponenten-Ergebnis (einmalig)."""
+    return st.session_state.pop(RESULT_KEY, None)
+
+
+# ============================================
+# DB-CALLS PRO USER
+# ============================================
+
+class DbCallCounter:
+    """Zaehlt table()/rpc() am LocalClient pro eingeloggtem User.
+
+    Zuordnung ueber den ScriptRunContext des ausfuehrenden Threads —
+    Worker aus utils/parallel_fetch.py erben ihn und zaehlen mit.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        orig_table, orig_rpc = LocalClient.table, LocalClient.rpc
+        counter = self
+
+        def table(client, name):
+            if not getattr(client._rpc_state, "active", False):   # nicht in RPC-Stand-ins
+                counter._count()
+            return orig_table(client, name)
+
+        def rpc(client, fn, params=None):
+            if not getattr(client._rpc_state, "active", False):
+                counter._count()
+            return orig_rpc(client, fn, params)
+
+        LocalClient.table = table
+        LocalClient.rpc = rpc
+
+    def _count(self) -> None:
+        user_id = "?"
+        ctx = get_script_run_ctx() if get_script_run_ctx else None
+        if ctx is not None:
+            try:
+                user_id = ctx.session_state["current_user_id"] or "?"
+            except Exception:
+                pass
+        with self._lock:
+            self.calls[user_id] += 1
+
+    def get(self, user_id: str) -> int:
+        with self._lock:
+            return self.calls[user_id]
+
+
+# ============================================
+# TESTDATEN
+# ============================================
+
+def seed_cohort(users: int, group_size: int, rng: random.Random) -> list:
+    """Legt Schueler, Coaches, Gruppen und Mitgliedschaften an.
+
+    Returns: Liste von {"user_id", "role", "group_id", "name"}
+    """
+    db = get_db()
+    now = datetime.now(timezone.utc).isoformat()
+    people, user_rows, group_rows, member_rows = [], [], [], []
+
+    n_groups = max(1, -(-users // group_size))
+    for g in range(n_groups):
+        group_id = f"lt_group_{g:04d}"
+        coach_id = f"lt_coach_{g:04d}"
+        group_rows.append({
+            "group_id": group_id, "name": f"Lasttest {g}", "coach_id": coach_id,
+            "start_date": now[:10], "current_week": 0, "is_active": 1,
+        })
+        user_rows.append(_user_row(coach_id, f"Coach {g}", "coach", now))
+        people.append({"user_id": coach_id, "role": "coach", "group_id": group_id, "name": f"Coach {g}"})
+
+    for i in range(users):
+        user_id = f"lt_user_{i:05d}"
+        group_id = f"lt_group_{i // group_size:04d}"
+        user_rows.append(_user_row(user_id, f"Kind {i}", "student", now))
+        member_rows.append({"group_id": group_id, "user_id": user_id, "status": "active", "joined_at": now})
+        people.append({"user_id": user_id, "role": "student", "group_id": group_id, "name": f"Kind {i}"})
+
+    db.table("users").insert(user_rows).execute()
+    db.table("learning_groups").insert(group_rows).execute()
+    db.table("group_members").insert(member_rows).execute()
+    rng.shuffle(people)
+    return people
+
+
+def people_from_cohort(preset: str, users: int, seed: int, rng: random.Random) -> list:
+    """Laedt eine synthetische Kohorte und waehlt `users` Schueler plus ihre Coaches.
+
+    Returns: Liste wie seed_cohort()
+    """
+    summary = load_cohort(get_db(), PRESETS[preset], seed=seed)
+    students = rng.sample(summary["students"], min(users, len(summary["students"])))
+    group_ids = {s["group_id"] for s in students}
+
+    people = [dict(s, role="student") for s in students]
+    people += [dict(c, role="coach") for c in summary["coaches"] if c["group_id"] in group_ids]
+    rng.shuffle(people)
+    return people
+
+
+def _user_row(user_id: str, name: str, role: str, now: str) -> dict:
+    return {
+        "user_id": user_id, "name": name.lower(), "username": name.lower(),
+        "display_name": name, "created_at": now, "last_login": now,
+        "xp_total": 0, "level": 1, "current_streak": 0, "longest_streak": 0,
+        "age_group": AGE_GROUPS[role], "role": role, "must_change_password": False,
+    }
+
+
+def app_secrets() -> dict:
+    """Secrets fuer die AppTest-Sessions — ohne secrets.toml (z.B. CI) fehlen
+    sie sonst, und Chat/Arena scheitern bei jedem Rerun an
+    st.secrets["SUPABASE_URL"] (nur ans Frontend gereicht, nie aufgerufen).
+    """
+    config = load_local_config()
+    return {
+        "SUPABASE_URL": "http://localhost:54321",
+        "SUPABASE_KEY": "loadtest-anon-key",
+        "cookie_secret": "loadtest-cookie-secret",
+        "local_db": {key: config[key] for key in ("enabled", "path", "latency_ms", "jitter_ms")},
+    }
+
+
+# ============================================
+# VIRTUELLER USER
+# ============================================
+
+class VirtualUser:
+    """Eine Browser-Session: AppTest ab Home.py, per Session-State eingeloggt."""
+
+    def __init__(self, person: dict, counter: DbCallCounter, rng: random.Random, timeout: float):
+        self.person = person
+        self.counter = counter
+        self.rng = rng
+        self.timeout = timeout
+        self.page = None
+        self.app = AppTest.from_file(HOME, default_timeout=timeout)
+        for key, value in app_secrets().items():
+            self.app.secrets[key] = value
+        self.app.session_state["current_user_id"] = person["user_id"]
+        self.app.session_state["current_user_name"] = person["name"]
+        self.app.session_state["current_user_age_group"] = AGE_GROUPS[person["role"]]
+        self.app.session_state["_cached_user_role"] = person["role"]
+        self.app.session_state["_cached_user_role_id"] = person["user_id"]
+
+    @property
+    def home_page(self) -> str:
+        return PAGE_GROUPS if self.person["role"] == "coach" else PAGE_MAP
+
+    def run(self, action: str, page: str = None, result: dict = None) -> dict:
+        """Ein Rerun: optional Seite wechseln / Komponenten-Ergebnis setzen."""
+        if page and page != self.page:
+            self.app.switch_page(page)
+            self.page = page
+        if result is not None:
+            self.app.session_state[RESULT_KEY] = result
+
+        calls_before = self.counter.get(self.person["user_id"])
+        t0 = time.perf_counter()
+        error = None
+        timed_out = False
+        try:
+            self.app.run()
+            if self.app.exception:
+                error = str(self.app.exception[0].value)[:200]
+        except Exception as e:   # Timeout o.ae.
+            error = f"{type(e).__name__}: {e}"[:200]
+            timed_out = "timed out" in str(e).lower() or time.perf_counter() - t0 >= self.timeout
+        return {
+            "action": action,
+            "ms": (time.perf_counter() - t0) * 1000,
+            "db_calls": self.counter.get(self.person["user_id"]) - calls_before,
+            "error": error,
+            "timeout": timed_out,
+        }
+
+    def next_action(self) -> dict:
+        mix = COACH_MIX if self.person["role"] == "coach" else STUDENT_MIX
+        action = self.rng.choices(list(mix), weights=list(mix.values()))[0]
+        island_id = self.rng.choice(list(ISLANDS))
+
+        if action == "quest":
+            return self.run(action, PAGE_MAP, {
+                "action": "quest_completed", "islandId": island_id,
+                "questType": self.rng.choice(QUEST_TYPES),
+            })
+        if action == "treasure":
+            treasures = ISLANDS[island_id].get("treasures") or [{"id": "t0", "xp": 10}]
+            treasure = self.rng.choice(treasures)
+            return self.run(action, PAGE_MAP, {
+                "action": "treasure_collected", "islandId": island_id,
+                "treasureId": treasure["id"], "xpEarned": treasure.get("xp", 10),
+            })
+        if action == "chat":
+            return self.run(action, PAGE_MAP, {
+                "action": "message_send", "groupId": self.person["group_id"],
+                "messageText": f"Lasttest {self.rng.randint(0, 10**6)}",
+            })
+        if action == "open_groups":
+            return self.run(action, PAGE_GROUPS)
+        # switch_page: zwischen Startseite der Rolle und zweiter Seite wechseln
+        other = PAGE_JOURNEY if self.person["role"] == "student" else PAGE_MAP
+        return self.run(action, other if self.page == self.home_page else self.home_page)
+
+
+def simulate_user(person: dict, actions: int, counter: DbCallCounter,
+                  seed: int, timeout: float, think_ms: float) -> list:
+    rng = random.Random(f"{seed}:{person['user_id']}")
+    user = VirtualUser(person, counter, rng, timeout)
+    samples = [user.run("login", user.home_page)]
+    for _ in range(actions):
+        if think_ms:
+            time.sleep(rng.uniform(0, 2 * think_ms) / 1000)
+        samples.append(user.next_action())
+    return samples
+
+
+# ============================================
+# REPORT
+# ============================================
+
+def _rss_mb():
+    """Aktueller Resident Set Size des Prozesses (MB), falls ermittelbar."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # Linux: KB
+    except ImportError:
+        return None
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def build_report(samples: list, wall_s: float, memory: dict, args) -> dict:
+    by_action = defaultdict(list)
+    for s in samples:
+        by_action[s["action"]].append(s)
+
+    # Abgebrochene Reruns (Timeout) zaehlen separat — ihre Dauer ist nur der
+    # Timeout und ihre DB-Calls laufen danach weiter, beides verzerrt sonst
+    # Latenz und DB-Calls der Aktion
+    actions = {}
+    for action, items in sorted(by_action.items()):
+        completed = [s for s in items if not s["timeout"]]
+        ms = [s["ms"] for s in completed]
+        calls = [s["db_calls"] for s in completed]
+        actions[action] = {
+            "n": len(items),
+            "errors": sum(1 for s in completed if s["error"]),
+            "timeouts": len(items) - len(completed),
+            "p50_ms": round(_percentile(ms, 50), 1),
+            "p95_ms": round(_percentile(ms, 95), 1),
+            "p99_ms": round(_percentile(ms, 99), 1),
+            "db_calls_avg": round(sum(calls) / len(calls), 1) if calls else 0.0,
+            "db_calls_max": max(calls, default=0),
+        }
+
+    errors = Counter(s["error"] for s in samples if s["error"] and not s["timeout"])
+    timeouts = Counter(s["action"] for s in samples if s["timeout"])
+    return {
+        "config": {"users": args.users, "actions": args.actions, "group_size": args.group_size,
+                   "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                   "think_ms": args.think_ms, "seed": args.seed},
+        "wall_s": round(wall_s, 2),
+        "reruns": len(samples),
+        "throughput_per_s": round(len(samples) / wall_s, 2) if wall_s else 0.0,
+        "errors": sum(errors.values()),
+        "top_errors": errors.most_common(5),
+        "timeouts": sum(timeouts.values()),
+        "timeouts_by_action": dict(timeouts),
+        "actions": actions,
+        "memory": memory,
+        "cache_entries": sum(cache_stats().values()),
+    }
+
+
+def print_report(report: dict) -> None:
+    cfg = report["config"]
+    print("=" * 78)
+    print(f"Lasttest: {cfg['users']} Schueler (+ Coaches), {cfg['actions']} Aktionen/User, "
+          f"Latenz {cfg['latency_ms']}±{cfg['jitter_ms']} ms")
+    print("=" * 78)
+    print(f"Reruns: {report['reruns']}  |  Laufzeit: {report['wall_s']} s  |  "
+          f"Durchsatz: {report['throughput_per_s']} Reruns/s  |  Fehler: {report['errors']}  |  "
+          f"Timeouts: {report['timeouts']}")
+    print()
+    print(f"{'Aktion':<14}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'DB/Akt.':>10}{'DB max':>8}"
+          f"{'Fehler':>8}{'Timeout':>9}")
+    for action, a in report["actions"].items():
+        print(f"{action:<14}{a['n']:>6}{a['p50_ms']:>10}{a['p95_ms']:>10}{a['p99_ms']:>10}"
+              f"{a['db_calls_avg']:>10}{a['db_calls_max']:>8}{a['errors']:>8}{a['timeouts']:>9}")
+    if report["timeouts"]:
+        print("(Latenz und DB-Calls ohne abgebrochene Reruns)")
+    print()
+    mem = report["memory"]
+    if mem["start_mb"] is not None:
+        print(f"Speicher (RSS): Start {mem['start_mb']:.0f} MB -> nach Seed {mem['seeded_mb']:.0f} MB "
+              f"-> Ende {mem['end_mb']:.0f} MB  ({mem['per_user_kb']:.0f} KB/Session)")
+    print(f"Cache-Eintraege: {report['cache_entries']}")
+    for error, n in report["top_errors"]:
+        print(f"  {n}x {error}")
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless-Lasttest fuer Schatzkarte/Lerngruppen")
+    parser.add_argument("--users", type=int, default=10, help="Gleichzeitige Schueler")
+    parser.add_argument("--actions", type=int, default=10, help="Aktionen pro User (nach dem Login)")
+    parser.add_argument("--group-size", type=int, default=8, help="Schueler pro Gruppe (1 Coach je Gruppe)")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Kuenstliche DB-Latenz pro Request")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--think-ms", type=float, default=0.0, help="Mittlere Pause zwischen Aktionen")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout pro Rerun (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cohort", choices=sorted(PRESETS),
+                        help="Synthetische Kohorte laden statt leerer Testdaten (--group-size entfaellt)")
+    parser.add_argument("--json", help="Report zusaetzlich als JSON speichern")
+    args = parser.parse_args()
+
+    if not hasattr(AppTest, "switch_page"):
+        sys.exit("AppTest.switch_page fehlt — bitte streamlit >= 1.34 installieren.")
+
+    # Frische Datei-DB: alle get_db()-Instanzen (auch aus AppTest) sehen dieselben Daten
+    db_path = Path(tempfile.mkdtemp(prefix="pulse_loadtest_")) / "local.db"
+    os.environ["PULSE_DB_PATH"] = str(db_path)
+    os.environ["PULSE_DB_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["PULSE_DB_JITTER_MS"] = str(args.jitter_ms)
+    os.chdir(ROOT)
+
+    rpg_component.rpg_schatzkarte = scripted_rpg_schatzkarte
+    counter = DbCallCounter()
+    counter.install()
+
+    memory = {"start_mb": _rss_mb()}
+    if args.cohort:
+        people = people_from_cohort(args.cohort, args.users, args.seed, random.Random(args.seed))
+    else:
+        people = seed_cohort(args.users, args.group_size, random.Random(args.seed))
+    memory["seeded_mb"] = _rss_mb()
+    print(f"{len(people)} Sessions ({args.users} Schueler), DB: {db_path}")
+
+    t0 = time.perf_counter()
+    samples = []
+    with ThreadPoolExecutor(max_workers=len(people), thread_name_prefix="vuser") as pool:
+        futures = [pool.submit(simulate_user, p, args.actions, counter, args.seed,
+                               args.timeout, args.think_ms) for p in people]
+        for future in futures:
+            samples.extend(future.result())
+    wall_s = time.perf_counter() - t0
+
+    memory["end_mb"] = _rss_mb()
+    if memory["start_mb"] is not None:
+        memory["per_user_kb"] = (memory["end_mb"] - memory["seeded_mb"]) * 1024 / len(people)
+    if counter.calls.get("?"):
+        print(f"Hinweis: {counter.calls['?']} DB-Calls ohne Session-Zuordnung (z.B. Seed)")
+
+    report = build_report(samples, wall_s, memory, args)
+    print_report(report)
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nJSON: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
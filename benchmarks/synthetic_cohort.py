@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetische Kohorten-Daten fuer Benchmarks und Kapazitaetstests
+=================================================================
+
+Erzeugt realistische Datenmengen (Schueler, Coaches, Gruppen, Challenges,
+Bandura-Eintraege, Activity-Log, Chat) und laedt sie per bulk_insert in
+das lokale SQLite-Backend (utils/db_local.py).
+
+Realistische Schiefe statt Gleichverteilung:
+    - Engagement pro Schueler log-normalverteilt (wenige sehr aktive)
+    - Wochenende deutlich ruhiger als Schultage
+    - Einstieg verteilt ueber die erste Haelfte des Zeitraums, ~25% Abbrecher
+    - Gruppengroessen und Chat-Volumen pro Gruppe schief verteilt,
+      wenige Vielschreiber pro Gruppe
+
+Reproduzierbar: gleicher Seed + gleiches --end-date -> gleiche Zeilen
+(inkl. IDs und updated_at; jede Zeile bringt ihre "id" mit, Zeitstempel
+haengen nur von --end-date ab). Volumen und Verteilung haengen nur vom
+Seed ab, Ergebnisse sind damit ueber Commits vergleichbar. Jede Tabelle
+hat einen eigenen Zufallsstrom — neue Tabellen aendern die bestehenden
+nicht. Pruefen mit --verify (zwei Laeufe, Dumps muessen gleich sein).
+
+Spalten wie in der App (utils/gamification_db.py, bandura_sources_widget.py,
+nachrichten_db.py, lerngruppen_db.py) bzw. sql/ — XP und Level der User
+passen zu den erzeugten Aktivitaeten.
+
+Verwendung:
+    python benchmarks/synthetic_cohort.py --preset cohort_10k --seed 42 --db perf/cohort_10k.db
+    python benchmarks/synthetic_cohort.py --preset ci --users 300 --seed 7 --db perf/ci.db
+    python benchmarks/synthetic_cohort.py --preset ci --seed 7 --end-date 2026-01-31 --verify
+
+    # aus Python (z.B. benchmarks/loadtest_pages.py):
+    from synthetic_cohort import PRESETS, load_cohort
+    summary = load_cohort(get_db(), PRESETS["school"], seed=42)
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.bandura_sources_widget import BANDURA_SOURCES, XP_CONFIG as BANDURA_XP
+from utils.gamification_db import XP_CONFIG, calculate_level
+from utils.gamification_ui import SUBJECTS
+
+
+# ============================================
+# PRESETS
+# ============================================
+
+PRESETS = {
+    # Schnell genug fuer CI (< 1 s Laden)
+    "ci": {"users": 200, "groups": 12, "days": 60, "messages_per_group": 150},
+    # Eine Schule
+    "school": {"users": 1000, "groups": 50, "days": 120, "messages_per_group": 600},
+    # Kapazitaetsplanung: Millionen Zeilen in activity_log/challenges/group_messages
+    "cohort_10k": {"users": 10000, "groups": 500, "days": 180, "messages_per_group": 2000},
+}
+
+DEFAULT_SPEC = {
+    "users": 1000,
+    "groups": 50,
+    "days": 120,
+    "messages_per_group": 600,
+    "activity_rate": 0.30,       # Basis-Wahrscheinlichkeit fuer einen aktiven Tag
+    "churn_rate": 0.25,          # Anteil Schueler, die irgendwann aufhoeren
+    "challenge_share": 0.5,      # Rest der Aktivitaeten: Bandura-Eintraege
+    "completion_rate": 0.85,     # abgeschlossene Challenges
+    "dm_share": 0.08,            # Direktnachrichten an Chat-Volumen
+    "coach_share": 0.15,         # Chat-Anteil des Coaches
+}
+
+WEEKDAY_FACTOR = [1.0, 1.0, 1.0, 1.0, 0.9, 0.35, 0.5]   # Mo..So
+BANDURA_WEIGHTS = {"mastery": 0.4, "vicarious": 0.2, "persuasion": 0.2, "physiological": 0.2}
+CHAT_SNIPPETS = ["Hallo zusammen!", "Hat jemand die Aufgabe verstanden?", "Ich hab's geschafft 🎉",
+                 "Bis morgen!", "Wann ist das naechste Treffen?", "Super gemacht!", "👍",
+                 "Ich brauche Hilfe bei Mathe", "Danke!", "Welche Insel macht ihr gerade?"]
+
+# Indizes, wie sie in Supabase auf den Fremdschluesseln liegen
+INDEXES = {
+    "users": [("user_id",)],
+    "learning_groups": [("group_id",), ("coach_id",)],
+    "group_members": [("user_id",), ("group_id",)],
+    "activity_log": [("user_id", "activity_date")],
+    "challenges": [("user_id", "challenge_date")],
+    "bandura_entries": [("user_id", "entry_date")],
+}
+
+
+# ============================================
+# HILFSFUNKTIONEN
+# ============================================
+
+def _rng(seed: int, stream: str) -> random.Random:
+    """Eigener, stabiler Zufallsstrom pro Tabelle/Objekt."""
+    return random.Random(f"{seed}:{stream}")
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _timestamp(day: date, rng: random.Random, start_hour: int = 13, end_hour: int = 21) -> str:
+    seconds = rng.randint(start_hour * 3600, end_hour * 3600 - 1)
+    return (datetime.combine(day, datetime.min.time()) + timedelta(seconds=seconds)).isoformat() + "+00:00"
+
+
+def _coach_name(coach_id: str) -> str:
+    return f"Coach {int(coach_id.split('_')[1]) + 1}"
+
+
+def _student_name(user_id: str) -> str:
+    return f"Kind {int(user_id.split('_')[1]) + 1}"
+
+
+def _streak_multiplier(streak: int) -> float:
+    if streak >= 30:
+        return XP_CONFIG["streak_bonus_30"]
+    if streak >= 7:
+        return XP_CONFIG["streak_bonus_7"]
+    if streak >= 3:
+        return XP_CONFIG["streak_bonus_3"]
+    return 1.0
+
+
+# ============================================
+# GENERATOR
+# ============================================
+
+def generate_cohort(spec: Dict[str, Any], seed: int, end_date: Optional[date] = None,
+                    chunk_size: int = 5000) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Erzeugt die Kohorte als Strom von (tabelle, zeilen)-Bloecken.
+
+    Speicherbedarf bleibt auch bei Millionen Zeilen klein: pro Tabelle wird
+    hoechstens chunk_size gepuffert. Users/Gruppen kommen zuerst.
+    """
+    spec = dict(DEFAULT_SPEC, **spec)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=spec["days"] - 1)
+    generated_at = datetime.combine(end_date, datetime.max.time()).replace(microsecond=0).isoformat() + "+00:00"
+    buffers: Dict[str, List[Dict[str, Any]]] = {}
+    # IDs aus eigenem Strom pro Tabelle: sonst vergibt db_local uuid4, und
+    # die bestehenden Zufallsstroeme bleiben unveraendert
+    id_rngs: Dict[str, random.Random] = {}
+
+    def row_id(table: str) -> str:
+        rng = id_rngs.get(table)
+        if rng is None:
+            rng = id_rngs[table] = _rng(seed, f"ids:{table}")
+        return _uuid(rng)
+
+    def emit(table: str, row: Dict[str, Any]):
+        buffer = buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= chunk_size:
+            buffers[table] = []
+            return table, buffer
+        return None
+
+    # --- Gruppen + Coaches ---
+    rng = _rng(seed, "groups")
+    groups, coach_rows = [], []
+    for g in range(spec["groups"]):
+        group_id = f"grp_{g:05d}"
+        coach_id = f"coach_{g:05d}"
+        groups.append({
+            "id": row_id("learning_groups"), "group_id": group_id, "name": f"Lerngruppe {g + 1}", "coach_id": coach_id,
+            "start_date": start_date.isoformat(), "current_week": min(14, spec["days"] // 7),
+            "is_active": 1, "settings": {}, "created_at": _timestamp(start_date, rng, 8, 12),
+            "size_factor": rng.lognormvariate(0, 0.5),
+        })
+        coach_rows.append({
+            "id": row_id("users"), "user_id": coach_id, "name": _coach_name(coach_id).lower(),
+            "username": _coach_name(coach_id).lower(), "display_name": _coach_name(coach_id),
+            "role": "coach", "age_group": "paedagoge",
+            "created_at": _timestamp(start_date, rng, 8, 12), "last_login": _timestamp(end_date, rng, 8, 20),
+            "xp_total": 0, "level": 1, "current_streak": 0, "longest_streak": 0,
+            "must_change_password": False,
+        })
+    weights = [g.pop("size_factor") for g in groups]
+    yield "learning_groups", groups
+    yield "users", coach_rows
+
+    # --- Schueler mit Aktivitaeten ---
+    members: Dict[str, List[Tuple[str, str, str]]] = {g["group_id"]: [] for g in groups}
+    user_rows: List[Dict[str, Any]] = []
+    rng_assign = _rng(seed, "assignment")
+
+    for i in range(spec["users"]):
+        user_id = f"user_{i:06d}"
+        name = _student_name(user_id)
+        rng = _rng(seed, user_id)
+        group = rng_assign.choices(groups, weights=weights)[0]
+        engagement = rng.lognormvariate(0, 0.9)
+        join = rng.randint(0, spec["days"] // 2)
+        last = spec["days"] - 1
+        if rng.random() < spec["churn_rate"]:
+            last = rng.randint(join, last)
+
+        joined_at = start_date + timedelta(days=join)
+        members[group["group_id"]].append((user_id, name, joined_at.isoformat()))
+        block = emit("group_members", {
+            "id": _uuid(rng), "group_id": group["group_id"], "user_id": user_id, "status": "active",
+            "joined_at": _timestamp(joined_at, rng, 8, 18),
+        })
+        if block:
+            yield block
+
+        xp_total, streak, longest, last_active = 0, 0, 0, None
+        rollup: Dict[str, List[int]] = {}
+        bandura_days: Dict[str, List[int]] = {source: [] for source in BANDURA_WEIGHTS}
+        for offset in range(join, last + 1):
+            day = start_date + timedelta(days=offset)
+            p = min(0.95, spec["activity_rate"] * engagement * WEEKDAY_FACTOR[day.weekday()])
+            if rng.random() >= p:
+                continue
+            streak = streak + 1 if last_active == day - timedelta(days=1) else 1
+            longest = max(longest, streak)
+            last_active = day
+
+            sources_today = set()
+            for _ in range(1 + min(8, int(rng.expovariate(1 / (1.2 * engagement))))):
+                if rng.random() < spec["challenge_share"]:
+                    rows, xp = _challenge_rows(rng, user_id, day, streak, spec)
+                    if rows[0][1]["completed"]:
+                        daily = rollup.setdefault(day.isoformat(), [0, 0])
+                        daily[0] += 1
+                        daily[1] += xp
+                else:
+                    source = rng.choices(list(BANDURA_WEIGHTS), weights=list(BANDURA_WEIGHTS.values()))[0]
+                    rows, xp = _bandura_rows(rng, user_id, day, source, sources_today)
+                    sources_today.add(source)
+                    bandura_days[source].append(offset)
+                xp_total += xp
+                for table, row in rows:
+                    block = emit(table, row)
+                    if block:
+                        yield block
+
+        for day_iso, (count, xp) in rollup.items():
+            block = emit("daily_activity_rollup", {
+                "id": row_id("daily_activity_rollup"), "user_id": user_id, "activity_date": day_iso, "source": "challenge",
+                "count": count, "xp": xp,
+            })
+            if block:
+                yield block
+
+        bits_row = _bandura_bits_row(user_id, bandura_days, start_date)
+        if bits_row:
+            bits_row["updated_at"] = generated_at
+            block = emit("bandura_day_bits", bits_row)
+            if block:
+                yield block
+
+        if last_active:
+            block = emit("user_streaks", {
+                "id": row_id("user_streaks"), "user_id": user_id, "stream": "challenge",
+                "current_streak": streak, "longest_streak": longest,
+                "last_activity_date": last_active.isoformat(), "updated_at": generated_at,
+            })
+            if block:
+                yield block
+
+        user_rows.append({
+            "id": row_id("users"), "user_id": user_id, "name": name.lower(), "username": name.lower(), "display_name": name,
+            "role": "student", "age_group": rng.choice(["grundschule", "grundschule", "unterstufe"]),
+            "created_at": _timestamp(joined_at, rng, 8, 18),
+            "last_login": _timestamp(last_active or joined_at, rng),
+            "xp_total": xp_total, "level": calculate_level(xp_total),
+            "current_streak": streak if last_active and (end_date - last_active).days <= 1 else 0,
+            "longest_streak": longest,
+            "last_activity_date": last_active.isoformat() if last_active else None,
+            "must_change_password": False,
+        })
+        if len(user_rows) >= chunk_size:
+            yield "users", user_rows
+            user_rows = []
+
+    if user_rows:
+        yield "users", user_rows
+
+    # --- Chat pro Gruppe ---
+    for group in groups:
+        yield from _message_blocks(seed, group, members[group["group_id"]], spec, start_date, end_date, chunk_size)
+
+    for table, buffer in buffers.items():
+        if buffer:
+            yield table, buffer
+
+
+def _challenge_rows(rng: random.Random, user_id: str, day: date, streak: int,
+                    spec: Dict[str, Any]) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+    """Challenge (wie create_challenge + complete_challenge) und Activity-Log."""
+    prediction = rng.randint(1, 10)
+    created_at = _timestamp(day, rng)
+    row = {
+        "id": _uuid(rng), "user_id": user_id, "challenge_date": day.isoformat(),
+        "subject": rng.choice(SUBJECTS), "task_description": f"Aufgabe {rng.randint(1, 500)}",
+        "prediction": prediction, "completed": False, "actual_result": None, "outcome": None,
+        "xp_earned": 0, "reflection": "", "created_at": created_at,
+    }
+    if rng.random() >= spec["completion_rate"]:
+        return [("challenges", row)], 0
+
+    actual = max(1, min(10, prediction + round(rng.gauss(0.3, 1.5))))
+    if actual > prediction:
+        outcome, base = "exceeded", XP_CONFIG["challenge_completed"] + XP_CONFIG["exceeded_expectation"]
+    elif actual == prediction:
+        outcome, base = "exact", XP_CONFIG["challenge_completed"] + XP_CONFIG["prediction_exact"]
+    else:
+        outcome, base = "below", XP_CONFIG["challenge_completed"]
+    xp = int(base * _streak_multiplier(streak))
+    row.update({"completed": True, "actual_result": actual, "outcome": outcome, "xp_earned": xp,
+                "reflection": rng.choice(["", "", "War schwieriger als gedacht", "Lief gut!"])})
+
+    log = {
+        "id": _uuid(rng), "user_id": user_id, "activity_date": day.isoformat(),
+        "activity_type": "challenge_completed", "xp_earned": xp, "created_at": created_at,
+        "details": json.dumps({"subject": row["subject"], "outcome": outcome,
+                               "prediction": prediction, "actual": actual}),
+    }
+    return [("challenges", row), ("activity_log", log)], xp
+
+
+def _bandura_rows(rng: random.Random, user_id: str, day: date, source: str,
+                  sources_today: set) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+    """Bandura-Eintrag (wie save_bandura_entry) inkl. Alle-4-Quellen-Bonus."""
+    xp = BANDURA_SOURCES[source].get("xp", BANDURA_XP["base_entry"])
+    created_at = _timestamp(day, rng)
+    rows = [
+        ("bandura_entries", {
+            "id": _uuid(rng), "user_id": user_id, "entry_date": day.isoformat(), "source_type": source,
+            "description": f"Eintrag {rng.randint(1, 10**6)}", "xp_earned": xp, "created_at": created_at,
+        }),
+        ("activity_log", {
+            "id": _uuid(rng), "user_id": user_id, "activity_date": day.isoformat(),
+            "activity_type": f"bandura_{source}", "xp_earned": xp, "created_at": created_at,
+            "details": json.dumps({"description": "", "source": source}),
+        }),
+    ]
+    if source not in sources_today and len(sources_today) == 3:
+        bonus = BANDURA_XP["all_four_today"]
+        xp += bonus
+        rows.append(("activity_log", {
+            "id": _uuid(rng), "user_id": user_id, "activity_date": day.isoformat(),
+            "activity_type": "bandura_all_four", "xp_earned": bonus, "created_at": created_at,
+            "details": json.dumps({"sources": sorted(sources_today | {source})}),
+        }))
+    return rows, xp
+
+
+def _bandura_bits_row(user_id: str, bandura_days: Dict[str, List[int]],
+                      start_date: date) -> Optional[Dict[str, Any]]:
+    """Tages-Bitsets (wie bump_bandura_day) aus den Tages-Offsets je Quelle."""
+    offsets = [offset for days in bandura_days.values() for offset in days]
+    if not offsets:
+        return None
+    first, last = min(offsets), max(offsets)
+    row: Dict[str, Any] = {"user_id": user_id, "origin": (start_date + timedelta(days=first)).isoformat()}
+    for source, days in bandura_days.items():
+        active = set(days)
+        bits = "".join("1" if offset in active else "0" for offset in range(first, last + 1))
+        row[source] = bits.rstrip("0")
+        row[f"{source}_count"] = len(days)
+    return row
+
+
+def _message_blocks(seed: int, group: Dict[str, Any], members: List[Tuple[str, str, str]],
+                    spec: Dict[str, Any], start_date: date, end_date: date,
+                    chunk_size: int) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Chat einer Gruppe: schiefes Volumen, Vielschreiber, Schultage, Nachmittag."""
+    if not members:
+        return
+    rng = _rng(seed, f"chat:{group['group_id']}")
+    total = int(spec["messages_per_group"] * rng.lognormvariate(-0.5, 1.0))
+    # Zipf-artig: wenige Mitglieder schreiben die meisten Nachrichten
+    writer_weights = [1 / (rank + 1) ** 1.1 for rank in range(len(members))]
+    days = [start_date + timedelta(days=d) for d in range((end_date - start_date).days + 1)]
+    day_weights = [WEEKDAY_FACTOR[d.weekday()] for d in days]
+
+    rows = []
+    for day in sorted(rng.choices(days, weights=day_weights, k=total)):
+        if rng.random() < spec["coach_share"]:
+            sender_id, sender_name = group["coach_id"], _coach_name(group["coach_id"])
+        else:
+            sender_id, sender_name, _ = rng.choices(members, weights=writer_weights)[0]
+        recipient_id = None
+        if rng.random() < spec["dm_share"]:
+            recipient_id = group["coach_id"] if sender_id != group["coach_id"] else rng.choice(members)[0]
+        created_at = _timestamp(day, rng, 7, 22)
+        deleted = rng.random() < 0.01
+        rows.append({
+            "id": _uuid(rng), "group_id": group["group_id"], "sender_id": sender_id,
+            "sender_name": sender_name, "recipient_id": recipient_id,
+            "message_text": rng.choice(CHAT_SNIPPETS), "message_type": "text",
+            "is_deleted": deleted, "deleted_by": group["coach_id"] if deleted else None,
+            "created_at": created_at, "updated_at": created_at,
+        })
+        if len(rows) >= chunk_size:
+            yield "group_messages", rows
+            rows = []
+    if rows:
+        yield "group_messages", rows
+
+
+# ============================================
+# LADEN
+# ============================================
+
+def load_cohort(client, spec: Dict[str, Any], seed: int = 42, end_date: Optional[date] = None,
+                chunk_size: int = 5000, verbose: bool = False) -> Dict[str, Any]:
+    """Laedt die Kohorte per bulk_insert in einen LocalClient.
+
+    Returns: {"counts": {tabelle: zeilen}, "seconds": ..., "students": [...], "coaches": [...]}
+             students/coaches: [{"user_id", "name", "group_id"}] fuer Lasttests
+    """
+    if not hasattr(client, "bulk_insert"):
+        raise TypeError("load_cohort braucht das lokale Backend (PULSE_DB_BACKEND=local)")
+
+    counts: Dict[str, int] = {}
+    students, coaches = [], []
+    t0 = time.perf_counter()
+    for table, rows in generate_cohort(spec, seed, end_date, chunk_size):
+        counts[table] = counts.get(table, 0) + client.bulk_insert(table, rows)
+        if table == "learning_groups":
+            coaches.extend({"user_id": r["coach_id"], "name": _coach_name(r["coach_id"]),
+                            "group_id": r["group_id"]} for r in rows)
+        elif table == "group_members":
+            students.extend({"user_id": r["user_id"], "name": _student_name(r["user_id"]),
+                             "group_id": r["group_id"]} for r in rows)
+        if verbose:
+            print(f"\r  {sum(counts.values()):>10,} Zeilen ...", end="", flush=True)
+
+    for table, indexes in INDEXES.items():
+        for columns in indexes:
+            client.ensure_index(table, *columns)
+    if verbose:
+        print()
+
+    return {"counts": counts, "seconds": round(time.perf_counter() - t0, 1),
+            "students": students, "coaches": coaches}
+
+
+def cohort_dump(client, tables: Iterable[str]) -> Dict[str, List[str]]:
+    """Alle Zeilen pro Tabelle als sortierte JSON-Strings (fuer Vergleiche)."""
+    return {
+        table: sorted(json.dumps(row, sort_keys=True, default=str)
+                      for row in client.table(table).select("*").execute().data)
+        for table in sorted(tables)
+    }
+
+
+def verify_determinism(spec: Dict[str, Any], seed: int, end_date: Optional[date] = None) -> List[str]:
+    """Laedt die Kohorte zweimal in frische In-Memory-Backends.
+
+    Returns: Tabellen, deren Dumps sich unterscheiden (leer = reproduzierbar)
+    """
+    from utils.db_local import LocalClient
+
+    end_date = end_date or date.today()
+    dumps = []
+    for _ in range(2):
+        client = LocalClient({"path": ":memory:", "latency_ms": 0, "jitter_ms": 0})
+        summary = load_cohort(client, spec, seed, end_date)
+        dumps.append(cohort_dump(client, summary["counts"]))
+    return [table for table in dumps[0] if dumps[0][table] != dumps[1].get(table)]
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetische Kohorte ins lokale Backend laden")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="school")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default="perf/cohort.db", help="SQLite-Datei (wird neu angelegt)")
+    parser.add_argument("--end-date", type=date.fromisoformat, help="Letzter Tag (YYYY-MM-DD), Default heute")
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--groups", type=int)
+    parser.add_argument("--days", type=int)
+    parser.add_argument("--messages-per-group", type=int)
+    parser.add_argument("--verify", action="store_true",
+                        help="Zweimal erzeugen und vergleichen (Reproduzierbarkeit), nichts schreiben")
+    args = parser.parse_args()
+
+    from utils.db_local import LocalClient
+
+    spec = dict(PRESETS[args.preset])
+    for key in ("users", "groups", "days", "messages_per_group"):
+        if getattr(args, key) is not None:
+            spec[key] = getattr(args, key)
+
+    if args.verify:
+        differing = verify_determinism(spec, args.seed, args.end_date)
+        if differing:
+            print(f"❌ Nicht reproduzierbar (Seed {args.seed}): {', '.join(differing)}")
+            sys.exit(1)
+        print(f"✅ Seed {args.seed}: zwei Laeufe liefern identische Zeilen")
+        return
+
+    db_path = Path(args.db)
+    if db_path.exists():
+        db_path.unlink()
+    client = LocalClient({"path": str(db_path)})
+
+    print(f"Kohorte '{args.preset}' (Seed {args.seed}): {spec}")
+    summary = load_cohort(client, spec, args.seed, args.end_date, verbose=True)
+    total = sum(summary["counts"].values())
+    print(f"{total:,} Zeilen in {summary['seconds']} s ({total / max(summary['seconds'], 0.1):,.0f}/s) -> {db_path}")
+    for table, n in sorted(summary["counts"].items(), key=lambda kv: -kv[1]):
+        print(f"  {table:<22}{n:>12,}")
+    print(f"\nNutzen mit: PULSE_DB_BACKEND=local PULSE_DB_PATH={db_path} ...")
+
+
+if __name__ == "__main__":
+    main()
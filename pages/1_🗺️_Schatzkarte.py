@@ -6,15 +6,13 @@ Die interaktive Lern-Weltkarte im RPG-Stil!
 import streamlit as st
 from schatzkarte.map_data import ISLANDS
 from schatzkarte.map_db import (
-    get_collected_treasures,
-    get_island_progress,
-    get_all_island_progress,
+    get_map_bootstrap,
     complete_island_action,
     save_treasure_collected
 )
 from schatzkarte.map_progress import get_unlocked_islands
-from schatzkarte.map_ships import check_and_render_modals, get_ships_css, render_polarstern_ship_html, get_polarstern_data
-from utils.gamification_db import get_user_stats, calculate_level
+from schatzkarte.map_ships import check_and_render_modals, get_ships_css, render_polarstern_ship_html
+from utils.gamification_db import calculate_level, xp_batch
 from utils.user_system import (
     is_logged_in,
     get_current_user,
@@ -28,8 +26,10 @@ from utils.user_system import (
     is_coach
 )
 from utils.page_config import get_page_path
+from utils.parallel_fetch import fetch_parallel, fetch_task, get_fetch_timings
+from utils.cache import invalidate_user
+from utils.streaks import STREAM_CHALLENGE, get_streaks
 from utils.lerngruppen_db import (
-    get_user_group,
     get_meeting_access,
     record_meeting_join,
     record_meeting_leave,
@@ -127,26 +127,29 @@ if not zeige_schatzkarte():
 # DATEN LADEN
 # ===============================================================
 
-@st.cache_data(ttl=30)
-def load_user_data(user_id):
-    """Laedt alle User-Daten fuer die React-Komponente.
+def load_user_data(bootstrap, streaks=None):
+    """Bereitet die User-Daten fuer die React-Komponente auf.
 
-    OPTIMIERUNG: Gecacht mit TTL=30s. user_id als Parameter statt Outer-Scope-Referenz,
-    damit @st.cache_data die Funktion korrekt hashen kann.
-    Profitiert zusaetzlich vom Caching der aufgerufenen Sub-Funktionen.
+    OPTIMIERUNG: Keine eigenen Queries mehr — alle Daten kommen aus
+    get_map_bootstrap() (1 RPC, gecacht mit TTL=30s) und get_streaks()
+    (alle Streams in 1 Query, abgelaufene Streaks = 0).
     """
-    stats = get_user_stats(user_id)
+    stats = bootstrap["stats"]
 
     # XP und Level berechnen
-    total_xp = stats.get('xp_total', 0)
-    current_streak = stats.get('current_streak', 0)
+    total_xp = stats.get('xp_total') or 0
+    challenge_streak = (streaks or {}).get(STREAM_CHALLENGE)
+    if challenge_streak:
+        current_streak = challenge_streak["current_streak"]
+    else:
+        current_streak = stats.get('current_streak') or 0
     level_info = calculate_level(total_xp)
 
     # Gesammelte Schaetze
-    collected_treasures = get_collected_treasures(user_id)
+    collected_treasures = bootstrap["collected_treasures"]
 
-    # Fortschritt fuer ALLE Inseln in einer Query laden
-    all_progress = get_all_island_progress(user_id)
+    # Fortschritt fuer ALLE Inseln (bereits im Bootstrap enthalten)
+    all_progress = bootstrap["island_progress"]
     user_progress = {}
     for island_id in ISLANDS.keys():
         progress = all_progress.get(island_id)
@@ -271,25 +274,23 @@ def _build_meeting_dict(access, uid, display_name, user_role):
     }
 
 
-def load_meeting_data(uid):
+def load_meeting_data(uid, bootstrap):
     """Laedt Meeting-Daten fuer das Floating Jitsi Widget.
     Sucht als Mitglied UND als Coach nach aktiven Meetings.
-    Bei Coaches mit mehreren Gruppen: allMeetings-Array mit allen Meetings + JWTs."""
-    try:
-        from utils.lerngruppen_db import get_coach_groups
+    Bei Coaches mit mehreren Gruppen: allMeetings-Array mit allen Meetings + JWTs.
 
-        # Gleicher Ansatz wie load_chat_data: is_coach(uid) + get_coach_groups()
+    Gruppen (Coach + Mitglied) kommen aus get_map_bootstrap() — keine eigenen Queries."""
+    try:
         group_entries = []  # [{group_id, name}]
         seen_ids = set()
 
         if is_coach(uid):
-            coach_groups = get_coach_groups(uid) or []
-            for cg in coach_groups:
-                group_entries.append({"group_id": cg["group_id"], "name": cg.get("name", "Gruppe")})
+            for cg in bootstrap["coach_groups"]:
+                group_entries.append({"group_id": cg["group_id"], "name": cg.get("name") or "Gruppe"})
                 seen_ids.add(cg["group_id"])
 
         # Auch als Mitglied pruefen (falls nicht schon als Coach-Gruppe)
-        group = get_user_group(uid)
+        group = bootstrap["group"]
         if group and group["group_id"] not in seen_ids:
             group_entries.append({"group_id": group["group_id"], "name": group.get("name", "Meine Gruppe")})
             seen_ids.add(group["group_id"])
@@ -310,9 +311,16 @@ def load_meeting_data(uid):
         best_access = None
         best_group_entry = None
 
+        # Meeting-Zugang aller Gruppen parallel abfragen (Coach mit N Gruppen = 1 Latenz statt N)
+        accesses = fetch_parallel({
+            entry["group_id"]: fetch_task(get_meeting_access, entry["group_id"], uid, user_role,
+                                          timeout=5, fallback=None)
+            for entry in group_entries
+        }, label="meetings")
+
         for entry in group_entries:
             gid = entry["group_id"]
-            access = get_meeting_access(gid, uid, user_role)
+            access = accesses.get(gid)
             if not access or not access.get("meeting"):
                 continue
 
@@ -366,11 +374,19 @@ if not HAS_REACT_COMPONENT:
     """)
     st.stop()
 
-# Daten laden
-user_data = load_user_data(user_id)
+# Daten laden: Bootstrap (1 Round-Trip fuer Stats, Schaetze, Fortschritt, Gruppe, Polarstern),
+# Streaks und Chat sind unabhaengig -> parallel. Ohne Bootstrap keine Karte (kein Fallback,
+# stattdessen ein zweiter Versuch im Seiten-Thread), Chat ist optional (Fallback None = Widget ausgeblendet).
+_fetched = fetch_parallel({
+    "bootstrap": fetch_task(get_map_bootstrap, user_id, timeout=20, retry_sync=True),
+    "streaks": fetch_task(get_streaks, [user_id], timeout=8, fallback={}),
+    "chat": None if is_preview_mode() else fetch_task(load_chat_data, user_id, timeout=8, fallback=None),
+}, label="schatzkarte")
+bootstrap = _fetched["bootstrap"]
+user_data = load_user_data(bootstrap, _fetched["streaks"].get(user_id))
 islands = convert_islands_for_react()
 hero_data = create_hero_data(user_data)
-unlocked_islands = get_unlocked_islands(user_id)
+unlocked_islands = get_unlocked_islands(user_id, bootstrap=bootstrap)
 
 # Demo-Modus: TEMPORAER nur 3 Inseln freischalten (Basiscamp, Mental Stark, Cleverer Lernen)
 if is_preview_mode() or user_id == "preview_user":
@@ -565,7 +581,7 @@ if check_and_render_modals(user_id, age_group):
 st.markdown(get_ships_css(), unsafe_allow_html=True)
 
 # Pulsierender Polarstern-Button oben rechts (als Floating-Element)
-polarstern_data = get_polarstern_data(user_id)
+polarstern_data = bootstrap["polarstern"]
 active_goals = polarstern_data.get('active', 0)
 badge_html = f'<span style="background:#FFD700;color:#1a237e;border-radius:10px;padding:2px 8px;font-size:0.75em;margin-left:5px;">{active_goals}</span>' if active_goals > 0 else ''
 
@@ -618,40 +634,28 @@ except Exception:
     preview_mode = False
     logged_in = False
 
-# Meeting-Daten laden (fuer Floating Jitsi Widget)
+# Meeting-Daten laden (fuer Floating Jitsi Widget, Gruppen aus dem Bootstrap)
 meeting_data = None
 if not is_preview_mode():
-    meeting_data = load_meeting_data(user_id)
+    meeting_data = load_meeting_data(user_id, bootstrap)
 
-# Chat-Daten laden (fuer Floating Chat Widget)
-chat_data = None
-if not is_preview_mode():
-    try:
-        chat_data = load_chat_data(user_id)
-    except Exception:
-        chat_data = None
+# Chat-Daten (fuer Floating Chat Widget) wurden oben parallel zum Bootstrap geladen
+chat_data = _fetched["chat"]
 
 # Arena-Daten laden (Supabase-Credentials fuer Einmaleins-Arena)
 arena_data = None
 if not is_preview_mode():
     try:
-        group = get_user_group(user_id)
-        coach_group_ids = []
-        if is_coach():
-            from utils.database import get_db
-            db = get_db()
-            coach_groups = db.table("learning_groups") \
-                .select("group_id") \
-                .eq("coach_id", user_id) \
-                .eq("is_active", 1) \
-                .execute()
-            coach_group_ids = [cg["group_id"] for cg in (coach_groups.data or [])]
+        # Gruppen kommen aus dem Bootstrap (keine eigene learning_groups-Query mehr)
+        group = bootstrap["group"]
+        coach_group_ids = bootstrap["coach_group_ids"]
+        arena_is_coach = is_coach()
         arena_data = {
             "userId": user_id,
             "supabaseUrl": st.secrets["SUPABASE_URL"],
             "supabaseAnonKey": st.secrets["SUPABASE_KEY"],
-            "isCoach": bool(is_coach()),
-            "groupIds": coach_group_ids if is_coach() else ([group["group_id"]] if group else []),
+            "isCoach": bool(arena_is_coach),
+            "groupIds": coach_group_ids if arena_is_coach else ([group["group_id"]] if group else []),
         }
     except Exception:
         arena_data = None
@@ -781,36 +785,38 @@ if result:
     if action_key != last_action:
         st.session_state["last_schatzkarte_action"] = action_key
 
-        if action == "quest_completed":
-            quest_type = result.get("questType")
-
-            # Fortschritt speichern
-            progress_key = {
-                "wisdom": "video_watched",
-                "video": "video_watched",
-                "video-watched": "video_watched",
-                "scroll": "explanation_read",
-                "battle": "quiz_passed",
-                "quiz": "quiz_passed",
-                "challenge": "challenge_completed"
-            }.get(quest_type)
-
-            if progress_key and island_id:
-                # complete_island_action vergibt automatisch XP
-                earned = complete_island_action(user_id, island_id, progress_key)
-                if earned > 0:
-                    st.toast(f"✅ Quest abgeschlossen! +{earned} XP", icon="⭐")
-
-        elif action == "treasure_collected":
-            treasure_id = result.get("treasureId")
-            xp_earned = result.get("xpEarned", 0)
-
-            if island_id and treasure_id:
-                # save_treasure_collected vergibt automatisch XP
-                was_new = save_treasure_collected(user_id, island_id, treasure_id, xp_earned)
-                if was_new:
-                    st.balloons()
-                    st.toast(f"💎 Schatz gesammelt! +{xp_earned} XP", icon="🎉")
+        # XP aller Aktionen dieses Reruns -> 1 atomarer grant_xp-RPC
+        with xp_batch():
+            if action == "quest_completed":
+                quest_type = result.get("questType")
+
+                # Fortschritt speichern
+                progress_key = {
+                    "wisdom": "video_watched",
+                    "video": "video_watched",
+                    "video-watched": "video_watched",
+                    "scroll": "explanation_read",
+                    "battle": "quiz_passed",
+                    "quiz": "quiz_passed",
+                    "challenge": "challenge_completed"
+                }.get(quest_type)
+
+                if progress_key and island_id:
+                    # complete_island_action vergibt automatisch XP
+                    earned = complete_island_action(user_id, island_id, progress_key)
+                    if earned > 0:
+                        st.toast(f"✅ Quest abgeschlossen! +{earned} XP", icon="⭐")
+
+            elif action == "treasure_collected":
+                treasure_id = result.get("treasureId")
+                xp_earned = result.get("xpEarned", 0)
+
+                if island_id and treasure_id:
+                    # save_treasure_collected vergibt automatisch XP
+                    was_new = save_treasure_collected(user_id, island_id, treasure_id, xp_earned)
+                    if was_new:
+                        st.balloons()
+                        st.toast(f"💎 Schatz gesammelt! +{xp_earned} XP", icon="🎉")
 
 # ===============================================================
 # SIDEBAR (optional - fuer Entwickler)
@@ -824,6 +830,14 @@ with st.sidebar:
             st.write(f"**XP:** {user_data['xp']}")
             st.write(f"**Freigeschaltet:** {len(unlocked_islands)} Inseln")
 
+            # Ladezeiten der parallelen Reads (letzter Render)
+            for _label, _timing in get_fetch_timings().items():
+                _branches = ", ".join(
+                    f"{name} {b['ms']:.0f} ms" + ("" if b["status"] == "ok" else f" ({b['status']})")
+                    for name, b in _timing["branches"].items()
+                )
+                st.caption(f"⏱️ {_label}: {_timing['total_ms']:.0f} ms — {_branches}")
+
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("🔄 Neu laden"):
@@ -835,6 +849,7 @@ with st.sidebar:
                     _db = get_db()
                     _db.table("island_progress").delete().eq("user_id", user_id).execute()
                     _db.table("user_treasures").delete().eq("user_id", user_id).execute()
+                    invalidate_user(user_id)
                     # Session-State zuruecksetzen
                     st.session_state["last_schatzkarte_action"] = ""
                     st.toast("🗑️ Fortschritt zurückgesetzt!", icon="✅")
@@ -250,7 +250,7 @@ elif factor == "EXT_MOTIV":
     if HAS_GAMIFICATION and is_logged_in():
         user = get_current_user()
         if user:
-            from utils.gamification_db import update_user_stats, get_or_create_user
+            from utils.gamification_db import queue_xp, xp_batch
 
             user_data = {
                 "user_id": user.get("user_id", "anonymous"),
@@ -259,12 +259,11 @@ elif factor == "EXT_MOTIV":
             }
 
             def award_xp_callback(user_id, xp, reason):
-                """Vergibt XP an den User."""
-                u = get_or_create_user(user_id)
-                current_streak = u.get("current_streak", 0)
-                update_user_stats(user_id, xp, current_streak)
+                """Vergibt XP an den User (gesammelt per xp_batch, 1 RPC pro Rerun)."""
+                queue_xp(user_id, xp, "motivation", {"reason": reason})
 
-            render_motivation_altersstufen(color, conn=None, user_data=user_data, xp_callback=award_xp_callback)
+            with xp_batch():
+                render_motivation_altersstufen(color, conn=None, user_data=user_data, xp_callback=award_xp_callback)
         else:
             render_motivation_altersstufen(color)
     else:
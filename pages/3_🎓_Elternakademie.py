@@ -36,9 +36,9 @@ from utils.coaching_db import (
 )
 from utils.scale_info import get_scale_info
 from utils.questionnaire_builder import (
-    load_items_for_scales, group_items_by_scale, estimate_questionnaire_duration
+    group_items_by_scale, estimate_questionnaire_duration
 )
-from utils.german_labels import add_german_labels_to_value_labels
+from utils.questionnaire_compiler import compile_questionnaire
 
 # ============================================
 # ELTERN-UNTERSTÜTZUNGS CONFIGURATION
@@ -421,7 +421,7 @@ if st.session_state.get('selected_student_id'):
         with col2:
             # Estimate duration
             try:
-                items, _, _ = load_items_for_scales(st.session_state.selected_scales)
+                items, _, _ = compile_questionnaire(st.session_state.selected_scales)
                 duration = estimate_questionnaire_duration(items)
                 st.metric("Geschätzte Dauer", f"{duration} Min")
             except Exception as e:
@@ -430,11 +430,8 @@ if st.session_state.get('selected_student_id'):
         # Generate questionnaire button
         if st.button("📄 Fragebogen generieren", type="primary", use_container_width=True):
             try:
-                # Load items and labels
-                items, value_labels, fragestamm = load_items_for_scales(st.session_state.selected_scales)
-
-                # Apply German labels
-                value_labels = add_german_labels_to_value_labels(value_labels, items)
+                # Load items and labels (German labels included)
+                items, value_labels, fragestamm = compile_questionnaire(st.session_state.selected_scales)
 
                 # Store in session state for questionnaire display
                 st.session_state.questionnaire_items = items
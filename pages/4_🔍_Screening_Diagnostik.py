@@ -34,12 +34,10 @@ from utils.coaching_db import (
 )
 from utils.scale_info import SCALE_CATEGORIES, get_scale_info
 from utils.questionnaire_builder import (
-    load_items_for_scales, group_items_by_scale, estimate_questionnaire_duration
+    group_items_by_scale, estimate_questionnaire_duration
 )
-from utils.grade_specific_items import (
-    extract_grade_from_class, adapt_matheff_for_grade
-)
-from utils.german_labels import add_german_labels_to_value_labels
+from utils.questionnaire_compiler import compile_questionnaire
+from utils.grade_specific_items import extract_grade_from_class
 
 # ============================================
 # SCREENING CONFIGURATION
@@ -390,7 +388,7 @@ if st.session_state.screening_student_id:
 
                     # Load items for this scale
                     try:
-                        items, _, _ = load_items_for_scales([scale_code])
+                        items, _, _ = compile_questionnaire([scale_code])
                         st.markdown(f"*Anzahl Items: {len(items)}*")
 
                         # Show first 3 items as preview
@@ -472,38 +470,12 @@ if st.session_state.get('show_screening_form', False):
         """)
         st.warning("⚠️ Klassenstufe nicht erkannt - verwende Standard-MATHEFF-Items (Klasse 8)")
 
-    # Load items with grade-specific adaptation
-    if 'MATHEFF' in current_scales and student_grade:
-        # Load other scales normally
-        other_scales = [s for s in current_scales if s != 'MATHEFF']
-
-        if other_scales:
-            other_items, other_labels, other_fragestamm = load_items_for_scales(other_scales)
-        else:
-            other_items, other_labels, other_fragestamm = [], {}, {}
-
-        # Load grade-specific MATHEFF items
-        matheff_items_orig, _, _ = load_items_for_scales(['MATHEFF'])
-        matheff_items, matheff_labels, matheff_fragestamm = adapt_matheff_for_grade(
-            student_grade, matheff_items_orig
-        )
-
-        # Combine all items
-        items = other_items + matheff_items
-        value_labels = {**other_labels, **matheff_labels}
-        fragestamm = {**other_fragestamm, 'MATHEFF': matheff_fragestamm}
-
-        # Add German labels to other scales (matheff_labels already have German labels)
-        value_labels = add_german_labels_to_value_labels(value_labels, items)
+    # Load items (grade-specific MATHEFF + German labels) from the compiled bundle
+    items, value_labels, fragestamm = compile_questionnaire(current_scales, student_grade)
 
+    if 'MATHEFF' in current_scales and student_grade:
         # Show grade info
         st.success(f"✅ MATHEFF-Items angepasst für Klassenstufe {student_grade}")
-    else:
-        # Standard loading without grade adaptation
-        items, value_labels, fragestamm = load_items_for_scales(current_scales)
-
-    # Add German labels
-    value_labels = add_german_labels_to_value_labels(value_labels, items)
 
     # Deduplicate items by variable_name to avoid duplicate keys in Streamlit
     seen_variables = set()
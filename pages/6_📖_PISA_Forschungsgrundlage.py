@@ -23,11 +23,14 @@ if not ENABLE_PISA:
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
-import sqlite3
 import sys
 sys.path.append('..')
 
 from utils.scale_info import get_scale_info, SCALE_CATEGORIES
+from utils.db_loader import load_student_columns
+from utils.pisa_stats import (
+    KEY_SCALES, PERFORMANCE, load_stats, correlations_with, quadrant_density, quadrant_of
+)
 
 # ============================================
 # HELPER FUNCTIONS
@@ -35,48 +38,44 @@ from utils.scale_info import get_scale_info, SCALE_CATEGORIES
 
 @st.cache_data
 def load_pisa_summary_stats():
-    """Lade zusammenfassende PISA-Statistiken"""
-    conn = sqlite3.connect('pisa_2022_germany.db')
-
+    """Lade zusammenfassende PISA-Statistiken (vorberechnet, sonst aus der DB)"""
     # Wichtigste Skalen
-    key_scales = ['MATHEFF', 'ANXMAT', 'BELONG', 'TEACHSUP', 'PERSEVAGR']
+    key_scales = KEY_SCALES
+
+    precomputed = load_stats()
+    if precomputed is not None:
+        return {
+            scale: {k: precomputed['summary'].get(scale, {}).get(k) for k in ('mean', 'n')}
+            for scale in key_scales
+        }
 
     stats = {}
     for scale in key_scales:
         try:
-            query = f"""
-            SELECT
-                AVG({scale}) as mean,
-                COUNT({scale}) as n
-            FROM student_data
-            WHERE {scale} IS NOT NULL
-            """
-            df = pd.read_sql_query(query, conn)
+            values = load_student_columns([scale], not_null=[scale])[scale]
             stats[scale] = {
-                'mean': df['mean'].iloc[0],
-                'n': int(df['n'].iloc[0])
+                'mean': values.mean() if len(values) > 0 else None,
+                'n': int(len(values))
             }
         except:
             stats[scale] = {'mean': None, 'n': 0}
 
-    conn.close()
     return stats
 
 @st.cache_data
 def calculate_correlations():
-    """Berechne Korrelationen mit Matheleistung"""
-    conn = sqlite3.connect('pisa_2022_germany.db')
-
-    query = """
-    SELECT
-        MATHEFF, ANXMAT, BELONG, TEACHSUP, PERSEVAGR,
-        PV1MATH as performance
-    FROM student_data
-    WHERE PV1MATH IS NOT NULL
-    """
-
-    df = pd.read_sql_query(query, conn)
-    conn.close()
+    """Berechne Korrelationen mit Matheleistung (vorberechnet, sonst aus der DB)"""
+    precomputed = load_stats()
+    if precomputed is not None:
+        return {
+            col: r for col, r in correlations_with(precomputed, PERFORMANCE).items()
+            if col in KEY_SCALES
+        }
+
+    df = load_student_columns(
+        ['MATHEFF', 'ANXMAT', 'BELONG', 'TEACHSUP', 'PERSEVAGR', 'PV1MATH'],
+        not_null=['PV1MATH']
+    ).rename(columns={'PV1MATH': 'performance'})
 
     correlations = {}
     for col in ['MATHEFF', 'ANXMAT', 'BELONG', 'TEACHSUP', 'PERSEVAGR']:
@@ -86,6 +85,41 @@ def calculate_correlations():
 
     return correlations
 
+@st.cache_data
+def load_quadrant_data():
+    """
+    Punkte für die Quadranten-Grafik
+
+    Vorberechnet: ein Punkt pro besetzter Zelle des 2D-Histogramms (alle
+    Schüler, Größe = Anzahl). Ohne Artefakt: bis zu 1000 Schüler aus der DB.
+
+    Returns:
+        Tuple: (DataFrame mit MATHEFF, ANXMAT, Anzahl, Quadrant,
+                Median MATHEFF, Median ANXMAT)
+    """
+    precomputed = load_stats()
+    if precomputed is not None and precomputed.get('quadrant'):
+        medians = precomputed['quadrant']['medians']
+        return pd.DataFrame(quadrant_density(precomputed)), medians['MATHEFF'], medians['ANXMAT']
+
+    df_quad = load_student_columns(
+        ['MATHEFF', 'ANXMAT', 'PV1MATH'],
+        not_null=['MATHEFF', 'ANXMAT', 'PV1MATH'],
+        limit=1000
+    ).rename(columns={'PV1MATH': 'performance'})
+
+    # Berechne Mediane
+    matheff_median = df_quad['MATHEFF'].median()
+    anxmat_median = df_quad['ANXMAT'].median()
+
+    # Quadranten zuweisen
+    df_quad['Quadrant'] = [
+        quadrant_of(m, a, matheff_median, anxmat_median)
+        for m, a in zip(df_quad['MATHEFF'], df_quad['ANXMAT'])
+    ]
+    df_quad['Anzahl'] = 1
+    return df_quad, matheff_median, anxmat_median
+
 # ============================================
 # MAIN APP
 # ============================================
@@ -263,35 +297,7 @@ with tab3:
     """)
 
     # Lade Daten für Quadranten
-    conn = sqlite3.connect('pisa_2022_germany.db')
-    query = """
-    SELECT
-        MATHEFF, ANXMAT, PV1MATH as performance
-    FROM student_data
-    WHERE MATHEFF IS NOT NULL
-      AND ANXMAT IS NOT NULL
-      AND PV1MATH IS NOT NULL
-    LIMIT 1000
-    """
-    df_quad = pd.read_sql_query(query, conn)
-    conn.close()
-
-    # Berechne Mediane
-    matheff_median = df_quad['MATHEFF'].median()
-    anxmat_median = df_quad['ANXMAT'].median()
-
-    # Quadranten zuweisen
-    def assign_quadrant(row):
-        if row['MATHEFF'] >= matheff_median and row['ANXMAT'] < anxmat_median:
-            return 'Q1: Optimal'
-        elif row['MATHEFF'] >= matheff_median and row['ANXMAT'] >= anxmat_median:
-            return 'Q2: Ambivalent'
-        elif row['MATHEFF'] < matheff_median and row['ANXMAT'] >= anxmat_median:
-            return 'Q3: Risikogruppe'
-        else:
-            return 'Q4: Angstfrei, aber unsicher'
-
-    df_quad['Quadrant'] = df_quad.apply(assign_quadrant, axis=1)
+    df_quad, matheff_median, anxmat_median = load_quadrant_data()
 
     # Visualisierung
     fig = px.scatter(
@@ -305,6 +311,8 @@ with tab3:
             'Q3: Risikogruppe': '#ff6b6b',
             'Q4: Angstfrei, aber unsicher': '#87CEEB'
         },
+        size='Anzahl',
+        size_max=18 if df_quad['Anzahl'].max() > 1 else 6,
         opacity=0.6,
         title="PISA 2022: Selbstwirksamkeit vs. Mathe-Angst"
     )
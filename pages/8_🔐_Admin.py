@@ -7,11 +7,19 @@ Verwaltung von Benutzer-Rollen.
 Zugang nur mit Admin-Passwort.
 """
 
+from datetime import datetime
+
 import streamlit as st
 from utils.user_system import (
     get_all_users, get_user_role, set_user_role,
     ROLE_STUDENT, ROLE_COACH, ROLE_ADMIN
 )
+from utils.db_instrumentation import (
+    call_site_stats, render_stats, get_calls, reset_instrumentation,
+    export_jsonl, export_prometheus, load_instrumentation_config
+)
+from utils.db_transport import get_transport_metrics, reset_transport_metrics
+from utils.cache import cache_stats
 
 # ============================================
 # KONFIGURATION
@@ -26,6 +34,10 @@ st.set_page_config(
 # Admin-Passwort (aendern fuer Produktion!)
 ADMIN_PASSWORD = "puls2024"
 
+# Zielverzeichnis fuer Performance-Exporte (JSONL-Exporte mit Zeitstempel,
+# damit sie nicht an den laufenden jsonl_path aus secrets.toml anhaengen)
+PERF_EXPORT_DIR = "perf"
+
 # ============================================
 # PASSWORT-SCHUTZ
 # ============================================
@@ -66,7 +78,7 @@ def main():
     st.success("✅ Angemeldet als Administrator")
 
     # Tabs
-    tab1, tab2 = st.tabs(["👥 Benutzer-Rollen", "📊 Statistiken"])
+    tab1, tab2, tab3 = st.tabs(["👥 Benutzer-Rollen", "📊 Statistiken", "⏱️ Performance"])
 
     with tab1:
         render_user_roles()
@@ -74,6 +86,9 @@ def main():
     with tab2:
         render_statistics()
 
+    with tab3:
+        render_performance()
+
 
 @st.fragment
 def render_user_roles():
@@ -220,6 +235,79 @@ def render_statistics():
         st.markdown(f"{medal} **{user.get('display_name', 'Unbekannt')}** - {user.get('xp_total', 0):,} XP (Level {user.get('level', 1)})")
 
 
+
+@st.fragment
+def render_performance():
+    """Supabase-Calls pro Render und Aufrufstelle (alle Sessions dieses Prozesses)."""
+
+    st.markdown("### ⏱️ Supabase-Performance")
+    st.caption("Daten seit Prozessstart bzw. letztem Reset. Quelle: utils/db_instrumentation.py")
+
+    # Transport / Connection-Pool
+    metrics = get_transport_metrics()
+    cols = st.columns(5)
+    with cols[0]:
+        st.metric("Requests", metrics["requests"])
+    with cols[1]:
+        st.metric("Laufend (max)", f"{metrics['in_flight']} ({metrics['max_in_flight']})")
+    with cols[2]:
+        st.metric("Pool-Auslastung", f"{metrics['saturation']:.0%}")
+    with cols[3]:
+        st.metric("Retries", metrics["retries"])
+    with cols[4]:
+        st.metric("Fehler", metrics["failures"])
+
+    st.markdown("---")
+
+    # Calls pro Render
+    st.markdown("#### 🔁 Calls pro Render")
+    renders = render_stats()
+    if renders:
+        st.dataframe(renders, use_container_width=True, hide_index=True)
+    else:
+        if load_instrumentation_config()["enabled"]:
+            st.info("Noch keine Supabase-Calls aufgezeichnet.")
+        else:
+            st.info("Instrumentierung ist aus. Einschalten in .streamlit/secrets.toml: "
+                    "`[supabase_instrumentation]` mit `enabled = true`.")
+        return
+
+    # Aufrufstellen
+    st.markdown("#### 📍 Aufrufstellen (langsamste zuerst)")
+    pages = sorted({r["page"] for r in renders})
+    page = st.selectbox("Seite", ["Alle"] + pages, key="perf_page")
+    st.dataframe(
+        call_site_stats(None if page == "Alle" else page),
+        use_container_width=True,
+        hide_index=True
+    )
+
+    with st.expander("🧾 Letzte 50 Calls"):
+        st.dataframe(list(reversed(get_calls(50))), use_container_width=True, hide_index=True)
+
+    with st.expander("🗄️ Cache-Eintraege"):
+        st.json(cache_stats())
+
+    # Export / Reset
+    st.markdown("---")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("💾 Export JSONL", use_container_width=True):
+            path = f"{PERF_EXPORT_DIR}/supabase_calls_{datetime.now():%Y%m%d_%H%M%S}.jsonl"
+            count = export_jsonl(path)
+            st.success(f"{count} Calls nach {path} geschrieben")
+    with col2:
+        if st.button("📈 Export Prometheus", use_container_width=True):
+            path = f"{PERF_EXPORT_DIR}/supabase.prom"
+            export_prometheus(path)
+            st.success(f"Metriken nach {path} geschrieben")
+    with col3:
+        if st.button("🗑️ Zuruecksetzen", use_container_width=True):
+            reset_instrumentation()
+            reset_transport_metrics()
+            st.rerun(scope="fragment")
+
+
 # ============================================
 # ENTRY POINT
 # ============================================
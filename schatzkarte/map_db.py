@@ -2,17 +2,20 @@
 """Datenbank fuer Schatzkarte.
 
 PERFORMANCE-OPTIMIERUNG:
-- @st.cache_data(ttl=60) auf Read-Funktionen
-- .clear() bei Write-Operationen
+- @tagged_cache auf Read-Funktionen (Tag "user:<id>")
+- invalidate_user() bei Write-Operationen (nur der betroffene User)
 - Doppelte get_all_island_progress() entfernt (war Zeile 123 + 196)
+- get_map_bootstrap(): kompletter Karten-Payload in 1 RPC statt 10-20 REST-Calls
 """
-import streamlit as st
 from datetime import datetime
-from typing import List, Tuple
+from typing import Any, Dict, List, Tuple
 
 # Import der XP-Funktion aus gamification_db
-from utils.gamification_db import update_user_stats, get_or_create_user
+from utils.gamification_db import queue_xp, xp_batch, get_user_stats, finalize_user_stats
 from utils.database import get_db
+from utils.db_errors import is_missing_constraint
+from utils.local_rpc import register_local_rpc
+from utils.cache import tagged_cache, user_tag, group_tag, invalidate_user
 
 def init_map_tables():
     """Keine Initialisierung nötig — Tabellen existieren in Supabase."""
@@ -23,39 +26,18 @@ def init_map_tables():
 # ===============================================================
 
 def save_treasure_collected(user_id: str, island_id: str, treasure_id: str, xp: int) -> bool:
-    """Speichert einen gesammelten Schatz. Returns: True wenn neu, False wenn bereits vorhanden."""
-    db = get_db()
-
-    # Prüfe ob bereits gesammelt
-    existing = db.table("user_treasures") \
-        .select("user_id") \
-        .eq("user_id", user_id) \
-        .eq("island_id", island_id) \
-        .eq("treasure_id", treasure_id) \
-        .execute()
-
-    if existing.data:
-        return False
-
-    db.table("user_treasures").insert({
-        "user_id": user_id,
-        "island_id": island_id,
-        "treasure_id": treasure_id,
-        "xp_earned": xp
-    }).execute()
+    """Speichert einen gesammelten Schatz. Returns: True wenn neu, False wenn bereits vorhanden.
 
-    # XP zum User hinzufuegen
-    user = get_or_create_user(user_id)
-    current_streak = user.get('current_streak', 0)
-    update_user_stats(user_id, xp, current_streak)
-
-    # ✅ Cache invalidieren nach Write
-    get_collected_treasures.clear()
-
-    return True
+    OPTIMIERUNG: 1 Upsert (ON CONFLICT DO NOTHING) statt select + insert —
+    auch bei Doppelklick wird der Schatz (und seine XP) nur einmal gebucht.
+    """
+    result = apply_island_actions(user_id, [
+        {"type": "treasure", "island_id": island_id, "treasure_id": treasure_id, "xp": xp}
+    ])
+    return bool(result["treasures"])
 
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda user_id: [user_tag(user_id)])
 def get_collected_treasures(user_id: str) -> List[Tuple[str, str]]:
     """Laedt alle gesammelten Schaetze. Returns: Liste von (island_id, treasure_id).
 
@@ -116,14 +98,7 @@ def get_island_progress(user_id: str, island_id: str) -> dict:
         .execute()
 
     if result.data:
-        row = result.data[0]
-        return {
-            "video_watched": bool(row.get("video_watched")),
-            "explanation_read": bool(row.get("explanation_read")),
-            "quiz_passed": bool(row.get("quiz_passed")),
-            "quiz_score": row.get("quiz_score"),
-            "challenge_completed": bool(row.get("challenge_completed")),
-        }
+        return _progress_from_row(result.data[0])
 
     return {
         "video_watched": False,
@@ -134,7 +109,7 @@ def get_island_progress(user_id: str, island_id: str) -> dict:
     }
 
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda user_id: [user_tag(user_id)])
 def get_all_island_progress(user_id: str) -> dict:
     """Holt den Fortschritt eines Users fuer ALLE Inseln in einer Query.
 
@@ -147,65 +122,186 @@ def get_all_island_progress(user_id: str) -> dict:
         .eq("user_id", user_id) \
         .execute()
 
-    progress_map = {}
-    for row in result.data:
-        progress_map[row["island_id"]] = {
-            "video_watched": bool(row.get("video_watched")),
-            "explanation_read": bool(row.get("explanation_read")),
-            "quiz_passed": bool(row.get("quiz_passed")),
-            "quiz_score": row.get("quiz_score"),
-            "challenge_completed": bool(row.get("challenge_completed")),
-        }
-    return progress_map
+    return {row["island_id"]: _progress_from_row(row) for row in result.data}
+
+
+def _progress_from_row(row: dict) -> dict:
+    """Wandelt eine island_progress-Zeile in das Fortschritts-Dict um."""
+    return {
+        "video_watched": bool(row.get("video_watched")),
+        "explanation_read": bool(row.get("explanation_read")),
+        "quiz_passed": bool(row.get("quiz_passed")),
+        "quiz_score": row.get("quiz_score"),
+        "challenge_completed": bool(row.get("challenge_completed")),
+    }
 
 
 def complete_island_action(user_id: str, island_id: str, action: str, extra_data: dict = None) -> int:
-    """Markiert eine Aktion als abgeschlossen und vergibt XP."""
-    # Prüfe ob bereits erledigt
-    progress = get_island_progress(user_id, island_id)
-    if progress.get(action):
-        return 0
+    """Markiert eine Aktion als abgeschlossen und vergibt XP.
 
-    db = get_db()
-    now = datetime.now().isoformat()
+    OPTIMIERUNG: Bedingtes Update (nur wenn noch nicht erledigt) statt
+    get_island_progress + select + update/insert — 1 Round-Trip, bei der
+    ersten Aktion einer Insel 2. XP nur wenn die Aktion wirklich neu ist.
+    """
+    result = apply_island_actions(user_id, [
+        {"type": "progress", "island_id": island_id, "action": action, "extra_data": extra_data}
+    ])
+    return result["xp"]
 
-    # Prüfe ob Eintrag existiert
-    existing = db.table("island_progress") \
-        .select("user_id") \
-        .eq("user_id", user_id) \
-        .eq("island_id", island_id) \
-        .execute()
 
-    update_data = {
-        action: True,
-        f"{action}_at": now,
-        "updated_at": now
-    }
+def apply_island_actions(user_id: str, actions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Bucht mehrere Schatzkarten-Aktionen auf einmal (idempotent).
 
-    if action == "quiz_passed" and extra_data and "score" in extra_data:
-        update_data["quiz_score"] = extra_data["score"]
+    Args:
+        actions: Liste von
+            {"type": "treasure", "island_id", "treasure_id", "xp"}
+            {"type": "progress", "island_id", "action", "extra_data" (optional)}
+            action ist ein Schluessel aus XP_REWARDS.
 
-    if existing.data:
-        db.table("island_progress").update(update_data) \
-            .eq("user_id", user_id) \
-            .eq("island_id", island_id) \
-            .execute()
-    else:
-        update_data["user_id"] = user_id
-        update_data["island_id"] = island_id
-        db.table("island_progress").insert(update_data).execute()
+    Returns:
+        {"treasures": [(island_id, treasure_id) neu gesammelt],
+         "progress": [(island_id, action) neu abgeschlossen],
+         "xp": vergebene XP gesamt}
 
-    # XP vergeben
-    xp = XP_REWARDS.get(action, 0)
-    if xp > 0:
-        user = get_or_create_user(user_id)
-        current_streak = user.get('current_streak', 0)
-        update_user_stats(user_id, xp, current_streak)
+    Schaetze: 1 Upsert fuer alle. Fortschritt: 1 bedingtes Update pro
+    Aktion, fehlende Inseln gesammelt in 1 Upsert. XP: 1 grant_xp-RPC.
+    """
+    treasures = [a for a in actions if a.get("type") == "treasure"]
+    progress = [a for a in actions if a.get("type") == "progress" and a.get("action") in XP_REWARDS]
+
+    new_treasures = _upsert_treasures(user_id, treasures)
+    new_progress = _apply_progress_actions(user_id, progress)
+
+    xp_by_treasure = {(a["island_id"], a["treasure_id"]): a.get("xp", 0) for a in treasures}
+    total_xp = 0
+    with xp_batch():
+        for island_id, treasure_id in new_treasures:
+            xp = xp_by_treasure.get((island_id, treasure_id), 0)
+            if xp > 0:
+                queue_xp(user_id, xp, "treasure", {"island_id": island_id, "treasure_id": treasure_id})
+                total_xp += xp
+        for island_id, action in new_progress:
+            xp = XP_REWARDS.get(action, 0)
+            if xp > 0:
+                queue_xp(user_id, xp, f"island_{action}", {"island_id": island_id})
+                total_xp += xp
+
+    if new_treasures or new_progress:
+        # ✅ Cache invalidieren nach Write (nur dieser User, inkl. Bootstrap)
+        invalidate_user(user_id)
+
+    return {"treasures": new_treasures, "progress": new_progress, "xp": total_xp}
+
+
+def _upsert_treasures(user_id: str, treasures: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """Fuegt Schaetze ein, Duplikate werden ignoriert. Returns: neu eingefuegte."""
+    rows = {}
+    for a in treasures:
+        if a.get("island_id") and a.get("treasure_id"):
+            rows[(a["island_id"], a["treasure_id"])] = {
+                "user_id": user_id,
+                "island_id": a["island_id"],
+                "treasure_id": a["treasure_id"],
+                "xp_earned": a.get("xp", 0),
+            }
+    if not rows:
+        return []
 
-    # ✅ Cache invalidieren nach Write
-    get_all_island_progress.clear()
+    db = get_db()
+    try:
+        # ignore_duplicates -> PostgREST liefert nur die wirklich eingefuegten Zeilen
+        result = db.table("user_treasures") \
+            .upsert(list(rows.values()), on_conflict="user_id,island_id,treasure_id", ignore_duplicates=True) \
+            .execute()
+        return [(r["island_id"], r["treasure_id"]) for r in (result.data or [])]
+    except Exception as e:
+        # Unique-Index fehlt noch (sql/14 nicht ausgefuehrt): einzeln pruefen + einfuegen
+        if not is_missing_constraint(e):
+            raise
+        print(f"[map_db] Schatz-Upsert nicht moeglich, nutze Fallback: {e}")
+
+    inserted = []
+    for key, row in rows.items():
+        existing = db.table("user_treasures").select("user_id") \
+            .eq("user_id", user_id).eq("island_id", row["island_id"]).eq("treasure_id", row["treasure_id"]) \
+            .execute()
+        if existing.data:
+            continue
+        db.table("user_treasures").insert(row).execute()
+        inserted.append(key)
+    return inserted
 
-    return xp
+
+def _apply_progress_actions(user_id: str, actions: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """Setzt Fortschritts-Flags nur wenn noch nicht gesetzt. Returns: neu gesetzte."""
+    db = get_db()
+    now = datetime.now().isoformat()
+    new_actions = []
+    missing = []   # Aktionen, deren Insel evtl. noch keine Zeile hat
+
+    def flag_data(a: Dict[str, Any]) -> Dict[str, Any]:
+        data = {a["action"]: True, f"{a['action']}_at": now, "updated_at": now}
+        extra = a.get("extra_data") or {}
+        if a["action"] == "quiz_passed" and "score" in extra:
+            data["quiz_score"] = extra["score"]
+        return data
+
+    def conditional_update(a: Dict[str, Any]) -> bool:
+        # WHERE <flag> IS NOT TRUE: bei gleichzeitigen Klicks gewinnt genau einer
+        result = db.table("island_progress") \
+            .update(flag_data(a)) \
+            .eq("user_id", user_id) \
+            .eq("island_id", a["island_id"]) \
+            .or_(f"{a['action']}.is.null,{a['action']}.eq.false") \
+            .execute()
+        return bool(result.data)
+
+    for a in actions:
+        if conditional_update(a):
+            new_actions.append((a["island_id"], a["action"]))
+        else:
+            missing.append(a)
+
+    # Hat ein Update die Zeile einer Insel getroffen, existiert sie — dort
+    # war ein leeres Update nur ein bereits gesetztes Flag (kein Upsert noetig)
+    existing = {island_id for island_id, _ in new_actions}
+    missing = [a for a in missing if a["island_id"] not in existing]
+
+    if not missing:
+        return new_actions
+
+    # Neue Inseln: alle Aktionen pro Insel in einer Zeile, 1 Upsert fuer alle
+    rows = {}
+    for a in missing:
+        row = rows.setdefault(a["island_id"], {"user_id": user_id, "island_id": a["island_id"]})
+        row.update(flag_data(a))
+    try:
+        result = db.table("island_progress") \
+            .upsert(list(rows.values()), on_conflict="user_id,island_id", ignore_duplicates=True) \
+            .execute()
+        inserted = {r["island_id"] for r in (result.data or [])}
+    except Exception as e:
+        # Unique-Index fehlt noch (sql/14 nicht ausgefuehrt): einzeln pruefen + einfuegen
+        if not is_missing_constraint(e):
+            raise
+        print(f"[map_db] Fortschritts-Upsert nicht moeglich, nutze Fallback: {e}")
+        inserted = set()
+        for island_id, row in rows.items():
+            existing = db.table("island_progress").select("island_id") \
+                .eq("user_id", user_id).eq("island_id", island_id).execute()
+            if existing.data:
+                continue
+            db.table("island_progress").insert(row).execute()
+            inserted.add(island_id)
+
+    for a in missing:
+        if a["island_id"] in inserted:
+            new_actions.append((a["island_id"], a["action"]))
+        elif conditional_update(a):
+            # Zeile wurde zwischenzeitlich von einem parallelen Request angelegt
+            new_actions.append((a["island_id"], a["action"]))
+
+    return new_actions
 
 
 def get_island_progress_percentage(user_id: str, island_id: str) -> int:
@@ -216,4 +312,108 @@ def get_island_progress_percentage(user_id: str, island_id: str) -> int:
     return int((completed / 4) * 100)
 
 # ✅ HINWEIS: Die zweite Definition von get_all_island_progress() (ehemals Zeile 196)
-#             wurde entfernt. Die obige Version (mit @st.cache_data) ist die einzige.
+#             wurde entfernt. Die obige Version (mit @tagged_cache) ist die einzige.
+
+
+# ===============================================================
+# MAP BOOTSTRAP (1 RPC statt 10-20 REST-Calls pro Render)
+# ===============================================================
+
+def _bootstrap_group_tags(bootstrap: Dict[str, Any]) -> List[str]:
+    """Bootstrap enthaelt Gruppen-Daten -> auch bei Gruppen-Writes verwerfen."""
+    group_ids = list(bootstrap.get("coach_group_ids") or [])
+    if bootstrap.get("group"):
+        group_ids.append(bootstrap["group"]["group_id"])
+    return [group_tag(gid) for gid in group_ids]
+
+
+@tagged_cache(ttl=30, tags=lambda user_id: [user_tag(user_id)], result_tags=_bootstrap_group_tags)
+def get_map_bootstrap(user_id: str) -> Dict[str, Any]:
+    """Laedt alle Daten fuer einen Schatzkarten-Render in EINEM Round-Trip.
+
+    Ersetzt die Kaskade get_user_stats, get_collected_treasures,
+    get_all_island_progress, get_unlocked_islands (get_user_group,
+    get_activated_islands, is_coach), Arena-Gruppenabfrage und
+    get_polarstern_data durch die Postgres-Funktion get_map_bootstrap
+    (sql/09_map_bootstrap_rpc.sql).
+
+    Ist die RPC noch nicht deployt, wird derselbe Payload lokal aus den
+    bestehenden Einzel-Funktionen zusammengesetzt (gleiche Struktur).
+
+    Returns:
+        Dict mit stats, collected_treasures, island_progress, role, group,
+        activated_islands, coach_groups, coach_group_ids, polarstern
+    """
+    payload = None
+    try:
+        payload = get_db().rpc("get_map_bootstrap", {"p_user_id": user_id}).execute().data
+    except Exception as e:
+        print(f"get_map_bootstrap RPC nicht verfuegbar, nutze lokalen Fallback: {e}")
+
+    # Neuer User (noch keine users-Zeile) -> Fallback legt ihn an
+    if not payload or not payload.get("user"):
+        payload = _build_map_bootstrap_local(user_id)
+
+    return _normalize_map_bootstrap(payload)
+
+
+def _build_map_bootstrap_local(user_id: str) -> Dict[str, Any]:
+    """Lokaler Stand-in fuer die RPC: gleicher Roh-Payload aus Einzel-Queries."""
+    from utils.user_system import get_user_role, ROLE_COACH, ROLE_ADMIN
+    from utils.lerngruppen_db import get_user_group, get_activated_islands, get_coach_groups
+
+    stats = get_user_stats(user_id)
+    challenge_keys = ("total_challenges", "times_exceeded", "exact_predictions", "times_below",
+                      "unique_subjects", "total_xp_from_challenges", "subjects_breakdown",
+                      "success_rate")
+    role = get_user_role(user_id)
+    group = get_user_group(user_id)
+    goals = get_db().table("polarstern_goals").select("*").eq("user_id", user_id).execute()
+
+    return {
+        "user": {**{k: v for k, v in stats.items() if k not in challenge_keys}, "role": role},
+        "challenge_stats": {k: stats[k] for k in challenge_keys if k in stats},
+        "treasures": [list(t) for t in get_collected_treasures(user_id)],
+        "island_progress": [{"island_id": k, **v} for k, v in get_all_island_progress(user_id).items()],
+        "group": group,
+        "activated_islands": get_activated_islands(group["group_id"]) if group else [],
+        "coach_groups": [{"group_id": g["group_id"], "name": g.get("name")}
+                         for g in (get_coach_groups(user_id) if role in (ROLE_COACH, ROLE_ADMIN) else [])],
+        "polarstern_goals": goals.data or [],
+    }
+
+
+@register_local_rpc("get_map_bootstrap")
+def _map_bootstrap_rpc(client, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Lokaler Stand-in fuer sql/09 (utils/db_local.py): ein Request wie in Postgres."""
+    return _build_map_bootstrap_local(params["p_user_id"])
+
+
+def _normalize_map_bootstrap(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Bringt den Roh-Payload (RPC oder lokal) in die Form der Einzel-Funktionen."""
+    from utils.polarstern_widget import summarize_polarstern_goals
+
+    stats = {**(payload.get("user") or {}), **(payload.get("challenge_stats") or {})}
+    stats.setdefault("subjects_breakdown", [])
+    stats = finalize_user_stats(stats)
+
+    polarstern = summarize_polarstern_goals(payload.get("polarstern_goals") or [])
+    coach_groups = payload.get("coach_groups") or []
+
+    return {
+        "stats": stats,
+        "collected_treasures": [tuple(t) for t in (payload.get("treasures") or [])],
+        "island_progress": {row["island_id"]: _progress_from_row(row)
+                            for row in (payload.get("island_progress") or [])},
+        "role": stats.get("role") or "student",
+        "group": payload.get("group"),
+        "activated_islands": payload.get("activated_islands") or [],
+        "coach_groups": coach_groups,
+        "coach_group_ids": [g["group_id"] for g in coach_groups],
+        "polarstern": {
+            "active": polarstern.get("active", 0),
+            "achieved": polarstern.get("achieved", 0),
+            "total_xp": polarstern.get("total_xp", 0),
+            "goals": polarstern.get("goals", []),
+        },
+    }
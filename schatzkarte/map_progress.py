@@ -13,7 +13,7 @@ def get_preview_week():
         return None
     return st.session_state.get("preview_week", None)
 
-def get_unlocked_islands(user_id, current_week=None):
+def get_unlocked_islands(user_id, current_week=None, bootstrap=None):
     """
     Gibt freigeschaltete Inseln zurueck.
 
@@ -21,12 +21,18 @@ def get_unlocked_islands(user_id, current_week=None):
     - Gruppen-Mitglied: Inseln die der Coach fuer die Gruppe aktiviert hat
     - Preview: preview_week = None -> alles offen, preview_week = 4 -> bis Woche 4
     - Fallback: Progressive Freischaltung nach Woche
+
+    bootstrap: Optionaler Payload aus get_map_bootstrap() — dann ohne eigene Queries.
     """
-    from utils.user_system import is_coach
-    from utils.lerngruppen_db import get_user_group, get_activated_islands, get_group_week
+    from utils.user_system import is_coach, ROLE_COACH, ROLE_ADMIN
+    from utils.lerngruppen_db import get_user_group, get_activated_islands, get_group_week, calculate_group_week
 
     # Coach: ALLE Inseln immer freigeschaltet
-    if is_coach(user_id):
+    if bootstrap is not None:
+        user_is_coach = bootstrap.get("role") in (ROLE_COACH, ROLE_ADMIN)
+    else:
+        user_is_coach = is_coach(user_id)
+    if user_is_coach:
         return list(ISLANDS.keys())
 
     # Preview: Alles offen?
@@ -34,11 +40,15 @@ def get_unlocked_islands(user_id, current_week=None):
         return list(ISLANDS.keys())
 
     # Gruppen-basierte Freischaltung
-    group = get_user_group(user_id)
+    group = bootstrap.get("group") if bootstrap is not None else get_user_group(user_id)
     if group:
         group_id = group["group_id"]
-        group_week = get_group_week(group_id)
-        activated = get_activated_islands(group_id)
+        if bootstrap is not None:
+            group_week = calculate_group_week(group)
+            activated = bootstrap.get("activated_islands", [])
+        else:
+            group_week = get_group_week(group_id)
+            activated = get_activated_islands(group_id)
 
         unlocked = ["start"]
         # Alle Inseln freischalten, die fuer Wochen <= aktuelle Woche aktiviert sind
@@ -0,0 +1,120 @@
+-- ============================================
+-- Schatzkarte: Bootstrap-RPC (1 Round-Trip pro Render)
+-- ============================================
+-- Ersetzt die REST-Kaskade beim Laden der Schatzkarte:
+--   get_user_stats (users + challenges), get_collected_treasures,
+--   get_all_island_progress, get_user_group, get_activated_islands,
+--   get_user_role, Arena-Gruppen (learning_groups), polarstern_goals
+-- durch EINE Postgres-Funktion.
+--
+-- Aufruf aus Python: get_db().rpc("get_map_bootstrap", {"p_user_id": ...})
+-- Fallback: schatzkarte/map_db.py setzt denselben Payload lokal zusammen,
+-- solange die Funktion nicht deployt ist.
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE OR REPLACE FUNCTION get_map_bootstrap(p_user_id TEXT)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_user JSONB;
+    v_group JSONB;
+    v_group_id TEXT;
+BEGIN
+    -- User-Zeile (ohne Passwort-Felder)
+    SELECT to_jsonb(u) - 'password_hash' - 'temp_password_plain'
+      INTO v_user
+      FROM users u
+     WHERE u.user_id = p_user_id;
+
+    -- Aktive Gruppen-Mitgliedschaft (User kann nur in einer Gruppe sein)
+    SELECT to_jsonb(g) || jsonb_build_object('joined_at', gm.joined_at), g.group_id
+      INTO v_group, v_group_id
+      FROM group_members gm
+      JOIN learning_groups g ON g.group_id = gm.group_id AND g.is_active = 1
+     WHERE gm.user_id = p_user_id
+       AND gm.status = 'active'
+     LIMIT 1;
+
+    RETURN jsonb_build_object(
+        'user', v_user,
+
+        -- Challenge-Aggregate (statt alle Zeilen nach Python zu laden)
+        'challenge_stats', (
+            SELECT jsonb_build_object(
+                'total_challenges', COUNT(*),
+                'times_exceeded', COUNT(*) FILTER (WHERE outcome = 'exceeded'),
+                'exact_predictions', COUNT(*) FILTER (WHERE outcome = 'exact'),
+                'times_below', COUNT(*) FILTER (WHERE outcome = 'below'),
+                'unique_subjects', COUNT(DISTINCT COALESCE(subject, '')),
+                'total_xp_from_challenges', COALESCE(SUM(xp_earned), 0),
+                'subjects_breakdown', COALESCE((
+                    SELECT jsonb_agg(jsonb_build_object(
+                        'subject', s.subject,
+                        'count', s.cnt,
+                        'exceeded', s.exceeded,
+                        'exact', s.exact
+                    ))
+                    FROM (
+                        SELECT COALESCE(subject, '') AS subject,
+                               COUNT(*) AS cnt,
+                               COUNT(*) FILTER (WHERE outcome = 'exceeded') AS exceeded,
+                               COUNT(*) FILTER (WHERE outcome = 'exact') AS exact
+                          FROM challenges
+                         WHERE user_id = p_user_id AND completed = TRUE
+                         GROUP BY COALESCE(subject, '')
+                    ) s
+                ), '[]'::jsonb)
+            )
+            FROM challenges
+            WHERE user_id = p_user_id AND completed = TRUE
+        ),
+
+        -- Gesammelte Schaetze als [island_id, treasure_id]
+        'treasures', COALESCE((
+            SELECT jsonb_agg(jsonb_build_array(t.island_id, t.treasure_id) ORDER BY t.collected_at)
+              FROM user_treasures t
+             WHERE t.user_id = p_user_id
+        ), '[]'::jsonb),
+
+        'island_progress', COALESCE((
+            SELECT jsonb_agg(to_jsonb(p))
+              FROM island_progress p
+             WHERE p.user_id = p_user_id
+        ), '[]'::jsonb),
+
+        'group', v_group,
+
+        'activated_islands', COALESCE((
+            SELECT jsonb_agg(to_jsonb(w) ORDER BY w.week_number)
+              FROM group_weekly_islands w
+             WHERE w.group_id = v_group_id
+        ), '[]'::jsonb),
+
+        -- Coach-Gruppen (fuer Arena + Meeting-Picker)
+        'coach_groups', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object('group_id', g.group_id, 'name', g.name)
+                             ORDER BY g.created_at DESC)
+              FROM learning_groups g
+             WHERE g.coach_id = p_user_id
+               AND g.is_active = 1
+        ), '[]'::jsonb),
+
+        'polarstern_goals', COALESCE((
+            SELECT jsonb_agg(to_jsonb(pg))
+              FROM polarstern_goals pg
+             WHERE pg.user_id = p_user_id
+        ), '[]'::jsonb)
+    );
+END;
+$$;
+
+-- anon darf die Funktion aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION get_map_bootstrap(TEXT) TO anon, authenticated;
+
+-- ============================================
+-- Teste mit:
+-- SELECT get_map_bootstrap('test_user');
+-- ============================================
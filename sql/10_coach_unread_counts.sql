@@ -0,0 +1,65 @@
+-- ============================================
+-- Chat: Ungelesen-Zaehler fuer alle Coach-Gruppen (1 Round-Trip)
+-- ============================================
+-- Ersetzt die Schleife in get_unread_count_for_coach (pro Gruppe
+-- group_members-Lookup + count-Query) durch EINE Aggregation.
+--
+-- Der Coach steht nicht in group_members — sein "zuletzt gelesen"
+-- liegt in learning_groups.settings->'coach_last_seen_chat'
+-- (siehe update_last_seen_coach in utils/nachrichten_db.py). Neue Werte
+-- tragen einen UTC-Offset, aeltere ohne Zone gelten als UTC.
+--
+-- Aufruf aus Python: get_db().rpc("get_coach_unread_counts", {"p_coach_id": ...})
+-- Rueckgabe: {"<group_id>": <anzahl>, ...} fuer alle aktiven Gruppen
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE OR REPLACE FUNCTION get_coach_unread_counts(p_coach_id TEXT)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN COALESCE((
+        SELECT jsonb_object_agg(g.group_id, g.unread)
+          FROM (
+            SELECT lg.group_id,
+                   COUNT(m.id) AS unread
+              FROM (
+                -- Werte ohne Zone gelten als UTC (wie _as_utc_iso in Python),
+                -- nicht als Zeitzone der Session
+                SELECT group_id,
+                       CASE WHEN seen ~ '(Z|[+-]\d{2}:?\d{2})$'
+                            THEN seen::timestamptz
+                            ELSE seen::timestamp AT TIME ZONE 'UTC'
+                        END AS last_seen
+                  FROM (
+                    -- settings kann als JSON-Objekt oder als JSON-String gespeichert sein
+                    SELECT group_id,
+                           CASE jsonb_typeof(settings::jsonb)
+                                WHEN 'string' THEN (settings::jsonb #>> '{}')::jsonb
+                                ELSE settings::jsonb
+                            END ->> 'coach_last_seen_chat' AS seen
+                      FROM learning_groups
+                     WHERE coach_id = p_coach_id
+                       AND is_active = 1
+                  ) raw
+              ) lg
+              LEFT JOIN group_messages m
+                ON m.group_id = lg.group_id
+               AND m.is_deleted = FALSE
+               AND m.sender_id <> p_coach_id
+               AND (lg.last_seen IS NULL OR m.created_at > lg.last_seen)
+             GROUP BY lg.group_id
+          ) g
+    ), '{}'::jsonb);
+END;
+$$;
+
+-- anon darf die Funktion aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION get_coach_unread_counts(TEXT) TO anon, authenticated;
+
+-- ============================================
+-- Teste mit:
+-- SELECT get_coach_unread_counts('test_coach');
+-- ============================================
@@ -0,0 +1,28 @@
+-- ============================================
+-- Chat: Index fuer Keyset-Pagination (created_at, id)
+-- ============================================
+-- get_group_messages / get_direct_messages holen Nachrichten jetzt mit
+-- EINER Query (OR-Filter), sortiert nach (created_at DESC, id DESC) und
+-- blaettern per Cursor (before=(created_at, id)) in die Vergangenheit.
+--
+-- Der Index deckt Sortierung + Cursor-Vergleich ab; nur nicht geloeschte
+-- Nachrichten werden indiziert (is_deleted = FALSE ist immer im Filter).
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE INDEX IF NOT EXISTS idx_group_messages_keyset
+    ON group_messages(group_id, created_at DESC, id DESC)
+    WHERE is_deleted = FALSE;
+
+-- DMs von mir (sender_id-Zweig des OR-Filters)
+CREATE INDEX IF NOT EXISTS idx_group_messages_sender
+    ON group_messages(group_id, sender_id, created_at DESC);
+
+-- ============================================
+-- Teste mit:
+-- EXPLAIN ANALYZE
+-- SELECT * FROM group_messages
+--  WHERE group_id = 'test_group' AND is_deleted = FALSE
+--    AND (recipient_id IS NULL OR recipient_id = 'u1' OR sender_id = 'u1')
+--  ORDER BY created_at DESC, id DESC LIMIT 50;
+-- ============================================
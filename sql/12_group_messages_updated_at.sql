@@ -0,0 +1,50 @@
+-- ============================================
+-- Chat: updated_at fuer inkrementellen Sync
+-- ============================================
+-- sync_messages() in utils/nachrichten_db.py holt nur Nachrichten, die
+-- seit dem letzten Cursor (updated_at, id) neu, bearbeitet oder
+-- soft-geloescht wurden — statt bei jedem Cache-Miss das ganze Fenster.
+--
+-- updated_at nutzt clock_timestamp() statt NOW(): NOW() ist der Start der
+-- Transaktion, eine lange Transaktion landete sonst weit hinter Zeilen, die
+-- schon vor ihrem Commit ausgeliefert wurden. Den verbleibenden Abstand
+-- (Zeitstempel vor Commit) deckt die Ueberlappung in sync_messages() ab.
+-- Das Skript kann erneut ausgefuehrt werden.
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+ALTER TABLE group_messages
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;
+
+-- Bestehende Nachrichten: updated_at = created_at (erst danach Default setzen)
+UPDATE group_messages SET updated_at = created_at WHERE updated_at IS NULL;
+
+ALTER TABLE group_messages
+    ALTER COLUMN updated_at SET DEFAULT clock_timestamp();
+
+-- Jede Aenderung (z.B. Soft-Delete) setzt updated_at neu
+CREATE OR REPLACE FUNCTION set_group_messages_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_group_messages_updated_at ON group_messages;
+CREATE TRIGGER trg_group_messages_updated_at
+    BEFORE UPDATE ON group_messages
+    FOR EACH ROW EXECUTE FUNCTION set_group_messages_updated_at();
+
+-- Index fuer den Sync-Cursor (group_id, updated_at, id)
+CREATE INDEX IF NOT EXISTS idx_group_messages_sync
+    ON group_messages(group_id, updated_at, id);
+
+-- ============================================
+-- Teste mit:
+-- SELECT id, is_deleted, updated_at FROM group_messages
+--  WHERE group_id = 'test_group' AND updated_at > NOW() - INTERVAL '1 hour'
+--  ORDER BY updated_at, id;
+-- ============================================
@@ -0,0 +1,104 @@
+-- ============================================
+-- XP-Ledger + atomare XP-Vergabe (grant_xp)
+-- ============================================
+-- Vorher: users.xp_total lesen -> in Python addieren -> zurueckschreiben
+--   (2 Round-Trips pro XP-Event, Lost Update bei gleichzeitigen Writes;
+--    create_bandura_entry hatte eine eigene Kopie davon).
+-- Nachher: grant_xp() schreibt alle Events eines Aufrufs ins Ledger
+--   (xp_events, append-only) und erhoeht xp_total serverseitig unter
+--   Row-Lock — 1 Round-Trip, auch fuer mehrere Events (xp_batch()).
+--
+-- Aufruf aus Python: utils/gamification_db.grant_xp()
+-- Level-Schwellen kommen aus LEVELS in gamification_db (p_level_thresholds).
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE TABLE IF NOT EXISTS xp_events (
+    id BIGSERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    xp_delta INTEGER NOT NULL,
+    source TEXT NOT NULL,             -- z.B. 'challenge_completed', 'treasure', 'bandura_mastery'
+    details JSONB,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_xp_events_user_created
+    ON xp_events(user_id, created_at DESC);
+
+-- ============================================
+-- Row Level Security
+-- ============================================
+
+ALTER TABLE xp_events ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Anon kann XP-Events lesen"
+    ON xp_events FOR SELECT
+    TO anon
+    USING (true);
+
+CREATE POLICY "Anon kann XP-Events erstellen"
+    ON xp_events FOR INSERT
+    TO anon
+    WITH CHECK (true);
+
+-- ============================================
+-- grant_xp: Events buchen + users atomar aktualisieren
+-- ============================================
+-- p_events: [{"xp": 10, "source": "treasure", "details": {...}}, ...]
+-- p_streak: neuer Streak oder NULL (unveraendert)
+-- Rueckgabe: aktualisierte users-Zeile (ohne Passwort-Felder) oder NULL
+
+CREATE OR REPLACE FUNCTION grant_xp(
+    p_user_id TEXT,
+    p_events JSONB,
+    p_streak INTEGER DEFAULT NULL,
+    p_today DATE DEFAULT CURRENT_DATE,
+    p_level_thresholds INTEGER[] DEFAULT ARRAY[0, 100, 250, 500, 1000, 2000, 5000, 10000]
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_delta INTEGER;
+    v_user users%ROWTYPE;
+BEGIN
+    SELECT COALESCE(SUM((e->>'xp')::INTEGER), 0)
+      INTO v_delta
+      FROM jsonb_array_elements(p_events) e;
+
+    -- UPDATE sperrt die Zeile: gleichzeitige grant_xp-Aufrufe laufen nacheinander
+    UPDATE users u
+       SET xp_total = COALESCE(u.xp_total, 0) + v_delta,
+           level = (SELECT COUNT(*) FROM unnest(p_level_thresholds) t
+                     WHERE t <= COALESCE(u.xp_total, 0) + v_delta),
+           current_streak = COALESCE(p_streak, u.current_streak),
+           longest_streak = GREATEST(COALESCE(u.longest_streak, 0),
+                                     COALESCE(p_streak, u.current_streak, 0)),
+           last_activity_date = p_today
+     WHERE u.user_id = p_user_id
+    RETURNING * INTO v_user;
+
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO xp_events (user_id, xp_delta, source, details)
+    SELECT p_user_id,
+           (e->>'xp')::INTEGER,
+           COALESCE(e->>'source', 'unknown'),
+           e->'details'
+      FROM jsonb_array_elements(p_events) e
+     WHERE COALESCE((e->>'xp')::INTEGER, 0) <> 0;
+
+    RETURN to_jsonb(v_user) - 'password_hash' - 'temp_password_plain';
+END;
+$$;
+
+-- anon darf die Funktion aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION grant_xp(TEXT, JSONB, INTEGER, DATE, INTEGER[]) TO anon, authenticated;
+
+-- ============================================
+-- Teste mit:
+-- SELECT grant_xp('test_user', '[{"xp": 10, "source": "test"}]'::jsonb);
+-- SELECT * FROM xp_events WHERE user_id = 'test_user' ORDER BY created_at DESC;
+-- ============================================
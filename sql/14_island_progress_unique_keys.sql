@@ -0,0 +1,100 @@
+-- ============================================
+-- Schatzkarte: Unique-Keys fuer atomare Upserts
+-- ============================================
+-- save_treasure_collected / complete_island_action / apply_island_actions
+-- (schatzkarte/map_db.py) schreiben per Upsert mit on_conflict auf den
+-- natuerlichen Schluesseln statt select + insert/update.
+-- Dafuer braucht PostgREST einen Unique-Constraint auf genau diesen Spalten.
+--
+-- Vorhandene Duplikate (z.B. durch Doppelklicks) werden vorher entfernt:
+-- es bleibt jeweils die aelteste Zeile (created_at bzw. collected_at, dann id).
+-- Bei island_progress wird der Fortschritt aller Duplikate vorher in diese
+-- Zeile uebernommen (Flag gesetzt, wenn es in irgendeiner Zeile gesetzt ist).
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+-- ============================================
+-- user_treasures: Duplikate entfernen
+-- ============================================
+
+WITH ranked AS (
+    SELECT id,
+           ROW_NUMBER() OVER (PARTITION BY user_id, island_id, treasure_id
+                              ORDER BY collected_at NULLS LAST, id) AS rn
+      FROM user_treasures
+)
+DELETE FROM user_treasures t
+ USING ranked r
+ WHERE t.id = r.id
+   AND r.rn > 1;
+
+-- ============================================
+-- island_progress: Fortschritt zusammenfuehren, dann Duplikate entfernen
+-- ============================================
+
+WITH ranked AS (
+    SELECT id, user_id, island_id,
+           ROW_NUMBER() OVER (PARTITION BY user_id, island_id
+                              ORDER BY created_at NULLS LAST, id) AS rn
+      FROM island_progress
+), merged AS (
+    SELECT user_id, island_id,
+           bool_or(COALESCE(video_watched, false)) AS video_watched,
+           MIN(video_watched_at) AS video_watched_at,
+           bool_or(COALESCE(explanation_read, false)) AS explanation_read,
+           MIN(explanation_read_at) AS explanation_read_at,
+           bool_or(COALESCE(quiz_passed, false)) AS quiz_passed,
+           MIN(quiz_passed_at) AS quiz_passed_at,
+           MAX(quiz_score) AS quiz_score,
+           bool_or(COALESCE(challenge_completed, false)) AS challenge_completed,
+           MIN(challenge_completed_at) AS challenge_completed_at,
+           MAX(updated_at) AS updated_at
+      FROM island_progress
+     GROUP BY user_id, island_id
+    HAVING COUNT(*) > 1
+)
+UPDATE island_progress p
+   SET video_watched = m.video_watched,
+       video_watched_at = m.video_watched_at,
+       explanation_read = m.explanation_read,
+       explanation_read_at = m.explanation_read_at,
+       quiz_passed = m.quiz_passed,
+       quiz_passed_at = m.quiz_passed_at,
+       quiz_score = m.quiz_score,
+       challenge_completed = m.challenge_completed,
+       challenge_completed_at = m.challenge_completed_at,
+       updated_at = m.updated_at
+  FROM merged m, ranked r
+ WHERE r.id = p.id
+   AND r.rn = 1
+   AND m.user_id = p.user_id
+   AND m.island_id = p.island_id;
+
+WITH ranked AS (
+    SELECT id,
+           ROW_NUMBER() OVER (PARTITION BY user_id, island_id
+                              ORDER BY created_at NULLS LAST, id) AS rn
+      FROM island_progress
+)
+DELETE FROM island_progress p
+ USING ranked r
+ WHERE p.id = r.id
+   AND r.rn > 1;
+
+-- ============================================
+-- Unique-Indizes (ON CONFLICT akzeptiert auch einen Unique-Index auf den Spalten)
+-- ============================================
+
+CREATE UNIQUE INDEX IF NOT EXISTS user_treasures_user_island_treasure_key
+    ON user_treasures(user_id, island_id, treasure_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS island_progress_user_island_key
+    ON island_progress(user_id, island_id);
+
+-- ============================================
+-- Teste mit:
+-- INSERT INTO user_treasures (user_id, island_id, treasure_id, xp_earned)
+-- VALUES ('test_user', 'start', 't1', 10)
+-- ON CONFLICT (user_id, island_id, treasure_id) DO NOTHING
+-- RETURNING *;
+-- ============================================
@@ -0,0 +1,90 @@
+-- ============================================
+-- User-Stats serverseitig aggregieren (get_user_stats)
+-- ============================================
+-- Vorher: gamification_db.get_user_stats laedt die users-Zeile und ALLE
+--   abgeschlossenen Challenges (subject, outcome, xp_earned) und zaehlt
+--   in Python — Payload und Latenz wachsen mit der Historie.
+-- Nachher: EIN Round-Trip, der die users-Zeile und die Aggregate
+--   (Outcome-Zaehler, Faecher, XP, subjects_breakdown) zurueckgibt.
+--
+-- challenge_stats_json() enthaelt dieselbe Aggregation wie
+-- get_map_bootstrap (sql/09_map_bootstrap_rpc.sql).
+--
+-- Aufruf aus Python: get_db().rpc("get_user_stats", {"p_user_id": ...})
+-- Fallback: utils/gamification_db.py zaehlt lokal, solange die Funktion
+-- nicht deployt ist (und legt neue User an).
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+-- Deckt die Aggregation ab (Index-Only-Scan statt Heap-Zugriff)
+CREATE INDEX IF NOT EXISTS idx_challenges_user_completed
+    ON challenges(user_id, subject, outcome, xp_earned)
+    WHERE completed = TRUE;
+
+-- ============================================
+-- challenge_stats_json: Aggregate abgeschlossener Challenges
+-- ============================================
+
+CREATE OR REPLACE FUNCTION challenge_stats_json(p_user_id TEXT)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'total_challenges', COALESCE(SUM(s.cnt), 0),
+        'times_exceeded', COALESCE(SUM(s.exceeded), 0),
+        'exact_predictions', COALESCE(SUM(s.exact), 0),
+        'times_below', COALESCE(SUM(s.below), 0),
+        'unique_subjects', COUNT(*),
+        'total_xp_from_challenges', COALESCE(SUM(s.xp), 0),
+        'subjects_breakdown', COALESCE(jsonb_agg(jsonb_build_object(
+            'subject', s.subject,
+            'count', s.cnt,
+            'exceeded', s.exceeded,
+            'exact', s.exact
+        )), '[]'::jsonb)
+    )
+    FROM (
+        SELECT COALESCE(subject, '') AS subject,
+               COUNT(*) AS cnt,
+               COUNT(*) FILTER (WHERE outcome = 'exceeded') AS exceeded,
+               COUNT(*) FILTER (WHERE outcome = 'exact') AS exact,
+               COUNT(*) FILTER (WHERE outcome = 'below') AS below,
+               SUM(COALESCE(xp_earned, 0)) AS xp
+          FROM challenges
+         WHERE user_id = p_user_id AND completed = TRUE
+         GROUP BY COALESCE(subject, '')
+    ) s;
+$$;
+
+-- ============================================
+-- get_user_stats: users-Zeile + Challenge-Aggregate
+-- ============================================
+-- Rueckgabe: {"user": {...} oder NULL, "challenge_stats": {...}}
+
+CREATE OR REPLACE FUNCTION get_user_stats(p_user_id TEXT)
+RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN jsonb_build_object(
+        'user', (
+            SELECT to_jsonb(u) - 'password_hash' - 'temp_password_plain'
+              FROM users u
+             WHERE u.user_id = p_user_id
+        ),
+        'challenge_stats', challenge_stats_json(p_user_id)
+    );
+END;
+$$;
+
+-- anon darf die Funktionen aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION challenge_stats_json(TEXT) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_user_stats(TEXT) TO anon, authenticated;
+
+-- ============================================
+-- Teste mit:
+-- SELECT get_user_stats('test_user');
+-- EXPLAIN ANALYZE SELECT challenge_stats_json('test_user');
+-- ============================================
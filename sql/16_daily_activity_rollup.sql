@@ -0,0 +1,118 @@
+-- ============================================
+-- Tages-Rollup fuer alle Aktivitaets-Heatmaps
+-- ============================================
+-- Vorher: get_activity_heatmap (challenges), get_activity_heatmap_data und
+--   get_daily_activity_summary (motivation_activity_log) lesen alle
+--   Rohzeilen im Zeitfenster und gruppieren in Python — die Kosten
+--   wachsen mit den Rohtabellen.
+-- Nachher: daily_activity_rollup haelt pro (User, Tag, Quelle) Anzahl und
+--   XP. Die Schreibpfade zaehlen inkrementell hoch (bump_daily_activity),
+--   eine 12-Wochen-Heatmap liest hoechstens ~84 Zeilen pro Quelle.
+--
+-- Quellen (source):
+--   'challenge'               Hattie-Challenges (Datum = challenge_date)
+--   'motivation:<beduerfnis>' Motivation-Challenges (autonomie, kompetenz,
+--                             verbundenheit)
+--
+-- Aufruf aus Python: utils/activity_rollup.py
+-- Fallback: Read-Modify-Write per upsert, solange die RPC nicht deployt ist.
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE TABLE IF NOT EXISTS daily_activity_rollup (
+    user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    activity_date DATE NOT NULL,
+    source TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    xp INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, activity_date, source)
+);
+
+-- ============================================
+-- Row Level Security
+-- ============================================
+
+ALTER TABLE daily_activity_rollup ENABLE ROW LEVEL SECURITY;
+
+-- DROP ... IF EXISTS: das Skript bleibt fuer den Backfill wiederholbar
+
+DROP POLICY IF EXISTS "Anon kann Activity-Rollup lesen" ON daily_activity_rollup;
+CREATE POLICY "Anon kann Activity-Rollup lesen"
+    ON daily_activity_rollup FOR SELECT
+    TO anon
+    USING (true);
+
+DROP POLICY IF EXISTS "Anon kann Activity-Rollup erstellen" ON daily_activity_rollup;
+CREATE POLICY "Anon kann Activity-Rollup erstellen"
+    ON daily_activity_rollup FOR INSERT
+    TO anon
+    WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Anon kann Activity-Rollup aktualisieren" ON daily_activity_rollup;
+CREATE POLICY "Anon kann Activity-Rollup aktualisieren"
+    ON daily_activity_rollup FOR UPDATE
+    TO anon
+    USING (true);
+
+-- ============================================
+-- bump_daily_activity: atomar hochzaehlen
+-- ============================================
+-- Rueckgabe: aktualisierte Rollup-Zeile
+
+CREATE OR REPLACE FUNCTION bump_daily_activity(
+    p_user_id TEXT,
+    p_date DATE,
+    p_source TEXT,
+    p_count INTEGER DEFAULT 1,
+    p_xp INTEGER DEFAULT 0
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row daily_activity_rollup;
+BEGIN
+    INSERT INTO daily_activity_rollup (user_id, activity_date, source, count, xp)
+    VALUES (p_user_id, p_date, p_source, p_count, COALESCE(p_xp, 0))
+    ON CONFLICT (user_id, activity_date, source) DO UPDATE
+        SET count = daily_activity_rollup.count + EXCLUDED.count,
+            xp = daily_activity_rollup.xp + EXCLUDED.xp
+    RETURNING * INTO v_row;
+
+    RETURN to_jsonb(v_row);
+END;
+$$;
+
+-- anon darf die Funktion aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION bump_daily_activity(TEXT, DATE, TEXT, INTEGER, INTEGER) TO anon, authenticated;
+
+-- ============================================
+-- Backfill aus den Rohtabellen
+-- ============================================
+-- Wiederholbar: nach dem Deploy des Python-Codes noch einmal ausfuehren.
+-- Abschluesse zwischen erstem Backfill und Deploy (alter Code zaehlt nicht
+-- hoch) werden so nachgetragen. GREATEST: ein Rollup zaehlt hoechstens zu
+-- wenig, parallele Bumps werden nicht ueberschrieben.
+
+INSERT INTO daily_activity_rollup (user_id, activity_date, source, count, xp)
+SELECT user_id, challenge_date::date, 'challenge', COUNT(*), COALESCE(SUM(xp_earned), 0)
+  FROM challenges
+ WHERE completed = TRUE
+ GROUP BY user_id, challenge_date::date
+ON CONFLICT (user_id, activity_date, source) DO UPDATE
+    SET count = GREATEST(daily_activity_rollup.count, EXCLUDED.count),
+        xp = GREATEST(daily_activity_rollup.xp, EXCLUDED.xp);
+
+INSERT INTO daily_activity_rollup (user_id, activity_date, source, count, xp)
+SELECT user_id, activity_date::date, 'motivation:' || grundbeduerfnis, COUNT(*), COALESCE(SUM(xp_earned), 0)
+  FROM motivation_activity_log
+ GROUP BY user_id, activity_date::date, grundbeduerfnis
+ON CONFLICT (user_id, activity_date, source) DO UPDATE
+    SET count = GREATEST(daily_activity_rollup.count, EXCLUDED.count),
+        xp = GREATEST(daily_activity_rollup.xp, EXCLUDED.xp);
+
+-- ============================================
+-- Teste mit:
+-- SELECT bump_daily_activity('test_user', CURRENT_DATE, 'challenge', 1, 10);
+-- SELECT * FROM daily_activity_rollup WHERE user_id = 'test_user' ORDER BY activity_date DESC;
+-- ============================================
@@ -0,0 +1,53 @@
+-- ============================================
+-- Badges: Unique-Keys fuer Bulk-Vergabe
+-- ============================================
+-- Die Badge-Engine (utils/badge_engine.py) vergibt alle neu verdienten
+-- Badges eines Events mit EINEM Upsert
+--   (on_conflict=user_id,badge_id, ignore_duplicates)
+-- statt pro Badge select + insert. PostgREST liefert dabei nur die
+-- tatsaechlich eingefuegten Zeilen zurueck — das sind die neuen Badges.
+-- Dafuer braucht PostgREST einen Unique-Constraint auf genau diesen Spalten.
+--
+-- Vorhandene Duplikate werden vorher entfernt: es bleibt jeweils die
+-- zuerst verdiente Zeile (earned_at, dann id bzw. Zeilenposition —
+-- user_badges hat nicht zwingend eine id-Spalte).
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+-- Duplikate entfernen
+WITH ranked AS (
+    SELECT ctid AS row_ctid,
+           ROW_NUMBER() OVER (PARTITION BY user_id, badge_id
+                              ORDER BY earned_at NULLS LAST, ctid) AS rn
+      FROM user_badges
+)
+DELETE FROM user_badges b
+ USING ranked r
+ WHERE b.ctid = r.row_ctid
+   AND r.rn > 1;
+
+WITH ranked AS (
+    SELECT id,
+           ROW_NUMBER() OVER (PARTITION BY user_id, badge_id
+                              ORDER BY earned_at NULLS LAST, id) AS rn
+      FROM motivation_badges
+)
+DELETE FROM motivation_badges b
+ USING ranked r
+ WHERE b.id = r.id
+   AND r.rn > 1;
+
+-- Unique-Indizes (ON CONFLICT akzeptiert auch einen Unique-Index auf den Spalten)
+CREATE UNIQUE INDEX IF NOT EXISTS user_badges_user_badge_key
+    ON user_badges(user_id, badge_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS motivation_badges_user_badge_key
+    ON motivation_badges(user_id, badge_id);
+
+-- ============================================
+-- Teste mit:
+-- INSERT INTO user_badges (user_id, badge_id)
+-- VALUES ('test_user', 'first_challenge'), ('test_user', 'streak_3')
+-- ON CONFLICT (user_id, badge_id) DO NOTHING
+-- RETURNING *;
+-- ============================================
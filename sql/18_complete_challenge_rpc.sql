@@ -0,0 +1,154 @@
+-- ============================================
+-- Hattie-Challenge abschliessen in EINER Transaktion
+-- ============================================
+-- Vorher: gamification_db.complete_challenge = challenges lesen,
+--   users lesen (calculate_streak), challenges updaten, activity_log
+--   schreiben, Rollup hochzaehlen, grant_xp — 6+ Round-Trips nacheinander,
+--   bei Doppelklick konnte dieselbe Challenge zweimal XP bringen.
+-- Nachher: complete_challenge() erledigt alles serverseitig unter
+--   Row-Locks und liefert das fertige Ergebnis-Dict (outcome, XP, Streak,
+--   Level-Up) — 1 Round-Trip.
+--
+-- Braucht: grant_xp (sql/13_xp_ledger.sql),
+--          bump_daily_activity (sql/16_daily_activity_rollup.sql)
+--
+-- Die Edge Function supabase/functions/complete-challenge setzt Supabase
+-- Auth voraus (die App nutzt eigene Logins) und bleibt ungenutzt.
+--
+-- Aufruf aus Python: utils/gamification_db.complete_challenge()
+-- XP-Regeln und Level-Schwellen kommen aus XP_CONFIG / LEVELS in
+-- gamification_db (p_xp_config, p_level_thresholds).
+-- Lokaler Stand-in: _complete_challenge_rpc in gamification_db.py
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE OR REPLACE FUNCTION complete_challenge(
+    p_challenge_id BIGINT,
+    p_actual_result INTEGER,
+    p_reflection TEXT DEFAULT '',
+    p_xp_config JSONB DEFAULT '{"challenge_completed": 10, "prediction_exact": 25,
+                                "exceeded_expectation": 50, "streak_bonus_3": 1.2,
+                                "streak_bonus_7": 1.5, "streak_bonus_30": 2.0}',
+    p_today DATE DEFAULT CURRENT_DATE,
+    p_level_thresholds INTEGER[] DEFAULT ARRAY[0, 100, 250, 500, 1000, 2000, 5000, 10000]
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_challenge challenges%ROWTYPE;
+    v_user users%ROWTYPE;
+    v_is_note BOOLEAN;
+    v_outcome TEXT;
+    v_base NUMERIC;
+    v_streak INTEGER;
+    v_xp INTEGER;
+    v_old_level INTEGER;
+    v_updated JSONB;
+BEGIN
+    -- Zeile sperren: ein zweiter Aufruf wartet und sieht dann completed = TRUE
+    SELECT * INTO v_challenge FROM challenges WHERE id = p_challenge_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'Challenge nicht gefunden');
+    END IF;
+    IF v_challenge.completed THEN
+        RETURN jsonb_build_object('error', 'Challenge bereits abgeschlossen');
+    END IF;
+
+    SELECT * INTO v_user FROM users WHERE user_id = v_challenge.user_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'User nicht gefunden');
+    END IF;
+
+    -- Outcome (bei Noten ist kleiner besser: task_description beginnt mit [note])
+    v_is_note := COALESCE(v_challenge.task_description, '') LIKE '[note]%';
+    IF (v_is_note AND p_actual_result < v_challenge.prediction)
+       OR (NOT v_is_note AND p_actual_result > v_challenge.prediction) THEN
+        v_outcome := 'exceeded';
+        v_base := (p_xp_config->>'challenge_completed')::NUMERIC
+                + (p_xp_config->>'exceeded_expectation')::NUMERIC;
+    ELSIF p_actual_result = v_challenge.prediction THEN
+        v_outcome := 'exact';
+        v_base := (p_xp_config->>'challenge_completed')::NUMERIC
+                + (p_xp_config->>'prediction_exact')::NUMERIC;
+    ELSE
+        v_outcome := 'below';
+        v_base := (p_xp_config->>'challenge_completed')::NUMERIC;
+    END IF;
+
+    -- Streak (wie calculate_streak)
+    v_streak := CASE
+        WHEN v_user.last_activity_date IS NULL THEN 1
+        WHEN v_user.last_activity_date::DATE = p_today THEN COALESCE(v_user.current_streak, 0)
+        WHEN v_user.last_activity_date::DATE = p_today - 1 THEN COALESCE(v_user.current_streak, 0) + 1
+        ELSE 1
+    END;
+
+    v_xp := FLOOR(v_base * CASE
+        WHEN v_streak >= 30 THEN (p_xp_config->>'streak_bonus_30')::NUMERIC
+        WHEN v_streak >= 7 THEN (p_xp_config->>'streak_bonus_7')::NUMERIC
+        WHEN v_streak >= 3 THEN (p_xp_config->>'streak_bonus_3')::NUMERIC
+        ELSE 1
+    END);
+
+    v_old_level := (SELECT COUNT(*) FROM unnest(p_level_thresholds) t
+                     WHERE t <= COALESCE(v_user.xp_total, 0));
+
+    UPDATE challenges
+       SET actual_result = p_actual_result,
+           outcome = v_outcome,
+           xp_earned = v_xp,
+           reflection = p_reflection,
+           completed = TRUE
+     WHERE id = p_challenge_id;
+
+    -- details wie bisher als JSON-Text; populate_record passt ihn an den
+    -- Spaltentyp an (TEXT oder JSONB), genau wie PostgREST beim Insert
+    INSERT INTO activity_log (user_id, activity_date, activity_type, xp_earned, details)
+    SELECT r.user_id, r.activity_date, r.activity_type, r.xp_earned, r.details
+      FROM jsonb_populate_record(NULL::activity_log, jsonb_build_object(
+               'user_id', v_challenge.user_id,
+               'activity_date', p_today,
+               'activity_type', 'challenge_completed',
+               'xp_earned', v_xp,
+               'details', jsonb_build_object(
+                   'subject', v_challenge.subject,
+                   'outcome', v_outcome,
+                   'prediction', v_challenge.prediction,
+                   'actual', p_actual_result
+               )::TEXT
+           )) r;
+
+    PERFORM bump_daily_activity(v_challenge.user_id, v_challenge.challenge_date::DATE,
+                                'challenge', 1, v_xp);
+
+    v_updated := grant_xp(
+        v_challenge.user_id,
+        jsonb_build_array(jsonb_build_object('xp', v_xp, 'source', 'challenge_completed')),
+        v_streak, p_today, p_level_thresholds
+    );
+
+    RETURN jsonb_build_object(
+        'user_id', v_challenge.user_id,
+        'challenge_id', p_challenge_id,
+        'outcome', v_outcome,
+        'prediction', v_challenge.prediction,
+        'actual_result', p_actual_result,
+        'xp_earned', v_xp,
+        'streak', v_streak,
+        'total_xp', (v_updated->>'xp_total')::INTEGER,
+        'level', (v_updated->>'level')::INTEGER,
+        'level_up', (v_updated->>'level')::INTEGER > v_old_level,
+        'streak_bonus', v_streak >= 3
+    );
+END;
+$$;
+
+-- anon darf die Funktion aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION complete_challenge(BIGINT, INTEGER, TEXT, JSONB, DATE, INTEGER[])
+    TO anon, authenticated;
+
+-- ============================================
+-- Teste mit:
+-- SELECT complete_challenge(1, 8, 'Lief gut!');
+-- ============================================
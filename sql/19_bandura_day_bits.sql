@@ -0,0 +1,169 @@
+-- ============================================
+-- Bandura: Tages-Bitsets pro Quelle statt Voll-Scan
+-- ============================================
+-- Vorher: get_bandura_stats laedt bei jedem Render (Bandura-Schiff auf
+--   der Karte) ALLE bandura_entries eines Users, calculate_bandura_streak
+--   noch einmal alle Daten — Kosten wachsen mit der Historie.
+-- Nachher: eine Zeile pro User mit einem Bitset pro Quelle
+--   (Zeichen i = '1': mind. ein Eintrag am Tag origin + i) und Zaehlern.
+--   Streak, laengster Streak, Tage mit allen 4 Quellen und heutige
+--   Quellen rechnet Python per Bit-Operationen daraus
+--   (utils/bandura_sources_widget.py, bandura_stats_from_bits).
+--   Ein Jahr = 365 Zeichen pro Quelle.
+--
+-- create_bandura_entry setzt das Bit per bump_bandura_day (atomar).
+-- Fallback: Read-Modify-Write per upsert, solange die RPC nicht deployt ist.
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE TABLE IF NOT EXISTS bandura_day_bits (
+    user_id TEXT PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    origin DATE NOT NULL,                      -- Tag von Zeichen 0
+    mastery TEXT NOT NULL DEFAULT '',
+    vicarious TEXT NOT NULL DEFAULT '',
+    persuasion TEXT NOT NULL DEFAULT '',
+    physiological TEXT NOT NULL DEFAULT '',
+    mastery_count INTEGER NOT NULL DEFAULT 0,
+    vicarious_count INTEGER NOT NULL DEFAULT 0,
+    persuasion_count INTEGER NOT NULL DEFAULT 0,
+    physiological_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- ============================================
+-- Row Level Security
+-- ============================================
+
+ALTER TABLE bandura_day_bits ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Anon kann Bandura-Bitsets lesen"
+    ON bandura_day_bits FOR SELECT
+    TO anon
+    USING (true);
+
+CREATE POLICY "Anon kann Bandura-Bitsets erstellen"
+    ON bandura_day_bits FOR INSERT
+    TO anon
+    WITH CHECK (true);
+
+CREATE POLICY "Anon kann Bandura-Bitsets aktualisieren"
+    ON bandura_day_bits FOR UPDATE
+    TO anon
+    USING (true);
+
+-- ============================================
+-- set_day_bit: Zeichen p_idx (0-basiert) auf '1' setzen, bei Bedarf verlaengern
+-- ============================================
+
+CREATE OR REPLACE FUNCTION set_day_bit(p_bits TEXT, p_idx INTEGER)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT overlay(rpad(p_bits, GREATEST(length(p_bits), p_idx + 1), '0')
+                   placing '1' from p_idx + 1 for 1);
+$$;
+
+-- ============================================
+-- bump_bandura_day: Eintrag (Tag, Quelle) verbuchen
+-- ============================================
+-- Rueckgabe: aktualisierte bandura_day_bits-Zeile
+
+CREATE OR REPLACE FUNCTION bump_bandura_day(
+    p_user_id TEXT,
+    p_date DATE,
+    p_source TEXT
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row bandura_day_bits;
+    v_shift INTEGER;
+    v_idx INTEGER;
+BEGIN
+    INSERT INTO bandura_day_bits (user_id, origin)
+    VALUES (p_user_id, p_date)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    SELECT * INTO v_row FROM bandura_day_bits WHERE user_id = p_user_id FOR UPDATE;
+
+    -- Tag vor origin: alle Bitsets vorne auffuellen
+    IF p_date < v_row.origin THEN
+        v_shift := v_row.origin - p_date;
+        UPDATE bandura_day_bits
+           SET origin = p_date,
+               mastery = repeat('0', v_shift) || mastery,
+               vicarious = repeat('0', v_shift) || vicarious,
+               persuasion = repeat('0', v_shift) || persuasion,
+               physiological = repeat('0', v_shift) || physiological
+         WHERE user_id = p_user_id;
+        v_idx := 0;
+    ELSE
+        v_idx := p_date - v_row.origin;
+    END IF;
+
+    UPDATE bandura_day_bits
+       SET mastery = CASE WHEN p_source = 'mastery' THEN set_day_bit(mastery, v_idx) ELSE mastery END,
+           vicarious = CASE WHEN p_source = 'vicarious' THEN set_day_bit(vicarious, v_idx) ELSE vicarious END,
+           persuasion = CASE WHEN p_source = 'persuasion' THEN set_day_bit(persuasion, v_idx) ELSE persuasion END,
+           physiological = CASE WHEN p_source = 'physiological'
+                                THEN set_day_bit(physiological, v_idx) ELSE physiological END,
+           mastery_count = mastery_count + (p_source = 'mastery')::INTEGER,
+           vicarious_count = vicarious_count + (p_source = 'vicarious')::INTEGER,
+           persuasion_count = persuasion_count + (p_source = 'persuasion')::INTEGER,
+           physiological_count = physiological_count + (p_source = 'physiological')::INTEGER,
+           updated_at = NOW()
+     WHERE user_id = p_user_id
+    RETURNING * INTO v_row;
+
+    RETURN to_jsonb(v_row);
+END;
+$$;
+
+-- anon darf die Funktionen aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION set_day_bit(TEXT, INTEGER) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION bump_bandura_day(TEXT, DATE, TEXT) TO anon, authenticated;
+
+-- ============================================
+-- Einmaliger Backfill aus bandura_entries
+-- ============================================
+
+WITH days AS (
+    SELECT user_id, entry_date::DATE AS d, source_type, COUNT(*) AS n
+      FROM bandura_entries
+     GROUP BY user_id, entry_date::DATE, source_type
+), spans AS (
+    SELECT user_id, MIN(d) AS origin, MAX(d) AS last
+      FROM days
+     GROUP BY user_id
+), bits AS (
+    SELECT s.user_id, s.origin, src.source_type,
+           string_agg(CASE WHEN x.d IS NULL THEN '0' ELSE '1' END, '' ORDER BY g.d) AS bits
+      FROM spans s
+     CROSS JOIN (VALUES ('mastery'), ('vicarious'), ('persuasion'), ('physiological')) AS src(source_type)
+     CROSS JOIN LATERAL generate_series(s.origin, s.last, INTERVAL '1 day') AS g(d)
+      LEFT JOIN days x
+        ON x.user_id = s.user_id AND x.d = g.d::DATE AND x.source_type = src.source_type
+     GROUP BY s.user_id, s.origin, src.source_type
+)
+INSERT INTO bandura_day_bits (user_id, origin, mastery, vicarious, persuasion, physiological,
+                              mastery_count, vicarious_count, persuasion_count, physiological_count)
+SELECT b.user_id, b.origin,
+       MAX(b.bits) FILTER (WHERE b.source_type = 'mastery'),
+       MAX(b.bits) FILTER (WHERE b.source_type = 'vicarious'),
+       MAX(b.bits) FILTER (WHERE b.source_type = 'persuasion'),
+       MAX(b.bits) FILTER (WHERE b.source_type = 'physiological'),
+       (SELECT COALESCE(SUM(n), 0) FROM days WHERE user_id = b.user_id AND source_type = 'mastery'),
+       (SELECT COALESCE(SUM(n), 0) FROM days WHERE user_id = b.user_id AND source_type = 'vicarious'),
+       (SELECT COALESCE(SUM(n), 0) FROM days WHERE user_id = b.user_id AND source_type = 'persuasion'),
+       (SELECT COALESCE(SUM(n), 0) FROM days WHERE user_id = b.user_id AND source_type = 'physiological')
+  FROM bits b
+ GROUP BY b.user_id, b.origin
+ON CONFLICT (user_id) DO NOTHING;
+
+-- ============================================
+-- Teste mit:
+-- SELECT bump_bandura_day('test_user', CURRENT_DATE, 'mastery');
+-- SELECT * FROM bandura_day_bits WHERE user_id = 'test_user';
+-- ============================================
@@ -0,0 +1,388 @@
+-- ============================================
+-- Streak-Engine: ein Streak pro (User, Stream)
+-- ============================================
+-- Vorher: jeder Bereich mit eigener Streak-Logik und eigenem
+--   Read-Modify-Write — users.current_streak (Hattie), alle
+--   bandura_entries (Bandura), motivation_streaks mit Freezes (Motivation),
+--   wortschmiede_progress.streak (Frontend).
+-- Nachher: user_streaks haelt pro (User, Stream) aktuellen und laengsten
+--   Streak, letzten Aktivitaetstag und Freezes.
+--   - record_streak(): Aktivitaet verbuchen, atomar unter Row-Lock
+--   - add_streak_freezes(): Freezes gutschreiben
+--   - Lesen: 1 Query fuer alle Streams eines oder vieler User
+--     (utils/streaks.py, get_streaks)
+--
+-- Streams: 'challenge', 'bandura', 'motivation', 'wortschmiede'
+--   Wortschmiede schreibt weiter das Frontend; ein Trigger auf
+--   wortschmiede_progress spiegelt den Streak hierher.
+--   users.current_streak/longest_streak bleiben als Spiegel des
+--   'challenge'-Streams (grant_xp mit p_streak), complete_challenge
+--   (sql/18) wird hier auf record_streak umgestellt.
+--
+-- Braucht: grant_xp (sql/13_xp_ledger.sql),
+--          bump_daily_activity (sql/16_daily_activity_rollup.sql)
+--
+-- Aufruf aus Python: utils/streaks.py
+-- Fallback: Read-Modify-Write per upsert, solange die RPCs nicht deployt sind.
+--
+-- Ausfuehren im Supabase SQL Editor (Dashboard > SQL Editor)
+
+CREATE TABLE IF NOT EXISTS user_streaks (
+    user_id TEXT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    stream TEXT NOT NULL,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    last_activity_date DATE,
+    freeze_available INTEGER NOT NULL DEFAULT 0,
+    freeze_used_date DATE,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (user_id, stream)
+);
+
+-- ============================================
+-- Row Level Security
+-- ============================================
+
+ALTER TABLE user_streaks ENABLE ROW LEVEL SECURITY;
+
+-- DROP ... IF EXISTS: das Skript bleibt wiederholbar
+
+DROP POLICY IF EXISTS "Anon kann Streaks lesen" ON user_streaks;
+CREATE POLICY "Anon kann Streaks lesen"
+    ON user_streaks FOR SELECT
+    TO anon
+    USING (true);
+
+DROP POLICY IF EXISTS "Anon kann Streaks erstellen" ON user_streaks;
+CREATE POLICY "Anon kann Streaks erstellen"
+    ON user_streaks FOR INSERT
+    TO anon
+    WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Anon kann Streaks aktualisieren" ON user_streaks;
+CREATE POLICY "Anon kann Streaks aktualisieren"
+    ON user_streaks FOR UPDATE
+    TO anon
+    USING (true);
+
+DROP POLICY IF EXISTS "Anon kann Streaks loeschen" ON user_streaks;
+CREATE POLICY "Anon kann Streaks loeschen"
+    ON user_streaks FOR DELETE
+    TO anon
+    USING (true);
+
+-- ============================================
+-- record_streak: Aktivitaet am Tag p_today verbuchen
+-- ============================================
+-- Regeln: heute schon aktiv -> unveraendert; gestern -> +1;
+-- vorgestern + Freeze verfuegbar -> Freeze verbrauchen, +1; sonst 1.
+-- Rueckgabe: user_streaks-Zeile + Flags (streak_continued, streak_broken,
+-- streak_saved_by_freeze, freeze_used, new_longest)
+
+CREATE OR REPLACE FUNCTION record_streak(
+    p_user_id TEXT,
+    p_stream TEXT,
+    p_today DATE DEFAULT CURRENT_DATE,
+    p_initial_freezes INTEGER DEFAULT 0
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_row user_streaks;
+    v_continued BOOLEAN := FALSE;
+    v_broken BOOLEAN := FALSE;
+    v_frozen BOOLEAN := FALSE;
+    v_new_longest BOOLEAN := FALSE;
+BEGIN
+    INSERT INTO user_streaks (user_id, stream, freeze_available)
+    VALUES (p_user_id, p_stream, p_initial_freezes)
+    ON CONFLICT (user_id, stream) DO NOTHING;
+
+    SELECT * INTO v_row FROM user_streaks
+     WHERE user_id = p_user_id AND stream = p_stream
+       FOR UPDATE;
+
+    IF v_row.last_activity_date = p_today THEN
+        v_continued := TRUE;
+    ELSE
+        IF v_row.last_activity_date = p_today - 1 THEN
+            v_row.current_streak := v_row.current_streak + 1;
+            v_continued := TRUE;
+        ELSIF v_row.last_activity_date = p_today - 2 AND v_row.freeze_available > 0 THEN
+            v_row.freeze_available := v_row.freeze_available - 1;
+            v_row.freeze_used_date := p_today - 1;
+            v_row.current_streak := v_row.current_streak + 1;
+            v_frozen := TRUE;
+        ELSIF v_row.last_activity_date IS NULL THEN
+            v_row.current_streak := 1;
+        ELSE
+            v_row.current_streak := 1;
+            v_broken := TRUE;
+        END IF;
+
+        IF v_row.current_streak > v_row.longest_streak THEN
+            v_row.longest_streak := v_row.current_streak;
+            v_new_longest := TRUE;
+        END IF;
+
+        UPDATE user_streaks
+           SET current_streak = v_row.current_streak,
+               longest_streak = v_row.longest_streak,
+               last_activity_date = p_today,
+               freeze_available = v_row.freeze_available,
+               freeze_used_date = v_row.freeze_used_date,
+               updated_at = NOW()
+         WHERE user_id = p_user_id AND stream = p_stream
+        RETURNING * INTO v_row;
+    END IF;
+
+    RETURN to_jsonb(v_row) || jsonb_build_object(
+        'streak_continued', v_continued,
+        'streak_broken', v_broken,
+        'streak_saved_by_freeze', v_frozen,
+        'freeze_used', v_frozen,
+        'new_longest', v_new_longest
+    );
+END;
+$$;
+
+-- ============================================
+-- add_streak_freezes: Freezes gutschreiben
+-- ============================================
+-- Fehlt die Zeile noch, wird sie mit p_initial_freezes angelegt (wie in
+-- record_streak) und die Freezes kommen dazu.
+-- Rueckgabe: neue Anzahl
+
+-- Alte Signatur ohne p_initial_freezes entfernen (sonst mehrdeutig)
+DROP FUNCTION IF EXISTS add_streak_freezes(TEXT, TEXT, INTEGER);
+
+CREATE OR REPLACE FUNCTION add_streak_freezes(
+    p_user_id TEXT,
+    p_stream TEXT,
+    p_count INTEGER DEFAULT 1,
+    p_initial_freezes INTEGER DEFAULT 0
+)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    INSERT INTO user_streaks (user_id, stream, freeze_available)
+    VALUES (p_user_id, p_stream, p_initial_freezes + p_count)
+    ON CONFLICT (user_id, stream) DO UPDATE
+        SET freeze_available = user_streaks.freeze_available + p_count,
+            updated_at = NOW()
+    RETURNING freeze_available;
+$$;
+
+-- anon darf die Funktionen aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION record_streak(TEXT, TEXT, DATE, INTEGER) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION add_streak_freezes(TEXT, TEXT, INTEGER, INTEGER) TO anon, authenticated;
+
+-- ============================================
+-- Wortschmiede: Streak aus wortschmiede_progress spiegeln
+-- ============================================
+-- Das Frontend schreibt streak/last_played_date direkt per upsert.
+
+CREATE OR REPLACE FUNCTION sync_wortschmiede_streak()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- wortschmiede_progress hat keinen Fremdschluessel auf users
+    IF NOT EXISTS (SELECT 1 FROM users WHERE user_id = NEW.user_id) THEN
+        RETURN NEW;
+    END IF;
+
+    INSERT INTO user_streaks (user_id, stream, current_streak, longest_streak, last_activity_date)
+    VALUES (NEW.user_id, 'wortschmiede', NEW.streak, NEW.streak, NEW.last_played_date)
+    ON CONFLICT (user_id, stream) DO UPDATE
+       SET current_streak = EXCLUDED.current_streak,
+           longest_streak = GREATEST(user_streaks.longest_streak, EXCLUDED.current_streak),
+           last_activity_date = EXCLUDED.last_activity_date,
+           updated_at = NOW();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_wortschmiede_streak_sync ON wortschmiede_progress;
+CREATE TRIGGER trg_wortschmiede_streak_sync
+    AFTER INSERT OR UPDATE OF streak, last_played_date ON wortschmiede_progress
+    FOR EACH ROW EXECUTE FUNCTION sync_wortschmiede_streak();
+
+-- ============================================
+-- complete_challenge (sql/18) mit record_streak
+-- ============================================
+
+CREATE OR REPLACE FUNCTION complete_challenge(
+    p_challenge_id BIGINT,
+    p_actual_result INTEGER,
+    p_reflection TEXT DEFAULT '',
+    p_xp_config JSONB DEFAULT '{"challenge_completed": 10, "prediction_exact": 25,
+                                "exceeded_expectation": 50, "streak_bonus_3": 1.2,
+                                "streak_bonus_7": 1.5, "streak_bonus_30": 2.0}',
+    p_today DATE DEFAULT CURRENT_DATE,
+    p_level_thresholds INTEGER[] DEFAULT ARRAY[0, 100, 250, 500, 1000, 2000, 5000, 10000]
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_challenge challenges%ROWTYPE;
+    v_user users%ROWTYPE;
+    v_is_note BOOLEAN;
+    v_outcome TEXT;
+    v_base NUMERIC;
+    v_streak INTEGER;
+    v_xp INTEGER;
+    v_old_level INTEGER;
+    v_updated JSONB;
+BEGIN
+    -- Zeile sperren: ein zweiter Aufruf wartet und sieht dann completed = TRUE
+    SELECT * INTO v_challenge FROM challenges WHERE id = p_challenge_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'Challenge nicht gefunden');
+    END IF;
+    IF v_challenge.completed THEN
+        RETURN jsonb_build_object('error', 'Challenge bereits abgeschlossen');
+    END IF;
+
+    SELECT * INTO v_user FROM users WHERE user_id = v_challenge.user_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'User nicht gefunden');
+    END IF;
+
+    -- Outcome (bei Noten ist kleiner besser: task_description beginnt mit [note])
+    v_is_note := COALESCE(v_challenge.task_description, '') LIKE '[note]%';
+    IF (v_is_note AND p_actual_result < v_challenge.prediction)
+       OR (NOT v_is_note AND p_actual_result > v_challenge.prediction) THEN
+        v_outcome := 'exceeded';
+        v_base := (p_xp_config->>'challenge_completed')::NUMERIC
+                + (p_xp_config->>'exceeded_expectation')::NUMERIC;
+    ELSIF p_actual_result = v_challenge.prediction THEN
+        v_outcome := 'exact';
+        v_base := (p_xp_config->>'challenge_completed')::NUMERIC
+                + (p_xp_config->>'prediction_exact')::NUMERIC;
+    ELSE
+        v_outcome := 'below';
+        v_base := (p_xp_config->>'challenge_completed')::NUMERIC;
+    END IF;
+
+    -- Streak ueber die Streak-Engine (Stream 'challenge')
+    v_streak := (record_streak(v_challenge.user_id, 'challenge', p_today)->>'current_streak')::INTEGER;
+
+    v_xp := FLOOR(v_base * CASE
+        WHEN v_streak >= 30 THEN (p_xp_config->>'streak_bonus_30')::NUMERIC
+        WHEN v_streak >= 7 THEN (p_xp_config->>'streak_bonus_7')::NUMERIC
+        WHEN v_streak >= 3 THEN (p_xp_config->>'streak_bonus_3')::NUMERIC
+        ELSE 1
+    END);
+
+    v_old_level := (SELECT COUNT(*) FROM unnest(p_level_thresholds) t
+                     WHERE t <= COALESCE(v_user.xp_total, 0));
+
+    UPDATE challenges
+       SET actual_result = p_actual_result,
+           outcome = v_outcome,
+           xp_earned = v_xp,
+           reflection = p_reflection,
+           completed = TRUE
+     WHERE id = p_challenge_id;
+
+    -- details wie bisher als JSON-Text; populate_record passt ihn an den
+    -- Spaltentyp an (TEXT oder JSONB), genau wie PostgREST beim Insert
+    INSERT INTO activity_log (user_id, activity_date, activity_type, xp_earned, details)
+    SELECT r.user_id, r.activity_date, r.activity_type, r.xp_earned, r.details
+      FROM jsonb_populate_record(NULL::activity_log, jsonb_build_object(
+               'user_id', v_challenge.user_id,
+               'activity_date', p_today,
+               'activity_type', 'challenge_completed',
+               'xp_earned', v_xp,
+               'details', jsonb_build_object(
+                   'subject', v_challenge.subject,
+                   'outcome', v_outcome,
+                   'prediction', v_challenge.prediction,
+                   'actual', p_actual_result
+               )::TEXT
+           )) r;
+
+    PERFORM bump_daily_activity(v_challenge.user_id, v_challenge.challenge_date::DATE,
+                                'challenge', 1, v_xp);
+
+    v_updated := grant_xp(
+        v_challenge.user_id,
+        jsonb_build_array(jsonb_build_object('xp', v_xp, 'source', 'challenge_completed')),
+        v_streak, p_today, p_level_thresholds
+    );
+
+    RETURN jsonb_build_object(
+        'user_id', v_challenge.user_id,
+        'challenge_id', p_challenge_id,
+        'outcome', v_outcome,
+        'prediction', v_challenge.prediction,
+        'actual_result', p_actual_result,
+        'xp_earned', v_xp,
+        'streak', v_streak,
+        'total_xp', (v_updated->>'xp_total')::INTEGER,
+        'level', (v_updated->>'level')::INTEGER,
+        'level_up', (v_updated->>'level')::INTEGER > v_old_level,
+        'streak_bonus', v_streak >= 3
+    );
+END;
+$$;
+
+-- anon darf die Funktion aufrufen (gleiches Modell wie die Tabellen-Policies)
+GRANT EXECUTE ON FUNCTION complete_challenge(BIGINT, INTEGER, TEXT, JSONB, DATE, INTEGER[])
+    TO anon, authenticated;
+
+-- ============================================
+-- Einmaliger Backfill
+-- ============================================
+
+-- Hattie: bisherige users-Spalten
+INSERT INTO user_streaks (user_id, stream, current_streak, longest_streak, last_activity_date)
+SELECT user_id, 'challenge', COALESCE(current_streak, 0),
+       GREATEST(COALESCE(longest_streak, 0), COALESCE(current_streak, 0)),
+       last_activity_date::DATE
+  FROM users
+ WHERE last_activity_date IS NOT NULL
+ON CONFLICT (user_id, stream) DO NOTHING;
+
+-- Motivation: motivation_streaks inkl. Freezes
+INSERT INTO user_streaks (user_id, stream, current_streak, longest_streak, last_activity_date,
+                          freeze_available, freeze_used_date)
+SELECT m.user_id, 'motivation', COALESCE(m.current_streak, 0), COALESCE(m.longest_streak, 0),
+       m.last_activity_date::DATE, COALESCE(m.freeze_available, 0), m.freeze_used_date::DATE
+  FROM motivation_streaks m
+  JOIN users u ON u.user_id = m.user_id
+ON CONFLICT (user_id, stream) DO NOTHING;
+
+-- Bandura: Folgen aufeinanderfolgender Tage (Gaps and Islands)
+WITH days AS (
+    SELECT DISTINCT user_id, entry_date::DATE AS d FROM bandura_entries
+), runs AS (
+    SELECT user_id, COUNT(*) AS len, MAX(d) AS last
+      FROM (SELECT user_id, d, d - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY d))::INTEGER AS grp
+              FROM days) g
+     GROUP BY user_id, grp
+)
+INSERT INTO user_streaks (user_id, stream, current_streak, longest_streak, last_activity_date)
+SELECT r.user_id, 'bandura',
+       (ARRAY_AGG(r.len ORDER BY r.last DESC))[1], MAX(r.len), MAX(r.last)
+  FROM runs r
+  JOIN users u ON u.user_id = r.user_id
+ GROUP BY r.user_id
+ON CONFLICT (user_id, stream) DO NOTHING;
+
+-- Wortschmiede
+INSERT INTO user_streaks (user_id, stream, current_streak, longest_streak, last_activity_date)
+SELECT w.user_id, 'wortschmiede', w.streak, w.streak, w.last_played_date
+  FROM wortschmiede_progress w
+  JOIN users u ON u.user_id = w.user_id
+ WHERE w.last_played_date IS NOT NULL
+ON CONFLICT (user_id, stream) DO NOTHING;
+
+-- ============================================
+-- Teste mit:
+-- SELECT record_streak('test_user', 'motivation', CURRENT_DATE, 1);
+-- SELECT * FROM user_streaks WHERE user_id = 'test_user';
+-- ============================================
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Tages-Rollup fuer Aktivitaets-Heatmaps
+======================================
+
+Statt fuer jede Heatmap alle Rohzeilen (challenges, motivation_activity_log)
+im Zeitfenster zu laden und in Python zu gruppieren, haelt die Tabelle
+daily_activity_rollup pro (User, Tag, Quelle) Anzahl und XP
+(sql/16_daily_activity_rollup.sql).
+
+- Schreibpfade rufen bump_daily_activity() auf (1 RPC, atomar hochzaehlen)
+- Heatmaps/Tageszusammenfassungen lesen get_daily_activity()
+  (hoechstens eine Zeile pro Tag und Quelle); fehlt die Tabelle noch
+  (sql/16 nicht ausgefuehrt), wird wie bisher aus den Rohzeilen gruppiert
+
+Quellen:
+    SOURCE_CHALLENGE                 Hattie-Challenges
+    motivation_source(beduerfnis)    Motivation-Challenges
+"""
+
+from datetime import date
+from typing import Any, Dict, List, Optional, Union
+
+from utils.database import get_db
+from utils.db_errors import is_missing_function, is_missing_table
+
+
+ROLLUP_TABLE = "daily_activity_rollup"
+SOURCE_CHALLENGE = "challenge"
+MOTIVATION_PREFIX = "motivation:"
+
+DateLike = Union[date, str]
+
+
+def motivation_source(grundbeduerfnis: str) -> str:
+    """Rollup-Quelle fuer ein SDT-Grundbeduerfnis (z.B. 'motivation:autonomie')."""
+    return f"{MOTIVATION_PREFIX}{grundbeduerfnis}"
+
+
+def _iso(day: Optional[DateLike]) -> str:
+    if day is None:
+        return date.today().isoformat()
+    return day if isinstance(day, str) else day.isoformat()
+
+
+# ============================================
+# SCHREIBEN
+# ============================================
+
+def bump_daily_activity(user_id: str, source: str, xp: int = 0,
+                        activity_date: Optional[DateLike] = None, count: int = 1) -> None:
+    """Zaehlt Anzahl und XP fuer (User, Tag, Quelle) hoch.
+
+    Fehler werden nur geloggt — die Rohzeile ist zu diesem Zeitpunkt
+    bereits geschrieben, die Aktion des Users soll nicht scheitern.
+    """
+    params = {
+        "p_user_id": user_id,
+        "p_date": _iso(activity_date),
+        "p_source": source,
+        "p_count": count,
+        "p_xp": xp or 0,
+    }
+    try:
+        get_db().rpc("bump_daily_activity", params).execute()
+        return
+    except Exception as e:
+        if not is_missing_function(e):
+            print(f"[activity_rollup] Rollup-Update fehlgeschlagen: {e}")
+            return
+        print(f"bump_daily_activity RPC nicht verfuegbar, nutze Fallback: {e}")
+
+    try:
+        bump_rows(get_db(), user_id, params["p_date"], source, count, xp or 0)
+    except Exception as e:
+        print(f"[activity_rollup] Rollup-Update fehlgeschlagen: {e}")
+
+
+def bump_rows(db, user_id: str, activity_date: str, source: str, count: int, xp: int) -> None:
+    """Fallback ohne RPC: Read-Modify-Write per upsert (nicht atomar).
+
+    Nimmt den Client explizit — auch fuer lokale RPC-Stand-ins, die in
+    ihrer eigenen Transaktion schreiben.
+    """
+    current = db.table(ROLLUP_TABLE) \
+        .select("count, xp") \
+        .eq("user_id", user_id) \
+        .eq("activity_date", activity_date) \
+        .eq("source", source) \
+        .execute()
+    row = current.data[0] if current.data else {}
+
+    db.table(ROLLUP_TABLE).upsert({
+        "user_id": user_id,
+        "activity_date": activity_date,
+        "source": source,
+        "count": (row.get("count") or 0) + count,
+        "xp": (row.get("xp") or 0) + xp,
+    }, on_conflict="user_id,activity_date,source").execute()
+
+
+def clear_daily_activity(user_id: str, source_prefix: str) -> None:
+    """Loescht Rollup-Zeilen eines Users fuer alle Quellen mit diesem Praefix."""
+    get_db().table(ROLLUP_TABLE) \
+        .delete() \
+        .eq("user_id", user_id) \
+        .like("source", f"{source_prefix}%") \
+        .execute()
+
+
+# ============================================
+# LESEN
+# ============================================
+
+def get_daily_activity(user_id: str, since: DateLike, until: Optional[DateLike] = None,
+                       source: Optional[str] = None,
+                       source_prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Rollup-Zeilen eines Users im Zeitraum [since, until], nach Datum sortiert.
+
+    Returns: [{"activity_date", "source", "count", "xp"}, ...]
+    """
+    try:
+        return _rollup_rows(user_id, since, until, source, source_prefix)
+    except Exception as e:
+        if not is_missing_table(e):
+            raise
+        print(f"[activity_rollup] Rollup-Tabelle fehlt, nutze Rohzeilen: {e}")
+    return _rows_from_raw(user_id, since, until, source, source_prefix)
+
+
+def _rollup_rows(user_id: str, since: DateLike, until: Optional[DateLike],
+                 source: Optional[str], source_prefix: Optional[str]) -> List[Dict[str, Any]]:
+    query = get_db().table(ROLLUP_TABLE) \
+        .select("activity_date, source, count, xp") \
+        .eq("user_id", user_id) \
+        .gte("activity_date", _iso(since))
+
+    if until is not None:
+        query = query.lte("activity_date", _iso(until))
+    if source:
+        query = query.eq("source", source)
+    elif source_prefix:
+        query = query.like("source", f"{source_prefix}%")
+
+    return query.order("activity_date").execute().data
+
+
+def _rows_from_raw(user_id: str, since: DateLike, until: Optional[DateLike],
+                   source: Optional[str], source_prefix: Optional[str]) -> List[Dict[str, Any]]:
+    """Fallback ohne Rollup-Tabelle: Rohzeilen laden und in Python gruppieren."""
+    def wanted(row_source: str) -> bool:
+        if source:
+            return row_source == source
+        if source_prefix:
+            return row_source.startswith(source_prefix)
+        return True
+
+    db = get_db()
+    groups: Dict[tuple, Dict[str, Any]] = {}
+
+    def add(day: str, row_source: str, xp: Optional[int]) -> None:
+        key = (str(day)[:10], row_source)
+        if key not in groups:
+            groups[key] = {"activity_date": key[0], "source": row_source, "count": 0, "xp": 0}
+        groups[key]["count"] += 1
+        groups[key]["xp"] += xp or 0
+
+    if wanted(SOURCE_CHALLENGE):
+        query = db.table("challenges") \
+            .select("challenge_date, xp_earned") \
+            .eq("user_id", user_id) \
+            .eq("completed", True) \
+            .gte("challenge_date", _iso(since))
+        if until is not None:
+            query = query.lte("challenge_date", _iso(until))
+        for row in query.execute().data:
+            add(row["challenge_date"], SOURCE_CHALLENGE, row.get("xp_earned"))
+
+    selector = source or source_prefix or ""
+    if selector.startswith(MOTIVATION_PREFIX) or MOTIVATION_PREFIX.startswith(selector):
+        query = db.table("motivation_activity_log") \
+            .select("activity_date, grundbeduerfnis, xp_earned") \
+            .eq("user_id", user_id) \
+            .gte("activity_date", _iso(since))
+        if until is not None:
+            query = query.lte("activity_date", _iso(until))
+        for row in query.execute().data:
+            row_source = motivation_source(row["grundbeduerfnis"])
+            if wanted(row_source):
+                add(row["activity_date"], row_source, row.get("xp_earned"))
+
+    return sorted(groups.values(), key=lambda r: (r["activity_date"], r["source"]))
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Ereignisgesteuerte Badge-Pruefung
+=================================
+
+Vorher haben Hattie-, Bandura- und Motivation-Badges je eine eigene
+Schleife: komplette Stats laden, alle Badges lesen und dann pro
+unverdientem Badge select + insert — mehrere Round-Trips pro
+abgeschlossener Challenge.
+
+BadgeEngine (eine pro Badge-Katalog):
+- Bedingungen werden beim Erzeugen einmal zu Predicates kompiliert
+- Index Event -> Badges: pro Event nur die Badges pruefen, die es
+  beeinflussen kann
+- Bereits verdiente Badges kommen aus dem Cache (Tag "user:<id>")
+- Stats werden nur geladen, wenn noch unverdiente Kandidaten uebrig sind
+- Alle neuen Badges mit EINEM Upsert (ignore_duplicates) vergeben —
+  PostgREST liefert nur die wirklich eingefuegten Zeilen zurueck
+  (Unique-Keys: sql/17_badge_unique_keys.sql)
+
+events_for ordnet jedem Badge die Events zu, die seine Bedingung aendern
+koennen (z.B. Streak-Badges -> EVENT_STREAK, Level-Badges -> EVENT_XP).
+Der Aufrufer meldet alle Events, die seine Aktion ausgeloest hat.
+
+Verwendung:
+    engine = get_engine("user_badges", BADGES, events_for=_badge_events)
+    new_badges = engine.evaluate(user_id, [EVENT_CHALLENGE, EVENT_STREAK, EVENT_XP],
+                                 stats_loader=lambda: get_user_stats(user_id))
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.database import get_db
+from utils.cache import tagged_cache, user_tag, invalidate_user
+from utils.db_errors import is_missing_constraint
+
+
+# ============================================
+# EVENTS
+# ============================================
+
+EVENT_CHALLENGE = "challenge_completed"      # Hattie-Challenge abgeschlossen
+EVENT_XP = "xp_granted"                      # XP/Level veraendert
+EVENT_BANDURA = "bandura_entry"              # Bandura-Eintrag erstellt
+EVENT_MOTIVATION = "motivation_completed"    # Motivation-Challenge abgeschlossen
+EVENT_STREAK = "streak_recorded"             # Aktivitaet im Streak des Bereichs verbucht
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+
+# ============================================
+# LESEN / VERGEBEN
+# ============================================
+
+@tagged_cache(ttl=300, tags=lambda table, user_id: [user_tag(user_id)])
+def get_earned_badge_ids(table: str, user_id: str) -> List[str]:
+    """IDs aller bereits verdienten Badges eines Users (gecacht)."""
+    result = get_db().table(table).select("badge_id").eq("user_id", user_id).execute()
+    return [row["badge_id"] for row in result.data]
+
+
+def award_badges(table: str, user_id: str, badge_ids: List[str]) -> List[str]:
+    """Vergibt Badges mit einem Upsert und liefert die tatsaechlich neuen IDs.
+
+    Bereits vorhandene Badges werden per ON CONFLICT DO NOTHING uebersprungen.
+    """
+    if not badge_ids:
+        return []
+
+    db = get_db()
+    rows = [{"user_id": user_id, "badge_id": badge_id} for badge_id in badge_ids]
+    try:
+        result = db.table(table) \
+            .upsert(rows, on_conflict="user_id,badge_id", ignore_duplicates=True) \
+            .execute()
+        inserted = {row["badge_id"] for row in result.data}
+    except Exception as e:
+        # Nur wenn der Unique-Key fehlt (sql/17 nicht ausgefuehrt):
+        # einzeln pruefen + einfuegen. Andere Fehler gehen an den Aufrufer.
+        if not is_missing_constraint(e):
+            raise
+        print(f"[badge_engine] Bulk-Upsert nicht moeglich, nutze Fallback: {e}")
+        inserted = set()
+        for row in rows:
+            existing = db.table(table).select("badge_id") \
+                .eq("user_id", user_id).eq("badge_id", row["badge_id"]).execute()
+            if existing.data:
+                continue
+            db.table(table).insert(row).execute()
+            inserted.add(row["badge_id"])
+
+    if inserted:
+        invalidate_user(user_id)
+    return [badge_id for badge_id in badge_ids if badge_id in inserted]
+
+
+# ============================================
+# ENGINE
+# ============================================
+
+def callable_condition(badge_id: str, badge: Dict[str, Any]) -> Optional[Predicate]:
+    """Standard-Compiler: "condition" ist bereits eine Funktion stats -> bool."""
+    condition = badge.get("condition")
+    return condition if callable(condition) else None
+
+
+class BadgeEngine:
+    """Kompilierte Badge-Bedingungen eines Katalogs, indiziert nach Event."""
+
+    def __init__(self, table: str, badges: Dict[str, Dict[str, Any]],
+                 events_for: Callable[[str, Dict[str, Any]], Iterable[str]],
+                 compile_condition: Callable[[str, Dict[str, Any]], Optional[Predicate]] = callable_condition):
+        self.table = table
+        self.badges = badges
+        self._predicates: Dict[str, Predicate] = {}
+        self._by_event: Dict[str, List[str]] = {}
+
+        for badge_id, badge in badges.items():
+            predicate = compile_condition(badge_id, badge)
+            if predicate is None:
+                continue
+            self._predicates[badge_id] = predicate
+            for event in events_for(badge_id, badge):
+                self._by_event.setdefault(event, []).append(badge_id)
+
+    def candidates(self, events: Optional[Iterable[str]] = None) -> List[str]:
+        """Badges, die eines der Events beeinflussen kann (None = alle)."""
+        if events is None:
+            return list(self._predicates)
+        return list(dict.fromkeys(
+            badge_id for event in events for badge_id in self._by_event.get(event, ())))
+
+    def matches(self, badge_id: str, stats: Dict[str, Any]) -> bool:
+        predicate = self._predicates.get(badge_id)
+        if predicate is None:
+            return False
+        try:
+            return bool(predicate(stats))
+        except Exception as e:
+            print(f"[badge_engine] Bedingung fuer {badge_id} fehlgeschlagen: {e}")
+            return False
+
+    def evaluate(self, user_id: str, events: Optional[Iterable[str]],
+                 stats_loader: Callable[[], Dict[str, Any]]) -> List[str]:
+        """Prueft die vom Event betroffenen, noch unverdienten Badges und vergibt sie.
+
+        Args:
+            user_id: User-ID
+            events: Ausgeloeste Events (None = alle Badges pruefen)
+            stats_loader: Laedt die Stats — wird nur aufgerufen, wenn es
+                          unverdiente Kandidaten gibt
+
+        Returns:
+            Liste der neu vergebenen Badge-IDs
+        """
+        earned = set(get_earned_badge_ids(self.table, user_id))
+        pending = [badge_id for badge_id in self.candidates(events) if badge_id not in earned]
+        if not pending:
+            return []
+
+        stats = stats_loader()
+        return award_badges(self.table, user_id, [b for b in pending if self.matches(b, stats)])
+
+
+_engines: Dict[Tuple[str, int], BadgeEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(table: str, badges: Dict[str, Dict[str, Any]],
+               events_for: Callable[[str, Dict[str, Any]], Iterable[str]],
+               compile_condition: Callable[[str, Dict[str, Any]], Optional[Predicate]] = callable_condition
+               ) -> BadgeEngine:
+    """Prozessweit eine Engine pro (Tabelle, Badge-Katalog) — einmal kompiliert."""
+    key = (table, id(badges))
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None or engine.badges is not badges:
+            engine = _engines[key] = BadgeEngine(table, badges, events_for, compile_condition)
+    return engine
@@ -17,11 +17,14 @@ Verwendung:
 """
 
 import streamlit as st
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Any, Optional
 import json
 
 from utils.database import get_db
+from utils.local_rpc import register_local_rpc
+from utils.cache import tagged_cache, user_tag
+from utils.streaks import STREAM_BANDURA, get_streak, record_activity
 
 # ============================================
 # INSPIRIERENDE BILDER FÜR JEDE QUELLE
@@ -241,13 +244,17 @@ def create_bandura_entry(user_id: str, source_type: str, description: str) -> Di
     }).execute()
     entry_id = insert_result.data[0]["id"]
 
-    # Prüfen ob alle 4 Quellen heute genutzt wurden
-    sources_result = db.table("bandura_entries") \
-        .select("source_type") \
-        .eq("user_id", user_id) \
-        .eq("entry_date", today) \
-        .execute()
-    sources_today = list(set(r["source_type"] for r in sources_result.data))
+    # Tages-Bit setzen; liefert die Bitsets fuer "alle 4 Quellen"
+    day_bits = record_bandura_day(user_id, today, source_type)
+    if day_bits:
+        sources_today = sources_on_day(day_bits, datetime.now().date())
+    else:
+        sources_result = db.table("bandura_entries") \
+            .select("source_type") \
+            .eq("user_id", user_id) \
+            .eq("entry_date", today) \
+            .execute()
+        sources_today = list(set(r["source_type"] for r in sources_result.data))
     all_four_bonus = 0
 
     if len(sources_today) == 4:
@@ -279,25 +286,26 @@ def create_bandura_entry(user_id: str, source_type: str, description: str) -> Di
         "details": json.dumps({"description": description[:100], "source": source_type})
     }).execute()
 
-    # Streak berechnen
-    streak = calculate_bandura_streak(user_id)
+    # Streak verbuchen (Streak-Engine)
+    streak = record_activity(user_id, STREAM_BANDURA)["current_streak"]
 
-    # User XP updaten
-    user_result = db.table("users").select("xp_total, level").eq("user_id", user_id).execute()
-
-    if user_result.data:
-        user_row = user_result.data[0]
-        new_xp = (user_row.get('xp_total') or 0) + total_xp
-        new_level = calculate_level(new_xp)
-        old_level = user_row.get('level') or 1
+    # User XP updaten: Basis + Bonus als 2 Ledger-Events in EINEM atomaren RPC
+    from utils.gamification_db import check_level_badges, grant_xp
+    user_row = grant_xp(user_id, [
+        {"xp": base_xp, "source": f"bandura_{source_type}", "details": {"entry_id": entry_id}},
+        {"xp": all_four_bonus, "source": "bandura_all_four"},
+    ])
 
-        db.table("users").update({
-            "xp_total": new_xp,
-            "level": new_level,
-            "last_activity_date": today
-        }).eq("user_id", user_id).execute()
+    # EVENT_XP: Level-Badges (Hattie-Katalog) koennen sich geaendert haben
+    try:
+        check_level_badges(user_id, user_row)
+    except Exception as e:
+        print(f"Error checking level badges: {e}")
 
-        level_up = new_level > old_level
+    if user_row:
+        new_xp = user_row.get('xp_total') or 0
+        new_level = user_row.get('level') or calculate_level(new_xp)
+        level_up = new_level > calculate_level(new_xp - total_xp)
     else:
         new_xp = total_xp
         new_level = 1
@@ -329,39 +337,22 @@ def calculate_level(xp: int) -> int:
 
 def calculate_bandura_streak(user_id: str) -> int:
     """Berechnet den aktuellen Bandura-Streak."""
-    today = datetime.now().date()
+    return get_streak(user_id, STREAM_BANDURA)["current_streak"]
 
-    result = get_db().table("bandura_entries") \
-        .select("entry_date") \
-        .eq("user_id", user_id) \
-        .order("entry_date", desc=True) \
-        .execute()
-
-    # Distinct dates
-    dates = list(dict.fromkeys(r["entry_date"] for r in result.data))
-
-    if not dates:
-        return 0
-
-    today_str = today.isoformat()
-    yesterday_str = (today - timedelta(days=1)).isoformat()
-
-    if dates[0] != today_str and dates[0] != yesterday_str:
-        return 0 if dates[0] != today_str else 1
-
-    streak = 1
-    for i in range(len(dates) - 1):
-        current = datetime.fromisoformat(dates[i]).date()
-        previous = datetime.fromisoformat(dates[i + 1]).date()
-        if (current - previous).days == 1:
-            streak += 1
-        else:
-            break
+@tagged_cache(ttl=120, tags=lambda user_id: [user_tag(user_id)])
+def get_bandura_stats(user_id: str) -> Dict[str, Any]:
+    """Holt Bandura-spezifische Statistiken.
 
-    return streak
+    Aus der Bitset-Zeile (1 Query, unabhaengig von der Anzahl Eintraege);
+    Voll-Scan ueber bandura_entries nur, solange es die Zeile nicht gibt.
+    """
+    row = _load_day_bits(user_id)
+    if row:
+        return bandura_stats_from_bits(row, datetime.now().date())
+    return _stats_from_entries(user_id)
 
-def get_bandura_stats(user_id: str) -> Dict[str, Any]:
-    """Holt Bandura-spezifische Statistiken."""
+def _stats_from_entries(user_id: str) -> Dict[str, Any]:
+    """Bandura-Stats aus allen Eintraegen (ohne Bitset-Zeile)."""
     db = get_db()
 
     # Alle Einträge holen
@@ -392,8 +383,9 @@ def get_bandura_stats(user_id: str) -> Dict[str, Any]:
     today = datetime.now().date().isoformat()
     stats["sources_today"] = list(set(e["source_type"] for e in entries if e["entry_date"] == today))
 
-    # Streak
-    stats["bandura_streak"] = calculate_bandura_streak(user_id)
+    # Streak aus der Streak-Engine (wie create_bandura_entry)
+    streak = get_streak(user_id, STREAM_BANDURA)
+    stats["bandura_streak"] = streak["current_streak"]
 
     # Längster Streak
     all_dates = sorted(set(e["entry_date"] for e in entries))
@@ -410,10 +402,139 @@ def get_bandura_stats(user_id: str) -> Dict[str, Any]:
                 current_streak = 1
         longest_streak = max(longest_streak, current_streak)
 
-    stats["bandura_longest_streak"] = max(longest_streak, stats["bandura_streak"])
+    stats["bandura_longest_streak"] = max(longest_streak, streak["longest_streak"] or 0,
+                                          stats["bandura_streak"])
 
     return stats
 
+# ============================================
+# TAGES-BITSETS (sql/19_bandura_day_bits.sql)
+# ============================================
+# Pro User eine Zeile mit einem Bitset je Quelle: Zeichen i = '1' heisst
+# "mind. ein Eintrag am Tag origin + i". Als int gelesen ist Zeichen i
+# Bit i — Streaks, "alle 4 Quellen" usw. sind dann Bit-Operationen.
+
+DAY_BITS_TABLE = "bandura_day_bits"
+
+def _bits_from_text(text: Optional[str]) -> int:
+    return int(text[::-1], 2) if text else 0
+
+def _bits_to_text(bits: int) -> str:
+    return format(bits, "b")[::-1] if bits else ""
+
+def _longest_run(bits: int) -> int:
+    """Laengste Folge gesetzter Bits (jede Runde kuerzt alle Folgen um 1)."""
+    run = 0
+    while bits:
+        bits &= bits >> 1
+        run += 1
+    return run
+
+def _parse_day(value: Any) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def sources_on_day(row: Dict[str, Any], day: date) -> List[str]:
+    """Quellen mit mind. einem Eintrag am Tag day (aus einer bandura_day_bits-Zeile)."""
+    idx = (day - _parse_day(row["origin"])).days
+    return [
+        source for source in BANDURA_SOURCES
+        if idx >= 0 and (_bits_from_text(row.get(source)) >> idx) & 1
+    ]
+
+def bandura_stats_from_bits(row: Dict[str, Any], today: date) -> Dict[str, Any]:
+    """Bandura-Stats (wie get_bandura_stats) aus einer bandura_day_bits-Zeile."""
+    bits = {source: _bits_from_text(row.get(source)) for source in BANDURA_SOURCES}
+
+    any_day = 0
+    all_four = -1
+    for source_bits in bits.values():
+        any_day |= source_bits
+        all_four &= source_bits
+
+    stats = {}
+    stats["bandura_total"] = sum(row.get(f"{source}_count") or 0 for source in BANDURA_SOURCES)
+    for source in BANDURA_SOURCES:
+        stats[f"bandura_{source}"] = row.get(f"{source}_count") or 0
+
+    stats["bandura_all_four_days"] = bin(all_four).count("1")
+    stats["sources_today"] = sources_on_day(row, today)
+
+    # Streak aus der Streak-Engine — derselbe Wert wie in create_bandura_entry
+    # und calculate_bandura_streak; die Bitsets liefern nur die Historie
+    streak = get_streak(row["user_id"], STREAM_BANDURA)
+    stats["bandura_streak"] = streak["current_streak"]
+    stats["bandura_longest_streak"] = max(_longest_run(any_day), streak["longest_streak"] or 0,
+                                          stats["bandura_streak"])
+
+    return stats
+
+def _load_day_bits(user_id: str) -> Optional[Dict[str, Any]]:
+    """Bitset-Zeile eines Users (None, wenn keine da ist oder die Tabelle fehlt)."""
+    try:
+        result = get_db().table(DAY_BITS_TABLE) \
+            .select("*") \
+            .eq("user_id", user_id) \
+            .execute()
+        return result.data[0] if result.data else None
+    except Exception as e:
+        print(f"[bandura] Bitsets nicht lesbar, nutze Eintraege: {e}")
+        return None
+
+def bump_day_bits(db, user_id: str, day: str, source_type: str) -> Dict[str, Any]:
+    """Fallback ohne RPC: Read-Modify-Write per upsert (nicht atomar).
+
+    Nimmt den Client explizit — auch fuer den lokalen RPC-Stand-in.
+    """
+    current = db.table(DAY_BITS_TABLE).select("*").eq("user_id", user_id).execute()
+    row = dict(current.data[0]) if current.data else {"user_id": user_id, "origin": day}
+    day_date = _parse_day(day)
+    origin = _parse_day(row["origin"])
+
+    # Tag vor origin: alle Bitsets nach oben schieben
+    shift = max(0, (origin - day_date).days)
+    if shift:
+        origin = day_date
+    for source in BANDURA_SOURCES:
+        source_bits = _bits_from_text(row.get(source)) << shift
+        if source == source_type:
+            source_bits |= 1 << (day_date - origin).days
+            row[f"{source}_count"] = (row.get(f"{source}_count") or 0) + 1
+        row[source] = _bits_to_text(source_bits)
+        row.setdefault(f"{source}_count", 0)
+
+    row["origin"] = origin.isoformat()
+    row["updated_at"] = datetime.now().isoformat()
+    db.table(DAY_BITS_TABLE).upsert(row, on_conflict="user_id").execute()
+    return row
+
+@register_local_rpc("bump_bandura_day")
+def _bump_bandura_day_rpc(client, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Lokaler Stand-in fuer die SQL-Funktion bump_bandura_day."""
+    return bump_day_bits(client, params["p_user_id"], params["p_date"], params["p_source"])
+
+def record_bandura_day(user_id: str, day: str, source_type: str) -> Optional[Dict[str, Any]]:
+    """Verbucht einen Eintrag im Bitset und liefert die aktualisierte Zeile.
+
+    None, wenn auch der Fallback scheitert — Aufrufer rechnen dann aus den
+    Eintraegen.
+    """
+    try:
+        result = get_db().rpc("bump_bandura_day", {
+            "p_user_id": user_id,
+            "p_date": day,
+            "p_source": source_type,
+        }).execute()
+        if result.data:
+            return result.data
+    except Exception as e:
+        print(f"bump_bandura_day RPC nicht verfuegbar, nutze Fallback: {e}")
+
+    try:
+        return bump_day_bits(get_db(), user_id, day, source_type)
+    except Exception as e:
+        print(f"[bandura] Bitset-Update fehlgeschlagen: {e}")
+        return None
+
 def get_bandura_entries(user_id: str, limit: int = 10) -> List[Dict]:
     """Holt die letzten Bandura-Einträge."""
     result = get_db().table("bandura_entries") \
@@ -425,25 +546,22 @@ def get_bandura_entries(user_id: str, limit: int = 10) -> List[Dict]:
     return result.data
 
 def check_and_award_bandura_badges(user_id: str) -> List[str]:
-    """Prüft und vergibt Bandura-Badges."""
-    from utils.gamification_db import get_user_badges, award_badge, get_user_stats
+    """Prüft und vergibt Bandura-Badges.
 
-    # Kombiniere normale Stats mit Bandura-Stats
-    stats = get_user_stats(user_id)
-    bandura_stats = get_bandura_stats(user_id)
-    stats.update(bandura_stats)
+    Alle Bedingungen nutzen nur Bandura-Stats — get_user_stats entfaellt.
+    """
+    from utils.badge_engine import EVENT_BANDURA, EVENT_STREAK, get_engine
 
-    existing = [b['badge_id'] for b in get_user_badges(user_id)]
-    new_badges = []
+    engine = get_engine("user_badges", BANDURA_BADGES, events_for=_bandura_badge_events)
+    # Ein Eintrag verbucht auch den Bandura-Streak (create_bandura_entry)
+    return engine.evaluate(user_id, [EVENT_BANDURA, EVENT_STREAK],
+                           stats_loader=lambda: get_bandura_stats(user_id))
 
-    for badge_id, badge_info in BANDURA_BADGES.items():
-        if badge_id not in existing:
-            condition_fn = badge_info.get("condition")
-            if condition_fn and condition_fn(stats):
-                if award_badge(user_id, badge_id):
-                    new_badges.append(badge_id)
+def _bandura_badge_events(badge_id: str, badge: Dict) -> List[str]:
+    """Streak-Badges haengen am Bandura-Streak, alle anderen an den Eintraegen."""
+    from utils.badge_engine import EVENT_BANDURA, EVENT_STREAK
 
-    return new_badges
+    return [EVENT_STREAK] if badge_id.startswith("bandura_streak") else [EVENT_BANDURA]
 
 # ============================================
 # UI COMPONENTS
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Gemeinsamer Cache mit gezielter Invalidierung (Tags)
+=====================================================
+
+@st.cache_data kann nur komplett geleert werden: sammelt EIN Kind einen
+Schatz, muessen nach get_collected_treasures.clear() ALLE Sessions ihre
+Daten neu laden. Dieser Cache ist ebenfalls prozessweit (alle Sessions),
+merkt sich aber pro Eintrag Tags wie "user:<id>" oder "group:<id>" und
+verwirft bei einem Write nur die betroffenen Eintraege.
+
+Verwendung:
+    from utils.cache import tagged_cache, user_tag, group_tag, invalidate_user
+
+    @tagged_cache(ttl=120, tags=lambda user_id: [user_tag(user_id)])
+    def get_user_stats(user_id: str) -> Dict: ...
+
+    # Nach einem Write:
+    invalidate_user(user_id)          # alle Eintraege mit "user:<id>"
+    invalidate_group(group_id)        # alle Eintraege mit "group:<id>"
+
+    get_user_stats.clear()            # wie bei st.cache_data: alles leeren
+
+Tags koennen zusaetzlich aus dem Ergebnis abgeleitet werden (result_tags),
+z.B. haengt get_user_group(user_id) auch an "group:<gruppe>".
+
+Wie bei st.cache_data bekommt jeder Aufrufer eine Kopie des Ergebnisses,
+Aenderungen daran landen also nicht im Cache.
+"""
+
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+DEFAULT_MAX_ENTRIES = 5000     # pro Funktion (LRU)
+
+_lock = threading.RLock()
+_entries: Dict[str, "OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]"] = {}
+_tag_index: Dict[str, Set[Tuple[str, str]]] = {}
+
+# Schutz gegen veraltete Writes: ein Ergebnis wird nur gespeichert, wenn
+# waehrend des Ladens nichts invalidiert/geleert wurde. Versionen gibt es
+# nur fuer Tags mit laufenden Loads (danach wieder weg -> begrenzt).
+_loads_in_flight: Dict[str, int] = {}     # Tag -> laufende Loads
+_tag_versions: Dict[str, int] = {}        # Tag -> Invalidierungen waehrend dieser Loads
+_function_epochs: Dict[str, int] = {}     # Funktion -> .clear()/.invalidate()
+_generation = 0                           # clear_all()
+
+
+def user_tag(user_id: Any) -> str:
+    return f"user:{user_id}"
+
+
+def group_tag(group_id: Any) -> str:
+    return f"group:{group_id}"
+
+
+# ============================================
+# DECORATOR
+# ============================================
+
+def tagged_cache(
+    ttl: float,
+    tags: Optional[Callable[..., Iterable[str]]] = None,
+    result_tags: Optional[Callable[[Any], Iterable[str]]] = None,
+    max_entries: int = DEFAULT_MAX_ENTRIES
+) -> Callable:
+    """Cacht eine Funktion prozessweit mit TTL und Tags.
+
+    Args:
+        ttl: Lebensdauer eines Eintrags in Sekunden
+        tags: Bekommt die Argumente der Funktion als Keywords (inkl. Defaults),
+              liefert Tags — z.B. lambda user_id: [user_tag(user_id)]
+        result_tags: Bekommt das Ergebnis, liefert weitere Tags
+        max_entries: Max. Eintraege fuer diese Funktion (aelteste fliegen raus)
+
+    Die dekorierte Funktion hat zusaetzlich:
+        .clear()             alle Eintraege dieser Funktion verwerfen
+        .invalidate(*args)   nur den Eintrag fuer diese Argumente verwerfen
+    """
+    def decorator(fn: Callable) -> Callable:
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+
+        def bind(args, kwargs) -> Tuple[str, Dict[str, Any]]:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return repr(tuple(bound.arguments.items())), bound.arguments
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key, arguments = bind(args, kwargs)
+            now = time.monotonic()
+
+            with _lock:
+                bucket = _entries.setdefault(name, OrderedDict())
+                entry = bucket.get(key)
+                if entry is not None and entry[0] > now:
+                    bucket.move_to_end(key)
+                    return copy.deepcopy(entry[1])
+                arg_tags = tuple(tags(**arguments)) if tags else ()
+                snapshot = _begin_load(name, arg_tags)
+
+            try:
+                value = fn(*args, **kwargs)
+                entry_tags = arg_tags + (tuple(result_tags(value)) if result_tags and value else ())
+                with _lock:
+                    # Waehrend des Ladens invalidiert oder geleert? Dann nicht (veraltet) speichern.
+                    if _load_is_current(name, snapshot):
+                        _store(name, key, now + ttl, value, entry_tags, max_entries)
+            finally:
+                with _lock:
+                    _end_load(arg_tags)
+            return copy.deepcopy(value)
+
+        def clear():
+            with _lock:
+                _function_epochs[name] = _function_epochs.get(name, 0) + 1
+                for key in list(_entries.get(name, {})):
+                    _drop(name, key)
+
+        def invalidate(*args, **kwargs):
+            with _lock:
+                _function_epochs[name] = _function_epochs.get(name, 0) + 1
+                _drop(name, bind(args, kwargs)[0])
+
+        wrapper.clear = clear
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
+
+
+# ============================================
+# INVALIDIERUNG
+# ============================================
+
+def invalidate_tags(*tags: str) -> None:
+    """Verwirft alle Eintraege (aller Funktionen) mit einem der Tags."""
+    with _lock:
+        for tag in tags:
+            if tag in _loads_in_flight:
+                _tag_versions[tag] = _tag_versions.get(tag, 0) + 1
+            for name, key in list(_tag_index.get(tag, ())):
+                _drop(name, key)
+
+
+def invalidate_user(*user_ids: Any) -> None:
+    """Verwirft alle gecachten Daten der angegebenen User."""
+    invalidate_tags(*(user_tag(u) for u in user_ids if u))
+
+
+def invalidate_group(*group_ids: Any) -> None:
+    """Verwirft alle gecachten Daten der angegebenen Gruppen."""
+    invalidate_tags(*(group_tag(g) for g in group_ids if g))
+
+
+def clear_all() -> None:
+    """Leert den kompletten Cache (z.B. fuer Benchmarks / Cold Load)."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _entries.clear()
+        _tag_index.clear()
+
+
+def cache_stats() -> Dict[str, int]:
+    """Anzahl Eintraege pro Funktion (fuer Admin-/Debug-Anzeige)."""
+    with _lock:
+        return {name: len(bucket) for name, bucket in _entries.items()}
+
+
+# ============================================
+# INTERN (nur unter _lock aufrufen)
+# ============================================
+
+def _begin_load(name: str, arg_tags: Tuple[str, ...]) -> Tuple[int, int, Dict[str, int]]:
+    """Merkt den Stand vor fn(); Gegenstueck: _end_load()."""
+    for tag in arg_tags:
+        _loads_in_flight[tag] = _loads_in_flight.get(tag, 0) + 1
+    return (_generation, _function_epochs.get(name, 0),
+            {tag: _tag_versions.get(tag, 0) for tag in arg_tags})
+
+
+def _load_is_current(name: str, snapshot: Tuple[int, int, Dict[str, int]]) -> bool:
+    generation, epoch, versions = snapshot
+    return (generation == _generation
+            and epoch == _function_epochs.get(name, 0)
+            and all(_tag_versions.get(tag, 0) == v for tag, v in versions.items()))
+
+
+def _end_load(arg_tags: Tuple[str, ...]) -> None:
+    for tag in arg_tags:
+        remaining = _loads_in_flight.get(tag, 0) - 1
+        if remaining > 0:
+            _loads_in_flight[tag] = remaining
+        else:
+            _loads_in_flight.pop(tag, None)
+            _tag_versions.pop(tag, None)
+
+
+def _store(name: str, key: str, expires: float, value: Any,
+           entry_tags: Tuple[str, ...], max_entries: int) -> None:
+    bucket = _entries.setdefault(name, OrderedDict())
+    if key in bucket:
+        _drop(name, key)
+    bucket[key] = (expires, copy.deepcopy(value), entry_tags)
+    for tag in entry_tags:
+        _tag_index.setdefault(tag, set()).add((name, key))
+    while len(bucket) > max_entries:
+        _drop(name, next(iter(bucket)))
+
+
+def _drop(name: str, key: str) -> None:
+    bucket = _entries.get(name)
+    if not bucket or key not in bucket:
+        return
+    _, _, entry_tags = bucket.pop(key)
+    for tag in entry_tags:
+        refs = _tag_index.get(tag)
+        if refs is not None:
+            refs.discard((name, key))
+            if not refs:
+                del _tag_index[tag]
@@ -7,6 +7,9 @@ Supabase (PostgreSQL) als Cloud-Datenbank.
 import streamlit as st
 from supabase import create_client, Client
 
+from utils.db_transport import install_transport
+from utils.db_local import load_local_config, create_local_client
+
 
 @st.cache_resource
 def get_db() -> Client:
@@ -15,8 +18,20 @@ def get_db() -> Client:
     Supabase nutzt HTTP/REST — keine persistenten DB-Verbindungen
     die "stale" werden können. @st.cache_resource ist hier sicher
     und überlebt WebSocket-Reconnects (wichtig für Multipage-Apps).
+
+    Die HTTP-Session ist gepoolt und konfigurierbar (Keep-Alive, HTTP/2,
+    Timeouts, Retry) — siehe utils/db_transport.py.
+
+    Offline (Benchmarks, Lasttests, CI): mit PULSE_DB_BACKEND=local bzw.
+    [local_db] enabled = true kommt stattdessen ein SQLite-Stand-in mit
+    gleicher Query-API — siehe utils/db_local.py.
     """
-    return create_client(
+    local_config = load_local_config()
+    if local_config["enabled"]:
+        return create_local_client(local_config)
+
+    client = create_client(
         st.secrets["SUPABASE_URL"],
         st.secrets["SUPABASE_KEY"]
     )
+    return install_transport(client)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Fehlerklassen der Datenbank (PostgREST / Postgres)
+==================================================
+
+Fallbacks sollen nur greifen, wenn eine Migration noch nicht deployt ist —
+nicht bei Netzwerkfehlern. Ein RPC, dessen Antwort verloren ging (z.B.
+ReadError nach dem POST), kann serverseitig committet sein; ein
+Python-Fallback wuerde die Buchung dann doppelt ausfuehren.
+
+Verwendung:
+    try:
+        db.rpc("grant_xp", {...}).execute()
+    except Exception as e:
+        if not is_missing_function(e):
+            raise
+        ...  # Fallback
+"""
+
+from typing import Optional
+
+
+MISSING_FUNCTION_CODES = ("PGRST202", "42883")      # RPC nicht im Schema-Cache / undefined_function
+MISSING_TABLE_CODES = ("PGRST205", "42P01")         # Tabelle nicht im Schema-Cache / undefined_table
+MISSING_CONSTRAINT_CODES = ("42P10",)               # on_conflict ohne passenden Unique-Index
+MISSING_COLUMN_CODES = ("42703", "PGRST204")        # undefined_column / Spalte nicht im Schema-Cache
+
+
+def error_code(error: BaseException) -> Optional[str]:
+    """Fehlercode von postgrest.APIError (bzw. dem lokalen Ersatz), sonst None."""
+    code = getattr(error, "code", None)
+    if code:
+        return str(code)
+    if error.args and isinstance(error.args[0], dict):
+        code = error.args[0].get("code")
+        return str(code) if code else None
+    return None
+
+
+def is_missing_function(error: BaseException) -> bool:
+    """RPC existiert (noch) nicht — Migration fehlt."""
+    return error_code(error) in MISSING_FUNCTION_CODES
+
+
+def is_missing_table(error: BaseException) -> bool:
+    """Tabelle existiert (noch) nicht — Migration fehlt."""
+    return error_code(error) in MISSING_TABLE_CODES
+
+
+def is_missing_constraint(error: BaseException) -> bool:
+    """upsert(on_conflict=...) ohne Unique-Index — Migration fehlt."""
+    return error_code(error) in MISSING_CONSTRAINT_CODES
+
+
+def is_missing_column(error: BaseException) -> bool:
+    """Spalte existiert (noch) nicht — Migration fehlt."""
+    return error_code(error) in MISSING_COLUMN_CODES
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Supabase-Query-Instrumentierung
+================================
+
+Zeichnet JEDEN Supabase-Request (= jedes .execute() auf table()/rpc())
+auf — Tabelle, Operation, Filter, Zeilen, Bytes, Wall-Time, Aufrufstelle —
+gruppiert pro Streamlit-Rerun und Seite.
+
+Sitzt als httpx-Transport unter dem PostgREST-Client (siehe
+utils/db_transport.py), erfasst also auch Requests aus Worker-Threads
+(utils/parallel_fetch.py) und zaehlt Retries in die Wall-Time mit.
+Das lokale SQLite-Backend (utils/db_local.py) meldet seine Requests
+ueber record_call() im gleichen Format.
+
+Auswertung:
+    from utils.db_instrumentation import call_site_stats, render_stats
+    call_site_stats()   # p50/p95 pro Aufrufstelle
+    render_stats()      # Calls pro Render und Seite
+
+Export:
+    export_jsonl("perf/calls.jsonl")        # alle gepufferten Calls
+    export_prometheus("perf/supabase.prom") # Text-Format fuer node_exporter
+
+Standardmaessig aus (Stack-Walk und Body-Parsing pro Request kosten in
+Produktion Zeit). Einschalten in .streamlit/secrets.toml:
+
+    [supabase_instrumentation]
+    enabled = true
+    jsonl_path = "perf/supabase_calls.jsonl"   # laufend anhaengen (optional)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote
+
+import httpx
+import streamlit as st
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:
+    get_script_run_ctx = None
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+MAX_CALLS = 5000           # Ringpuffer fuer einzelne Calls
+MAX_RENDERS = 500          # Ringpuffer fuer abgeschlossene Renders
+ROW_COUNT_MAX_BYTES = 256 * 1024   # groessere Bodies nicht fuer Zeilenzahl parsen
+
+# Parameter, die keine Filter sind
+_NON_FILTER_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+# Module, die selbst keine "Aufrufstelle" sind
+_INFRA_FILES = {"database.py", "db_transport.py", "db_instrumentation.py",
+                "db_local.py", "parallel_fetch.py", "cache.py"}
+
+_REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+def load_instrumentation_config() -> Dict[str, Any]:
+    config = {"enabled": False, "jsonl_path": None}
+    try:
+        overrides = st.secrets.get("supabase_instrumentation", {})
+        config.update({k: overrides[k] for k in overrides if k in config})
+    except Exception:
+        pass
+    return config
+
+
+# ============================================
+# SPEICHER (prozessweit, alle Sessions)
+# ============================================
+
+_lock = threading.Lock()
+_calls: deque = deque(maxlen=MAX_CALLS)
+_renders: deque = deque(maxlen=MAX_RENDERS)
+_current_renders: Dict[str, Dict[str, Any]] = {}   # session_id -> laufender Render
+# Monoton seit Prozessstart/Reset (der Ringpuffer _calls vergisst alte Calls):
+# (call_site, table, op) -> {"calls": n, "ms": summe}
+_totals: Dict[tuple, Dict[str, float]] = {}
+_jsonl_path: Optional[str] = None
+
+
+def _session_and_run():
+    """(session_id, run_key, page_hash) des aktuellen Streamlit-Reruns."""
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    if ctx is None:
+        return None, None, None
+    # widget_ids_this_run wird bei jedem Rerun neu angelegt -> eindeutig pro Run
+    run_key = id(getattr(ctx, "widget_ids_this_run", ctx))
+    return ctx.session_id, run_key, getattr(ctx, "page_script_hash", None)
+
+
+def _call_site():
+    """(Seite, Aufrufstelle) aus dem Stack: erster Frame im Repo ausserhalb der DB-Schicht."""
+    page, site = None, None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_REPO_ROOT):
+            rel = os.path.relpath(filename, _REPO_ROOT)
+            base = os.path.basename(filename)
+            if site is None and base not in _INFRA_FILES:
+                site = f"{rel}:{frame.f_code.co_name}"
+            if rel.startswith("pages" + os.sep) or rel == "Home.py":
+                page = rel
+                break
+        frame = frame.f_back
+    return page, site
+
+
+def _parse_request(request: httpx.Request) -> Dict[str, Any]:
+    """Tabelle, Operation und Filter-Spalten aus dem PostgREST-Request."""
+    path = unquote(request.url.path)
+    target = path.split("/rest/v1/", 1)[-1]
+    method = request.method
+
+    if target.startswith("rpc/"):
+        table, op = target[4:], "rpc"
+    else:
+        table = target
+        prefer = request.headers.get("prefer", "")
+        op = {
+            "GET": "select", "HEAD": "count", "PATCH": "update", "DELETE": "delete",
+        }.get(method, "upsert" if "resolution=" in prefer else "insert")
+
+    # Nur Spalte + Operator (ohne Werte): "user_id=eq,status=eq"
+    filters = []
+    for key, value in request.url.params.multi_items():
+        if key in _NON_FILTER_PARAMS:
+            continue
+        if key in ("or", "and"):
+            filters.append(key)
+        else:
+            filters.append(f"{key}={value.split('.', 1)[0]}")
+
+    return {"table": table, "op": op, "filters": ",".join(filters)}
+
+
+def _row_count(response: httpx.Response) -> Optional[int]:
+    """Zeilen aus Content-Range (PostgREST) bzw. JSON-Array-Laenge."""
+    content_range = response.headers.get("content-range", "")
+    if "-" in content_range.split("/")[0]:
+        start, end = content_range.split("/")[0].split("-")
+        try:
+            return int(end) - int(start) + 1
+        except ValueError:
+            pass
+    if content_range.startswith("*/"):
+        return 0
+    if len(response.content) <= ROW_COUNT_MAX_BYTES:
+        try:
+            data = json.loads(response.content or b"null")
+            return len(data) if isinstance(data, list) else (1 if data else 0)
+        except ValueError:
+            return None
+    return None
+
+
+def record_call(request: httpx.Request, response: Optional[httpx.Response],
+                elapsed_ms: float, error: Optional[BaseException] = None) -> None:
+    """Speichert einen Call und ordnet ihn dem laufenden Render zu."""
+    session_id, run_key, page_hash = _session_and_run()
+    page, site = _call_site()
+
+    record = {
+        "ts": time.time(),
+        **_parse_request(request),
+        "status": response.status_code if response is not None else type(error).__name__,
+        "rows": _row_count(response) if response is not None else None,
+        "bytes": len(response.content) if response is not None else 0,
+        "ms": round(elapsed_ms, 2),
+        "call_site": site or "?",
+        "session": session_id,
+    }
+
+    with _lock:
+        render = _current_renders.get(session_id) if session_id else None
+        if session_id and (render is None or render["run_key"] != run_key):
+            if render is not None:
+                _finish_render(render)
+            render = {"run_key": run_key, "session": session_id, "page": page,
+                      "page_hash": page_hash, "started": record["ts"], "calls": 0, "ms": 0.0}
+            _current_renders[session_id] = render
+            if len(_current_renders) > MAX_RENDERS:
+                # Beendete Sessions: aeltesten laufenden Render abschliessen
+                oldest = min(_current_renders, key=lambda sid: _current_renders[sid]["started"])
+                _finish_render(_current_renders.pop(oldest))
+        if render is not None:
+            # Worker-Threads sehen die Seite nicht im Stack -> vom Render uebernehmen
+            render["page"] = render["page"] or page
+            page = render["page"]
+            render["calls"] += 1
+            render["ms"] += record["ms"]
+        record["page"] = page or "?"
+        _calls.append(record)
+        totals = _totals.setdefault((record["call_site"], record["table"], record["op"]),
+                                    {"calls": 0, "ms": 0.0})
+        totals["calls"] += 1
+        totals["ms"] += record["ms"]
+
+    if _jsonl_path:
+        _append_jsonl(_jsonl_path, [record])
+
+
+def _finish_render(render: Dict[str, Any]) -> None:
+    _renders.append({k: v for k, v in render.items() if k != "run_key"})
+
+
+# ============================================
+# TRANSPORT
+# ============================================
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Misst jeden Request des inneren Transports (inkl. Retries)."""
+
+    def __init__(self, inner: httpx.BaseTransport):
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        t0 = time.perf_counter()
+        try:
+            response = self._inner.handle_request(request)
+            response.read()   # Bytes/Zeilen zaehlen; der Client nutzt den gelesenen Body
+        except Exception as e:
+            _safe_record(request, None, (time.perf_counter() - t0) * 1000, e)
+            raise
+        _safe_record(request, response, (time.perf_counter() - t0) * 1000)
+        return response
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+def _safe_record(request, response, elapsed_ms, error=None) -> None:
+    # Instrumentierung darf nie einen Request scheitern lassen
+    try:
+        record_call(request, response, elapsed_ms, error)
+    except Exception as e:
+        print(f"[db_instrumentation] {e}")
+
+
+def instrument_transport(transport: httpx.BaseTransport) -> httpx.BaseTransport:
+    """Haengt die Instrumentierung vor den Transport (falls aktiviert)."""
+    global _jsonl_path
+    config = load_instrumentation_config()
+    if not config["enabled"]:
+        return transport
+    _jsonl_path = config["jsonl_path"]
+    return InstrumentedTransport(transport)
+
+
+# ============================================
+# AUSWERTUNG
+# ============================================
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def get_calls(limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    with _lock:
+        calls = list(_calls)
+    return calls[-limit:] if limit else calls
+
+
+def call_site_totals() -> Dict[tuple, Dict[str, float]]:
+    """Calls und Wall-Time pro (Aufrufstelle, Tabelle, Operation) seit Start/Reset (monoton)."""
+    with _lock:
+        return {key: dict(value) for key, value in _totals.items()}
+
+
+def call_site_stats(page: Optional[str] = None) -> List[Dict[str, Any]]:
+    """p50/p95 pro (Aufrufstelle, Tabelle, Operation), langsamste Summe zuerst."""
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for call in get_calls():
+        if page and call["page"] != page:
+            continue
+        groups.setdefault((call["call_site"], call["table"], call["op"]), []).append(call)
+
+    stats = []
+    for (site, table, op), calls in groups.items():
+        ms = [c["ms"] for c in calls]
+        stats.append({
+            "call_site": site,
+            "table": table,
+            "op": op,
+            "calls": len(calls),
+            "p50_ms": round(_percentile(ms, 50), 1),
+            "p95_ms": round(_percentile(ms, 95), 1),
+            "total_ms": round(sum(ms), 1),
+            "avg_rows": round(sum(c["rows"] or 0 for c in calls) / len(calls), 1),
+            "bytes": sum(c["bytes"] for c in calls),
+        })
+    stats.sort(key=lambda s: s["total_ms"], reverse=True)
+    return stats
+
+
+def render_stats() -> List[Dict[str, Any]]:
+    """Calls pro Render, aggregiert pro Seite (abgeschlossene + laufende Renders)."""
+    with _lock:
+        renders = list(_renders) + [
+            {k: v for k, v in r.items() if k != "run_key"} for r in _current_renders.values()
+        ]
+
+    by_page: Dict[str, List[Dict[str, Any]]] = {}
+    for r in renders:
+        by_page.setdefault(r["page"] or "?", []).append(r)
+
+    stats = []
+    for page, items in by_page.items():
+        counts = [r["calls"] for r in items]
+        ms = [r["ms"] for r in items]
+        stats.append({
+            "page": page,
+            "renders": len(items),
+            "calls_p50": _percentile(counts, 50),
+            "calls_p95": _percentile(counts, 95),
+            "calls_max": max(counts),
+            "db_ms_p50": round(_percentile(ms, 50), 1),
+            "db_ms_p95": round(_percentile(ms, 95), 1),
+        })
+    stats.sort(key=lambda s: s["calls_p95"], reverse=True)
+    return stats
+
+
+def reset_instrumentation() -> None:
+    with _lock:
+        _calls.clear()
+        _renders.clear()
+        _current_renders.clear()
+        _totals.clear()
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+def _append_jsonl(path: str, records: List[Dict[str, Any]]) -> None:
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[db_instrumentation] JSONL-Export fehlgeschlagen: {e}")
+
+
+def export_jsonl(path: str) -> int:
+    """Schreibt alle gepufferten Calls als JSONL. Returns: Anzahl Zeilen."""
+    calls = get_calls()
+    _append_jsonl(path, calls)
+    return len(calls)
+
+
+def export_prometheus(path: str) -> None:
+    """Schreibt Metriken im Prometheus-Textformat (z.B. fuer node_exporter textfile)."""
+    from utils.db_transport import get_transport_metrics
+
+    def esc(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+    def labels_for(site: str, table: str, op: str) -> str:
+        return f'call_site="{esc(site)}",table="{esc(table)}",op="{op}"'
+
+    # Zaehler und _sum/_count aus den monotonen Summen, Quantile aus dem Ringpuffer
+    totals = call_site_totals()
+    lines = [
+        "# HELP supabase_calls_total Supabase-Requests pro Aufrufstelle",
+        "# TYPE supabase_calls_total counter",
+    ]
+    for key, total in totals.items():
+        lines.append(f"supabase_calls_total{{{labels_for(*key)}}} {total['calls']}")
+
+    lines += ["# HELP supabase_call_duration_ms Wall-Time pro Request (Quantile: letzte Calls)",
+              "# TYPE supabase_call_duration_ms summary"]
+    quantiles = {(s["call_site"], s["table"], s["op"]): s for s in call_site_stats()}
+    for key, total in totals.items():
+        labels = labels_for(*key)
+        if key in quantiles:
+            lines.append(f'supabase_call_duration_ms{{{labels},quantile="0.5"}} {quantiles[key]["p50_ms"]}')
+            lines.append(f'supabase_call_duration_ms{{{labels},quantile="0.95"}} {quantiles[key]["p95_ms"]}')
+        lines.append(f"supabase_call_duration_ms_sum{{{labels}}} {round(total['ms'], 1)}")
+        lines.append(f"supabase_call_duration_ms_count{{{labels}}} {total['calls']}")
+
+    lines += ["# HELP supabase_calls_per_render Supabase-Requests pro Rerun",
+              "# TYPE supabase_calls_per_render gauge"]
+    for r in render_stats():
+        lines.append(f'supabase_calls_per_render{{page="{esc(r["page"])}",quantile="0.5"}} {r["calls_p50"]}')
+        lines.append(f'supabase_calls_per_render{{page="{esc(r["page"])}",quantile="0.95"}} {r["calls_p95"]}')
+
+    lines += ["# HELP supabase_transport Pool-Metriken des HTTP-Transports",
+              "# TYPE supabase_transport gauge"]
+    for key, value in get_transport_metrics().items():
+        if isinstance(value, (int, float)):
+            lines.append(f'supabase_transport{{metric="{key}"}} {value}')
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)   # atomar, damit der Scraper nie eine halbe Datei liest
@@ -1,35 +1,168 @@
 """
 Shared database loading functions for PISA 2022 Explorer
+
+Zugriffsschicht auf pisa_2022_germany.db (nur lesend):
+- Pro Thread EINE gecachte Verbindung (mode=ro, immutable=1, mmap,
+  grosser Page-Cache) statt sqlite3.connect bei jedem Aufruf
+- Nur parametrisierte Queries — sqlite3 haelt die vorbereiteten
+  Statements im Statement-Cache der Verbindung, gleiche SQL-Texte werden
+  nicht neu geparst
+- Spaltennamen (nicht parametrisierbar) werden gegen das Schema von
+  student_data geprueft
+- load_*: Cache-Key sind nur die fachlichen Argumente (kein _conn mehr)
+- student_data liest zuerst aus dem Spaltenspeicher (utils/pisa_store.py,
+  memory-mapped .npy pro Spalte); SQL nur, wenn kein aktueller Export da ist
 """
 
 import streamlit as st
 import sqlite3
+import threading
 import pandas as pd
 from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from utils.pisa_store import get_student_store
+
+
+# Immer die vollständige Datenbank verwenden (6,116 Schüler)
+PISA_DB_PATH = "pisa_2022_germany.db"
+
+MMAP_SIZE = 512 * 1024 * 1024       # Bytes; die DB wird direkt aus dem Page-Cache gelesen
+CACHE_SIZE_KIB = 64 * 1024          # SQLite-Page-Cache pro Verbindung (64 MiB)
+STATEMENT_CACHE = 256               # vorbereitete Statements pro Verbindung
+
+_local = threading.local()
+
+
+# ============================================
+# VERBINDUNGEN
+# ============================================
+
+def _open_read_only(db_path: str) -> sqlite3.Connection:
+    """Oeffnet die PISA-DB schreibgeschuetzt und unveraenderlich.
+
+    immutable=1: SQLite verzichtet auf Locks und Change-Detection — die
+    Datei wird zur Laufzeit nie geschrieben.
+    """
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE)
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def get_read_connection(db_path: str = PISA_DB_PATH) -> sqlite3.Connection:
+    """Gecachte Lese-Verbindung des aktuellen Threads (nicht schliessen)."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = _open_read_only(db_path)
+    return conn
 
 
 def get_db_connection():
     """
-    Erstellt neue Datenbankverbindung zur vollständigen PISA 2022 Deutschland Datenbank
+    Datenbankverbindung zur vollständigen PISA 2022 Deutschland Datenbank
+
+    Liefert die gecachte Lese-Verbindung des aktuellen Threads —
+    nicht schliessen.
+
+    Returns:
+        sqlite3.Connection: Datenbankverbindung (read-only)
+    """
+    return get_read_connection()
+
+
+def read_sql(query: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+    """
+    Führt eine parametrisierte Query auf der PISA-DB aus
 
-    WICHTIG: Kein Caching mehr, da SQLite-Connections nicht thread-safe gecacht werden können
+    Args:
+        query: SQL mit ?-Platzhaltern
+        params: Werte für die Platzhalter
 
     Returns:
-        sqlite3.Connection: Datenbankverbindung
+        pd.DataFrame: Ergebnis
     """
-    # Immer die vollständige Datenbank verwenden (6,116 Schüler)
-    db_path = "pisa_2022_germany.db"
+    return pd.read_sql_query(query, get_read_connection(), params=tuple(params))
 
-    return sqlite3.connect(db_path, check_same_thread=False)
 
+@st.cache_resource
+def get_student_columns() -> FrozenSet[str]:
+    """Alle Spaltennamen von student_data (für die Prüfung von Spaltennamen)."""
+    store = get_student_store()
+    if store is not None:
+        return frozenset(store.columns)
+    rows = get_read_connection().execute("PRAGMA table_info(student_data)").fetchall()
+    return frozenset(row[1] for row in rows)
+
+
+def student_column(name: str) -> str:
+    """
+    Prüft einen Spaltennamen von student_data (Spalten lassen sich nicht parametrisieren)
+
+    Raises:
+        ValueError: Spalte existiert nicht
+    """
+    if name not in get_student_columns():
+        raise ValueError(f"Unbekannte Variable in student_data: {name!r}")
+    return name
+
+
+def student_columns(names: Iterable[str]) -> List[str]:
+    """Prüft mehrere Spaltennamen, Reihenfolge bleibt, Duplikate fallen weg."""
+    return [student_column(name) for name in dict.fromkeys(names)]
+
+
+def load_student_columns(variables: Sequence[str], not_null: Sequence[str] = (),
+                         limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Spalten aus student_data (Spaltenspeicher, sonst SQL)
+
+    Entspricht SELECT variables FROM student_data
+    WHERE not_null IS NOT NULL LIMIT limit.
+
+    Args:
+        variables: Spaltennamen (werden geprüft)
+        not_null: Spalten, die einen Wert haben müssen
+        limit: Max. Zeilen (None = alle)
+
+    Returns:
+        pd.DataFrame: Spalten in der Reihenfolge von variables
+    """
+    variables = student_columns(variables)
+    not_null = student_columns(not_null)
+
+    store = get_student_store()
+    if store is not None:
+        return store.frame(variables, not_null, limit)
+
+    query = f"SELECT {', '.join(variables)} FROM student_data"
+    if not_null:
+        query += " WHERE " + " AND ".join(f"{column} IS NOT NULL" for column in not_null)
+    params = ()
+    if limit is not None:
+        query += " LIMIT ?"
+        params = (int(limit),)
+    return read_sql(query, params)
+
+
+# ============================================
+# LOADER
+# ============================================
 
 @st.cache_data
-def load_codebook(_conn, search_term=None):
+def load_codebook(search_term=None):
     """
     Lädt Codebook mit optionalem Filter
 
     Args:
-        _conn: Datenbankverbindung (nicht für Cache-Key verwendet)
         search_term: Optionaler Suchbegriff
 
     Returns:
@@ -42,31 +175,33 @@ def load_codebook(_conn, search_term=None):
         data_type
     FROM codebook
     """
+    params = ()
 
     if search_term:
-        query += f"""
-        WHERE LOWER(variable_label) LIKE LOWER('%{search_term}%')
-        OR LOWER(variable_name) LIKE LOWER('%{search_term}%')
+        query += """
+        WHERE LOWER(variable_label) LIKE LOWER(?)
+        OR LOWER(variable_name) LIKE LOWER(?)
         """
+        pattern = f"%{search_term}%"
+        params = (pattern, pattern)
 
     query += " ORDER BY variable_name;"
 
-    return pd.read_sql_query(query, _conn)
+    return read_sql(query, params)
 
 
 @st.cache_data
-def load_value_labels(_conn, variable_name):
+def load_value_labels(variable_name):
     """
     Lädt Value Labels für eine Variable (mit deutschen Labels falls vorhanden)
 
     Args:
-        _conn: Datenbankverbindung
         variable_name: Name der Variable
 
     Returns:
         pd.DataFrame: Value Labels
     """
-    query = f"""
+    query = """
     SELECT
         value,
         label_en as label,
@@ -75,44 +210,42 @@ def load_value_labels(_conn, variable_name):
         percent,
         is_missing_code
     FROM value_labels
-    WHERE variable_name = '{variable_name}'
+    WHERE variable_name = ?
     ORDER BY sort_order, value;
     """
-    return pd.read_sql_query(query, _conn)
+    return read_sql(query, (variable_name,))
 
 
 @st.cache_data
-def load_question_text(_conn, variable_name):
+def load_question_text(variable_name):
     """
     Lädt Fragetext für eine Variable
 
     Args:
-        _conn: Datenbankverbindung
         variable_name: Name der Variable
 
     Returns:
         pd.Series or None: Fragetext-Daten
     """
-    query = f"""
+    query = """
     SELECT
         question_text_en,
         question_text_de,
         questionnaire_type,
         question_category
     FROM question_text
-    WHERE variable_name = '{variable_name}';
+    WHERE variable_name = ?;
     """
-    result = pd.read_sql_query(query, _conn)
+    result = read_sql(query, (variable_name,))
     return result.iloc[0] if len(result) > 0 else None
 
 
 @st.cache_data
-def load_student_data(_conn, variables, performance_vars=['PV1MATH', 'PV1READ', 'PV1SCIE']):
+def load_student_data(variables, performance_vars=('PV1MATH', 'PV1READ', 'PV1SCIE')):
     """
     Lädt Schülerdaten für ausgewählte Variablen
 
     Args:
-        _conn: Datenbankverbindung
         variables: Liste der zu ladenden Variablen
         performance_vars: Leistungsvariablen (Math, Reading, Science)
 
@@ -120,26 +253,15 @@ def load_student_data(_conn, variables, performance_vars=['PV1MATH', 'PV1READ',
         pd.DataFrame: Schülerdaten
     """
     # Ensure performance variables and gender are always included
-    var_list = list(set(variables + performance_vars + ['ST004D01T']))
-    var_str = ", ".join(var_list)
-
-    query = f"""
-    SELECT
-        {var_str}
-    FROM student_data
-    WHERE {variables[0]} IS NOT NULL;
-    """
-    return pd.read_sql_query(query, _conn)
+    var_list = list(variables) + list(performance_vars) + ['ST004D01T']
+    return load_student_columns(var_list, not_null=[variables[0]])
 
 
 @st.cache_data
-def get_available_scales(_conn):
+def get_available_scales():
     """
     Lädt alle verfügbaren WLE-Skalen (nicht-NULL Werte)
 
-    Args:
-        _conn: Datenbankverbindung
-
     Returns:
         pd.DataFrame: Verfügbare Skalen mit Statistiken
     """
@@ -152,25 +274,118 @@ def get_available_scales(_conn):
     WHERE variable_label LIKE '%WLE%'
     ORDER BY variable_name;
     """
-    return pd.read_sql_query(query, _conn)
+    return read_sql(query)
 
 
 @st.cache_data
-def count_non_null(_conn, variable_name):
+def count_non_null(variable_name):
     """
     Zählt nicht-NULL Werte für eine Variable
 
     Args:
-        _conn: Datenbankverbindung
         variable_name: Name der Variable
 
     Returns:
         int: Anzahl nicht-NULL Werte
     """
+    column = student_column(variable_name)
+    store = get_student_store()
+    if store is not None:
+        return store.count(column)
+
     query = f"""
-    SELECT COUNT({variable_name}) as count
+    SELECT COUNT({column}) as count
     FROM student_data
-    WHERE {variable_name} IS NOT NULL;
+    WHERE {column} IS NOT NULL;
+    """
+    result = read_sql(query)
+    return int(result['count'][0]) if len(result) > 0 else 0
+
+
+# ============================================
+# BULK-LOADER (Fragebogen-Bau)
+# ============================================
+# Zwei IN (...)-Queries für alle Variablen statt zwei Queries pro Item.
+
+IN_CHUNK_SIZE = 500     # Platzhalter pro Query (SQLite-Limit: 999 bei alten Versionen)
+
+
+def _read_sql_in(query: str, values: Sequence[str]) -> pd.DataFrame:
+    """Führt eine Query mit "IN ({placeholders})" in Blöcken aus."""
+    values = list(dict.fromkeys(values))
+    frames = []
+    for start in range(0, len(values), IN_CHUNK_SIZE):
+        chunk = values[start:start + IN_CHUNK_SIZE]
+        frames.append(read_sql(query.format(placeholders=", ".join("?" * len(chunk))), chunk))
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def load_question_texts(variable_names: Iterable[str]) -> Dict[str, pd.Series]:
+    """
+    Lädt Fragetexte für viele Variablen mit einer Query
+
+    Args:
+        variable_names: Namen der Variablen
+
+    Returns:
+        Dict[str, pd.Series]: Fragetext-Daten pro Variable (wie load_question_text);
+        Variablen ohne Eintrag fehlen
+    """
+    names = list(variable_names)
+    if not names:
+        return {}
+
+    query = """
+    SELECT
+        variable_name,
+        question_text_en,
+        question_text_de,
+        questionnaire_type,
+        question_category
+    FROM question_text
+    WHERE variable_name IN ({placeholders});
+    """
+    result = _read_sql_in(query, names).drop_duplicates("variable_name")
+    return {
+        row["variable_name"]: row.drop(labels="variable_name").rename(0)
+        for _, row in result.iterrows()
+    }
+
+
+def load_value_labels_bulk(variable_names: Iterable[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Lädt Value Labels für viele Variablen mit einer Query
+
+    Args:
+        variable_names: Namen der Variablen
+
+    Returns:
+        Dict[str, pd.DataFrame]: Value Labels pro Variable (Spalten wie
+        load_value_labels); Variablen ohne Labels fehlen
+    """
+    names = list(variable_names)
+    if not names:
+        return {}
+
+    query = """
+    SELECT
+        variable_name,
+        value,
+        label_en as label,
+        label_de,
+        count,
+        percent,
+        is_missing_code
+    FROM value_labels
+    WHERE variable_name IN ({placeholders})
+    ORDER BY variable_name, sort_order, value;
     """
-    result = pd.read_sql_query(query, _conn)
-    return result['count'][0] if len(result) > 0 else 0
+    result = _read_sql_in(query, names)
+    if result.empty:
+        return {}
+    return {
+        name: group.drop(columns="variable_name").reset_index(drop=True)
+        for name, group in result.groupby("variable_name", sort=False)
+    }
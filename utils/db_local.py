@@ -0,0 +1,1035 @@
+# -*- coding: utf-8 -*-
+"""
+Lokaler Stand-in fuer Supabase (SQLite, offline)
+=================================================
+
+Benchmarks und Lasttests brauchen sonst das Cloud-Projekt. Dieser Client
+implementiert die Teilmenge der supabase-py/PostgREST-Query-API, die das
+Projekt nutzt, auf einer SQLite-Datenbank im Prozess:
+
+    get_db().table("users").select("user_id, xp_total").eq("role", "student") \\
+        .order("xp_total", desc=True).limit(10).execute()
+
+Unterstuetzt:
+    select(cols, count="exact") / insert / upsert(on_conflict, ignore_duplicates)
+    update / delete
+    eq, neq, gt, gte, lt, lte, like, ilike, is_, in_, match, filter, not_.<op>
+    or_("a.eq.1,and(b.gt.2,c.is.null)")
+    order(col, desc, nullsfirst), limit, offset, range
+
+Schema:
+    Die Tabellen aus sql/*.sql (CREATE TABLE, ADD COLUMN, UNIQUE-Constraints/
+    -Indizes, updated_at-Trigger) werden beim Start eingelesen — Typen,
+    Defaults (NOW(), gen_random_uuid(), ...) und Unique-Keys gelten wie in
+    Postgres; Indizes aus CREATE INDEX werden ebenfalls angelegt.
+    Tabellen/Spalten ohne Migration (users, learning_groups, ...)
+    entstehen beim ersten Zugriff; der Typ kommt vom ersten Wert, neue
+    Zeilen ohne Migration bekommen eine UUID als "id".
+
+RPCs:
+    rpc() schlaegt wie eine fehlende Postgres-Funktion fehl (PGRST202) —
+    die Module nutzen dann ihren Python-Fallback. Ausnahme: Funktionen, fuer
+    die ein Modul mit @register_local_rpc (utils/local_rpc.py) einen
+    Stand-in registriert hat.
+    Der laeuft wie in Postgres als EIN Request in EINER Transaktion
+    (table()-Aufrufe darin ohne eigene Latenz/Instrumentierung).
+
+Aktivieren (get_db() in utils/database.py liefert dann diesen Client):
+
+    PULSE_DB_BACKEND=local streamlit run Home.py
+
+    # oder in .streamlit/secrets.toml:
+    [local_db]
+    enabled = true
+    path = ":memory:"       # oder Datei, z.B. "perf/local.db"
+    latency_ms = 40         # kuenstliche Netzwerk-Latenz pro Request
+    jitter_ms = 10          # +/- zufaellig
+
+Umgebungsvariablen (fuer CI) ueberschreiben secrets.toml:
+    PULSE_DB_BACKEND=local, PULSE_DB_PATH, PULSE_DB_LATENCY_MS, PULSE_DB_JITTER_MS
+"""
+
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+from utils.local_rpc import get_local_rpc, register_local_rpc  # noqa: F401 (Re-Export)
+
+try:
+    from postgrest.exceptions import APIError
+except ImportError:
+    class APIError(Exception):
+        """Ersatz fuer postgrest.exceptions.APIError (gleiche Attribute)."""
+
+        def __init__(self, error: Dict[str, Any]):
+            self._raw_error = error
+            self.message = error.get("message")
+            self.code = error.get("code")
+            self.hint = error.get("hint")
+            self.details = error.get("details")
+            super().__init__(str(error))
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+DEFAULT_CONFIG = {
+    "enabled": False,
+    "path": ":memory:",
+    "latency_ms": 0.0,
+    "jitter_ms": 0.0,
+}
+
+_ENV_OVERRIDES = {
+    "PULSE_DB_PATH": ("path", str),
+    "PULSE_DB_LATENCY_MS": ("latency_ms", float),
+    "PULSE_DB_JITTER_MS": ("jitter_ms", float),
+}
+
+SQL_DIR = Path(__file__).resolve().parent.parent / "sql"
+
+
+def load_local_config() -> Dict[str, Any]:
+    """DEFAULT_CONFIG <- [local_db] aus st.secrets <- Umgebungsvariablen."""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        overrides = st.secrets.get("local_db", {})
+        config.update({k: overrides[k] for k in overrides if k in DEFAULT_CONFIG})
+    except Exception:
+        pass  # Keine secrets.toml (z.B. CI)
+
+    backend = os.environ.get("PULSE_DB_BACKEND")
+    if backend:
+        config["enabled"] = backend.lower() == "local"
+    for env, (key, cast) in _ENV_OVERRIDES.items():
+        if os.environ.get(env):
+            config[key] = cast(os.environ[env])
+    return config
+
+
+# ============================================
+# SCHEMA (aus sql/*.sql)
+# ============================================
+
+# Spalten-Art -> deklarierter SQLite-Typ (bestimmt Affinitaet und Rueckwandlung)
+_KIND_DECL = {"bool": "BOOLEAN", "json": "JSONTEXT", "int": "INTEGER",
+              "real": "REAL", "text": "TEXT", "any": ""}
+_DECL_KIND = {v: k for k, v in _KIND_DECL.items()}
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class _TableSchema:
+    """Bekannte Spalten, Defaults und Keys einer Tabelle."""
+
+    def __init__(self, name: str, declared: bool = False):
+        self.name = name
+        self.declared = declared                       # aus sql/ bekannt?
+        self.kinds: Dict[str, str] = {}                 # Spalte -> Art
+        self.defaults: Dict[str, Callable[[], Any]] = {}
+        self.primary_key: Optional[str] = None
+        self.auto_increment = False
+        self.unique: List[Tuple[str, ...]] = []
+        self.indexes: List[Tuple[str, ...]] = []
+        self.touch_on_update: List[str] = []            # BEFORE UPDATE: NEW.x := NOW()
+
+
+def _kind_for_type(sql_type: str) -> str:
+    t = sql_type.upper()
+    if t.endswith("[]") or "JSON" in t:
+        return "json"
+    if t.startswith("BOOL"):
+        return "bool"
+    if "SERIAL" in t or "INT" in t:
+        return "int"
+    if any(x in t for x in ("REAL", "DOUBLE", "NUMERIC", "DECIMAL", "FLOAT")):
+        return "real"
+    return "text"
+
+
+def _kind_for_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "real"
+    if isinstance(value, (dict, list)):
+        return "json"
+    if value is None:
+        return "any"
+    return "text"
+
+
+def _parse_default(expr: str, kind: str) -> Optional[Callable[[], Any]]:
+    """SQL-Default -> Funktion, die den Python-Wert liefert."""
+    expr = expr.strip()
+    lowered = expr.lower()
+    if lowered in ("now()", "clock_timestamp()", "current_timestamp", "timezone('utc'::text, now())"):
+        return _now_iso
+    if lowered == "current_date":
+        return lambda: date.today().isoformat()
+    if lowered in ("gen_random_uuid()", "uuid_generate_v4()"):
+        return lambda: str(uuid.uuid4())
+    if lowered == "null":
+        return None
+    if lowered in ("true", "false"):
+        value = lowered == "true"
+        return lambda: value
+    if lowered.startswith("array["):
+        return lambda: []
+    if re.fullmatch(r"-?\d+", expr):
+        return lambda: int(expr)
+    if re.fullmatch(r"-?\d+\.\d*", expr):
+        return lambda: float(expr)
+
+    literal = re.match(r"'((?:[^']|'')*)'", expr)
+    if literal:
+        text = literal.group(1).replace("''", "'")
+        if kind == "json":
+            try:
+                parsed = json.loads(text)
+            except ValueError:
+                parsed = [] if text == "{}" else text   # Postgres-Array-Literal
+            return lambda: json.loads(json.dumps(parsed))
+        return lambda: text
+    return None
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Trennt an sep ausserhalb von Klammern und Anfuehrungszeichen."""
+    parts, depth, quote, current = [], 0, None, []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            current.append(ch)
+            if ch == "\\" and i + 1 < len(text):
+                current.append(text[i + 1])
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+            current.append(ch)
+        elif ch == "(":
+            depth += 1
+            current.append(ch)
+        elif ch == ")":
+            depth -= 1
+            current.append(ch)
+        elif ch == sep and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+_COLUMN_STOP = r"(?=\s+(?:NOT\s+NULL|NULL|PRIMARY\s+KEY|UNIQUE|REFERENCES|CHECK|CONSTRAINT|GENERATED)\b|\s*$)"
+
+
+def _apply_column_def(schema: _TableSchema, definition: str) -> None:
+    match = re.match(r'"?(\w+)"?\s+([\w ]+?(?:\[\])?)(?=\s|$)', definition + " ")
+    if not match:
+        return
+    column, sql_type = match.group(1), match.group(2).strip()
+    # "DOUBLE PRECISION", "TIMESTAMP WITH TIME ZONE": Zusatzwoerter abschneiden
+    sql_type = re.split(r"\s+(?:DEFAULT|NOT|NULL|PRIMARY|UNIQUE|REFERENCES|CHECK)\b",
+                        sql_type, flags=re.I)[0]
+    kind = _kind_for_type(sql_type)
+    schema.kinds[column] = kind
+
+    upper = definition.upper()
+    if "PRIMARY KEY" in upper:
+        schema.primary_key = column
+        schema.auto_increment = "SERIAL" in sql_type.upper() or "IDENTITY" in upper
+    elif re.search(r"\bUNIQUE\b", upper):
+        schema.unique.append((column,))
+
+    default = re.search(r"\bDEFAULT\s+(.+?)" + _COLUMN_STOP, definition, re.I | re.S)
+    if default:
+        fn = _parse_default(re.sub(r"::[\w\[\] ]+$", "", default.group(1).strip()), kind)
+        if fn:
+            schema.defaults[column] = fn
+
+
+def _strip_comments(sql: str) -> str:
+    return re.sub(r"--[^\n]*", "", sql)
+
+
+def load_schema(sql_dir: Path = SQL_DIR) -> Dict[str, _TableSchema]:
+    """Liest Tabellen, Spalten, Defaults, Unique-Keys und Trigger aus sql/*.sql."""
+    tables: Dict[str, _TableSchema] = {}
+    touch_functions: Dict[str, List[str]] = {}
+
+    def schema_for(name: str) -> _TableSchema:
+        return tables.setdefault(name, _TableSchema(name, declared=True))
+
+    for path in sorted(sql_dir.glob("*.sql")):
+        sql = _strip_comments(path.read_text(encoding="utf-8"))
+
+        for name, body in re.findall(
+                r"CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)\s*\((.*?)\)\s*;", sql, re.I | re.S):
+            schema = schema_for(name)
+            for definition in _split_top_level(body):
+                head = definition.split(None, 1)[0].upper() if definition else ""
+                if head in ("UNIQUE", "PRIMARY", "CONSTRAINT", "CHECK", "FOREIGN", "EXCLUDE"):
+                    cols = re.search(r"(UNIQUE|PRIMARY\s+KEY)\s*\(([^)]*)\)", definition, re.I)
+                    if cols:
+                        keys = tuple(c.strip() for c in cols.group(2).split(","))
+                        if cols.group(1).upper() == "UNIQUE":
+                            schema.unique.append(keys)
+                        elif len(keys) == 1:
+                            schema.primary_key = keys[0]
+                        else:
+                            schema.unique.append(keys)
+                elif definition:
+                    _apply_column_def(schema, definition)
+
+        for name, definition in re.findall(
+                r"ALTER\s+TABLE\s+(?:IF\s+EXISTS\s+)?(?:ONLY\s+)?(\w+)\s+ADD\s+COLUMN\s+"
+                r"(?:IF\s+NOT\s+EXISTS\s+)?([^;]+?)\s*;", sql, re.I | re.S):
+            _apply_column_def(schema_for(name), definition.strip())
+
+        for name, column, expr in re.findall(
+                r"ALTER\s+TABLE\s+(\w+)\s+ALTER\s+COLUMN\s+(\w+)\s+SET\s+DEFAULT\s+([^;]+?)\s*;",
+                sql, re.I | re.S):
+            schema = schema_for(name)
+            fn = _parse_default(expr, schema.kinds.get(column, "text"))
+            if fn:
+                schema.defaults[column] = fn
+
+        for name, cols in re.findall(
+                r"ALTER\s+TABLE\s+(\w+)\s+ADD\s+CONSTRAINT\s+\w+\s+UNIQUE\s*\(([^)]*)\)", sql, re.I):
+            schema_for(name).unique.append(tuple(c.strip() for c in cols.split(",")))
+
+        for name, cols in re.findall(
+                r"CREATE\s+UNIQUE\s+INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?\w+\s+ON\s+(\w+)\s*\(([^)]*)\)",
+                sql, re.I):
+            schema_for(name).unique.append(tuple(c.strip() for c in cols.split(",")))
+
+        # Normale Indizes: nur die Spalten (ASC/DESC und WHERE-Teil entfallen)
+        for name, cols in re.findall(
+                r"CREATE\s+INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?\w+\s+ON\s+(\w+)\s*\(([^)]*)\)",
+                sql, re.I):
+            schema_for(name).indexes.append(tuple(c.split()[0] for c in cols.split(",")))
+
+        # updated_at-Trigger: Funktion setzt NEW.<spalte> := NOW() / clock_timestamp()
+        for fn_name, body in re.findall(
+                r"CREATE\s+(?:OR\s+REPLACE\s+)?FUNCTION\s+(\w+)\s*\(\s*\)\s*RETURNS\s+TRIGGER.*?\$\$(.*?)\$\$",
+                sql, re.I | re.S):
+            touch_functions[fn_name] = re.findall(r"NEW\.(\w+)\s*:=\s*(?:NOW|clock_timestamp)\(\)", body, re.I)
+
+        for name, fn_name in re.findall(
+                r"CREATE\s+TRIGGER\s+\w+\s+BEFORE\s+UPDATE\s+ON\s+(\w+).*?EXECUTE\s+(?:FUNCTION|PROCEDURE)\s+(\w+)",
+                sql, re.I | re.S):
+            schema_for(name).touch_on_update.extend(touch_functions.get(fn_name, []))
+
+    return tables
+
+
+# ============================================
+# FILTER (PostgREST-Syntax)
+# ============================================
+
+# Knoten: ("cond", spalte, operator, wert, negiert) | ("and"/"or", [knoten], negiert)
+
+_SQL_OPS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+
+def _parse_condition(text: str) -> tuple:
+    """'col.op.wert', 'col.not.op.wert', 'and(...)', 'or(...)', 'not.and(...)'."""
+    negate = False
+    if text.startswith("not.") and re.match(r"not\.(and|or)\(", text):
+        negate, text = True, text[4:]
+    logic = re.match(r"(and|or)\((.*)\)$", text, re.S)
+    if logic:
+        return (logic.group(1), [_parse_condition(p) for p in _split_top_level(logic.group(2))], negate)
+
+    column, rest = text.split(".", 1)
+    if rest.startswith("not."):
+        negate, rest = True, rest[4:]
+    op, value = rest.split(".", 1)
+    if op == "in":
+        value = [_unquote(v) for v in _split_top_level(value.strip()[1:-1])]
+    else:
+        value = _unquote(value)
+    return ("cond", column, op, value, negate)
+
+
+def _encode_param(op: str, value: Any) -> str:
+    """Filter-Wert als PostgREST-Query-Parameter (fuer die Instrumentierung)."""
+    if op == "in":
+        return "in.(" + ",".join(str(v) for v in value) + ")"
+    return f"{op}.{value}"
+
+
+# ============================================
+# QUERY-BUILDER
+# ============================================
+
+class LocalResponse:
+    """Wie postgrest APIResponse: .data (Liste von Dicts) und .count."""
+
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"LocalResponse(data={self.data!r}, count={self.count!r})"
+
+
+class _Negator:
+    """builder.not_.is_("spalte", "null") — negiert den naechsten Filter."""
+
+    def __init__(self, builder: "LocalQuery"):
+        self._builder = builder
+
+    def __getattr__(self, name: str):
+        method = getattr(self._builder, name)
+
+        def negated(*args, **kwargs):
+            self._builder._negate_next = True
+            return method(*args, **kwargs)
+        return negated
+
+
+class LocalQuery:
+    """Sammelt Operation, Filter, Sortierung und fuehrt sie bei execute() aus."""
+
+    def __init__(self, client: "LocalClient", table: str):
+        self._client = client
+        self.table = table
+        self.method = "select"
+        self.columns = "*"
+        self.payload: Any = None
+        self.filters: List[tuple] = []
+        self.orders: List[Tuple[str, bool, Optional[bool]]] = []
+        self.limit_value: Optional[int] = None
+        self.offset_value: Optional[int] = None
+        self.count: Optional[str] = None
+        self.head = False
+        self.on_conflict: Optional[str] = None
+        self.ignore_duplicates = False
+        self.params: List[Tuple[str, str]] = []
+        self._negate_next = False
+
+    # --- Operationen ---
+
+    def select(self, *columns: str, count: Optional[str] = None, head: bool = False) -> "LocalQuery":
+        self.method = "select"
+        self.columns = ",".join(columns) if columns else "*"
+        self.count = count
+        self.head = bool(head)     # nur zaehlen, keine Zeilen (HEAD-Request)
+        return self
+
+    def insert(self, json: Any, count: Optional[str] = None, upsert: bool = False, **_) -> "LocalQuery":
+        if upsert:
+            return self.upsert(json)
+        self.method, self.payload = "insert", json
+        return self
+
+    def upsert(self, json: Any, on_conflict: str = "", ignore_duplicates: bool = False, **_) -> "LocalQuery":
+        self.method, self.payload = "upsert", json
+        self.on_conflict = on_conflict or None
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json: Dict[str, Any], **_) -> "LocalQuery":
+        self.method, self.payload = "update", json
+        return self
+
+    def delete(self, **_) -> "LocalQuery":
+        self.method = "delete"
+        return self
+
+    # --- Filter ---
+
+    @property
+    def not_(self) -> _Negator:
+        return _Negator(self)
+
+    def filter(self, column: str, operator: str, criteria: Any) -> "LocalQuery":
+        negate, self._negate_next = self._negate_next, False
+        if operator.startswith("not."):
+            negate, operator = not negate, operator[4:]
+        if operator == "in" and isinstance(criteria, str):
+            criteria = [_unquote(v) for v in _split_top_level(criteria.strip()[1:-1])]
+        self.filters.append(("cond", column, operator, criteria, negate))
+        self.params.append((column, ("not." if negate else "") + _encode_param(operator, criteria)))
+        return self
+
+    def eq(self, column: str, value: Any) -> "LocalQuery":
+        return self.filter(column, "eq", value)
+
+    def neq(self, column: str, value: Any) -> "LocalQuery":
+        return self.filter(column, "neq", value)
+
+    def gt(self, column: str, value: Any) -> "LocalQuery":
+        return self.filter(column, "gt", value)
+
+    def gte(self, column: str, value: Any) -> "LocalQuery":
+        return self.filter(column, "gte", value)
+
+    def lt(self, column: str, value: Any) -> "LocalQuery":
+        return self.filter(column, "lt", value)
+
+    def lte(self, column: str, value: Any) -> "LocalQuery":
+        return self.filter(column, "lte", value)
+
+    def like(self, column: str, pattern: str) -> "LocalQuery":
+        return self.filter(column, "like", pattern)
+
+    def ilike(self, column: str, pattern: str) -> "LocalQuery":
+        return self.filter(column, "ilike", pattern)
+
+    def is_(self, column: str, value: Any) -> "LocalQuery":
+        return self.filter(column, "is", "null" if value is None else str(value).lower())
+
+    def in_(self, column: str, values: Any) -> "LocalQuery":
+        return self.filter(column, "in", list(values))
+
+    def match(self, query: Dict[str, Any]) -> "LocalQuery":
+        for column, value in query.items():
+            self.eq(column, value)
+        return self
+
+    def or_(self, filters: str, reference_table: Optional[str] = None) -> "LocalQuery":
+        self.filters.append(("or", [_parse_condition(p) for p in _split_top_level(filters)], False))
+        self.params.append(("or", f"({filters})"))
+        return self
+
+    # --- Sortierung / Paging ---
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: Optional[bool] = None, **_) -> "LocalQuery":
+        self.orders.append((column, desc, nullsfirst))
+        self.params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def limit(self, size: int, **_) -> "LocalQuery":
+        self.limit_value = size
+        self.params.append(("limit", str(size)))
+        return self
+
+    def offset(self, size: int) -> "LocalQuery":
+        self.offset_value = size
+        self.params.append(("offset", str(size)))
+        return self
+
+    def range(self, start: int, end: int, **_) -> "LocalQuery":
+        self.offset_value, self.limit_value = start, end - start + 1
+        return self
+
+    def execute(self) -> LocalResponse:
+        return self._client._execute(self)
+
+
+class _LocalRpc:
+    method = "rpc"
+
+    def __init__(self, client: "LocalClient", fn: str, params: Dict[str, Any]):
+        self._client = client
+        self.fn = fn
+        self.params = params
+
+    def execute(self) -> LocalResponse:
+        return self._client._execute_rpc(self)
+
+
+# ============================================
+# CLIENT
+# ============================================
+
+class LocalClient:
+    """SQLite-Ersatz fuer den Supabase-Client (nur table()/rpc())."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, sql_dir: Path = SQL_DIR):
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self._schemas = load_schema(sql_dir)
+        self._lock = threading.RLock()
+        self._created: set = set()
+        path = str(self.config["path"])
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._record = _instrumentation_hook()
+        self._rpc_state = threading.local()   # verschachtelte table()-Aufrufe in Stand-ins
+
+    # --- Oeffentliche API (wie supabase.Client) ---
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, fn: str, params: Optional[Dict[str, Any]] = None) -> _LocalRpc:
+        return _LocalRpc(self, fn, params or {})
+
+    def bulk_insert(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """Schnelles Laden (Benchmarks, Testdaten): eine Transaktion, executemany.
+
+        Ohne kuenstliche Latenz, ohne Instrumentierung, ohne Rueckgabe der
+        Zeilen. Returns: Anzahl eingefuegter Zeilen.
+        """
+        if not rows:
+            return 0
+        with self._lock:
+            schema = self._schema(table)
+            prepared = [self._prepare_row(schema, row) for row in rows]
+            columns = list(dict.fromkeys(c for row in prepared for c in row))
+            kinds = [schema.kinds.get(c, "any") for c in columns]
+            cols = ", ".join(f'"{c}"' for c in columns)
+            marks = ", ".join("?" * len(columns))
+            params = [[self._encode(k, row.get(c)) for c, k in zip(columns, kinds)] for row in prepared]
+            with self._transaction():
+                self._conn.executemany(f'INSERT INTO "{schema.name}" ({cols}) VALUES ({marks})', params)
+        return len(rows)
+
+    def ensure_index(self, table: str, *columns: str) -> None:
+        """Legt einen (nicht eindeutigen) Index an — fuer Tabellen ohne Migration."""
+        with self._lock:
+            schema = self._schema(table)
+            if columns not in schema.indexes:
+                schema.indexes.append(columns)
+            self._create_index(schema, columns)
+
+    def reset(self) -> None:
+        """Loescht alle Tabellen (z.B. zwischen zwei Lasttest-Laeufen)."""
+        with self._lock:
+            for name in list(self._created):
+                self._conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+            self._created.clear()
+
+    # --- Ausfuehrung ---
+
+    def _simulate_latency(self) -> None:
+        latency = self.config["latency_ms"] + random.uniform(-1, 1) * self.config["jitter_ms"]
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def _execute(self, query: LocalQuery) -> LocalResponse:
+        nested = getattr(self._rpc_state, "active", False)
+        t0 = time.perf_counter()
+        if not nested:
+            self._simulate_latency()   # ausserhalb des Locks: parallele Requests ueberlappen
+        with self._lock:
+            handler = getattr(self, f"_run_{query.method}")
+            response = handler(query)
+        if self._record and not nested:
+            self._record(query, response, (time.perf_counter() - t0) * 1000)
+        return response
+
+    def _execute_rpc(self, rpc: _LocalRpc) -> LocalResponse:
+        nested = getattr(self._rpc_state, "active", False)   # RPC aus einem Stand-in heraus
+        t0 = time.perf_counter()
+        if not nested:
+            self._simulate_latency()
+        handler = get_local_rpc(rpc.fn)
+        if handler is None:
+            raise APIError({
+                "message": f"Could not find the function public.{rpc.fn} in the schema cache",
+                "code": "PGRST202", "hint": "Lokales Backend: kein RPC, Python-Fallback nutzen",
+                "details": None,
+            })
+
+        with self._lock:
+            self._rpc_state.active = True
+            try:
+                with self._transaction():
+                    response = LocalResponse(handler(self, dict(rpc.params)))
+            finally:
+                self._rpc_state.active = nested
+        if self._record and not nested:
+            self._record(rpc, response, (time.perf_counter() - t0) * 1000)
+        return response
+
+    # --- Schema-Verwaltung (nur unter _lock) ---
+
+    def _schema(self, table: str) -> _TableSchema:
+        schema = self._schemas.get(table)
+        if schema is None:
+            schema = self._schemas[table] = _TableSchema(table)
+        if table not in self._created:
+            if schema.primary_key is None and "id" not in schema.kinds:
+                # Wie Supabase-Tabellen: UUID-Spalte "id" als Primary Key
+                schema.kinds = {"id": "text", **schema.kinds}
+                schema.primary_key = "id"
+                schema.defaults["id"] = lambda: str(uuid.uuid4())
+            self._create_table(schema)
+        return schema
+
+    def _create_table(self, schema: _TableSchema) -> None:
+        columns = []
+        for column, kind in schema.kinds.items():
+            if column == schema.primary_key and schema.auto_increment:
+                columns.append(f'"{column}" INTEGER PRIMARY KEY AUTOINCREMENT')
+            elif column == schema.primary_key:
+                columns.append(f'"{column}" {_KIND_DECL[kind]} PRIMARY KEY')
+            else:
+                columns.append(f'"{column}" {_KIND_DECL[kind]}')
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS "{schema.name}" ({", ".join(columns)})')
+
+        # Bestehende Datei-DB: fehlende Spalten ergaenzen, zusaetzliche uebernehmen
+        existing = {row["name"]: row["type"]
+                    for row in self._conn.execute(f'PRAGMA table_info("{schema.name}")')}
+        for column, kind in schema.kinds.items():
+            if column not in existing:
+                self._conn.execute(f'ALTER TABLE "{schema.name}" ADD COLUMN "{column}" {_KIND_DECL[kind]}')
+        for column, decl in existing.items():
+            schema.kinds.setdefault(column, _DECL_KIND.get(decl, "any"))
+        for keys in schema.unique:
+            try:
+                self._ensure_unique(schema, keys)
+            except sqlite3.IntegrityError as e:
+                print(f"[db_local] Unique-Index {schema.name}{keys} nicht moeglich: {e}")
+        for columns in schema.indexes:
+            self._create_index(schema, columns)
+        self._created.add(schema.name)
+
+    def _create_index(self, schema: _TableSchema, columns: Tuple[str, ...]) -> None:
+        self._ensure_columns(schema, {c: None for c in columns})
+        name = f"ix_{schema.name}_{'_'.join(columns)}"
+        cols = ", ".join(f'"{c}"' for c in columns)
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{schema.name}" ({cols})')
+
+    def _ensure_columns(self, schema: _TableSchema, values: Dict[str, Any]) -> None:
+        for column, value in values.items():
+            if column not in schema.kinds:
+                kind = _kind_for_value(value)
+                self._conn.execute(f'ALTER TABLE "{schema.name}" ADD COLUMN "{column}" {_KIND_DECL[kind]}')
+                schema.kinds[column] = kind
+            elif schema.kinds[column] == "any" and value is not None:
+                # Spalte ohne Typ (erster Zugriff war ein Filter): Art nachtragen
+                schema.kinds[column] = _kind_for_value(value)
+
+    def _ensure_unique(self, schema: _TableSchema, keys: Tuple[str, ...]) -> None:
+        self._ensure_columns(schema, {k: None for k in keys})
+        name = f"uq_{schema.name}_{'_'.join(keys)}"
+        cols = ", ".join(f'"{k}"' for k in keys)
+        self._conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{name}" ON "{schema.name}" ({cols})')
+
+    # --- Werte umwandeln ---
+
+    @staticmethod
+    def _encode(kind: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if kind == "json" or isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _coerce_filter(kind: str, value: Any) -> Any:
+        """Filterwert (oft String aus or_()) passend zur Spalte."""
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, str):
+            if kind == "bool" and value.lower() in ("true", "false"):
+                return int(value.lower() == "true")
+            if kind == "int" and re.fullmatch(r"-?\d+", value):
+                return int(value)
+            if kind == "real":
+                try:
+                    return float(value)
+                except ValueError:
+                    return value
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    def _decode_row(self, schema: _TableSchema, row: sqlite3.Row) -> Dict[str, Any]:
+        result = {}
+        for column in row.keys():
+            if column.startswith("__"):
+                continue
+            value, kind = row[column], schema.kinds.get(column, "any")
+            if value is not None:
+                if kind == "bool":
+                    value = bool(value)
+                elif kind == "json" and isinstance(value, str):
+                    try:
+                        value = json.loads(value)
+                    except ValueError:
+                        pass
+            result[column] = value
+        return result
+
+    # --- SQL aus Filtern ---
+
+    def _where(self, schema: _TableSchema, nodes: List[tuple], joiner: str = " AND ") -> Tuple[str, List[Any]]:
+        parts, params = [], []
+        for node in nodes:
+            if node[0] == "cond":
+                sql, node_params = self._condition(schema, *node[1:])
+            else:
+                inner, node_params = self._where(schema, node[1], " AND " if node[0] == "and" else " OR ")
+                sql = f"NOT ({inner})" if node[2] else f"({inner})"
+            parts.append(sql)
+            params.extend(node_params)
+        return (joiner.join(parts) if parts else "1"), params
+
+    def _condition(self, schema: _TableSchema, column: str, op: str, value: Any,
+                   negate: bool) -> Tuple[str, List[Any]]:
+        self._ensure_columns(schema, {column: value if not isinstance(value, (list, str)) else None})
+        kind = schema.kinds.get(column, "any")
+        col = f'"{column}"'
+
+        if op in _SQL_OPS:
+            sql, params = f"{col} {_SQL_OPS[op]} ?", [self._coerce_filter(kind, value)]
+        elif op == "is":
+            literal = str(value).lower()
+            sql = {"null": f"{col} IS NULL", "true": f"{col} = 1", "false": f"{col} = 0",
+                   "unknown": f"{col} IS NULL"}.get(literal, f"{col} IS NULL")
+            params = []
+        elif op == "in":
+            values = [self._coerce_filter(kind, v) for v in value]
+            sql = f"{col} IN ({', '.join('?' * len(values))})" if values else "0"
+            params = values
+        elif op in ("like", "ilike"):
+            pattern = str(value).replace("*", "%")
+            sql = f"{col} LIKE ?" if op == "ilike" else f"{col} GLOB ?"
+            params = [pattern if op == "ilike" else pattern.replace("%", "*").replace("_", "?")]
+        else:
+            raise APIError({"message": f"Operator '{op}' wird lokal nicht unterstuetzt",
+                            "code": "PGRST100", "hint": None, "details": None})
+
+        if negate:
+            sql = f"NOT ({sql})"
+        return sql, params
+
+    def _order_sql(self, schema: _TableSchema, orders) -> str:
+        terms = []
+        for column, desc, nullsfirst in orders:
+            self._ensure_columns(schema, {column: None})
+            # Postgres: ASC -> NULLS LAST, DESC -> NULLS FIRST
+            nulls_first = desc if nullsfirst is None else nullsfirst
+            terms.append(f'("{column}" IS NULL) {"DESC" if nulls_first else "ASC"}')
+            terms.append(f'"{column}" {"DESC" if desc else "ASC"}')
+        return (" ORDER BY " + ", ".join(terms)) if terms else ""
+
+    # --- Operationen (nur unter _lock) ---
+
+    @contextmanager
+    def _transaction(self):
+        if self._conn.in_transaction:
+            # Verschachtelt (RPC-Stand-in): die aeussere Transaktion committet/rollt zurueck
+            yield
+            return
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except sqlite3.IntegrityError as e:
+            self._conn.execute("ROLLBACK")
+            raise APIError({"message": f"duplicate key value violates unique constraint ({e})",
+                            "code": "23505", "hint": None, "details": None})
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _project(self, rows: List[Dict[str, Any]], columns: str) -> List[Dict[str, Any]]:
+        names = [c.strip() for c in columns.split(",") if c.strip()]
+        if not names or "*" in names:
+            return rows
+        return [{name: row.get(name) for name in names} for row in rows]
+
+    def _select_rows(self, schema: _TableSchema, query: LocalQuery,
+                     paged: bool = True) -> List[sqlite3.Row]:
+        where, params = self._where(schema, query.filters)
+        sql = f'SELECT rowid AS __rowid, * FROM "{schema.name}" WHERE {where}'
+        if paged:
+            sql += self._order_sql(schema, query.orders)
+            if query.limit_value is not None or query.offset_value:
+                sql += " LIMIT ? OFFSET ?"
+                params += [-1 if query.limit_value is None else query.limit_value, query.offset_value or 0]
+        return self._conn.execute(sql, params).fetchall()
+
+    def _rows_by_rowid(self, schema: _TableSchema, rowids: List[int]) -> List[Dict[str, Any]]:
+        if not rowids:
+            return []
+        marks = ", ".join("?" * len(rowids))
+        rows = self._conn.execute(
+            f'SELECT rowid AS __rowid, * FROM "{schema.name}" WHERE rowid IN ({marks})', rowids).fetchall()
+        order = {rowid: i for i, rowid in enumerate(rowids)}
+        return [self._decode_row(schema, r) for r in sorted(rows, key=lambda r: order[r["__rowid"]])]
+
+    def _run_select(self, query: LocalQuery) -> LocalResponse:
+        schema = self._schema(query.table)
+        rows = [] if query.head else [self._decode_row(schema, r) for r in self._select_rows(schema, query)]
+        count = None
+        if query.count:
+            where, params = self._where(schema, query.filters)
+            count = self._conn.execute(
+                f'SELECT COUNT(*) FROM "{schema.name}" WHERE {where}', params).fetchone()[0]
+        return LocalResponse(self._project(rows, query.columns), count)
+
+    def _prepare_row(self, schema: _TableSchema, row: Dict[str, Any]) -> Dict[str, Any]:
+        values = dict(row)
+        for column, default in schema.defaults.items():
+            if column not in values:
+                values[column] = default()
+        self._ensure_columns(schema, values)
+        return values
+
+    def _insert_sql(self, schema: _TableSchema, values: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        cols = ", ".join(f'"{c}"' for c in values)
+        marks = ", ".join("?" * len(values))
+        params = [self._encode(schema.kinds.get(c, "any"), v) for c, v in values.items()]
+        return f'INSERT INTO "{schema.name}" ({cols}) VALUES ({marks})', params
+
+    def _payload_rows(self, payload: Any) -> List[Dict[str, Any]]:
+        return list(payload) if isinstance(payload, list) else [payload]
+
+    def _run_insert(self, query: LocalQuery) -> LocalResponse:
+        schema = self._schema(query.table)
+        rowids = []
+        with self._transaction():
+            for row in self._payload_rows(query.payload):
+                sql, params = self._insert_sql(schema, self._prepare_row(schema, row))
+                rowids.append(self._conn.execute(sql, params).lastrowid)
+        return LocalResponse(self._rows_by_rowid(schema, rowids))
+
+    def _run_upsert(self, query: LocalQuery) -> LocalResponse:
+        schema = self._schema(query.table)
+        keys = tuple(c.strip() for c in (query.on_conflict or schema.primary_key or "id").split(","))
+        if keys not in schema.unique and keys != (schema.primary_key,):
+            schema.unique.append(keys)
+            self._ensure_unique(schema, keys)
+        conflict = ", ".join(f'"{k}"' for k in keys)
+
+        rowids = []
+        with self._transaction():
+            for row in self._payload_rows(query.payload):
+                values = self._prepare_row(schema, row)
+                sql, params = self._insert_sql(schema, values)
+                updates = [c for c in row if c not in keys]
+                updates += [c for c in schema.touch_on_update if c not in row]
+                if query.ignore_duplicates or not updates:
+                    sql += f" ON CONFLICT ({conflict}) DO NOTHING"
+                else:
+                    assignments = ", ".join(
+                        f'"{c}" = excluded."{c}"' if c in row else f'"{c}" = ?' for c in updates)
+                    params += [_now_iso() for c in updates if c not in row]
+                    sql += f" ON CONFLICT ({conflict}) DO UPDATE SET {assignments}"
+                cursor = self._conn.execute(sql, params)
+                if cursor.rowcount == 0 and query.ignore_duplicates:
+                    continue   # PostgREST liefert dann nur neu eingefuegte Zeilen
+                key_where = " AND ".join(f'"{k}" = ?' for k in keys)
+                found = self._conn.execute(
+                    f'SELECT rowid FROM "{schema.name}" WHERE {key_where}',
+                    [self._encode(schema.kinds.get(k, "any"), values.get(k)) for k in keys]).fetchone()
+                rowids.append(found[0] if found else cursor.lastrowid)
+        return LocalResponse(self._rows_by_rowid(schema, rowids))
+
+    def _run_update(self, query: LocalQuery) -> LocalResponse:
+        schema = self._schema(query.table)
+        values = dict(query.payload)
+        for column in schema.touch_on_update:
+            values.setdefault(column, _now_iso())
+        self._ensure_columns(schema, values)
+
+        with self._transaction():
+            rowids = [r["__rowid"] for r in self._select_rows(schema, query, paged=False)]
+            if rowids:
+                assignments = ", ".join(f'"{c}" = ?' for c in values)
+                params = [self._encode(schema.kinds.get(c, "any"), v) for c, v in values.items()]
+                marks = ", ".join("?" * len(rowids))
+                self._conn.execute(
+                    f'UPDATE "{schema.name}" SET {assignments} WHERE rowid IN ({marks})', params + rowids)
+        return LocalResponse(self._rows_by_rowid(schema, rowids))
+
+    def _run_delete(self, query: LocalQuery) -> LocalResponse:
+        schema = self._schema(query.table)
+        with self._transaction():
+            rows = self._select_rows(schema, query, paged=False)
+            deleted = [self._decode_row(schema, r) for r in rows]
+            if rows:
+                marks = ", ".join("?" * len(rows))
+                self._conn.execute(f'DELETE FROM "{schema.name}" WHERE rowid IN ({marks})',
+                                   [r["__rowid"] for r in rows])
+        return LocalResponse(deleted)
+
+
+# ============================================
+# INSTRUMENTIERUNG
+# ============================================
+
+_HTTP_METHODS = {"select": "GET", "insert": "POST", "upsert": "POST", "update": "PATCH", "delete": "DELETE"}
+
+
+def _instrumentation_hook() -> Optional[Callable]:
+    """Meldet lokale Requests an utils/db_instrumentation (wie der HTTP-Transport)."""
+    try:
+        import httpx
+        from utils.db_instrumentation import load_instrumentation_config, record_call
+    except ImportError:
+        return None
+    if not load_instrumentation_config()["enabled"]:
+        return None
+
+    def record(query: Any, response: LocalResponse, elapsed_ms: float) -> None:
+        try:
+            body = json.dumps(response.data, default=str).encode("utf-8")
+            if query.method == "rpc":
+                request = httpx.Request("POST", f"http://local/rest/v1/rpc/{query.fn}",
+                                        content=json.dumps(query.params, default=str).encode("utf-8"))
+                record_call(request, httpx.Response(200, content=body), elapsed_ms)
+                return
+
+            headers = {}
+            if query.method == "upsert":
+                headers["prefer"] = ("resolution=ignore-duplicates" if query.ignore_duplicates
+                                     else "resolution=merge-duplicates")
+            params = [("select", query.columns)] + query.params if query.method == "select" else query.params
+            request = httpx.Request(_HTTP_METHODS[query.method], f"http://local/rest/v1/{query.table}",
+                                    params=params, headers=headers)
+            total = "*" if response.count is None else response.count
+            content_range = f"0-{len(response.data) - 1}/{total}" if response.data else f"*/{total}"
+            record_call(request, httpx.Response(200, content=body,
+                                                headers={"content-range": content_range}), elapsed_ms)
+        except Exception as e:
+            print(f"[db_local] Instrumentierung fehlgeschlagen: {e}")
+
+    return record
+
+
+def create_local_client(config: Optional[Dict[str, Any]] = None) -> LocalClient:
+    """Erzeugt den lokalen Client (Konfiguration siehe load_local_config)."""
+    config = config or load_local_config()
+    print(f"[db_local] Lokales SQLite-Backend aktiv ({config['path']}, "
+          f"Latenz {config['latency_ms']}±{config['jitter_ms']} ms)")
+    return LocalClient(config)
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP-Transport fuer den Supabase-Client
+========================================
+
+create_client() baut intern einen httpx.Client mit Default-Einstellungen.
+Alle Streamlit-Sessions eines Prozesses teilen sich diesen Client (get_db()
+ist @st.cache_resource) — ohne Kontrolle ueber Pool-Groesse, Keep-Alive,
+HTTP/2 oder Timeouts.
+
+install_transport(client) ersetzt die HTTP-Session des PostgREST-Clients
+(table() und rpc()) durch eine konfigurierbare:
+
+- Connection-Pool mit Keep-Alive (spart TLS-Handshakes)
+- optional HTTP/2 (braucht das Paket `h2`, sonst Fallback auf HTTP/1.1)
+- Connect-/Read-Timeouts
+- Retry mit Jitter bei httpx.ReadError / RemoteProtocolError
+  (nur fuer idempotente Requests: GET/HEAD)
+- Metriken: laufende Requests, Pool-Auslastung, Retries (get_transport_metrics)
+
+Konfiguration (optional) in .streamlit/secrets.toml:
+
+    [supabase_http]
+    pool_size = 20            # max. gleichzeitige Verbindungen
+    keepalive = 10            # max. offene Idle-Verbindungen
+    keepalive_expiry = 30.0   # Sekunden bis Idle-Verbindung geschlossen wird
+    http2 = false
+    connect_timeout = 5.0
+    read_timeout = 15.0
+    retries = 2
+    backoff = 0.2             # Basis-Wartezeit (s), verdoppelt sich pro Versuch
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import streamlit as st
+
+from utils.db_instrumentation import instrument_transport
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+DEFAULT_CONFIG = {
+    "pool_size": 20,
+    "keepalive": 10,
+    "keepalive_expiry": 30.0,
+    "http2": False,
+    "connect_timeout": 5.0,
+    "read_timeout": 15.0,
+    "retries": 2,
+    "backoff": 0.2,
+}
+
+RETRY_EXCEPTIONS = (httpx.ReadError, httpx.RemoteProtocolError)
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def load_transport_config() -> Dict[str, Any]:
+    """DEFAULT_CONFIG, ueberschrieben durch [supabase_http] aus st.secrets."""
+    config = dict(DEFAULT_CONFIG)
+    try:
+        overrides = st.secrets.get("supabase_http", {})
+        config.update({k: overrides[k] for k in overrides if k in DEFAULT_CONFIG})
+    except Exception:
+        pass  # Keine secrets.toml (z.B. Skripte) -> Defaults
+    return config
+
+
+# ============================================
+# METRIKEN
+# ============================================
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "requests": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "saturated": 0,         # Requests, die bei vollem Pool gestartet wurden
+    "retries": 0,
+    "read_errors": 0,
+    "failures": 0,          # nach allen Retries fehlgeschlagen
+    "pool_size": DEFAULT_CONFIG["pool_size"],
+}
+
+
+def get_transport_metrics() -> Dict[str, Any]:
+    """Momentaufnahme der Transport-Metriken (prozessweit, alle Sessions).
+
+    saturation = max_in_flight / pool_size — Werte nahe 1.0 bedeuten,
+    dass Requests auf freie Verbindungen warten mussten.
+    """
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    snapshot["saturation"] = round(snapshot["max_in_flight"] / max(1, snapshot["pool_size"]), 2)
+    snapshot["open_connections"] = _open_connections()
+    return snapshot
+
+
+def reset_transport_metrics() -> None:
+    with _metrics_lock:
+        for key in ("requests", "max_in_flight", "saturated", "retries", "read_errors", "failures"):
+            _metrics[key] = 0
+
+
+# ============================================
+# TRANSPORT
+# ============================================
+
+_active_transport: Optional["RetryingTransport"] = None
+
+
+class RetryingTransport(httpx.BaseTransport):
+    """httpx-Transport mit Pool-Metriken und Retry (Exponential Backoff + Jitter)."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        http2 = bool(config["http2"])
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("[db_transport] http2=true, aber Paket 'h2' fehlt — nutze HTTP/1.1")
+                http2 = False
+
+        self._inner = httpx.HTTPTransport(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=config["pool_size"],
+                max_keepalive_connections=config["keepalive"],
+                keepalive_expiry=config["keepalive_expiry"],
+            ),
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        retries = self.config["retries"] if request.method in IDEMPOTENT_METHODS else 0
+
+        with _metrics_lock:
+            _metrics["requests"] += 1
+            _metrics["in_flight"] += 1
+            _metrics["max_in_flight"] = max(_metrics["max_in_flight"], _metrics["in_flight"])
+            if _metrics["in_flight"] > self.config["pool_size"]:
+                _metrics["saturated"] += 1
+
+        try:
+            attempt = 0
+            while True:
+                try:
+                    return self._inner.handle_request(request)
+                except RETRY_EXCEPTIONS:
+                    with _metrics_lock:
+                        _metrics["read_errors"] += 1
+                    if attempt >= retries:
+                        with _metrics_lock:
+                            _metrics["failures"] += 1
+                        raise
+                    # Full Jitter: zufaellig in [0, backoff * 2^attempt]
+                    time.sleep(random.uniform(0, self.config["backoff"] * (2 ** attempt)))
+                    attempt += 1
+                    with _metrics_lock:
+                        _metrics["retries"] += 1
+        finally:
+            with _metrics_lock:
+                _metrics["in_flight"] -= 1
+
+    def close(self) -> None:
+        self._inner.close()
+
+
+def _open_connections() -> Optional[int]:
+    """Anzahl offener Verbindungen im Pool (httpcore-Interna, daher optional)."""
+    try:
+        return len(_active_transport._inner._pool.connections)
+    except Exception:
+        return None
+
+
+# ============================================
+# INSTALLATION
+# ============================================
+
+def install_transport(client, config: Optional[Dict[str, Any]] = None):
+    """Ersetzt die HTTP-Session des PostgREST-Clients durch den gepoolten Transport.
+
+    Base-URL und Header (apikey, Authorization) werden aus der bestehenden
+    Session uebernommen. Schlaegt etwas fehl, bleibt der Default-Client aktiv.
+
+    Returns: den (gleichen) Supabase-Client
+    """
+    global _active_transport
+    config = config or load_transport_config()
+
+    try:
+        postgrest = client.postgrest
+        old_session = postgrest.session
+        transport = RetryingTransport(config)
+        postgrest.session = httpx.Client(
+            base_url=old_session.base_url,
+            headers=old_session.headers,
+            timeout=httpx.Timeout(
+                config["read_timeout"],
+                connect=config["connect_timeout"],
+            ),
+            # Instrumentierung misst inkl. Retries (utils/db_instrumentation.py)
+            transport=instrument_transport(transport),
+            follow_redirects=True,
+        )
+        old_session.close()
+
+        _active_transport = transport
+        with _metrics_lock:
+            _metrics["pool_size"] = config["pool_size"]
+    except Exception as e:
+        print(f"[db_transport] Konnte Transport nicht installieren, nutze Default: {e}")
+
+    return client
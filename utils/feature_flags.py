@@ -4,4 +4,6 @@
 # PISA-Daten (SQLite DB, JSON-Dateien, Korrelationsberechnungen)
 # False = deaktiviert → schnellerer App-Start auf Community Cloud
 # True = aktiviert → volle PISA-Analyse verfügbar
+# Die PISA-Forschungsseite liest Kennwerte aus data/pisa_stats.json
+# (bauen: python -m utils.pisa_stats) — die DB wird dafür nicht mehr geöffnet
 ENABLE_PISA = False
@@ -10,12 +10,19 @@ Features:
 - Badge-System nach Bandura's 4 Quellen
 """
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import json
-import streamlit as st
+import threading
 
 from utils.database import get_db
+from utils.db_errors import is_missing_function
+from utils.local_rpc import register_local_rpc
+from utils.activity_rollup import SOURCE_CHALLENGE, bump_daily_activity, bump_rows, get_daily_activity
+from utils.badge_engine import EVENT_CHALLENGE, EVENT_STREAK, EVENT_XP, award_badges, get_engine
+from utils.cache import tagged_cache, user_tag, invalidate_user
+from utils.streaks import STREAM_CHALLENGE, advance_streak, get_streak, record_activity, record_rows as record_streak_rows
 
 # ============================================
 # KONFIGURATION
@@ -71,35 +78,136 @@ def get_or_create_user(user_id: str, username: str = "Lernender") -> Dict[str, A
 
     return result.data[0]
 
-def update_user_stats(user_id: str, xp_delta: int, streak: int) -> Dict[str, Any]:
-    """Aktualisiert XP und Streak eines Users."""
+def update_user_stats(user_id: str, xp_delta: int, streak: Optional[int] = None,
+                      source: str = "xp") -> Dict[str, Any]:
+    """Aktualisiert XP und Streak eines Users.
+
+    streak=None laesst den Streak unveraendert (spart das vorherige
+    get_or_create_user nur um den aktuellen Streak mitzuschicken).
+    """
+    return grant_xp(user_id, [{"xp": xp_delta, "source": source}], streak=streak)
+
+
+# ============================================
+# XP-LEDGER (sql/13_xp_ledger.sql)
+# ============================================
+
+_xp_batch = threading.local()
+
+
+def grant_xp(user_id: str, events: List[Dict[str, Any]], streak: Optional[int] = None) -> Dict[str, Any]:
+    """Bucht XP-Events atomar: Ledger-Eintraege + users-Update in EINEM RPC.
+
+    OPTIMIERUNG: Statt users lesen -> XP addieren -> users schreiben
+    (2 Round-Trips, Lost Update bei gleichzeitigen Writes) erhoeht die
+    Postgres-Funktion grant_xp xp_total serverseitig unter Row-Lock.
+
+    Args:
+        user_id: User-ID
+        events: [{"xp": int, "source": str, "details": dict (optional)}, ...]
+        streak: Neuer Streak oder None (unveraendert)
+
+    Returns:
+        Aktualisierte users-Zeile (xp_total, level, current_streak, ...)
+    """
+    events = [e for e in events if e.get("xp")]
+    if not events:
+        return get_or_create_user(user_id)
+
+    db = get_db()
+    today = datetime.now().date().isoformat()
+    user = None
+    try:
+        user = db.rpc("grant_xp", {
+            "p_user_id": user_id,
+            "p_events": events,
+            "p_streak": streak,
+            "p_today": today,
+            "p_level_thresholds": [LEVELS[lvl]["min_xp"] for lvl in sorted(LEVELS)],
+        }).execute().data
+    except Exception as e:
+        # Nur bei fehlender Funktion: nach Netzwerkfehlern kann der RPC
+        # committet sein, der Fallback wuerde die XP doppelt buchen
+        if not is_missing_function(e):
+            raise
+        print(f"grant_xp RPC nicht verfuegbar, nutze Fallback: {e}")
+        user = _grant_xp_local(user_id, sum(e["xp"] for e in events), streak, today)
+
+    # ✅ Cache invalidieren nach Write: nur dieser User
+    #    (get_user_stats, get_user_by_id, Schatzkarten-Bootstrap, ...)
+    invalidate_user(user_id)
+
+    return user or get_or_create_user(user_id)
+
+
+def _grant_xp_local(user_id: str, xp_delta: int, streak: Optional[int], today: str) -> Dict[str, Any]:
+    """Fallback ohne RPC: klassisches Read-Modify-Write (nicht atomar, kein Ledger)."""
     db = get_db()
-    result = db.table("users").select("xp_total, longest_streak").eq("user_id", user_id).execute()
+    result = db.table("users").select("xp_total, current_streak, longest_streak").eq("user_id", user_id).execute()
     current = result.data[0]
 
     new_xp = (current.get('xp_total') or 0) + xp_delta
-    new_level = calculate_level(new_xp)
+    if streak is None:
+        streak = current.get('current_streak') or 0
     longest = max(current.get('longest_streak') or 0, streak)
-    today = datetime.now().date().isoformat()
 
     update_result = db.table("users").update({
         "xp_total": new_xp,
-        "level": new_level,
+        "level": calculate_level(new_xp),
         "current_streak": streak,
         "longest_streak": longest,
         "last_activity_date": today
     }).eq("user_id", user_id).execute()
+    return update_result.data[0]
+
 
-    # ✅ Cache invalidieren nach Write
-    get_user_stats.clear()
-    # Auch get_user_by_id invalidieren (XP/Level haben sich geaendert)
+def queue_xp(user_id: str, xp: int, source: str, details: Optional[Dict[str, Any]] = None) -> None:
+    """Vergibt XP — innerhalb von xp_batch() gesammelt, sonst sofort."""
+    event = {"xp": xp, "source": source}
+    if details:
+        event["details"] = details
+
+    pending = getattr(_xp_batch, "pending", None)
+    if pending is None:
+        _grant_and_check_level(user_id, [event])
+    else:
+        pending.setdefault(user_id, []).append(event)
+
+
+@contextmanager
+def xp_batch():
+    """Sammelt alle queue_xp()-Aufrufe eines Reruns und bucht sie am Ende
+    mit EINEM grant_xp-RPC pro User (auch bei st.rerun() im Block).
+
+    Verwendung:
+        with xp_batch():
+            render_widget(xp_callback=award_xp_callback)  # ruft queue_xp()
+    """
+    if getattr(_xp_batch, "pending", None) is not None:
+        # Verschachtelt: aeusserer Block bucht
+        yield
+        return
+
+    _xp_batch.pending = {}
+    try:
+        yield
+    finally:
+        pending, _xp_batch.pending = _xp_batch.pending, None
+        for uid, events in pending.items():
+            try:
+                _grant_and_check_level(uid, events)
+            except Exception as e:
+                print(f"Error granting batched XP for {uid}: {e}")
+
+
+def _grant_and_check_level(user_id: str, events: List[Dict[str, Any]]) -> None:
+    """grant_xp + Level-Badges (EVENT_XP); Badge-Fehler blockieren die XP nicht."""
+    user_row = grant_xp(user_id, events)
     try:
-        from utils.user_system import get_user_by_id
-        get_user_by_id.clear()
-    except ImportError:
-        pass
+        check_level_badges(user_id, user_row)
+    except Exception as e:
+        print(f"Error checking level badges for {user_id}: {e}")
 
-    return update_result.data[0]
 
 def calculate_level(xp: int) -> int:
     """Berechnet das Level basierend auf XP."""
@@ -135,7 +243,76 @@ def create_challenge(user_id: str, subject: str, prediction: int,
 
 def complete_challenge(challenge_id: int, actual_result: int,
                        reflection: str = "") -> Dict[str, Any]:
-    """Schließt eine Challenge ab und berechnet XP (Phase 2: Ergebnis)."""
+    """Schließt eine Challenge ab und berechnet XP (Phase 2: Ergebnis).
+
+    OPTIMIERUNG: EIN Round-Trip — die Postgres-Funktion complete_challenge
+    (sql/18_complete_challenge_rpc.sql) liest, bewertet und schreibt alles
+    in einer Transaktion (statt 6+ Requests nacheinander). Ohne RPC laufen
+    die Einzelschritte wie bisher (_complete_challenge_steps).
+    """
+    result = None
+    try:
+        result = get_db().rpc("complete_challenge", {
+            "p_challenge_id": challenge_id,
+            "p_actual_result": actual_result,
+            "p_reflection": reflection,
+            "p_xp_config": XP_CONFIG,
+            "p_today": datetime.now().date().isoformat(),
+            "p_level_thresholds": [LEVELS[lvl]["min_xp"] for lvl in sorted(LEVELS)],
+        }).execute().data
+    except Exception as e:
+        if not is_missing_function(e):
+            raise
+        print(f"complete_challenge RPC nicht verfuegbar, nutze Fallback: {e}")
+        return _complete_challenge_steps(challenge_id, actual_result, reflection)
+
+    if result and "error" not in result:
+        # ✅ Cache invalidieren: nur dieser User
+        invalidate_user(result["user_id"])
+    return result or {"error": "Challenge konnte nicht abgeschlossen werden"}
+
+
+def _challenge_outcome(challenge: Dict[str, Any], actual_result: int,
+                       xp_config: Dict[str, Any] = XP_CONFIG) -> Tuple[str, float]:
+    """Outcome und Basis-XP (ohne Streak-Bonus) einer Challenge."""
+    prediction = challenge['prediction']
+
+    # Typ aus task_description extrahieren (für Note-Umkehrung)
+    task_desc = challenge.get('task_description') or ''
+    is_note_type = task_desc.startswith("[note]")
+
+    # Bei Noten ist ein kleinerer Wert besser
+    exceeded = actual_result < prediction if is_note_type else actual_result > prediction
+    if exceeded:
+        return "exceeded", xp_config["challenge_completed"] + xp_config["exceeded_expectation"]
+    if actual_result == prediction:
+        return "exact", xp_config["challenge_completed"] + xp_config["prediction_exact"]
+    return "below", xp_config["challenge_completed"]
+
+
+def _streak_xp(base_xp: float, streak: int, xp_config: Dict[str, Any] = XP_CONFIG) -> int:
+    """Wendet den Streak-Bonus an."""
+    if streak >= 30:
+        return int(base_xp * xp_config["streak_bonus_30"])
+    if streak >= 7:
+        return int(base_xp * xp_config["streak_bonus_7"])
+    if streak >= 3:
+        return int(base_xp * xp_config["streak_bonus_3"])
+    return int(base_xp)
+
+
+def _activity_details(challenge: Dict[str, Any], outcome: str, actual_result: int) -> str:
+    return json.dumps({
+        "subject": challenge['subject'],
+        "outcome": outcome,
+        "prediction": challenge['prediction'],
+        "actual": actual_result
+    })
+
+
+def _complete_challenge_steps(challenge_id: int, actual_result: int,
+                              reflection: str = "") -> Dict[str, Any]:
+    """Fallback ohne RPC: Einzelschritte (nicht atomar, 6+ Round-Trips)."""
     db = get_db()
 
     # Challenge holen
@@ -149,46 +326,11 @@ def complete_challenge(challenge_id: int, actual_result: int,
         return {"error": "Challenge bereits abgeschlossen"}
 
     user_id = challenge['user_id']
-    prediction = challenge['prediction']
-
-    # Typ aus task_description extrahieren (für Note-Umkehrung)
-    task_desc = challenge.get('task_description') or ''
-    is_note_type = task_desc.startswith("[note]")
+    outcome, base_xp = _challenge_outcome(challenge, actual_result)
 
-    # Outcome bestimmen
-    if is_note_type:
-        if actual_result < prediction:
-            outcome = "exceeded"
-            base_xp = XP_CONFIG["challenge_completed"] + XP_CONFIG["exceeded_expectation"]
-        elif actual_result == prediction:
-            outcome = "exact"
-            base_xp = XP_CONFIG["challenge_completed"] + XP_CONFIG["prediction_exact"]
-        else:
-            outcome = "below"
-            base_xp = XP_CONFIG["challenge_completed"]
-    else:
-        if actual_result > prediction:
-            outcome = "exceeded"
-            base_xp = XP_CONFIG["challenge_completed"] + XP_CONFIG["exceeded_expectation"]
-        elif actual_result == prediction:
-            outcome = "exact"
-            base_xp = XP_CONFIG["challenge_completed"] + XP_CONFIG["prediction_exact"]
-        else:
-            outcome = "below"
-            base_xp = XP_CONFIG["challenge_completed"]
-
-    # Streak berechnen
-    new_streak = calculate_streak(user_id)
-
-    # Streak-Bonus anwenden
-    if new_streak >= 30:
-        xp_earned = int(base_xp * XP_CONFIG["streak_bonus_30"])
-    elif new_streak >= 7:
-        xp_earned = int(base_xp * XP_CONFIG["streak_bonus_7"])
-    elif new_streak >= 3:
-        xp_earned = int(base_xp * XP_CONFIG["streak_bonus_3"])
-    else:
-        xp_earned = base_xp
+    # Streak verbuchen (Streak-Engine) + Bonus anwenden
+    new_streak = record_activity(user_id, STREAM_CHALLENGE)["current_streak"]
+    xp_earned = _streak_xp(base_xp, new_streak)
 
     # Challenge updaten
     db.table("challenges").update({
@@ -199,6 +341,10 @@ def complete_challenge(challenge_id: int, actual_result: int,
         "completed": True
     }).eq("id", challenge_id).execute()
 
+    # Heatmap-Rollup (Tag der Challenge, wie bisher in get_activity_heatmap)
+    bump_daily_activity(user_id, SOURCE_CHALLENGE, xp_earned,
+                        activity_date=challenge.get('challenge_date'))
+
     # Activity Log
     today = datetime.now().date().isoformat()
     db.table("activity_log").insert({
@@ -206,28 +352,24 @@ def complete_challenge(challenge_id: int, actual_result: int,
         "activity_date": today,
         "activity_type": "challenge_completed",
         "xp_earned": xp_earned,
-        "details": json.dumps({
-            "subject": challenge['subject'],
-            "outcome": outcome,
-            "prediction": prediction,
-            "actual": actual_result
-        })
+        "details": _activity_details(challenge, outcome, actual_result)
     }).execute()
 
     # User-Stats updaten
-    user = update_user_stats(user_id, xp_earned, new_streak)
+    user = update_user_stats(user_id, xp_earned, new_streak, source="challenge_completed")
 
     # ✅ Cache invalidieren (update_user_stats macht das schon,
-    #    aber get_user_stats braucht auch ein clear wegen der Challenge-Daten)
-    get_user_stats.clear()
+    #    aber get_user_stats braucht es auch wegen der Challenge-Daten)
+    invalidate_user(user_id)
 
     # Alte XP für Level-Up Check
     old_level = calculate_level(user['xp_total'] - xp_earned)
 
     return {
+        "user_id": user_id,
         "challenge_id": challenge_id,
         "outcome": outcome,
-        "prediction": prediction,
+        "prediction": challenge['prediction'],
         "actual_result": actual_result,
         "xp_earned": xp_earned,
         "streak": new_streak,
@@ -237,33 +379,84 @@ def complete_challenge(challenge_id: int, actual_result: int,
         "streak_bonus": new_streak >= 3
     }
 
-def calculate_streak(user_id: str) -> int:
-    """Berechnet den aktuellen Streak eines Users."""
-    db = get_db()
-    today = datetime.now().date()
-    yesterday = (today - timedelta(days=1)).isoformat()
-    today_str = today.isoformat()
 
-    # Hole aktuellen Streak
-    result = db.table("users").select("current_streak, last_activity_date").eq("user_id", user_id).execute()
+@register_local_rpc("complete_challenge")
+def _complete_challenge_rpc(client, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Lokaler Stand-in fuer sql/18 (utils/db_local.py): gleiche Schritte,
+    eine Transaktion, ein Request."""
+    challenge_id = params["p_challenge_id"]
+    actual_result = params["p_actual_result"]
+    xp_config = params.get("p_xp_config") or XP_CONFIG
+    thresholds = params.get("p_level_thresholds") or [LEVELS[lvl]["min_xp"] for lvl in sorted(LEVELS)]
+    today = params.get("p_today") or datetime.now().date().isoformat()
 
-    if not result.data:
-        return 1
+    found = client.table("challenges").select("*").eq("id", challenge_id).execute().data
+    if not found:
+        return {"error": "Challenge nicht gefunden"}
+    challenge = found[0]
+    if challenge['completed']:
+        return {"error": "Challenge bereits abgeschlossen"}
+
+    user_id = challenge['user_id']
+    users = client.table("users").select("*").eq("user_id", user_id).execute().data
+    if not users:
+        return {"error": "User nicht gefunden"}
+    user = users[0]
+
+    outcome, base_xp = _challenge_outcome(challenge, actual_result, xp_config)
+    streak = record_streak_rows(client, user_id, STREAM_CHALLENGE, today)["current_streak"]
+    xp_earned = _streak_xp(base_xp, streak, xp_config)
+    old_xp = user.get('xp_total') or 0
+    new_xp = old_xp + xp_earned
+    old_level = sum(1 for t in thresholds if t <= old_xp)
+    new_level = sum(1 for t in thresholds if t <= new_xp)
+
+    client.table("challenges").update({
+        "actual_result": actual_result,
+        "outcome": outcome,
+        "xp_earned": xp_earned,
+        "reflection": params.get("p_reflection") or "",
+        "completed": True
+    }).eq("id", challenge_id).execute()
+    client.table("activity_log").insert({
+        "user_id": user_id,
+        "activity_date": today,
+        "activity_type": "challenge_completed",
+        "xp_earned": xp_earned,
+        "details": _activity_details(challenge, outcome, actual_result)
+    }).execute()
+    bump_rows(client, user_id, challenge.get('challenge_date') or today, SOURCE_CHALLENGE, 1, xp_earned)
 
-    user_data = result.data[0]
-    current_streak = user_data.get('current_streak') or 0
-    last_activity = user_data.get('last_activity_date')
+    # wie grant_xp (sql/13): Ledger + users
+    client.table("xp_events").insert({
+        "user_id": user_id, "xp_delta": xp_earned, "source": "challenge_completed"
+    }).execute()
+    client.table("users").update({
+        "xp_total": new_xp,
+        "level": new_level,
+        "current_streak": streak,
+        "longest_streak": max(user.get('longest_streak') or 0, streak),
+        "last_activity_date": today
+    }).eq("user_id", user_id).execute()
 
-    if not last_activity:
-        return 1
+    return {
+        "user_id": user_id,
+        "challenge_id": challenge_id,
+        "outcome": outcome,
+        "prediction": challenge['prediction'],
+        "actual_result": actual_result,
+        "xp_earned": xp_earned,
+        "streak": streak,
+        "total_xp": new_xp,
+        "level": new_level,
+        "level_up": new_level > old_level,
+        "streak_bonus": streak >= 3
+    }
 
-    # Streak-Logik
-    if last_activity == today_str:
-        return current_streak
-    elif last_activity == yesterday:
-        return current_streak + 1
-    else:
-        return 1
+def calculate_streak(user_id: str) -> int:
+    """Streak, den eine Challenge heute ergeben wuerde (ohne zu schreiben)."""
+    state = get_streak(user_id, STREAM_CHALLENGE)
+    return advance_streak(state, datetime.now().date())["current_streak"]
 
 def get_user_challenges(user_id: str, limit: int = 20) -> List[Dict]:
     """Holt die letzten Challenges eines Users."""
@@ -289,13 +482,32 @@ def get_open_challenges(user_id: str) -> List[Dict]:
 # STATISTICS
 # ============================================
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda user_id: [user_tag(user_id)])
 def get_user_stats(user_id: str) -> Dict[str, Any]:
     """Holt umfassende Statistiken eines Users.
 
     OPTIMIERUNG: Gecacht mit TTL=120s. Wird 1x pro Render aufgerufen.
-    Spart ~2 REST-Calls pro Render (users + challenges).
+    User-Zeile und Challenge-Aggregate kommen in EINEM Round-Trip aus der
+    Postgres-Funktion get_user_stats (sql/15_user_stats_rpc.sql) statt alle
+    abgeschlossenen Challenges nach Python zu laden.
     """
+    payload = None
+    try:
+        payload = get_db().rpc("get_user_stats", {"p_user_id": user_id}).execute().data
+    except Exception as e:
+        print(f"get_user_stats RPC nicht verfuegbar, nutze Fallback: {e}")
+
+    # Neuer User (noch keine users-Zeile) -> Fallback legt ihn an
+    if not payload or not payload.get("user"):
+        return _user_stats_local(user_id)
+
+    stats = {**payload["user"], **(payload.get("challenge_stats") or {})}
+    stats.setdefault("subjects_breakdown", [])
+    return finalize_user_stats(stats)
+
+
+def _user_stats_local(user_id: str) -> Dict[str, Any]:
+    """Fallback ohne RPC: users-Zeile + alle abgeschlossenen Challenges zaehlen."""
     db = get_db()
 
     # Basis-User-Daten
@@ -314,20 +526,13 @@ def get_user_stats(user_id: str) -> Dict[str, Any]:
     stats["times_exceeded"] = sum(1 for c in challenges if c.get("outcome") == "exceeded")
     stats["exact_predictions"] = sum(1 for c in challenges if c.get("outcome") == "exact")
     stats["times_below"] = sum(1 for c in challenges if c.get("outcome") == "below")
-    stats["unique_subjects"] = len(set(c.get("subject", "") for c in challenges))
+    stats["unique_subjects"] = len(set(c.get("subject") or "" for c in challenges))
     stats["total_xp_from_challenges"] = sum(c.get("xp_earned") or 0 for c in challenges)
 
-    # Erfolgsquote berechnen
-    if stats["total_challenges"] > 0:
-        success = stats["times_exceeded"] + stats["exact_predictions"]
-        stats["success_rate"] = round((success / stats["total_challenges"]) * 100, 1)
-    else:
-        stats["success_rate"] = 0
-
     # Fächer-Breakdown
     subjects = {}
     for c in challenges:
-        subj = c.get("subject", "")
+        subj = c.get("subject") or ""
         if subj not in subjects:
             subjects[subj] = {"subject": subj, "count": 0, "exceeded": 0, "exact": 0}
         subjects[subj]["count"] += 1
@@ -338,31 +543,28 @@ def get_user_stats(user_id: str) -> Dict[str, Any]:
 
     stats["subjects_breakdown"] = list(subjects.values())
 
+    return finalize_user_stats(stats)
+
+def finalize_user_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Ergänzt abgeleitete Felder (Erfolgsquote) an bereits aggregierten Stats."""
+    if stats.get("total_challenges", 0) > 0:
+        success = stats.get("times_exceeded", 0) + stats.get("exact_predictions", 0)
+        stats["success_rate"] = round((success / stats["total_challenges"]) * 100, 1)
+    else:
+        stats["success_rate"] = 0
     return stats
 
 def get_activity_heatmap(user_id: str, days: int = 90) -> List[Dict]:
-    """Holt Activity-Daten für Heatmap (GitHub-Style)."""
-    db = get_db()
-    start_date = (datetime.now() - timedelta(days=days)).date().isoformat()
+    """Holt Activity-Daten für Heatmap (GitHub-Style).
 
-    result = db.table("challenges") \
-        .select("challenge_date, xp_earned") \
-        .eq("user_id", user_id) \
-        .gte("challenge_date", start_date) \
-        .eq("completed", True) \
-        .order("challenge_date") \
-        .execute()
-
-    # Gruppierung nach Datum in Python
-    dates = {}
-    for row in result.data:
-        d = row["challenge_date"]
-        if d not in dates:
-            dates[d] = {"challenge_date": d, "count": 0, "xp": 0}
-        dates[d]["count"] += 1
-        dates[d]["xp"] += row.get("xp_earned") or 0
+    Liest das Tages-Rollup (hoechstens eine Zeile pro Tag) statt aller
+    abgeschlossenen Challenges im Zeitfenster.
 
-    return list(dates.values())
+    Returns: [{"date", "count", "xp"}, ...]
+    """
+    start_date = (datetime.now() - timedelta(days=days)).date()
+    rows = get_daily_activity(user_id, since=start_date, source=SOURCE_CHALLENGE)
+    return [{"date": r["activity_date"], "count": r["count"] or 0, "xp": r["xp"] or 0} for r in rows]
 
 # ============================================
 # BADGE SYSTEM
@@ -379,36 +581,42 @@ def get_user_badges(user_id: str) -> List[Dict]:
 
 def award_badge(user_id: str, badge_id: str) -> bool:
     """Vergibt ein Badge an einen User."""
-    db = get_db()
-    # Prüfe ob Badge bereits vergeben
-    existing = db.table("user_badges") \
-        .select("user_id") \
-        .eq("user_id", user_id) \
-        .eq("badge_id", badge_id) \
-        .execute()
-    if existing.data:
-        return False
+    return bool(award_badges("user_badges", user_id, [badge_id]))
+
+# Welche Events koennen Badges einer Kategorie freischalten
+BADGE_CATEGORY_EVENTS = {
+    "mastery": [EVENT_CHALLENGE],     # Vorhersage vs. Ergebnis
+    "effort": [EVENT_CHALLENGE],      # Anzahl Challenges
+    "diversity": [EVENT_CHALLENGE],   # Faecher
+    "streak": [EVENT_STREAK],         # Challenge-Streak
+    "level": [EVENT_XP],              # jede XP-Vergabe (Challenges, Karte, Bandura, ...)
+}
 
-    try:
-        db.table("user_badges").insert({
-            "user_id": user_id,
-            "badge_id": badge_id
-        }).execute()
-        return True
-    except Exception:
-        return False
-
-def check_and_award_badges(user_id: str, badges_config: Dict) -> List[str]:
-    """Prüft und vergibt neue Badges basierend auf Stats."""
-    stats = get_user_stats(user_id)
-    existing = [b['badge_id'] for b in get_user_badges(user_id)]
-    new_badges = []
-
-    for badge_id, badge_info in badges_config.items():
-        if badge_id not in existing:
-            condition_fn = badge_info.get("condition")
-            if condition_fn and condition_fn(stats):
-                if award_badge(user_id, badge_id):
-                    new_badges.append(badge_id)
-
-    return new_badges
+# Events einer abgeschlossenen Hattie-Challenge (Streak + XP inklusive)
+CHALLENGE_EVENTS = [EVENT_CHALLENGE, EVENT_STREAK, EVENT_XP]
+
+def _badge_events(badge_id: str, badge: Dict) -> List[str]:
+    return BADGE_CATEGORY_EVENTS.get(badge.get("category"), [EVENT_CHALLENGE])
+
+def check_and_award_badges(user_id: str, badges_config: Dict,
+                           events: Optional[List[str]] = None) -> List[str]:
+    """Prüft und vergibt neue Badges basierend auf Stats.
+
+    events: nur Badges pruefen, die diese Events beeinflussen koennen
+    (z.B. CHALLENGE_EVENTS); None prueft alle. Stats werden nur geladen,
+    wenn noch unverdiente Kandidaten uebrig sind.
+    """
+    engine = get_engine("user_badges", badges_config, events_for=_badge_events)
+    return engine.evaluate(user_id, events, stats_loader=lambda: get_user_stats(user_id))
+
+def check_level_badges(user_id: str, user_row: Optional[Dict[str, Any]] = None) -> List[str]:
+    """EVENT_XP nach einer XP-Vergabe ausserhalb der Challenges (Karte, Bandura, ...).
+
+    Prueft nur die Level-Badges; die users-Zeile aus grant_xp reicht als
+    Stats (spart get_user_stats).
+    """
+    from utils.gamification_ui import BADGES  # Badge-Katalog liegt bei der UI
+
+    engine = get_engine("user_badges", BADGES, events_for=_badge_events)
+    return engine.evaluate(user_id, [EVENT_XP],
+                           stats_loader=lambda: user_row or get_user_stats(user_id))
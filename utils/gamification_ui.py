@@ -548,7 +548,9 @@ def render_challenge_history(challenges: List[Dict], limit: int = 5):
 def render_activity_heatmap(activity_data: List[Dict], weeks: int = 12):
     """Zeigt eine GitHub-Style Activity Heatmap."""
     # Erstelle ein Dictionary mit Aktivitäten pro Tag
-    activity_dict = {a['challenge_date']: a['count'] for a in activity_data}
+    activity_dict = {}
+    for a in activity_data:
+        activity_dict[a['date']] = activity_dict.get(a['date'], 0) + a['count']
     
     # Generiere die letzten N Wochen
     today = datetime.now().date()
@@ -21,7 +21,7 @@ try:
         get_or_create_user, create_challenge,
         complete_challenge, get_user_stats, get_user_challenges,
         get_open_challenges, check_and_award_badges, get_user_badges,
-        get_activity_heatmap
+        get_activity_heatmap, CHALLENGE_EVENTS
     )
     from utils.gamification_ui import (
         render_level_card, render_streak_display, render_badges_showcase,
@@ -409,7 +409,7 @@ def render_challenge_phase2(user_id: str, challenge: dict, color: str):
                 st.error(result["error"])
             else:
                 # Badges prüfen
-                new_badges = check_and_award_badges(user_id, BADGES)
+                new_badges = check_and_award_badges(user_id, BADGES, events=CHALLENGE_EVENTS)
 
                 # Speichere Ergebnis in Session State für Anzeige nach dem Rerun
                 st.session_state["last_challenge_result"] = result
@@ -26,6 +26,8 @@ from zoneinfo import ZoneInfo
 import jwt
 import streamlit as st
 from utils.database import get_db
+from utils.cache import tagged_cache, user_tag, group_tag, invalidate_user, invalidate_group
+from utils.streaks import STREAM_CHALLENGE, current_streaks
 
 
 # ============================================
@@ -169,7 +171,7 @@ def create_group(name: str, coach_id: str, start_date: str = None) -> Optional[s
             "current_week": 0
         }).execute()
         # ✅ Cache invalidieren nach Write
-        get_coach_groups.clear()
+        invalidate_user(coach_id)
         return group_id
     except Exception as e:
         print(f"Error creating group: {e}")
@@ -185,15 +187,16 @@ def get_group(group_id: str) -> Optional[Dict]:
     return result.data[0] if result.data else None
 
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda coach_id: [user_tag(coach_id)],
+              result_tags=lambda groups: [group_tag(g["group_id"]) for g in groups])
 def get_coach_groups(coach_id: str) -> List[Dict]:
     """Holt alle aktiven Gruppen eines Coaches, inkl. member_count.
 
     OPTIMIERUNG: Gecacht mit TTL=120s. Wird 3x pro Load aufgerufen
-    (meeting, chat, arena). Spart N+1 Queries pro Aufruf.
+    (meeting, chat, arena). member_count kommt aus get_member_counts()
+    -> immer 2 Queries, unabhaengig von der Anzahl Gruppen (statt 1+N).
     """
-    db = get_db()
-    groups_result = db.table("learning_groups") \
+    groups_result = get_db().table("learning_groups") \
         .select("*") \
         .eq("coach_id", coach_id) \
         .eq("is_active", 1) \
@@ -201,17 +204,33 @@ def get_coach_groups(coach_id: str) -> List[Dict]:
         .execute()
 
     groups = groups_result.data
+    counts = get_member_counts([g["group_id"] for g in groups])
     for group in groups:
-        members_result = db.table("group_members") \
-            .select("id") \
-            .eq("group_id", group["group_id"]) \
-            .eq("status", "active") \
-            .execute()
-        group["member_count"] = len(members_result.data)
+        group["member_count"] = counts.get(group["group_id"], 0)
 
     return groups
 
 
+def get_member_counts(group_ids: List[str]) -> Dict[str, int]:
+    """Zaehlt aktive Mitglieder fuer mehrere Gruppen mit EINER Query.
+
+    Returns: {group_id: anzahl} — Gruppen ohne Mitglieder haben 0.
+    """
+    counts = {gid: 0 for gid in group_ids}
+    if not group_ids:
+        return counts
+
+    result = get_db().table("group_members") \
+        .select("group_id") \
+        .in_("group_id", list(group_ids)) \
+        .eq("status", "active") \
+        .execute()
+
+    for row in result.data or []:
+        counts[row["group_id"]] = counts.get(row["group_id"], 0) + 1
+    return counts
+
+
 def update_group(group_id: str, **kwargs) -> bool:
     """Aktualisiert Gruppen-Eigenschaften.
     Erlaubte Felder: name, start_date, current_week, is_active, settings"""
@@ -225,8 +244,8 @@ def update_group(group_id: str, **kwargs) -> bool:
             .update(updates) \
             .eq("group_id", group_id) \
             .execute()
-        # ✅ Cache invalidieren nach Write
-        get_coach_groups.clear()
+        # ✅ Cache invalidieren nach Write (Coach-Liste + Mitglieder dieser Gruppe)
+        invalidate_group(group_id)
         return len(result.data) > 0
     except Exception as e:
         print(f"Error updating group: {e}")
@@ -253,7 +272,7 @@ def delete_group(group_id: str, soft_delete: bool = True) -> bool:
         db.table("group_members").delete().eq("group_id", group_id).execute()
         db.table("learning_groups").delete().eq("group_id", group_id).execute()
         # ✅ Cache invalidieren nach Write
-        get_coach_groups.clear()
+        invalidate_group(group_id)
         return True
     except Exception as e:
         print(f"Error deleting group: {e}")
@@ -335,9 +354,9 @@ def add_member(group_id: str, user_id: str) -> bool:
             "user_id": user_id,
             "status": "active"
         }).execute()
-        # ✅ Cache invalidieren nach Write
-        get_user_group.clear()
-        get_group_members.clear()
+        # ✅ Cache invalidieren nach Write (User + Gruppe inkl. member_count)
+        invalidate_user(user_id)
+        invalidate_group(group_id)
         return True
     except Exception as e:
         print(f"User already in a group or error: {e}")
@@ -352,16 +371,16 @@ def remove_member(group_id: str, user_id: str) -> bool:
             .eq("group_id", group_id) \
             .eq("user_id", user_id) \
             .execute()
-        # ✅ Cache invalidieren nach Write
-        get_user_group.clear()
-        get_group_members.clear()
+        # ✅ Cache invalidieren nach Write (User + Gruppe inkl. member_count)
+        invalidate_user(user_id)
+        invalidate_group(group_id)
         return len(result.data) > 0
     except Exception as e:
         print(f"Error removing member: {e}")
         return False
 
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda group_id: [group_tag(group_id)])
 def get_group_members(group_id: str) -> List[Dict]:
     """Alle aktiven Mitglieder mit User-Details. Sortiert nach display_name.
 
@@ -393,19 +412,29 @@ def get_group_members(group_id: str) -> List[Dict]:
             .execute()
     user_map = {u["user_id"]: u for u in users_result.data}
 
+    # Aktuelle Streaks aller Mitglieder in 1 Query (abgelaufene = 0)
+    try:
+        streaks = current_streaks(user_ids, STREAM_CHALLENGE)
+    except Exception as e:
+        print(f"[get_group_members] Streaks nicht lesbar: {e}")
+        streaks = {}
+
     members = []
     for gm in members_result.data:
         member = {**gm}
         user_data = user_map.get(gm["user_id"])
         if user_data:
             member.update(user_data)
+        if gm["user_id"] in streaks:
+            member["current_streak"] = streaks[gm["user_id"]]
         members.append(member)
 
     members.sort(key=lambda m: (m.get("display_name") or "").lower())
     return members
 
 
-@st.cache_data(ttl=60)
+@tagged_cache(ttl=60, tags=lambda user_id: [user_tag(user_id)],
+              result_tags=lambda group: [group_tag(group["group_id"])])
 def get_user_group(user_id: str) -> Optional[Dict]:
     """Holt die Gruppe eines Users. User kann nur in einer Gruppe sein.
 
@@ -736,6 +765,8 @@ def activate_weekly_island(group_id: str, week_number: int, island_id: str, note
             .update({"current_week": max_week}) \
             .eq("group_id", group_id) \
             .execute()
+        # ✅ Cache invalidieren (Schatzkarten-Bootstrap der Gruppe)
+        invalidate_group(group_id)
         return True
     except Exception as e:
         print(f"Island activation conflict: {e}")
@@ -752,6 +783,7 @@ def deactivate_weekly_island(group_id: str, week_number: int, island_id: str) ->
             .eq("week_number", week_number) \
             .eq("island_id", island_id) \
             .execute()
+        invalidate_group(group_id)
         return True
     except Exception as e:
         print(f"Island deactivation error: {e}")
@@ -795,7 +827,11 @@ def get_group_week(group_id: str, start_date: str = None) -> int:
     group = get_group(group_id)
     if not group:
         return 0
+    return calculate_group_week(group, start_date)
+
 
+def calculate_group_week(group: Dict, start_date: str = None) -> int:
+    """Berechnet die Woche (0-12) aus einem bereits geladenen Gruppen-Dict (ohne Query)."""
     start = start_date or group.get('start_date')
     if not start:
         return group.get('current_week', 0)
@@ -899,7 +935,7 @@ def schedule_meeting(
         }).execute()
 
         # ✅ Cache invalidieren nach Write
-        get_next_meeting.clear()
+        invalidate_group(group_id)
         return {
             "id": meeting_id,
             "group_id": group_id,
@@ -991,7 +1027,7 @@ def renew_recurring_meeting(meeting: Dict) -> Optional[Dict]:
         return None
 
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda group_id: [group_tag(group_id)])
 def get_next_meeting(group_id: str) -> Optional[Dict]:
     """Nächstes Meeting (scheduled_end > now, status != cancelled).
     Erneuert automatisch wöchentliche Meetings wenn nötig.
@@ -1214,7 +1250,7 @@ def cancel_meeting(meeting_id: str) -> bool:
             .eq("id", meeting_id) \
             .execute()
         # ✅ Cache invalidieren nach Write
-        get_next_meeting.clear()
+        invalidate_group(*(m["group_id"] for m in result.data or []))
         return len(result.data) > 0
     except Exception as e:
         print(f"Error cancelling meeting: {e}")
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Registry fuer lokale RPC-Stand-ins
+==================================
+
+Fachmodule (gamification_db, streaks, ...) registrieren hier Python-
+Stand-ins fuer ihre Postgres-Funktionen. Das SQLite-Backend
+(utils/db_local.py) schlaegt sie bei rpc() nach; gegen Supabase werden
+sie nie aufgerufen.
+
+Bewusst ohne Abhaengigkeiten — Produktionsmodule importieren nur diese
+Registry, nicht das lokale Backend.
+
+Verwendung:
+    from utils.local_rpc import register_local_rpc
+
+    @register_local_rpc("complete_challenge")
+    def _complete_challenge_rpc(client, params): ...
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+
+# Handler: (client, params) -> JSON-Payload der Funktion
+LocalRpcHandler = Callable[[Any, Dict[str, Any]], Any]
+
+_LOCAL_RPCS: Dict[str, LocalRpcHandler] = {}
+
+
+def register_local_rpc(fn: str) -> Callable[[LocalRpcHandler], LocalRpcHandler]:
+    """Registriert einen Python-Stand-in fuer die Postgres-Funktion `fn`.
+
+    Der Handler bekommt (client, params) und liefert den JSON-Payload der
+    Funktion. Er laeuft unter dem Client-Lock in einer Transaktion — eine
+    Exception rollt alle Writes darin zurueck.
+    """
+    def decorator(handler: LocalRpcHandler) -> LocalRpcHandler:
+        _LOCAL_RPCS[fn] = handler
+        return handler
+    return decorator
+
+
+def get_local_rpc(fn: str) -> Optional[LocalRpcHandler]:
+    """Registrierter Stand-in fuer `fn` (None = keiner, rpc() meldet PGRST202)."""
+    return _LOCAL_RPCS.get(fn)
@@ -16,7 +16,7 @@ Badge-Kategorien:
 5. Geheime Badges: Überraschende Achievements
 """
 
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
 from datetime import date
 
 
@@ -557,155 +557,162 @@ def get_all_badges_by_category() -> Dict[str, List[Dict]]:
     return result
 
 
-def check_badge_condition(badge_id: str, user_stats: Dict) -> bool:
+def compile_badge_condition(condition: Dict) -> Callable[[Dict], bool]:
     """
-    Prüft ob ein Badge verdient wurde.
-    
-    Args:
-        badge_id: ID des Badges
-        user_stats: Dict mit:
-            - completed_by_category: {"autonomie": 2, "kompetenz": 1, ...}
-            - total_completed: int
-            - current_streak: int
-            - longest_streak: int
-            - challenge_counts: {"us_abc": 3, ...}
-            - completed_age_groups: ["grundschule", ...]
-            - last_activity_date: date
-            - activity_hour: int (0-23)
-            - days_since_last: int
+    Übersetzt eine Badge-Bedingung (Dict) einmalig in eine Funktion stats -> bool.
+
+    Die Engine (utils/badge_engine.py) kompiliert jede Bedingung nur einmal
+    pro Prozess statt sie bei jeder Prüfung neu zu interpretieren.
+    Unbekannte Typen ergeben eine Funktion, die immer False liefert.
     """
-    badge = MOTIVATION_BADGES.get(badge_id)
-    if not badge:
-        return False
-    
-    condition = badge.get("condition", {})
     cond_type = condition.get("type")
-    
+
     # Category Count
     if cond_type == "category_count":
         cat = condition.get("category")
         min_count = condition.get("min_count", 1)
-        actual = user_stats.get("completed_by_category", {}).get(cat, 0)
-        return actual >= min_count
-    
+        return lambda s: s.get("completed_by_category", {}).get(cat, 0) >= min_count
+
     # All Categories
     if cond_type == "all_categories":
         min_per = condition.get("min_count_per_category", 1)
-        by_cat = user_stats.get("completed_by_category", {})
-        return all(by_cat.get(c, 0) >= min_per for c in ["autonomie", "kompetenz", "verbundenheit"])
-    
+        return lambda s: all(s.get("completed_by_category", {}).get(c, 0) >= min_per
+                             for c in ["autonomie", "kompetenz", "verbundenheit"])
+
     # Category Complete
     if cond_type == "category_complete":
         cat = condition.get("category")
         # Dies erfordert Wissen über die Gesamtzahl - vereinfacht: 2+ als "complete"
-        total_in_cat = user_stats.get("total_by_category", {}).get(cat, 2)
-        actual = user_stats.get("completed_by_category", {}).get(cat, 0)
-        return actual >= total_in_cat
-    
+        return lambda s: (s.get("completed_by_category", {}).get(cat, 0)
+                          >= s.get("total_by_category", {}).get(cat, 2))
+
     # Streak
     if cond_type == "streak":
         min_days = condition.get("min_days", 3)
-        current = max(user_stats.get("current_streak", 0), user_stats.get("longest_streak", 0))
-        return current >= min_days
-    
+        return lambda s: max(s.get("current_streak", 0), s.get("longest_streak", 0)) >= min_days
+
     # Total Count
     if cond_type == "total_count":
         min_count = condition.get("min_count", 1)
-        return user_stats.get("total_completed", 0) >= min_count
-    
+        return lambda s: s.get("total_completed", 0) >= min_count
+
     # Challenge Specific
     if cond_type == "challenge_specific":
         challenge_ids = condition.get("challenge_ids", [])
         min_count = condition.get("min_count", 1)
-        counts = user_stats.get("challenge_counts", {})
-        total = sum(counts.get(cid, 0) for cid in challenge_ids)
-        return total >= min_count
-    
+        return lambda s: sum(s.get("challenge_counts", {}).get(cid, 0) for cid in challenge_ids) >= min_count
+
     # Age Complete
     if cond_type == "age_complete":
         age_group = condition.get("age_group")
-        return age_group in user_stats.get("completed_age_groups", [])
-    
+        return lambda s: age_group in s.get("completed_age_groups", [])
+
     # Weekend Activity
     if cond_type == "weekend_activity":
-        last_date = user_stats.get("last_activity_date")
-        if last_date:
-            if isinstance(last_date, str):
-                last_date = date.fromisoformat(last_date)
-            return last_date.weekday() >= 5  # Samstag=5, Sonntag=6
-        return False
-    
+        def weekend(s: Dict) -> bool:
+            last_date = s.get("last_activity_date")
+            if last_date:
+                if isinstance(last_date, str):
+                    last_date = date.fromisoformat(last_date)
+                return last_date.weekday() >= 5  # Samstag=5, Sonntag=6
+            return False
+        return weekend
+
     # Time Based
     if cond_type == "time_based":
-        hour = user_stats.get("activity_hour", 12)
         after = condition.get("after_hour")
         before = condition.get("before_hour")
-        if after and hour >= after:
-            return True
-        if before and hour < before:
-            return True
-        return False
-    
+        def time_based(s: Dict) -> bool:
+            hour = s.get("activity_hour", 12)
+            if after and hour >= after:
+                return True
+            if before and hour < before:
+                return True
+            return False
+        return time_based
+
     # Comeback
     if cond_type == "comeback":
         min_days = condition.get("min_days_away", 7)
-        days_away = user_stats.get("days_since_last", 0)
-        return days_away >= min_days
-    
-    return False
+        return lambda s: s.get("days_since_last", 0) >= min_days
 
+    return lambda s: False
 
-def check_and_award_badges(conn, user_id: str, age_group: str) -> List[str]:
+
+def _compile_badge(badge_id: str, badge: Dict) -> Callable[[Dict], bool]:
+    return compile_badge_condition(badge.get("condition", {}))
+
+
+def _badge_events(badge_id: str, badge: Dict) -> List[str]:
+    """Streak-Badges haengen am Motivation-Streak, alle anderen an Abschluessen."""
+    from utils.badge_engine import EVENT_MOTIVATION, EVENT_STREAK
+    if badge.get("condition", {}).get("type") == "streak":
+        return [EVENT_STREAK]
+    return [EVENT_MOTIVATION]
+
+
+def _badge_engine():
+    from utils.badge_engine import get_engine
+    return get_engine("motivation_badges", MOTIVATION_BADGES,
+                      events_for=_badge_events,
+                      compile_condition=_compile_badge)
+
+
+def check_badge_condition(badge_id: str, user_stats: Dict) -> bool:
     """
-    Prüft alle Badges und vergibt neue.
+    Prüft ob ein Badge verdient wurde.
     
-    Returns:
-        Liste der neu vergebenen Badge-IDs
+    Args:
+        badge_id: ID des Badges
+        user_stats: Dict mit:
+            - completed_by_category: {"autonomie": 2, "kompetenz": 1, ...}
+            - total_completed: int
+            - current_streak: int
+            - longest_streak: int
+            - challenge_counts: {"us_abc": 3, ...}
+            - completed_age_groups: ["grundschule", ...]
+            - last_activity_date: date
+            - activity_hour: int (0-23)
+            - days_since_last: int
     """
-    from .motivation_db import (
-        count_completed_challenges,
-        get_completed_challenges,
-        get_or_create_streak,
-        award_badge,
-        has_badge,
-        get_daily_activity_summary,
-    )
-    from .motivation_content import (
-        get_all_challenge_ids,
-        count_challenges_by_category,
-    )
+    return _badge_engine().matches(badge_id, user_stats)
+
+
+def _collect_user_stats(conn, user_id: str, age_group: str) -> Dict[str, Any]:
+    """Stats für die Badge-Bedingungen (2 Queries: Challenges + Streak)."""
+    from .motivation_db import get_completed_challenges, get_or_create_streak
+    from .motivation_content import get_all_challenge_ids, count_challenges_by_category
     from datetime import datetime
-    
-    # User-Stats sammeln
+
     completed = get_completed_challenges(conn, user_id)
     streak = get_or_create_streak(conn, user_id)
-    
-    # Completed by category
+
+    # Completed by category / age group
     by_cat = {"autonomie": 0, "kompetenz": 0, "verbundenheit": 0}
+    by_age = {}
     challenge_counts = {}
-    
+
     for c in completed:
         cat = c.get("grundbeduerfnis")
         if cat in by_cat:
             by_cat[cat] += 1
-        
+
         cid = c.get("challenge_id")
         challenge_counts[cid] = challenge_counts.get(cid, 0) + 1
-    
-    # Total by category (für "complete" check)
-    total_by_cat = count_challenges_by_category(age_group)
-    
-    # Completed age groups
+
+        ag = c.get("age_group")
+        by_age[ag] = by_age.get(ag, 0) + 1
+
+    # Completed age groups (aus derselben Liste statt 4 weiteren Queries)
     completed_age_groups = []
     for ag in ["grundschule", "unterstufe", "mittelstufe", "oberstufe"]:
         all_ids = get_all_challenge_ids(ag)
-        completed_ids = [c["challenge_id"] for c in get_completed_challenges(conn, user_id, ag)]
-        if len(completed_ids) >= len(all_ids) and len(all_ids) > 0:
+        if by_age.get(ag, 0) >= len(all_ids) and len(all_ids) > 0:
             completed_age_groups.append(ag)
-    
-    user_stats = {
+
+    return {
         "completed_by_category": by_cat,
-        "total_by_category": total_by_cat,
+        "total_by_category": count_challenges_by_category(age_group),
         "total_completed": len(completed),
         "current_streak": streak.get("current_streak", 0),
         "longest_streak": streak.get("longest_streak", 0),
@@ -715,19 +722,21 @@ def check_and_award_badges(conn, user_id: str, age_group: str) -> List[str]:
         "activity_hour": datetime.now().hour,
         "days_since_last": 0,  # Vereinfacht
     }
+
+
+def check_and_award_badges(conn, user_id: str, age_group: str) -> List[str]:
+    """
+    Prüft alle noch nicht verdienten Badges und vergibt neue (1 Bulk-Insert).
     
-    # Alle Badges prüfen
-    new_badges = []
-    
-    for badge_id in MOTIVATION_BADGES.keys():
-        if has_badge(conn, user_id, badge_id):
-            continue
-        
-        if check_badge_condition(badge_id, user_stats):
-            if award_badge(conn, user_id, badge_id):
-                new_badges.append(badge_id)
-    
-    return new_badges
+    Returns:
+        Liste der neu vergebenen Badge-IDs
+    """
+    from utils.badge_engine import EVENT_MOTIVATION, EVENT_STREAK
+
+    # Ein Abschluss verbucht auch den Motivation-Streak (update_streak)
+    return _badge_engine().evaluate(
+        user_id, [EVENT_MOTIVATION, EVENT_STREAK],
+        stats_loader=lambda: _collect_user_stats(conn, user_id, age_group))
 
 
 # ============================================
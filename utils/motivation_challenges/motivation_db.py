@@ -7,7 +7,8 @@ Basiert auf der Selbstbestimmungstheorie (SDT) von Deci & Ryan.
 Tabellen:
 - motivation_challenges: Challenge-Fortschritt pro User
 - motivation_sdt_progress: SDT-Level (Autonomie, Kompetenz, Verbundenheit)
-- motivation_streaks: Streak-Tracking mit Freeze-Option
+- user_streaks (Stream "motivation"): Streak-Tracking mit Freeze-Option
+  (utils/streaks.py, vorher motivation_streaks)
 """
 
 from datetime import datetime, date, timedelta
@@ -15,6 +16,13 @@ from typing import Dict, List, Optional, Any
 import json
 
 from utils.database import get_db
+from utils.badge_engine import award_badges
+from utils.cache import invalidate_user
+from utils.activity_rollup import (
+    MOTIVATION_PREFIX, bump_daily_activity, clear_daily_activity,
+    get_daily_activity, motivation_source,
+)
+from utils.streaks import STREAM_MOTIVATION, add_freezes, clear_streak, get_streak, record_activity
 
 
 # ============================================
@@ -291,113 +299,38 @@ def get_sdt_summary(conn, user_id: str) -> Dict[str, Any]:
 # ============================================
 
 def get_or_create_streak(conn, user_id: str) -> Dict[str, Any]:
-    """Holt oder erstellt Streak-Daten."""
-    db = get_db()
-
-    result = db.table("motivation_streaks") \
-        .select("current_streak, longest_streak, last_activity_date, freeze_available, freeze_used_date") \
-        .eq("user_id", user_id) \
-        .execute()
-
-    if result.data:
-        return result.data[0]
-    else:
-        db.table("motivation_streaks").insert({
-            "user_id": user_id
-        }).execute()
-        return {
-            "current_streak": 0,
-            "longest_streak": 0,
-            "last_activity_date": None,
-            "freeze_available": 1,
-            "freeze_used_date": None
-        }
+    """Holt die Streak-Daten (ohne Aktivitaet: Startwerte inkl. Freeze)."""
+    streak = get_streak(user_id, STREAM_MOTIVATION)
+    return {
+        "current_streak": streak["current_streak"],
+        "longest_streak": streak["longest_streak"],
+        "last_activity_date": streak["last_activity_date"],
+        "freeze_available": streak["freeze_available"],
+        "freeze_used_date": streak["freeze_used_date"]
+    }
 
 
 def update_streak(conn, user_id: str) -> Dict[str, Any]:
-    """Aktualisiert den Streak nach einer Aktivität."""
-    streak_data = get_or_create_streak(conn, user_id)
-    today = date.today()
-
-    last_activity = streak_data["last_activity_date"]
-    if last_activity:
-        if isinstance(last_activity, str):
-            last_activity = date.fromisoformat(last_activity)
-
-    current_streak = streak_data["current_streak"] or 0
-    longest_streak = streak_data["longest_streak"] or 0
-    freeze_available = streak_data["freeze_available"] or 0
-
-    result = {
-        "streak_continued": False,
-        "streak_broken": False,
-        "streak_saved_by_freeze": False,
-        "freeze_used": False,
-        "new_longest": False
-    }
-
-    if last_activity == today:
-        result["streak_continued"] = True
-        return {**result, "current_streak": current_streak, "longest_streak": longest_streak}
-
-    yesterday = today - timedelta(days=1)
-    day_before = today - timedelta(days=2)
-
-    if last_activity == yesterday:
-        current_streak += 1
-        result["streak_continued"] = True
-    elif last_activity == day_before and freeze_available > 0:
-        freeze_available -= 1
-        result["streak_saved_by_freeze"] = True
-        result["freeze_used"] = True
-        current_streak += 1
-    elif last_activity is None:
-        current_streak = 1
-    else:
-        result["streak_broken"] = True
-        current_streak = 1
-
-    if current_streak > longest_streak:
-        longest_streak = current_streak
-        result["new_longest"] = True
-
-    get_db().table("motivation_streaks").update({
-        "current_streak": current_streak,
-        "longest_streak": longest_streak,
-        "last_activity_date": today.isoformat(),
-        "freeze_available": freeze_available,
-        "updated_at": datetime.now().isoformat()
-    }).eq("user_id", user_id).execute()
+    """Aktualisiert den Streak nach einer Aktivität.
 
+    Atomar in der Streak-Engine (RPC record_streak), Freeze inklusive.
+    """
+    result = record_activity(user_id, STREAM_MOTIVATION)
     return {
-        **result,
-        "current_streak": current_streak,
-        "longest_streak": longest_streak,
-        "freeze_available": freeze_available
+        "streak_continued": result["streak_continued"],
+        "streak_broken": result["streak_broken"],
+        "streak_saved_by_freeze": result["streak_saved_by_freeze"],
+        "freeze_used": result["freeze_used"],
+        "new_longest": result["new_longest"],
+        "current_streak": result["current_streak"],
+        "longest_streak": result["longest_streak"],
+        "freeze_available": result["freeze_available"]
     }
 
 
 def add_streak_freeze(conn, user_id: str, count: int = 1) -> int:
     """Fügt Streak-Freezes hinzu. Returns: Neue Anzahl verfügbarer Freezes"""
-    db = get_db()
-
-    # Aktuellen Wert holen
-    current = db.table("motivation_streaks") \
-        .select("freeze_available") \
-        .eq("user_id", user_id) \
-        .execute()
-
-    if not current.data:
-        return 0
-
-    new_value = (current.data[0]["freeze_available"] or 0) + count
-
-    db.table("motivation_streaks") \
-        .update({"freeze_available": new_value}) \
-        .eq("user_id", user_id) \
-        .execute()
-
-    return new_value
+    return add_freezes(user_id, STREAM_MOTIVATION, count)
 
 
 # ============================================
@@ -419,6 +352,7 @@ def log_activity(
         "grundbeduerfnis": grundbeduerfnis,
         "xp_earned": xp_earned
     }).execute()
+    bump_daily_activity(user_id, motivation_source(grundbeduerfnis), xp_earned)
 
 
 def get_activity_heatmap_data(
@@ -426,26 +360,16 @@ def get_activity_heatmap_data(
     user_id: str,
     weeks: int = 12
 ) -> List[Dict[str, Any]]:
-    """Holt Aktivitätsdaten für die GitHub-Style Heatmap."""
-    start_date = (date.today() - timedelta(weeks=weeks * 7)).isoformat()
-
-    result = get_db().table("motivation_activity_log") \
-        .select("activity_date, grundbeduerfnis, xp_earned") \
-        .eq("user_id", user_id) \
-        .gte("activity_date", start_date) \
-        .order("activity_date") \
-        .execute()
-
-    # Gruppierung in Python (ersetzt GROUP BY)
-    groups = {}
-    for row in result.data:
-        key = (row["activity_date"], row["grundbeduerfnis"])
-        if key not in groups:
-            groups[key] = {"date": row["activity_date"], "grundbeduerfnis": row["grundbeduerfnis"], "count": 0, "xp": 0}
-        groups[key]["count"] += 1
-        groups[key]["xp"] += row.get("xp_earned") or 0
+    """Holt Aktivitätsdaten für die GitHub-Style Heatmap (aus dem Tages-Rollup)."""
+    start_date = date.today() - timedelta(weeks=weeks)
+    rows = get_daily_activity(user_id, since=start_date, source_prefix=MOTIVATION_PREFIX)
 
-    return list(groups.values())
+    return [{
+        "date": row["activity_date"],
+        "grundbeduerfnis": row["source"][len(MOTIVATION_PREFIX):],
+        "count": row["count"] or 0,
+        "xp": row["xp"] or 0
+    } for row in rows]
 
 
 def get_daily_activity_summary(
@@ -457,11 +381,8 @@ def get_daily_activity_summary(
     if target_date is None:
         target_date = date.today()
 
-    result = get_db().table("motivation_activity_log") \
-        .select("grundbeduerfnis, xp_earned") \
-        .eq("user_id", user_id) \
-        .eq("activity_date", target_date.isoformat()) \
-        .execute()
+    rows = get_daily_activity(user_id, since=target_date, until=target_date,
+                              source_prefix=MOTIVATION_PREFIX)
 
     summary = {
         "date": target_date.isoformat(),
@@ -472,13 +393,13 @@ def get_daily_activity_summary(
         "total_xp": 0
     }
 
-    for row in result.data:
-        gb = row["grundbeduerfnis"]
+    for row in rows:
+        gb = row["source"][len(MOTIVATION_PREFIX):]
         if gb in summary:
-            summary[gb]["count"] += 1
-            summary[gb]["xp"] += row.get("xp_earned") or 0
-            summary["total_count"] += 1
-            summary["total_xp"] += row.get("xp_earned") or 0
+            summary[gb]["count"] += row["count"] or 0
+            summary[gb]["xp"] += row["xp"] or 0
+            summary["total_count"] += row["count"] or 0
+            summary["total_xp"] += row["xp"] or 0
 
     return summary
 
@@ -489,26 +410,7 @@ def get_daily_activity_summary(
 
 def award_badge(conn, user_id: str, badge_id: str) -> bool:
     """Vergibt ein Badge an einen User."""
-    db = get_db()
-
-    # Prüfe ob Badge bereits vergeben
-    existing = db.table("motivation_badges") \
-        .select("id") \
-        .eq("user_id", user_id) \
-        .eq("badge_id", badge_id) \
-        .execute()
-
-    if existing.data:
-        return False
-
-    try:
-        db.table("motivation_badges").insert({
-            "user_id": user_id,
-            "badge_id": badge_id
-        }).execute()
-        return True
-    except Exception:
-        return False
+    return bool(award_badges("motivation_badges", user_id, [badge_id]))
 
 
 def get_user_badges(conn, user_id: str) -> List[Dict[str, Any]]:
@@ -620,3 +522,7 @@ def reset_user_motivation_data(conn, user_id: str) -> None:
 
     for table in tables:
         db.table(table).delete().eq("user_id", user_id).execute()
+
+    clear_daily_activity(user_id, MOTIVATION_PREFIX)
+    clear_streak(user_id, STREAM_MOTIVATION)
+    invalidate_user(user_id)
@@ -11,11 +11,13 @@ Verwendung:
     )
 """
 
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Tuple
 
 import streamlit as st
 from utils.database import get_db
+from utils.cache import tagged_cache, user_tag, group_tag
+from utils.db_errors import is_missing_column
 
 
 # ============================================
@@ -25,114 +27,243 @@ from utils.database import get_db
 MAX_MESSAGE_LENGTH = 500
 MESSAGES_PER_PAGE = 50
 
+# sync_messages() liest die letzten Sekunden vor dem Cursor erneut: eine
+# Aenderung, die spaet committet, kann einen kleineren updated_at haben als
+# Zeilen, die schon ausgeliefert wurden
+SYNC_OVERLAP_SECONDS = 5
+
 
 # ============================================
 # NACHRICHTEN LESEN
 # ============================================
 
+MESSAGE_COLUMNS = ("id, group_id, sender_id, sender_name, recipient_id, "
+                   "message_text, message_type, is_deleted, created_at, updated_at")
+# Ohne sql/12_group_messages_updated_at.sql gibt es updated_at noch nicht
+LEGACY_MESSAGE_COLUMNS = MESSAGE_COLUMNS.replace(", updated_at", "")
+
+
 def get_group_messages(
     group_id: str,
     user_id: str,
     limit: int = MESSAGES_PER_PAGE,
-    include_dms: bool = True
+    include_dms: bool = True,
+    before: Optional[Tuple[str, str]] = None
 ) -> List[Dict[str, Any]]:
     """Holt Nachrichten fuer eine Gruppe (Gruppen-Chat + eigene DMs).
 
+    OPTIMIERUNG: 1 Query mit OR-Filter, serverseitig sortiert und limitiert
+    (statt 3 Queries mit je `limit` Zeilen und Merge in Python).
+
     Args:
         group_id: Gruppen-ID
         user_id: Aktueller User (fuer DM-Filterung)
         limit: Max. Anzahl Nachrichten
         include_dms: Auch Direktnachrichten einbeziehen
+        before: Keyset-Cursor (created_at, id) — nur aeltere Nachrichten laden,
+                z.B. message_cursor(messages[0]) fuer "Aeltere laden"
 
     Returns:
         Liste von Nachrichten, aelteste zuerst
     """
-    db = get_db()
+    try:
+        return _fetch_page(_group_messages_query(MESSAGE_COLUMNS, group_id, user_id, include_dms),
+                           limit, before)
+    except Exception as e:
+        if not is_missing_column(e):
+            raise
+        print(f"[nachrichten_db] updated_at fehlt, lade ohne (sql/12 ausfuehren): {e}")
+        return _fetch_page(_group_messages_query(LEGACY_MESSAGE_COLUMNS, group_id, user_id, include_dms),
+                           limit, before)
 
-    # Gruppen-Nachrichten (recipient_id IS NULL) + eigene DMs
-    # Supabase-py unterstuetzt kein OR mit IS NULL direkt,
-    # daher holen wir beides separat und mergen.
 
-    # 1. Gruppen-Nachrichten
-    group_result = db.table("group_messages") \
-        .select("id, group_id, sender_id, sender_name, recipient_id, "
-                "message_text, message_type, is_deleted, created_at") \
+def _group_messages_query(columns: str, group_id: str, user_id: str, include_dms: bool):
+    query = get_db().table("group_messages") \
+        .select(columns) \
         .eq("group_id", group_id) \
-        .is_("recipient_id", "null") \
-        .eq("is_deleted", False) \
-        .order("created_at", desc=True) \
-        .limit(limit) \
-        .execute()
-
-    messages = group_result.data or []
+        .eq("is_deleted", False)
 
-    # 2. Direktnachrichten (an mich oder von mir)
     if include_dms:
-        # DMs an mich
-        dm_to_me = db.table("group_messages") \
-            .select("id, group_id, sender_id, sender_name, recipient_id, "
-                    "message_text, message_type, is_deleted, created_at") \
-            .eq("group_id", group_id) \
-            .eq("recipient_id", user_id) \
-            .eq("is_deleted", False) \
-            .order("created_at", desc=True) \
-            .limit(limit) \
-            .execute()
-
-        # DMs von mir
-        dm_from_me = db.table("group_messages") \
-            .select("id, group_id, sender_id, sender_name, recipient_id, "
-                    "message_text, message_type, is_deleted, created_at") \
-            .eq("group_id", group_id) \
-            .eq("sender_id", user_id) \
-            .neq("recipient_id", "null") \
-            .eq("is_deleted", False) \
-            .order("created_at", desc=True) \
-            .limit(limit) \
-            .execute()
-
-        messages += (dm_to_me.data or [])
-        messages += (dm_from_me.data or [])
-
-    # Sortieren (aelteste zuerst) und Limit
-    messages.sort(key=lambda m: m.get("created_at", ""))
-    return messages[-limit:]
+        # Gruppen-Nachrichten + DMs an mich + DMs von mir
+        uid = _pg_quote(user_id)
+        query = query.or_(f"recipient_id.is.null,recipient_id.eq.{uid},sender_id.eq.{uid}")
+    else:
+        query = query.is_("recipient_id", "null")
+    return query
 
 
 def get_direct_messages(
     group_id: str,
     user_id: str,
     other_user_id: str,
-    limit: int = MESSAGES_PER_PAGE
+    limit: int = MESSAGES_PER_PAGE,
+    before: Optional[Tuple[str, str]] = None
 ) -> List[Dict[str, Any]]:
-    """Holt DMs zwischen zwei Usern innerhalb einer Gruppe."""
-    db = get_db()
-
-    # Nachrichten von user_id an other_user_id
-    sent = db.table("group_messages") \
+    """Holt DMs zwischen zwei Usern innerhalb einer Gruppe (1 Query, beide Richtungen)."""
+    me, other = _pg_quote(user_id), _pg_quote(other_user_id)
+    query = get_db().table("group_messages") \
         .select("*") \
         .eq("group_id", group_id) \
-        .eq("sender_id", user_id) \
-        .eq("recipient_id", other_user_id) \
         .eq("is_deleted", False) \
+        .or_(f"and(sender_id.eq.{me},recipient_id.eq.{other}),"
+             f"and(sender_id.eq.{other},recipient_id.eq.{me})")
+
+    return _fetch_page(query, limit, before)
+
+
+def message_cursor(message: Dict[str, Any]) -> Tuple[str, str]:
+    """Keyset-Cursor (created_at, id) einer Nachricht fuer den before-Parameter."""
+    return (message["created_at"], message["id"])
+
+
+def _fetch_page(query, limit: int, before: Optional[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Neueste `limit` Nachrichten vor dem Cursor, aelteste zuerst.
+
+    Sortierung (created_at, id) ist eindeutig — auch bei gleichen
+    Timestamps gehen beim Blaettern keine Nachrichten verloren.
+    """
+    if before:
+        created_at, msg_id = _pg_quote(before[0]), _pg_quote(before[1])
+        query = query.or_(f"created_at.lt.{created_at},"
+                          f"and(created_at.eq.{created_at},id.lt.{msg_id})")
+
+    result = query \
         .order("created_at", desc=True) \
+        .order("id", desc=True) \
         .limit(limit) \
         .execute()
 
-    # Nachrichten von other_user_id an user_id
-    received = db.table("group_messages") \
+    messages = result.data or []
+    messages.reverse()
+    return messages
+
+
+def _pg_quote(value: Any) -> str:
+    """Wert fuer PostgREST or=/and= Filter quoten (Kommas, Punkte, Doppelpunkte)."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+# ============================================
+# INKREMENTELLER SYNC
+# ============================================
+
+def sync_messages(
+    group_id: str,
+    user_id: str,
+    since_cursor: Optional[str] = None,
+    limit: int = MESSAGES_PER_PAGE
+) -> Dict[str, Any]:
+    """Liefert nur Aenderungen seit dem letzten Sync (neu, bearbeitet, geloescht).
+
+    OPTIMIERUNG: Statt bei jedem Cache-Miss das ganze Fenster
+    (MESSAGES_PER_PAGE) neu zu laden, holt der Client nur die Zeilen mit
+    updated_at nach dem Cursor (sql/12_group_messages_updated_at.sql).
+
+    Die letzten SYNC_OVERLAP_SECONDS vor dem Cursor werden jedes Mal erneut
+    gelesen (spaet committete Aenderungen). Bereits bekannte Nachrichten
+    koennen also nochmal kommen — der Client fuehrt per id zusammen.
+    Folgeseiten (hasMore) lesen ab dem Cursor ohne Ueberlappung.
+
+    Args:
+        group_id: Gruppen-ID
+        user_id: Aktueller User (fuer DM-Filterung)
+        since_cursor: Cursor aus dem letzten Sync bzw. syncCursor aus
+                      load_chat_data(). None = erstes Laden (neuestes Fenster).
+        limit: Max. Aenderungen pro Aufruf (has_more=True -> erneut syncen)
+
+    Returns:
+        {"messages": [formatierte Nachrichten, neu oder bearbeitet],
+         "deletedIds": [IDs soft-geloeschter Nachrichten],
+         "cursor": neuer Cursor (String), "hasMore": bool}
+    """
+    if not since_cursor:
+        messages = get_group_messages(group_id, user_id, limit=limit)
+        return {
+            "messages": [_format_message(m) for m in messages],
+            "deletedIds": [],
+            "cursor": _sync_cursor_for(messages),
+            "hasMore": False,
+        }
+
+    changed_at, msg_id, continued = _decode_sync_cursor(since_cursor)
+    uid = _pg_quote(user_id)
+
+    # Geloeschte Nachrichten werden mitgeliefert (is_deleted-Filter fehlt bewusst)
+    query = get_db().table("group_messages") \
         .select("*") \
         .eq("group_id", group_id) \
-        .eq("sender_id", other_user_id) \
-        .eq("recipient_id", user_id) \
-        .eq("is_deleted", False) \
-        .order("created_at", desc=True) \
-        .limit(limit) \
+        .or_(f"recipient_id.is.null,recipient_id.eq.{uid},sender_id.eq.{uid}")
+    if continued:
+        ts, mid = _pg_quote(changed_at), _pg_quote(msg_id)
+        query = query.or_(f"updated_at.gt.{ts},and(updated_at.eq.{ts},id.gt.{mid})")
+    else:
+        overlap_start = datetime.fromisoformat(changed_at.replace("Z", "+00:00")) \
+            - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+        query = query.gte("updated_at", overlap_start.isoformat())
+
+    result = query \
+        .order("updated_at") \
+        .order("id") \
+        .limit(limit + 1) \
         .execute()
 
-    messages = (sent.data or []) + (received.data or [])
-    messages.sort(key=lambda m: m.get("created_at", ""))
-    return messages[-limit:]
+    rows = result.data or []
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if has_more:
+        # Naechste Seite strikt nach der letzten Zeile (sonst kaeme dieselbe Seite wieder)
+        cursor = _encode_sync_cursor(rows[-1]["updated_at"], rows[-1]["id"], continued=True)
+    else:
+        # Cursor nie zurueckdrehen (die Ueberlappung liegt vor dem alten Cursor)
+        latest = max([(changed_at, msg_id)] + [(m["updated_at"], m["id"]) for m in rows],
+                     key=lambda c: (_as_utc_iso(c[0]), c[1]))
+        cursor = _encode_sync_cursor(*latest)
+
+    return {
+        "messages": [_format_message(m) for m in rows if not m.get("is_deleted")],
+        "deletedIds": [m["id"] for m in rows if m.get("is_deleted")],
+        "cursor": cursor,
+        "hasMore": has_more,
+    }
+
+
+def _sync_cursor_for(messages: List[Dict[str, Any]]) -> Optional[str]:
+    """Cursor fuer ein geladenes Fenster: juengste Aenderung darin."""
+    if not messages:
+        return None
+    latest = max(messages, key=lambda m: (m.get("updated_at") or m["created_at"], m["id"]))
+    return _encode_sync_cursor(latest.get("updated_at") or latest["created_at"], latest["id"])
+
+
+def _encode_sync_cursor(changed_at: str, msg_id: str, continued: bool = False) -> str:
+    """Cursor als String (JSON-tauglich fuer die React-Komponente).
+
+    continued=True markiert eine Folgeseite (ohne Ueberlappung lesen).
+    """
+    return f"{changed_at}|{msg_id}|+" if continued else f"{changed_at}|{msg_id}"
+
+
+def _decode_sync_cursor(cursor: str) -> Tuple[str, str, bool]:
+    continued = cursor.endswith("|+")
+    if continued:
+        cursor = cursor[:-2]
+    changed_at, _, msg_id = cursor.rpartition("|")
+    return changed_at, msg_id, continued
+
+
+def _format_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """DB-Zeile -> Format der React-Chat-Komponente."""
+    return {
+        "id": msg["id"],
+        "senderId": msg["sender_id"],
+        "senderName": msg["sender_name"],
+        "recipientId": msg.get("recipient_id"),
+        "text": msg["message_text"],
+        "type": msg.get("message_type", "text"),
+        "createdAt": msg["created_at"]
+    }
 
 
 # ============================================
@@ -281,24 +412,79 @@ def get_unread_count(group_id: str, user_id: str) -> int:
 
 
 def get_unread_count_for_coach(coach_id: str) -> Dict[str, int]:
-    """Zaehlt ungelesene Nachrichten pro Gruppe fuer einen Coach."""
+    """Zaehlt ungelesene Nachrichten pro Gruppe fuer einen Coach.
+
+    OPTIMIERUNG: 1 RPC (sql/10_coach_unread_counts.sql) statt 2 Queries
+    pro Gruppe. Beruecksichtigt coach_last_seen_chat aus
+    learning_groups.settings (der Coach steht nicht in group_members).
+
+    Returns: {group_id: anzahl} fuer alle aktiven Gruppen des Coaches
+    """
+    try:
+        result = get_db().rpc("get_coach_unread_counts", {"p_coach_id": coach_id}).execute()
+        if isinstance(result.data, dict):
+            return {gid: int(n or 0) for gid, n in result.data.items()}
+    except Exception as e:
+        print(f"get_coach_unread_counts RPC nicht verfuegbar, nutze Fallback: {e}")
+
+    return _unread_counts_for_coach_local(coach_id)
+
+
+def _unread_counts_for_coach_local(coach_id: str) -> Dict[str, int]:
+    """Fallback ohne RPC: 1 Gruppen-Query + 1 Count-Query (HEAD) pro Gruppe.
+
+    Gezaehlt wird serverseitig (count="exact") mit dem last_seen der
+    jeweiligen Gruppe — keine Nachrichten-Zeilen im Payload, kein
+    1000-Zeilen-Limit von PostgREST.
+    """
     db = get_db()
 
-    # Alle Gruppen des Coaches
     groups = db.table("learning_groups") \
-        .select("group_id") \
+        .select("group_id, settings") \
         .eq("coach_id", coach_id) \
         .eq("is_active", 1) \
         .execute()
 
     counts = {}
     for g in (groups.data or []):
-        gid = g["group_id"]
-        counts[gid] = get_unread_count(gid, coach_id)
+        seen = _parse_settings(g.get("settings")).get("coach_last_seen_chat")
+        query = db.table("group_messages") \
+            .select("id", count="exact", head=True) \
+            .eq("group_id", g["group_id"]) \
+            .eq("is_deleted", False) \
+            .neq("sender_id", coach_id)
+        if seen:
+            query = query.gt("created_at", _as_utc_iso(seen))
+        counts[g["group_id"]] = query.execute().count or 0
 
     return counts
 
 
+def _as_utc_iso(value: str) -> str:
+    """Timestamp als UTC-ISO-String fuer Filter und Vergleiche.
+
+    Werte ohne Zone gelten als UTC — wie in sql/10_coach_unread_counts.sql
+    (alte coach_last_seen_chat-Eintraege wurden ohne Offset geschrieben).
+    """
+    ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).isoformat()
+
+
+def _parse_settings(settings) -> Dict[str, Any]:
+    """learning_groups.settings kann als Dict oder JSON-String kommen."""
+    if not settings:
+        return {}
+    if isinstance(settings, str):
+        import json
+        try:
+            settings = json.loads(settings)
+        except ValueError:
+            return {}
+    return settings if isinstance(settings, dict) else {}
+
+
 def update_last_seen(group_id: str, user_id: str) -> bool:
     """Aktualisiert den last_seen_chat Timestamp."""
     try:
@@ -324,13 +510,10 @@ def update_last_seen_coach(group_id: str, coach_id: str) -> bool:
             .execute()
 
         settings = {}
-        if group.data and group.data[0].get("settings"):
-            settings = group.data[0]["settings"]
-            if isinstance(settings, str):
-                import json
-                settings = json.loads(settings)
+        if group.data:
+            settings = _parse_settings(group.data[0].get("settings"))
 
-        settings["coach_last_seen_chat"] = datetime.now().isoformat()
+        settings["coach_last_seen_chat"] = datetime.now(timezone.utc).isoformat()
 
         db.table("learning_groups") \
             .update({"settings": settings}) \
@@ -346,8 +529,12 @@ def update_last_seen_coach(group_id: str, coach_id: str) -> bool:
 # CHAT-DATEN FUER REACT LADEN
 # ============================================
 
-def _load_group_chat(group: Dict, user_id: str, user_name: str) -> Dict[str, Any]:
-    """Laedt Chat-Daten fuer eine einzelne Gruppe."""
+def _load_group_chat(group: Dict, user_id: str, user_name: str,
+                     unread: Optional[int] = None) -> Dict[str, Any]:
+    """Laedt Chat-Daten fuer eine einzelne Gruppe.
+
+    unread: Bereits berechneter Ungelesen-Zaehler (Coach-Batch), sonst Query.
+    """
     from utils.user_system import get_user_by_id
     from utils.lerngruppen_db import get_group_members
 
@@ -380,31 +567,22 @@ def _load_group_chat(group: Dict, user_id: str, user_name: str) -> Dict[str, Any
                 })
 
     # Ungelesen-Zaehler
-    unread = get_unread_count(group_id, user_id)
-
-    # Nachrichten formatieren
-    formatted_messages = []
-    for msg in messages:
-        formatted_messages.append({
-            "id": msg["id"],
-            "senderId": msg["sender_id"],
-            "senderName": msg["sender_name"],
-            "recipientId": msg.get("recipient_id"),
-            "text": msg["message_text"],
-            "type": msg.get("message_type", "text"),
-            "createdAt": msg["created_at"]
-        })
+    if unread is None:
+        unread = get_unread_count(group_id, user_id)
 
     return {
         "groupId": group_id,
         "groupName": group.get("name", "Meine Gruppe"),
-        "initialMessages": formatted_messages,
+        "initialMessages": [_format_message(m) for m in messages],
         "members": members,
         "unreadCount": unread,
+        # Ab hier kann der Client per sync_messages() inkrementell nachladen
+        "syncCursor": _sync_cursor_for(messages),
     }
 
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda user_id: [user_tag(user_id)],
+              result_tags=lambda chat: [group_tag(g["groupId"]) for g in chat["allGroups"]])
 def load_chat_data(user_id: str) -> Optional[Dict[str, Any]]:
     """Laedt alle Chat-Daten fuer die React-Komponente.
 
@@ -414,7 +592,7 @@ def load_chat_data(user_id: str) -> Optional[Dict[str, Any]]:
 
     Returns:
         Dict mit groupId, groupName, userId, userName, userRole,
-        initialMessages, members, unreadCount, supabaseUrl, supabaseAnonKey,
+        initialMessages, members, unreadCount, syncCursor, supabaseUrl, supabaseAnonKey,
         allGroups (fuer Coaches mit mehreren Gruppen)
         oder None wenn User in keiner Gruppe ist.
     """
@@ -424,10 +602,14 @@ def load_chat_data(user_id: str) -> Optional[Dict[str, Any]]:
     # Gruppe(n) finden
     all_groups = []
     user_role = "kind"
+    unread_counts = {}
 
     if is_coach(user_id):
         user_role = "coach"
         all_groups = get_coach_groups(user_id) or []
+        if all_groups:
+            # Alle Gruppen in 1 Round-Trip (statt 2 Queries pro Gruppe)
+            unread_counts = get_unread_count_for_coach(user_id)
     else:
         group = get_user_group(user_id)
         if group:
@@ -444,15 +626,19 @@ def load_chat_data(user_id: str) -> Optional[Dict[str, Any]]:
     user_name = user.get("display_name", "Unbekannt")
 
     # Erste Gruppe als Standard laden
-    primary = _load_group_chat(all_groups[0], user_id, user_name)
+    primary = _load_group_chat(all_groups[0], user_id, user_name,
+                               unread=unread_counts.get(all_groups[0]["group_id"]))
 
     # Alle Gruppen als Liste (fuer Gruppen-Wechsler)
     groups_list = []
     for g in all_groups:
-        groups_list.append({
+        entry = {
             "groupId": g["group_id"],
             "groupName": g.get("name", "Gruppe"),
-        })
+        }
+        if user_role == "coach":
+            entry["unreadCount"] = unread_counts.get(g["group_id"], 0)
+        groups_list.append(entry)
 
     return {
         **primary,
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Paralleles Laden unabhaengiger Supabase-Reads
+==============================================
+
+Seiten wie die Schatzkarte laden mehrere voneinander unabhaengige Daten
+(Bootstrap, Chat, Meetings). Nacheinander addieren sich die Latenzen;
+parallel bestimmt nur die langsamste Abfrage die Wartezeit.
+
+- Ein eigener Worker-Thread pro Zweig, prozessweit begrenzt auf
+  MAX_WORKERS gleichzeitig laufende Worker. Es gibt keine gemeinsame
+  Warteschlange: ist kein Platz frei, laeuft der Zweig direkt im
+  aufrufenden Thread (wie vor der Parallelisierung) — eine Session kann
+  so nie hinter den Requests anderer Sessions warten.
+- Timeout und Fallback pro Aufruf; der Timeout zaehlt ab Start des Zweigs.
+  Ein abgelaufener Worker laeuft weiter (Threads lassen sich nicht
+  abbrechen), belegt aber nur seinen eigenen Platz.
+- retry_sync=True: nach Timeout/Fehler ein zweiter Versuch im aufrufenden
+  Thread statt Fallback/Exception (fuer Daten, ohne die die Seite nicht
+  rendern kann)
+- Streamlit-ScriptRunContext wird an die Worker weitergereicht, damit
+  st.session_state / st.cache_data / st.secrets dort funktionieren, und
+  am Ende des Zweigs wieder entfernt
+- Wall-Time jedes Zweigs wird in st.session_state protokolliert
+
+Verwendung:
+    from utils.parallel_fetch import fetch_parallel, fetch_task
+
+    results = fetch_parallel({
+        "bootstrap": fetch_task(get_map_bootstrap, user_id, timeout=15, retry_sync=True),
+        "chat": fetch_task(load_chat_data, user_id, timeout=8, fallback=None),
+    }, label="schatzkarte")
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import streamlit as st
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Aeltere/neuere Streamlit-Versionen ohne diesen Pfad
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+# Attribut, unter dem add_script_run_ctx den Kontext am Thread ablegt
+SCRIPT_RUN_CTX_ATTR = "streamlit_script_run_ctx"
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+MAX_WORKERS = 16           # Gleichzeitig laufende Worker fuer alle Sessions eines Prozesses
+DEFAULT_TIMEOUT = 10.0     # Sekunden pro Aufruf, falls nicht angegeben
+TIMINGS_KEY = "_fetch_timings"
+
+# Sentinel: Kein Fallback -> Fehler wird an den Aufrufer weitergereicht
+RAISE = object()
+
+_worker_slots = threading.BoundedSemaphore(MAX_WORKERS)
+
+
+# ============================================
+# API
+# ============================================
+
+def fetch_task(fn: Callable, *args, timeout: Optional[float] = None,
+               fallback: Any = RAISE, retry_sync: bool = False, **kwargs) -> Dict[str, Any]:
+    """Beschreibt einen Aufruf fuer fetch_parallel().
+
+    Args:
+        fn: Aufzurufende Funktion
+        *args, **kwargs: Argumente fuer fn
+        timeout: Max. Laufzeit in Sekunden ab Start des Zweigs (Default: DEFAULT_TIMEOUT)
+        fallback: Rueckgabewert bei Fehler/Timeout. Ohne Angabe wird der
+                  Fehler beim Aufrufer erneut ausgeloest.
+        retry_sync: Nach Fehler/Timeout einmal im aufrufenden Thread
+                    wiederholen (ohne Timeout), erst dann Fallback/Fehler
+    """
+    return {
+        "fn": fn,
+        "args": args,
+        "kwargs": kwargs,
+        "timeout": timeout if timeout is not None else DEFAULT_TIMEOUT,
+        "fallback": fallback,
+        "retry_sync": retry_sync,
+    }
+
+
+def fetch_parallel(tasks: Dict[str, Optional[Dict[str, Any]]], label: str = "default") -> Dict[str, Any]:
+    """Fuehrt unabhaengige Aufrufe parallel aus und sammelt die Ergebnisse.
+
+    Args:
+        tasks: {name: fetch_task(...)} — None-Eintraege werden uebersprungen
+               und liefern None (praktisch fuer bedingte Aufrufe)
+        label: Name der Gruppe fuer die Timing-Protokollierung
+
+    Returns:
+        {name: Ergebnis oder Fallback}
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    started = time.perf_counter()
+
+    branches = {name: _Branch(task) for name, task in tasks.items() if task is not None}
+    inline = []
+    for name, branch in branches.items():
+        if _worker_slots.acquire(blocking=False):
+            branch.start_worker(f"pol-fetch-{label}-{name}", ctx)
+        else:
+            inline.append(name)
+    if inline:
+        print(f"[parallel_fetch] {label}: alle {MAX_WORKERS} Worker belegt, "
+              f"{', '.join(map(str, inline))} laufen im aufrufenden Thread")
+    for name in inline:
+        branches[name].run()
+
+    results: Dict[str, Any] = {name: None for name in tasks}
+    timings: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, BaseException] = {}
+
+    for name, branch in branches.items():
+        task = tasks[name]
+        # Timeout zaehlt ab Start des Zweigs (nicht ab Start der Gruppe)
+        remaining = max(0.0, task["timeout"] - (time.perf_counter() - branch.started))
+        if not branch.done.wait(timeout=remaining):
+            timings[name] = {"ms": task["timeout"] * 1000, "status": "timeout"}
+            print(f"[parallel_fetch] {label}/{name}: Timeout nach {task['timeout']}s")
+            error = TimeoutError(f"{label}/{name} Timeout nach {task['timeout']}s")
+        elif branch.error is not None:
+            timings[name] = {"ms": branch.elapsed_ms, "status": "error"}
+            print(f"[parallel_fetch] {label}/{name}: {branch.error}")
+            error = branch.error
+        else:
+            results[name] = branch.value
+            timings[name] = {"ms": branch.elapsed_ms, "status": "ok" if name not in inline else "inline"}
+            continue
+
+        if task["retry_sync"]:
+            retry = _Branch(task)
+            retry.run()
+            timings[f"{name}:retry"] = {"ms": retry.elapsed_ms, "status": "ok" if retry.error is None else "error"}
+            if retry.error is None:
+                results[name] = retry.value
+                continue
+            print(f"[parallel_fetch] {label}/{name}: Wiederholung fehlgeschlagen: {retry.error}")
+            error = retry.error
+        errors[name] = error
+
+    for name, err in errors.items():
+        if tasks[name]["fallback"] is RAISE:
+            _record_timings(label, timings, started)
+            raise err
+        results[name] = tasks[name]["fallback"]
+
+    _record_timings(label, timings, started)
+    return results
+
+
+def get_fetch_timings(label: Optional[str] = None) -> Dict[str, Any]:
+    """Letzte Timings dieser Session (fuer Entwickler-Anzeige).
+
+    Returns:
+        {label: {"total_ms": ..., "branches": {name: {"ms", "status"}}}}
+        bzw. nur den Eintrag fuer `label`.
+    """
+    try:
+        all_timings = st.session_state.get(TIMINGS_KEY, {})
+    except Exception:
+        all_timings = {}
+    if label is not None:
+        return all_timings.get(label, {})
+    return all_timings
+
+
+# ============================================
+# INTERN
+# ============================================
+
+class _Branch:
+    """Ein Zweig von fetch_parallel(): Ergebnis/Fehler plus Laufzeit."""
+
+    def __init__(self, task: Dict[str, Any]):
+        self.task = task
+        self.done = threading.Event()
+        self.started = time.perf_counter()
+        self.elapsed_ms = 0.0
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+    def start_worker(self, thread_name: str, ctx) -> None:
+        """Startet den Zweig in einem eigenen Thread (Worker-Platz ist belegt)."""
+        self.started = time.perf_counter()
+        thread = threading.Thread(target=self._run_worker, args=(ctx,), name=thread_name, daemon=True)
+        thread.start()
+
+    def _run_worker(self, ctx) -> None:
+        """Worker: haengt den ScriptRunContext an und gibt Kontext und Platz am Ende frei."""
+        thread = threading.current_thread()
+        if ctx is not None and add_script_run_ctx is not None:
+            add_script_run_ctx(thread, ctx)
+        try:
+            self.run()
+        finally:
+            if getattr(thread, SCRIPT_RUN_CTX_ATTR, None) is not None:
+                setattr(thread, SCRIPT_RUN_CTX_ATTR, None)
+            _worker_slots.release()
+
+    def run(self) -> None:
+        """Fuehrt den Aufruf im aktuellen Thread aus und misst die Laufzeit."""
+        self.started = time.perf_counter()
+        try:
+            self.value = self.task["fn"](*self.task["args"], **self.task["kwargs"])
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed_ms = (time.perf_counter() - self.started) * 1000
+            self.done.set()
+
+
+def _record_timings(label: str, timings: Dict[str, Dict[str, Any]], started: float) -> None:
+    """Speichert die Zweig-Zeiten in st.session_state (pro Session)."""
+    entry = {
+        "total_ms": (time.perf_counter() - started) * 1000,
+        "branches": timings,
+    }
+    try:
+        all_timings = st.session_state.get(TIMINGS_KEY, {})
+        all_timings[label] = entry
+        st.session_state[TIMINGS_KEY] = all_timings
+    except Exception:
+        # Ausserhalb einer Streamlit-Session (z.B. Benchmarks): nur Konsole
+        pass
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Vorberechnete PISA-Statistiken (Build-Artefakt)
+===============================================
+
+Vorher: die PISA-Seite rechnete Mittelwerte, Korrelationen und
+Quadranten-Mediane beim Aufruf aus der SQLite-DB — langsam auf
+Community Cloud, deshalb ENABLE_PISA = False.
+
+Jetzt: ein Build-Schritt rechnet alles einmal aus dem Spaltenspeicher
+(utils/pisa_store.py) und schreibt ein kleines JSON (data/pisa_stats.json,
+wenige KB). Die Seiten laden es erst beim ersten Zugriff; die DB braucht
+nur noch die freie Exploration.
+
+Inhalt (Version STATS_VERSION):
+    summary       pro Variable: mean, sd, n
+    correlations  Korrelationsmatrix (paarweise vollstaendig) + N pro Paar
+    percentiles   pro Variable: Werte fuer PERCENTILES
+    quadrant      Mediane MATHEFF/ANXMAT, N und mittlere Leistung pro
+                  Quadrant, 2D-Histogramm (QUADRANT_BINS x QUADRANT_BINS)
+
+Bauen (legt den Spaltenspeicher bei Bedarf mit an):
+    python -m utils.pisa_stats
+    python -m utils.pisa_stats --db pisa_2022_germany.db --out data/pisa_stats.json
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+STATS_VERSION = 1
+STATS_PATH = Path(__file__).parent.parent / 'data' / 'pisa_stats.json'
+
+KEY_SCALES = ['MATHEFF', 'ANXMAT', 'BELONG', 'TEACHSUP', 'PERSEVAGR']
+PERFORMANCE = 'PV1MATH'
+PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+QUADRANT_X, QUADRANT_Y = 'MATHEFF', 'ANXMAT'
+QUADRANT_BINS = 30
+
+QUADRANTS = ['Q1: Optimal', 'Q2: Ambivalent', 'Q3: Risikogruppe', 'Q4: Angstfrei, aber unsicher']
+
+_lock = threading.Lock()
+_loaded: Dict[str, Any] = {}
+
+
+def quadrant_of(matheff: float, anxmat: float, matheff_median: float, anxmat_median: float) -> str:
+    """Quadrant nach Selbstwirksamkeit und Angst (Grenzen: Mediane)."""
+    if matheff >= matheff_median and anxmat < anxmat_median:
+        return QUADRANTS[0]
+    elif matheff >= matheff_median and anxmat >= anxmat_median:
+        return QUADRANTS[1]
+    elif matheff < matheff_median and anxmat >= anxmat_median:
+        return QUADRANTS[2]
+    else:
+        return QUADRANTS[3]
+
+
+# ============================================
+# BUILD
+# ============================================
+
+def _round(value: Optional[float], digits: int = 4) -> Optional[float]:
+    return None if value is None else round(float(value), digits)
+
+
+def build_stats(store) -> Dict[str, Any]:
+    """Rechnet das Artefakt aus einem StudentStore (utils/pisa_store.py)."""
+    import numpy as np
+
+    variables = [v for v in KEY_SCALES + [PERFORMANCE] if store.has(v)]
+    columns = {v: np.asarray(store.column(v), dtype=np.float64) for v in variables}
+    present = {v: ~np.isnan(columns[v]) for v in variables}
+
+    summary = {}
+    percentiles = {}
+    for v in variables:
+        values = columns[v][present[v]]
+        summary[v] = {
+            'mean': _round(values.mean()) if len(values) else None,
+            'sd': _round(values.std(ddof=1)) if len(values) > 1 else None,
+            'n': int(len(values)),
+        }
+        percentiles[v] = {
+            str(p): _round(q) for p, q in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        } if len(values) else {}
+
+    r_matrix: List[List[Optional[float]]] = []
+    n_matrix: List[List[int]] = []
+    for a in variables:
+        r_row, n_row = [], []
+        for b in variables:
+            both = present[a] & present[b]
+            n = int(both.sum())
+            r = None
+            if n > 2 and columns[a][both].std() > 0 and columns[b][both].std() > 0:
+                r = _round(np.corrcoef(columns[a][both], columns[b][both])[0, 1])
+            r_row.append(r)
+            n_row.append(n)
+        r_matrix.append(r_row)
+        n_matrix.append(n_row)
+
+    quadrant = None
+    if all(v in columns for v in (QUADRANT_X, QUADRANT_Y, PERFORMANCE)):
+        rows = present[QUADRANT_X] & present[QUADRANT_Y] & present[PERFORMANCE]
+        x, y, perf = columns[QUADRANT_X][rows], columns[QUADRANT_Y][rows], columns[PERFORMANCE][rows]
+        if len(x):
+            x_median, y_median = float(np.median(x)), float(np.median(y))
+            labels = np.array([quadrant_of(a, b, x_median, y_median) for a, b in zip(x, y)])
+            counts, x_edges, y_edges = np.histogram2d(x, y, bins=QUADRANT_BINS)
+            quadrant = {
+                'x': QUADRANT_X,
+                'y': QUADRANT_Y,
+                'n': int(len(x)),
+                'medians': {QUADRANT_X: _round(x_median), QUADRANT_Y: _round(y_median)},
+                'groups': {
+                    q: {
+                        'n': int((labels == q).sum()),
+                        'mean_performance': _round(perf[labels == q].mean(), 1) if (labels == q).any() else None,
+                    }
+                    for q in QUADRANTS
+                },
+                'density': {
+                    'x_edges': [_round(e) for e in x_edges],
+                    'y_edges': [_round(e) for e in y_edges],
+                    'counts': counts.astype(int).tolist(),   # counts[i][j]: x-Bin i, y-Bin j
+                },
+            }
+
+    return {
+        'version': STATS_VERSION,
+        'rows': store.rows,
+        'source': store.manifest.get('source'),
+        'created_at': datetime.now().isoformat(),
+        'performance': PERFORMANCE,
+        'summary': summary,
+        'percentiles': percentiles,
+        'correlations': {'variables': variables, 'r': r_matrix, 'n': n_matrix},
+        'quadrant': quadrant,
+    }
+
+
+def write_stats(stats: Dict[str, Any], path: Path = STATS_PATH) -> None:
+    """Atomar schreiben (temporaere Datei + replace)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_name, path)
+    with _lock:
+        _loaded.clear()
+
+
+# ============================================
+# LADEN (lazy)
+# ============================================
+
+def load_stats(path: Path = STATS_PATH) -> Optional[Dict[str, Any]]:
+    """Artefakt beim ersten Zugriff laden (danach aus dem Speicher).
+
+    Returns: None, wenn es fehlt, unlesbar ist oder eine andere Version hat
+    """
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+    key = f"{path.resolve()}:{mtime}"
+    with _lock:
+        if key in _loaded:
+            return _loaded[key]
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+    except Exception as e:
+        print(f"⚠️  PISA-Statistiken unlesbar, nutze DB: {e}")
+        stats = None
+
+    if stats is not None and stats.get('version') != STATS_VERSION:
+        print(f"⚠️  PISA-Statistiken haben Version {stats.get('version')}, erwartet {STATS_VERSION} — nutze DB")
+        stats = None
+
+    with _lock:
+        _loaded.clear()
+        _loaded[key] = stats
+    return stats
+
+
+def correlations_with(stats: Dict[str, Any], target: str) -> Dict[str, Optional[float]]:
+    """Korrelationen aller Variablen mit target (ohne target selbst)."""
+    variables = stats['correlations']['variables']
+    if target not in variables:
+        return {}
+    row = stats['correlations']['r'][variables.index(target)]
+    return {v: r for v, r in zip(variables, row) if v != target}
+
+
+def quadrant_density(stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Besetzte Zellen des Quadranten-Histogramms.
+
+    Returns: [{x, y, 'Anzahl', 'Quadrant'}] — x/y sind die Zellmitten
+    """
+    quadrant = stats.get('quadrant')
+    if not quadrant:
+        return []
+
+    density = quadrant['density']
+    x_edges, y_edges = density['x_edges'], density['y_edges']
+    x_median = quadrant['medians'][quadrant['x']]
+    y_median = quadrant['medians'][quadrant['y']]
+
+    cells = []
+    for i, row in enumerate(density['counts']):
+        for j, count in enumerate(row):
+            if not count:
+                continue
+            x = (x_edges[i] + x_edges[i + 1]) / 2
+            y = (y_edges[j] + y_edges[j + 1]) / 2
+            cells.append({
+                quadrant['x']: x,
+                quadrant['y']: y,
+                'Anzahl': count,
+                'Quadrant': quadrant_of(x, y, x_median, y_median),
+            })
+    return cells
+
+
+# ============================================
+# CLI
+# ============================================
+
+def main() -> None:
+    from utils.pisa_store import DB_PATH, STORE_DIR, export_student_store, get_student_store
+
+    parser = argparse.ArgumentParser(description="PISA-Statistiken vorberechnen")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="PISA-SQLite-Datei")
+    parser.add_argument("--store", type=Path, default=STORE_DIR, help="Spaltenspeicher (wird bei Bedarf gebaut)")
+    parser.add_argument("--out", type=Path, default=STATS_PATH, help="Ziel-JSON")
+    args = parser.parse_args()
+
+    store = get_student_store(args.store, args.db)
+    if store is None:
+        export_student_store(args.db, args.store)
+        store = get_student_store(args.store, args.db)
+
+    stats = build_stats(store)
+    write_stats(stats, args.out)
+    print(f"✅ {stats['rows']} Zeilen -> {args.out} ({args.out.stat().st_size / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+Spaltenspeicher fuer student_data (PISA 2022 Deutschland)
+=========================================================
+
+Vorher: jede Analyse (load_student_data, Korrelationen, Kennwerte,
+Quadranten) zog per SELECT ... FROM student_data ueber SQLite und baute
+daraus bei jedem Cache-Miss einen DataFrame.
+
+Jetzt: einmaliger Export in ein Verzeichnis mit einer .npy-Datei pro Spalte.
+Der Loader oeffnet die Dateien per np.load(mmap_mode='r') — Spalten sind
+schreibgeschuetzte Views auf den Page-Cache, gelesen wird nur, was eine
+Analyse wirklich anfasst.
+
+Layout (STORE_DIR):
+    manifest.json          Version, Zeilen, Spalten, Quelle (sha256 und Groesse der DB)
+    <SPALTE>.npy           Zahlen: float64 (NULL = NaN), Text: Unicode (NULL = '')
+    <SPALTE>.null.npy      bool, True = NULL (nur fuer Spalten mit NULLs)
+
+Veraltet (Inhalt der DB anders als beim Export)? Dann liefert
+get_student_store() None und db_loader faellt auf SQL zurueck. Verglichen
+wird der Inhalts-Hash, nicht die mtime — eine kopierte oder neu
+ausgecheckte DB macht den Export nicht ungueltig. Ohne DB (nur Export
+deployt) wird der Export genutzt.
+
+Bauen:
+    python -m utils.pisa_store                      # pisa_2022_germany.db -> data/pisa_store
+    python -m utils.pisa_store --db andere.db --out /tmp/store
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+STORE_VERSION = 2          # 2: Quelle per sha256 statt Groesse/mtime
+STORE_DIR = Path(__file__).parent.parent / 'data' / 'pisa_store'
+DB_PATH = Path(__file__).parent.parent / 'pisa_2022_germany.db'   # wie db_loader.PISA_DB_PATH
+TABLE = 'student_data'
+MANIFEST = 'manifest.json'
+
+_COLUMN_NAME = re.compile(r'^\w+$')
+
+_lock = threading.Lock()
+_stores: Dict[str, "StudentStore"] = {}          # nur gueltige Speicher (None wird nicht gemerkt)
+_digests: Dict[tuple, str] = {}                  # (pfad, groesse, mtime_ns) -> sha256
+_warned: set = set()
+
+
+def _source_info(db_path: Path) -> Optional[Dict[str, Any]]:
+    """Groesse und sha256 der DB (None, wenn sie fehlt).
+
+    Der Hash wird pro Prozess nur neu berechnet, wenn sich Groesse oder
+    mtime geaendert haben.
+    """
+    try:
+        stat = db_path.stat()
+    except OSError:
+        return None
+
+    key = (str(db_path.resolve()), stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(db_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        _digests[key] = digest
+    return {'size': stat.st_size, 'sha256': digest}
+
+
+def _warn_once(message: str) -> None:
+    if message not in _warned:
+        _warned.add(message)
+        print(message)
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+def _column_array(values: List[Any]) -> Dict[str, Any]:
+    """Eine Spalte als Array plus NULL-Maske (None, wenn keine NULLs)."""
+    nulls = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    present = [v for v in values if v is not None]
+
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        data = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    else:
+        data = np.array(['' if v is None else str(v) for v in values], dtype=np.str_)
+
+    return {'data': data, 'nulls': nulls if nulls.any() else None}
+
+
+def export_student_store(db_path: Path = DB_PATH, out_dir: Path = STORE_DIR) -> Dict[str, Any]:
+    """Exportiert student_data spaltenweise nach out_dir.
+
+    Schreibt in ein temporaeres Nachbarverzeichnis und tauscht es am Ende
+    aus — laufende Leser sehen nie einen halben Export.
+
+    Returns: das geschriebene Manifest
+    """
+    db_path, out_dir = Path(db_path), Path(out_dir)
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(f"SELECT * FROM {TABLE}")
+        names = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=out_dir.parent, prefix=f".{out_dir.name}-"))
+
+    columns = {}
+    for idx, name in enumerate(names):
+        if not _COLUMN_NAME.match(name):
+            print(f"⚠️  Spalte {name!r} uebersprungen (kein gueltiger Dateiname)")
+            continue
+        column = _column_array([row[idx] for row in rows])
+        np.save(tmp_dir / f"{name}.npy", column['data'], allow_pickle=False)
+        if column['nulls'] is not None:
+            np.save(tmp_dir / f"{name}.null.npy", column['nulls'], allow_pickle=False)
+        columns[name] = {
+            'dtype': column['data'].dtype.str,
+            'nulls': int(column['nulls'].sum()) if column['nulls'] is not None else 0,
+        }
+
+    manifest = {
+        'version': STORE_VERSION,
+        'table': TABLE,
+        'rows': len(rows),
+        'columns': columns,
+        'source': _source_info(db_path),
+        'created_at': datetime.now().isoformat(),
+    }
+    with open(tmp_dir / MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    if out_dir.exists():
+        old_dir = out_dir.with_name(f".{out_dir.name}-old")
+        shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(out_dir, old_dir)
+        os.replace(tmp_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, out_dir)
+
+    with _lock:
+        _stores.clear()
+    return manifest
+
+
+# ============================================
+# LESEN
+# ============================================
+
+class StudentStore:
+    """Schreibgeschuetzte Spalten-Views auf einen Export von student_data."""
+
+    def __init__(self, store_dir: Path, manifest: Dict[str, Any]):
+        self.store_dir = Path(store_dir)
+        self.manifest = manifest
+        self.rows: int = manifest['rows']
+        self._columns: Dict[str, np.ndarray] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        self._no_nulls = np.zeros(self.rows, dtype=bool)
+        self._no_nulls.flags.writeable = False
+        self._lock = threading.Lock()
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.manifest['columns'])
+
+    def has(self, name: str) -> bool:
+        return name in self.manifest['columns']
+
+    def _check(self, name: str) -> None:
+        if not self.has(name):
+            raise ValueError(f"Unbekannte Variable in {TABLE}: {name!r}")
+
+    def column(self, name: str) -> np.ndarray:
+        """Spalte als memory-mapped View (Zahlen: NULL = NaN)."""
+        self._check(name)
+        array = self._columns.get(name)
+        if array is None:
+            with self._lock:
+                array = self._columns.get(name)
+                if array is None:
+                    array = np.load(self.store_dir / f"{name}.npy", mmap_mode='r', allow_pickle=False)
+                    self._columns[name] = array
+        return array
+
+    def null_mask(self, name: str) -> np.ndarray:
+        """bool-View, True = NULL (geteilte Null-Maske fuer Spalten ohne NULLs)."""
+        self._check(name)
+        if not self.manifest['columns'][name]['nulls']:
+            return self._no_nulls
+        mask = self._masks.get(name)
+        if mask is None:
+            with self._lock:
+                mask = self._masks.get(name)
+                if mask is None:
+                    mask = np.load(self.store_dir / f"{name}.null.npy", mmap_mode='r', allow_pickle=False)
+                    self._masks[name] = mask
+        return mask
+
+    def present(self, names: Iterable[str]) -> np.ndarray:
+        """Zeilen, in denen alle Spalten einen Wert haben (WHERE ... IS NOT NULL)."""
+        valid = np.ones(self.rows, dtype=bool)
+        for name in names:
+            valid &= ~self.null_mask(name)
+        return valid
+
+    def count(self, name: str) -> int:
+        """Anzahl nicht-NULL Werte (COUNT(spalte))."""
+        self._check(name)
+        return self.rows - self.manifest['columns'][name]['nulls']
+
+    def frame(self, names: Sequence[str], not_null: Sequence[str] = (),
+              limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        DataFrame für ausgewählte Spalten (wie SELECT names ... WHERE not_null IS NOT NULL LIMIT limit)
+
+        NULL wird wie bei read_sql zu NaN bzw. None.
+        """
+        rows = np.flatnonzero(self.present(not_null)) if not_null else None
+        if rows is not None and limit is not None:
+            rows = rows[:limit]
+        elif rows is None and limit is not None:
+            rows = np.arange(min(limit, self.rows))
+
+        data = {}
+        for name in dict.fromkeys(names):
+            values = self.column(name)
+            values = values[rows] if rows is not None else np.array(values)
+            if values.dtype.kind == 'U':
+                nulls = self.null_mask(name)
+                nulls = nulls[rows] if rows is not None else nulls
+                values = values.astype(object)
+                values[nulls] = None
+            data[name] = values
+        return pd.DataFrame(data)
+
+
+def _open_store(store_dir: Path, db_path: Path) -> Optional[StudentStore]:
+    try:
+        with open(store_dir / MANIFEST, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        _warn_once(f"⚠️  PISA-Spaltenspeicher unlesbar, nutze SQL: {e}")
+        return None
+
+    if manifest.get('version') != STORE_VERSION:
+        _warn_once(f"⚠️  PISA-Spaltenspeicher hat Version {manifest.get('version')}, erwartet {STORE_VERSION} "
+                   f"— nutze SQL (neu bauen: python -m utils.pisa_store)")
+        return None
+
+    source = _source_info(db_path)
+    if source is not None and source['sha256'] != (manifest.get('source') or {}).get('sha256'):
+        _warn_once("⚠️  PISA-Spaltenspeicher passt nicht zur DB — nutze SQL (neu bauen: python -m utils.pisa_store)")
+        return None
+
+    return StudentStore(store_dir, manifest)
+
+
+def get_student_store(store_dir: Path = STORE_DIR, db_path: Path = DB_PATH) -> Optional[StudentStore]:
+    """Geteilter Spaltenspeicher (prozessweit) oder None, wenn keiner/veraltet.
+
+    None wird nicht gemerkt: ein spaeter gebauter Export wird ohne Neustart
+    gefunden.
+    """
+    key = str(Path(store_dir).resolve())
+    with _lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _open_store(Path(store_dir), Path(db_path))
+            if store is not None:
+                _stores[key] = store
+        return store
+
+
+# ============================================
+# CLI
+# ============================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="student_data als Spaltenspeicher (.npy) exportieren")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="PISA-SQLite-Datei")
+    parser.add_argument("--out", type=Path, default=STORE_DIR, help="Zielverzeichnis")
+    args = parser.parse_args()
+
+    manifest = export_student_store(args.db, args.out)
+    size = sum(p.stat().st_size for p in args.out.glob('*.npy'))
+    print(f"✅ {manifest['rows']} Zeilen, {len(manifest['columns'])} Spalten -> {args.out} "
+          f"({size / 1024 / 1024:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
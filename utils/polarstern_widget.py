@@ -25,6 +25,7 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 
 from utils.database import get_db
+from utils.cache import tagged_cache, user_tag, invalidate_user
 
 # ============================================
 # INSPIRIERENDE BILDER NACH ALTERSSTUFE
@@ -232,6 +233,11 @@ def auto_categorize(text: str) -> str:
 # GOAL MANAGEMENT
 # ============================================
 
+def _clear_polarstern_caches(user_id: str) -> None:
+    """Invalidiert die Caches des Users nach Write (inkl. Schatzkarten-Bootstrap)."""
+    invalidate_user(user_id)
+
+
 def create_goal(user_id: str, goal_title: str, current_state: str, strategy: str) -> int:
     """Erstellt ein neues Ziel mit automatischer Kategorisierung."""
     combined_text = f"{goal_title} {current_state} {strategy}"
@@ -246,7 +252,7 @@ def create_goal(user_id: str, goal_title: str, current_state: str, strategy: str
         "xp_earned": XP_REWARDS['goal_created']
     }).execute()
 
-    get_all_polarstern_data.clear()
+    _clear_polarstern_caches(user_id)
     return result.data[0]["id"]
 
 
@@ -275,7 +281,7 @@ def update_goal(goal_id: int, goal_title: str = None, current_state: str = None,
         "updated_at": datetime.now().isoformat()
     }).eq("id", goal_id).execute()
 
-    get_all_polarstern_data.clear()
+    _clear_polarstern_caches(goal["user_id"])
     return True
 
 
@@ -298,14 +304,15 @@ def mark_goal_achieved(goal_id: int, reflection: str = "") -> Dict[str, Any]:
         "xp_earned": new_xp
     }).eq("id", goal_id).execute()
 
-    get_all_polarstern_data.clear()
+    _clear_polarstern_caches(goal["user_id"])
     return {"success": True, "xp_earned": XP_REWARDS['goal_achieved']}
 
 
 def delete_goal(goal_id: int) -> bool:
     """Löscht ein Ziel."""
     result = get_db().table("polarstern_goals").delete().eq("id", goal_id).execute()
-    get_all_polarstern_data.clear()
+    for goal in result.data or []:
+        _clear_polarstern_caches(goal["user_id"])
     return len(result.data) > 0
 
 
@@ -333,7 +340,7 @@ def get_achieved_goals(user_id: str) -> List[Dict]:
     return result.data
 
 
-@st.cache_data(ttl=120)
+@tagged_cache(ttl=120, tags=lambda user_id: [user_tag(user_id)])
 def get_all_polarstern_data(user_id: str) -> Dict[str, Any]:
     """Holt ALLE Polarstern-Daten in einer einzigen Query.
 
@@ -346,8 +353,14 @@ def get_all_polarstern_data(user_id: str) -> Dict[str, Any]:
         .eq("user_id", user_id) \
         .execute()
 
-    all_goals = result.data
+    return summarize_polarstern_goals(result.data)
+
 
+def summarize_polarstern_goals(all_goals: List[Dict]) -> Dict[str, Any]:
+    """Fasst bereits geladene Ziel-Zeilen zusammen (aktiv/erreicht/XP).
+
+    Wird von get_all_polarstern_data() und vom Schatzkarten-Bootstrap genutzt.
+    """
     # In Python filtern statt 3 separate DB-Queries
     active_goals = sorted(
         [g for g in all_goals if g.get("is_active") and not g.get("is_achieved")],
@@ -10,10 +10,11 @@ Baut Fragebögen aus PISA-Skalen zusammen:
 
 import pandas as pd
 import json
+import streamlit as st
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 from utils.json_item_loader import get_scale_items, get_fragestamm
-from utils.db_loader import get_db_connection, load_value_labels, load_question_text
+from utils.db_loader import load_question_texts, load_value_labels_bulk
 
 # Paths to manual scale definitions
 MANUAL_SCALES_PATHS = [
@@ -101,6 +102,11 @@ def load_manual_scale(scale_name: str) -> Tuple[Optional[List[Dict]], Optional[D
     return None, None, None
 
 
+def normalize_scale_name(scale_name: str) -> str:
+    """Replace HOMEPOS with HOMEPOS_SHORT (9 items instead of 26)"""
+    return 'HOMEPOS_SHORT' if scale_name == 'HOMEPOS' else scale_name
+
+
 def load_items_for_scales(scale_names: List[str]) -> Tuple[List[Dict], Dict[str, pd.DataFrame], Dict[str, str], List[str]]:
     """
     Lädt alle Items, Fragetexte und Value Labels für eine Liste von Skalen
@@ -121,30 +127,57 @@ def load_items_for_scales(scale_names: List[str]) -> Tuple[List[Dict], Dict[str,
         >>> if skipped:
         >>>     print(f"Übersprungen: {', '.join(skipped)}")
     """
-    # Replace HOMEPOS with HOMEPOS_SHORT (9 items instead of 26)
-    scale_names = [
-        'HOMEPOS_SHORT' if scale == 'HOMEPOS' else scale
-        for scale in scale_names
-    ]
+    scale_names = [normalize_scale_name(scale) for scale in scale_names]
 
-    conn = get_db_connection()
+    # Gecacht pro Skalen-Menge (sortiert) — Reihenfolge kommt aus scale_names
+    bundle = _load_scale_bundle(tuple(sorted(set(scale_names))))
 
     all_items = []
     value_labels_dict = {}
     fragestamm_dict = {}
-    skipped_scales = []
 
     for scale_name in scale_names:
+        scale = bundle.get(scale_name)
+        if scale is None:
+            continue
+
+        all_items.extend(scale['items'])
+        value_labels_dict.update(scale['value_labels'])
+        if scale['fragestamm']:
+            fragestamm_dict[scale_name] = scale['fragestamm']
+
+    return all_items, value_labels_dict, fragestamm_dict
+
+
+@st.cache_data(show_spinner=False)
+def _load_scale_bundle(scale_key: Tuple[str, ...]) -> Dict[str, Optional[Dict]]:
+    """
+    Lädt Items, Value Labels und Fragestamm für eine Menge von Skalen
+
+    Fragetexte und Value Labels aller DB-Items kommen aus zwei IN-Queries
+    (statt zwei Queries pro Item).
+
+    Args:
+        scale_key: Sortierte Skalen-Codes (Cache-Key)
+
+    Returns:
+        Dict pro Skala: {'items', 'value_labels', 'fragestamm'}
+        oder None (Skala ohne Items, übersprungen)
+    """
+    bundle = {}
+    db_items = {}
+
+    for scale_name in scale_key:
         # 0. Try to load from manual definitions first
         manual_items, manual_labels, manual_fragestamm = load_manual_scale(scale_name)
 
         if manual_items is not None:
             # Manual scale found - use it directly
-            all_items.extend(manual_items)
-            if manual_labels:
-                value_labels_dict.update(manual_labels)
-            if manual_fragestamm:
-                fragestamm_dict[scale_name] = manual_fragestamm
+            bundle[scale_name] = {
+                'items': manual_items,
+                'value_labels': manual_labels or {},
+                'fragestamm': manual_fragestamm
+            }
             continue
 
         # 1. Lade Items aus JSON (fallback if not manual)
@@ -152,20 +185,28 @@ def load_items_for_scales(scale_names: List[str]) -> Tuple[List[Dict], Dict[str,
 
         if not items:
             print(f"⚠️  Keine Items für Skala {scale_name} in JSON gefunden (übersprungen)")
-            skipped_scales.append(scale_name)
+            bundle[scale_name] = None
             continue
 
-        # 2. Lade Fragestamm (falls vorhanden)
-        fragestamm = get_fragestamm(scale_name)
-        if fragestamm:
-            fragestamm_dict[scale_name] = fragestamm
+        # 2. Items kopieren (JSON-Cache nicht veraendern) + Fragestamm (falls vorhanden)
+        db_items[scale_name] = [dict(item) for item in items]
+        bundle[scale_name] = {
+            'items': db_items[scale_name],
+            'value_labels': {},
+            'fragestamm': get_fragestamm(scale_name)
+        }
 
-        # 3. Für jedes Item: Lade detaillierte Infos aus DB
+    # 3. Detaillierte Infos aller Items aus der DB (2 Queries)
+    variable_names = [item['variable_name'] for items in db_items.values() for item in items]
+    question_texts = load_question_texts(variable_names)
+    value_labels = load_value_labels_bulk(variable_names)
+
+    for scale_name, items in db_items.items():
         for item in items:
             variable_name = item['variable_name']
 
-            # Lade Fragetext aus DB (falls vorhanden, überschreibt JSON)
-            question_data = load_question_text(conn, variable_name)
+            # Fragetext aus DB (falls vorhanden, überschreibt JSON)
+            question_data = question_texts.get(variable_name)
 
             if question_data is not None and not question_data.empty:
                 # Nutze DB-Text nur wenn nicht None/leer (präziser als JSON)
@@ -177,22 +218,16 @@ def load_items_for_scales(scale_names: List[str]) -> Tuple[List[Dict], Dict[str,
                 if db_text_en is not None and db_text_en != '':
                     item['question_text_en'] = db_text_en
 
-            # Lade Value Labels
-            value_labels = load_value_labels(conn, variable_name)
-
-            if not value_labels.empty:
-                value_labels_dict[variable_name] = value_labels
+            # Value Labels
+            if variable_name in value_labels:
+                bundle[scale_name]['value_labels'][variable_name] = value_labels[variable_name]
             else:
                 print(f"⚠️  Keine Value Labels für {variable_name}")
 
             # Füge Skalen-Info hinzu
             item['scale'] = scale_name
 
-            all_items.append(item)
-
-    conn.close()
-
-    return all_items, value_labels_dict, fragestamm_dict
+    return bundle
 
 
 def estimate_questionnaire_duration(num_items: int) -> int:
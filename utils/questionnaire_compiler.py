@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Kompilierte Fragebogen-Bundles
+==============================
+
+Vorher hat jeder Render von Screening und Elternakademie den Fragebogen
+neu zusammengebaut: manuelle Skalen aus JSON, get_scale_items,
+get_fragestamm, Value Labels aus der DB, add_german_labels_to_value_labels
+(iterrows pro Variable) und fuer MATHEFF adapt_matheff_for_grade.
+
+Jetzt wird pro (Skalen-Menge, Klassenstufe) EINMAL kompiliert:
+- compile_questionnaire(): (items, value_labels, fragestamm) wie
+  load_items_for_scales, deutsche Labels und MATHEFF-Anpassung inklusive
+- Bundle = gepickelte Bytes (unveraenderlich); jeder Aufrufer bekommt
+  eigene Objekte
+- Speicher: prozessweiter LRU (utils.cache) ueber die Bytes
+- Platte: .cache/questionnaires/<hash>.pkl — ueberlebt Neustarts
+- Der Hash enthaelt BUNDLE_VERSION und Groesse/mtime aller Quellen
+  (Skalen-JSONs, PISA-DB, Label-Module): aendert sich eine Quelle, wird
+  neu kompiliert
+
+Klassenstufe zaehlt nur, wenn MATHEFF in der Skalen-Menge ist.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from utils.cache import tagged_cache
+from utils.db_loader import PISA_DB_PATH
+from utils.german_labels import add_german_labels_to_value_labels
+from utils.grade_specific_items import adapt_matheff_for_grade
+from utils.json_item_loader import JSON_PATH
+from utils.questionnaire_builder import (
+    MANUAL_SCALES_PATHS, load_items_for_scales, normalize_scale_name
+)
+
+
+# ============================================
+# KONFIGURATION
+# ============================================
+
+BUNDLE_VERSION = 1                  # erhoehen, wenn sich das Bundle-Format aendert
+BUNDLE_DIR = Path(__file__).parent.parent / '.cache' / 'questionnaires'
+MEMORY_ENTRIES = 64                 # Bundles im Speicher (LRU)
+MEMORY_TTL = 24 * 60 * 60           # Sekunden; Quellen-Aenderungen greifen ueber den Hash
+
+GRADE_SCALE = 'MATHEFF'
+MIN_GRADE, MAX_GRADE = 5, 12        # Bereich von adapt_matheff_for_grade
+
+_ROOT = Path(__file__).parent.parent
+SOURCE_PATHS = [
+    _ROOT / JSON_PATH,
+    *MANUAL_SCALES_PATHS,
+    _ROOT / PISA_DB_PATH,
+    Path(__file__).parent / 'german_labels.py',
+    Path(__file__).parent / 'grade_specific_items.py',
+]
+
+BundleKey = Tuple[Tuple[str, ...], Optional[int]]
+
+
+# ============================================
+# SCHLUESSEL
+# ============================================
+
+def bundle_key(scale_names: Sequence[str], grade: Optional[int] = None) -> BundleKey:
+    """Cache-Key: sortierte Skalen-Menge plus Klassenstufe (nur mit MATHEFF)."""
+    scales = tuple(sorted({normalize_scale_name(s) for s in scale_names}))
+    if grade is None or GRADE_SCALE not in scales:
+        return scales, None
+    return scales, min(max(int(grade), MIN_GRADE), MAX_GRADE)
+
+
+def source_fingerprint() -> str:
+    """Groesse und mtime aller Quellen (fehlende Dateien zaehlen mit)."""
+    parts = []
+    for path in SOURCE_PATHS:
+        try:
+            stat = path.stat()
+            parts.append(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}")
+        except OSError:
+            parts.append(f"{path.name}:-")
+    return "|".join(parts)
+
+
+def _bundle_path(key: BundleKey, fingerprint: str) -> Path:
+    digest = hashlib.sha1(repr((BUNDLE_VERSION, key, fingerprint)).encode('utf-8')).hexdigest()
+    return BUNDLE_DIR / f"{digest}.pkl"
+
+
+# ============================================
+# KOMPILIEREN
+# ============================================
+
+def _compile_bundle(key: BundleKey) -> Dict[str, Dict[str, Any]]:
+    """Baut das Bundle: pro Skala {'items', 'value_labels', 'fragestamm'}.
+
+    Skalen ohne Items fehlen (wie bei load_items_for_scales).
+    """
+    scales, grade = key
+    items, value_labels, fragestamm = load_items_for_scales(list(scales))
+
+    bundle: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        scale = bundle.setdefault(item['scale'], {
+            'items': [], 'value_labels': {}, 'fragestamm': fragestamm.get(item['scale'])
+        })
+        scale['items'].append(item)
+        if item['variable_name'] in value_labels:
+            scale['value_labels'][item['variable_name']] = value_labels[item['variable_name']]
+
+    if grade is not None and GRADE_SCALE in bundle:
+        matheff_items, matheff_labels, matheff_fragestamm = adapt_matheff_for_grade(
+            grade, bundle[GRADE_SCALE]['items']
+        )
+        bundle[GRADE_SCALE] = {
+            'items': matheff_items,
+            'value_labels': matheff_labels,
+            'fragestamm': matheff_fragestamm,
+        }
+
+    for scale in bundle.values():
+        scale['value_labels'] = add_german_labels_to_value_labels(scale['value_labels'], scale['items'])
+    return bundle
+
+
+def _read_bundle_file(path: Path) -> Optional[bytes]:
+    try:
+        blob = path.read_bytes()
+        pickle.loads(blob)          # kaputte/halbe Datei -> neu kompilieren
+        return blob
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️  Fragebogen-Bundle {path.name} unlesbar, kompiliere neu: {e}")
+        return None
+
+
+def _write_bundle_file(path: Path, blob: bytes) -> None:
+    """Atomar schreiben: parallele Sessions sehen nie eine halbe Datei."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_name, path)
+    except Exception as e:
+        print(f"⚠️  Fragebogen-Bundle konnte nicht gespeichert werden: {e}")
+
+
+@tagged_cache(ttl=MEMORY_TTL, max_entries=MEMORY_ENTRIES)
+def _bundle_bytes(key: BundleKey, fingerprint: str) -> bytes:
+    """Bundle als Bytes: Platte, sonst kompilieren und ablegen."""
+    path = _bundle_path(key, fingerprint)
+    blob = _read_bundle_file(path)
+    if blob is None:
+        blob = pickle.dumps(_compile_bundle(key), protocol=pickle.HIGHEST_PROTOCOL)
+        _write_bundle_file(path, blob)
+    return blob
+
+
+def clear_bundles() -> None:
+    """Verwirft alle Bundles (Speicher und Platte)."""
+    _bundle_bytes.clear()
+    for path in BUNDLE_DIR.glob('*.pkl'):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+# ============================================
+# ABRUF
+# ============================================
+
+def compile_questionnaire(scale_names: Sequence[str],
+                          grade: Optional[int] = None
+                          ) -> Tuple[List[Dict], Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    Fragebogen für Skalen (und Klassenstufe) aus dem Bundle-Cache
+
+    Args:
+        scale_names: Skalen-Codes in Anzeige-Reihenfolge
+        grade: Klassenstufe für MATHEFF-Anpassung (None = Standard-Items)
+
+    Returns:
+        Tuple wie load_items_for_scales, mit deutschen Labels:
+        - items: List[Dict]
+        - value_labels: Dict[str, pd.DataFrame]
+        - fragestamm: Dict[str, str]
+        Bei angepasstem MATHEFF stehen dessen Items am Ende.
+    """
+    key = bundle_key(scale_names, grade)
+    bundle = pickle.loads(_bundle_bytes(key, source_fingerprint()))
+
+    order = list(dict.fromkeys(normalize_scale_name(s) for s in scale_names))
+    if key[1] is not None:
+        order = [s for s in order if s != GRADE_SCALE] + [GRADE_SCALE]
+
+    all_items = []
+    value_labels_dict = {}
+    fragestamm_dict = {}
+    for scale_name in order:
+        scale = bundle.get(scale_name)
+        if scale is None:
+            continue
+        all_items.extend(scale['items'])
+        value_labels_dict.update(scale['value_labels'])
+        if scale['fragestamm']:
+            fragestamm_dict[scale_name] = scale['fragestamm']
+
+    return all_items, value_labels_dict, fragestamm_dict
@@ -194,11 +194,9 @@ def render_learnstrat_altersstufen(color: str):
 
                 # XP Callback definieren
                 def award_xp_callback(user_id, xp, reason):
-                    """Vergibt XP an den User."""
-                    from utils.gamification_db import update_user_stats, get_or_create_user
-                    user_data = get_or_create_user(user_id)
-                    current_streak = user_data.get("current_streak", 0)
-                    update_user_stats(user_id, xp, current_streak)
+                    """Vergibt XP an den User (gesammelt per xp_batch, 1 RPC pro Rerun)."""
+                    from utils.gamification_db import queue_xp
+                    queue_xp(user_id, xp, "learnstrat", {"reason": reason})
 
                 # Session State für Challenge-Auswahl
                 if "learnstrat_challenge" not in st.session_state:
@@ -254,28 +252,30 @@ def render_learnstrat_altersstufen(color: str):
 
                 st.divider()
 
-                # Challenge-Inhalt anzeigen
-                if st.session_state.learnstrat_challenge == "powertechniken":
-                    st.caption("Challenge 1: Wissenschaftlich fundierte Lerntechniken kennenlernen")
-                    render_powertechniken_challenge(
-                        user=user,
-                        conn=conn,
-                        xp_callback=award_xp_callback
-                    )
-                elif st.session_state.learnstrat_challenge == "transfer":
-                    st.caption("Challenge 2: Transfer-Strategien (Effektstärke d=0.86!)")
-                    render_transfer_challenge(
-                        user=user,
-                        conn=conn,
-                        xp_callback=award_xp_callback
-                    )
-                else:
-                    st.caption("Challenge 3: Die Birkenbihl-Methode (nach Vera F. Birkenbihl)")
-                    render_birkenbihl_challenge(
-                        user=user,
-                        conn=conn,
-                        xp_callback=award_xp_callback
-                    )
+                # Challenge-Inhalt anzeigen (alle XP dieses Reruns -> 1 grant_xp-RPC)
+                from utils.gamification_db import xp_batch
+                with xp_batch():
+                    if st.session_state.learnstrat_challenge == "powertechniken":
+                        st.caption("Challenge 1: Wissenschaftlich fundierte Lerntechniken kennenlernen")
+                        render_powertechniken_challenge(
+                            user=user,
+                            conn=conn,
+                            xp_callback=award_xp_callback
+                        )
+                    elif st.session_state.learnstrat_challenge == "transfer":
+                        st.caption("Challenge 2: Transfer-Strategien (Effektstärke d=0.86!)")
+                        render_transfer_challenge(
+                            user=user,
+                            conn=conn,
+                            xp_callback=award_xp_callback
+                        )
+                    else:
+                        st.caption("Challenge 3: Die Birkenbihl-Methode (nach Vera F. Birkenbihl)")
+                        render_birkenbihl_challenge(
+                            user=user,
+                            conn=conn,
+                            xp_callback=award_xp_callback
+                        )
             else:
                 st.warning("Fehler beim Laden des Benutzerprofils.")
         elif HAS_LEARNSTRAT and HAS_GAMIFICATION and not is_logged_in():
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Streak-Engine fuer alle Bereiche
+================================
+
+Vorher hatte jeder Bereich seine eigene Streak-Logik mit eigenem
+Lesen + Schreiben: gamification_db.calculate_streak (users-Spalten),
+calculate_bandura_streak (alle Eintraege), motivation_db.update_streak
+(motivation_streaks mit Freezes), Wortschmiede (Frontend).
+
+Jetzt eine Zeile pro (User, Stream) in user_streaks (sql/20_streak_engine.sql):
+- record_activity(): Aktivitaet verbuchen — serverseitig atomar per RPC
+  record_streak (Row-Lock), inkl. Freeze
+- get_streaks(): alle Streams eines oder vieler User mit EINER Query
+  (Kartenkopf, Gruppen-Mitglieder) — gecacht pro User
+- Lesen ist O(1): der aktuelle Streak folgt aus current_streak und
+  last_activity_date (abgelaufene Streaks zaehlen als 0)
+
+Regeln (wie bisher in allen Bereichen):
+- heute schon aktiv: unveraendert
+- zuletzt gestern aktiv: +1
+- zuletzt vorgestern aktiv und Freeze verfuegbar: Freeze verbrauchen, +1
+- sonst: neu bei 1
+
+Streams:
+    STREAM_CHALLENGE     Hattie-Challenges (gespiegelt in users.current_streak)
+    STREAM_BANDURA       Bandura-Eintraege
+    STREAM_MOTIVATION    Motivation-Challenges (mit Freezes)
+    STREAM_WORTSCHMIEDE  schreibt das Frontend, ein Trigger spiegelt ihn
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from utils.database import get_db
+from utils.local_rpc import register_local_rpc
+from utils.cache import tagged_cache, user_tag, invalidate_user
+from utils.db_errors import is_missing_function, is_missing_table
+
+
+STREAKS_TABLE = "user_streaks"
+
+STREAM_CHALLENGE = "challenge"
+STREAM_BANDURA = "bandura"
+STREAM_MOTIVATION = "motivation"
+STREAM_WORTSCHMIEDE = "wortschmiede"
+
+# Freezes beim Anlegen der Zeile (Streams ohne Eintrag: keine Freezes)
+INITIAL_FREEZES = {STREAM_MOTIVATION: 1}
+
+# Flags, die advance_streak/record_streak zur Zeile hinzufuegen
+STREAK_FLAGS = ("streak_continued", "streak_broken", "streak_saved_by_freeze",
+                "freeze_used", "new_longest")
+
+DateLike = Union[date, str]
+
+
+def _to_date(day: Optional[DateLike]) -> Optional[date]:
+    if day is None or isinstance(day, date):
+        return day
+    return date.fromisoformat(str(day)[:10])
+
+
+def empty_streak(stream: str) -> Dict[str, Any]:
+    """Streak-Zeile eines Streams ohne bisherige Aktivitaet."""
+    return {
+        "stream": stream,
+        "current_streak": 0,
+        "longest_streak": 0,
+        "last_activity_date": None,
+        "freeze_available": INITIAL_FREEZES.get(stream, 0),
+        "freeze_used_date": None,
+    }
+
+
+# ============================================
+# REGELN
+# ============================================
+
+def advance_streak(state: Dict[str, Any], today: date) -> Dict[str, Any]:
+    """Streak-Zeile nach einer Aktivitaet am Tag today (ohne DB).
+
+    Returns: neue Zeile plus streak_continued, streak_broken,
+             streak_saved_by_freeze, freeze_used, new_longest
+    """
+    last = _to_date(state.get("last_activity_date"))
+    current = state.get("current_streak") or 0
+    longest = state.get("longest_streak") or 0
+    freezes = state.get("freeze_available") or 0
+
+    row = {**state, "current_streak": current, "longest_streak": longest, "freeze_available": freezes}
+    flags = dict.fromkeys(STREAK_FLAGS, False)
+
+    if last == today:
+        flags["streak_continued"] = True
+        return {**row, **flags}
+
+    if last == today - timedelta(days=1):
+        current += 1
+        flags["streak_continued"] = True
+    elif last == today - timedelta(days=2) and freezes > 0:
+        freezes -= 1
+        current += 1
+        row["freeze_used_date"] = (today - timedelta(days=1)).isoformat()
+        flags["streak_saved_by_freeze"] = True
+        flags["freeze_used"] = True
+    elif last is None:
+        current = 1
+    else:
+        flags["streak_broken"] = True
+        current = 1
+
+    if current > longest:
+        longest = current
+        flags["new_longest"] = True
+
+    row.update({
+        "current_streak": current,
+        "longest_streak": longest,
+        "last_activity_date": today.isoformat(),
+        "freeze_available": freezes,
+    })
+    return {**row, **flags}
+
+
+def live_streak(state: Dict[str, Any], today: date) -> int:
+    """Aktueller Streak beim Lesen: 0, wenn er inzwischen abgelaufen ist."""
+    last = _to_date(state.get("last_activity_date"))
+    if last is None:
+        return 0
+    gap = (today - last).days
+    if gap <= 1 or (gap == 2 and (state.get("freeze_available") or 0) > 0):
+        return state.get("current_streak") or 0
+    return 0
+
+
+# ============================================
+# SCHREIBEN
+# ============================================
+
+def record_rows(db, user_id: str, stream: str, today: DateLike) -> Dict[str, Any]:
+    """Fallback ohne RPC: Read-Modify-Write per upsert (nicht atomar).
+
+    Nimmt den Client explizit — auch fuer lokale RPC-Stand-ins, die in
+    ihrer eigenen Transaktion schreiben.
+    """
+    current = db.table(STREAKS_TABLE) \
+        .select("*") \
+        .eq("user_id", user_id) \
+        .eq("stream", stream) \
+        .execute()
+    state = current.data[0] if current.data else empty_streak(stream)
+
+    result = advance_streak(state, _to_date(today))
+    db.table(STREAKS_TABLE).upsert({
+        "user_id": user_id,
+        "stream": stream,
+        "current_streak": result["current_streak"],
+        "longest_streak": result["longest_streak"],
+        "last_activity_date": result["last_activity_date"],
+        "freeze_available": result["freeze_available"],
+        "freeze_used_date": result.get("freeze_used_date"),
+        "updated_at": datetime.now().isoformat(),
+    }, on_conflict="user_id,stream").execute()
+    return {**result, "user_id": user_id, "stream": stream}
+
+
+@register_local_rpc("record_streak")
+def _record_streak_rpc(client, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Lokaler Stand-in fuer die SQL-Funktion record_streak."""
+    today = params.get("p_today") or date.today().isoformat()
+    return record_rows(client, params["p_user_id"], params["p_stream"], today)
+
+
+def record_activity(user_id: str, stream: str, today: Optional[DateLike] = None) -> Dict[str, Any]:
+    """Verbucht eine Aktivitaet im Stream und liefert die neue Streak-Zeile.
+
+    Schlaegt das Update fehl, kommt der letzte bekannte Stand zurueck
+    (alle Flags False) — die Aktion des Users soll nicht scheitern.
+
+    Returns: {"current_streak", "longest_streak", "last_activity_date",
+              "freeze_available", "freeze_used_date", "streak_continued",
+              "streak_broken", "streak_saved_by_freeze", "freeze_used",
+              "new_longest"}
+    """
+    today_iso = (_to_date(today) or date.today()).isoformat()
+    db = get_db()
+    try:
+        result = db.rpc("record_streak", {
+            "p_user_id": user_id,
+            "p_stream": stream,
+            "p_today": today_iso,
+            "p_initial_freezes": INITIAL_FREEZES.get(stream, 0),
+        }).execute().data
+    except Exception as e:
+        if not is_missing_function(e):
+            print(f"[streaks] Streak-Update fehlgeschlagen: {e}")
+            return _last_known_streak(user_id, stream)
+        print(f"record_streak RPC nicht verfuegbar, nutze Fallback: {e}")
+        try:
+            result = record_rows(db, user_id, stream, today_iso)
+        except Exception as e:
+            print(f"[streaks] Streak-Update fehlgeschlagen: {e}")
+            return _last_known_streak(user_id, stream)
+
+    invalidate_user(user_id)
+    return result or _last_known_streak(user_id, stream)
+
+
+def _last_known_streak(user_id: str, stream: str) -> Dict[str, Any]:
+    """Gespeicherte Streak-Zeile ohne Aenderung (nach fehlgeschlagenem Update)."""
+    return {**get_streak(user_id, stream), **dict.fromkeys(STREAK_FLAGS, False)}
+
+
+def add_freeze_rows(db, user_id: str, stream: str, count: int) -> int:
+    """Fallback ohne RPC: Freezes per Read-Modify-Write gutschreiben (nicht atomar).
+
+    Fehlt die Zeile, wird sie mit INITIAL_FREEZES angelegt (wie record_rows).
+    """
+    current = db.table(STREAKS_TABLE) \
+        .select("freeze_available") \
+        .eq("user_id", user_id) \
+        .eq("stream", stream) \
+        .execute()
+
+    if not current.data:
+        new_value = INITIAL_FREEZES.get(stream, 0) + count
+        db.table(STREAKS_TABLE).upsert({
+            **empty_streak(stream),
+            "user_id": user_id,
+            "freeze_available": new_value,
+            "updated_at": datetime.now().isoformat(),
+        }, on_conflict="user_id,stream").execute()
+        return new_value
+
+    new_value = (current.data[0]["freeze_available"] or 0) + count
+    db.table(STREAKS_TABLE) \
+        .update({"freeze_available": new_value, "updated_at": datetime.now().isoformat()}) \
+        .eq("user_id", user_id) \
+        .eq("stream", stream) \
+        .execute()
+    return new_value
+
+
+@register_local_rpc("add_streak_freezes")
+def _add_streak_freezes_rpc(client, params: Dict[str, Any]) -> int:
+    """Lokaler Stand-in fuer die SQL-Funktion add_streak_freezes."""
+    return add_freeze_rows(client, params["p_user_id"], params["p_stream"], params.get("p_count", 1))
+
+
+def add_freezes(user_id: str, stream: str, count: int = 1) -> int:
+    """Fuegt Freezes hinzu (legt die Zeile bei Bedarf an). Returns: neue Anzahl."""
+    db = get_db()
+    try:
+        new_value = db.rpc("add_streak_freezes", {
+            "p_user_id": user_id,
+            "p_stream": stream,
+            "p_count": count,
+            "p_initial_freezes": INITIAL_FREEZES.get(stream, 0),
+        }).execute().data
+    except Exception as e:
+        if not is_missing_function(e):
+            raise
+        print(f"add_streak_freezes RPC nicht verfuegbar, nutze Fallback: {e}")
+        new_value = add_freeze_rows(db, user_id, stream, count)
+
+    invalidate_user(user_id)
+    return new_value or 0
+
+
+def clear_streak(user_id: str, stream: str) -> None:
+    """Loescht die Streak-Zeile eines Streams (Reset)."""
+    get_db().table(STREAKS_TABLE).delete().eq("user_id", user_id).eq("stream", stream).execute()
+    invalidate_user(user_id)
+
+
+# ============================================
+# LESEN
+# ============================================
+
+@tagged_cache(ttl=120, tags=lambda user_ids, streams=None: [user_tag(u) for u in user_ids])
+def get_streaks(user_ids: List[str],
+                streams: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Streaks vieler User mit EINER Query.
+
+    current_streak ist bereits der aktuelle Wert (abgelaufen = 0).
+
+    Returns: {user_id: {stream: zeile}} — fehlende Streams fehlen auch hier
+             (alle, solange sql/20_streak_engine.sql noch nicht ausgefuehrt ist)
+    """
+    if not user_ids:
+        return {}
+
+    query = get_db().table(STREAKS_TABLE) \
+        .select("user_id, stream, current_streak, longest_streak, last_activity_date, "
+                "freeze_available, freeze_used_date") \
+        .in_("user_id", list(user_ids))
+    if streams:
+        query = query.in_("stream", list(streams))
+
+    today = date.today()
+    streaks: Dict[str, Dict[str, Dict[str, Any]]] = {user_id: {} for user_id in user_ids}
+    try:
+        rows = query.execute().data
+    except Exception as e:
+        if not is_missing_table(e):
+            raise
+        print(f"[streaks] {STREAKS_TABLE} fehlt, keine Streaks: {e}")
+        return streaks
+    for row in rows:
+        streaks.setdefault(row["user_id"], {})[row["stream"]] = {
+            **row, "current_streak": live_streak(row, today)}
+    return streaks
+
+
+def get_streak(user_id: str, stream: str) -> Dict[str, Any]:
+    """Streak-Zeile eines Users fuer einen Stream (leer, wenn noch keine Aktivitaet)."""
+    return get_streaks([user_id]).get(user_id, {}).get(stream) or empty_streak(stream)
+
+
+def current_streaks(user_ids: Iterable[str], stream: str) -> Dict[str, int]:
+    """Aktueller Streak pro User fuer einen Stream (z.B. Gruppen-Mitglieder).
+
+    User ohne Zeile im Stream fehlen im Ergebnis.
+    """
+    streaks = get_streaks(list(user_ids), [stream])
+    return {user_id: rows[stream]["current_streak"] for user_id, rows in streaks.items() if stream in rows}
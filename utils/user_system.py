@@ -28,6 +28,8 @@ import random
 import streamlit.components.v1 as components
 
 from utils.database import get_db
+from utils.cache import tagged_cache, user_tag, invalidate_user
+from utils.streaks import STREAM_CHALLENGE, clear_streak
 
 # ============================================
 # COOKIE-BASIERTER AUTO-LOGIN
@@ -333,7 +335,7 @@ def update_user_avatar(user_id: str, avatar_settings: Dict) -> bool:
     try:
         get_db().table("users").update({"avatar_settings": json.dumps(avatar_settings)}).eq("user_id", user_id).execute()
         # ✅ Cache invalidieren nach Write
-        get_user_by_id.clear()
+        invalidate_user(user_id)
         return True
     except Exception as e:
         print(f"Error updating avatar: {e}")
@@ -344,13 +346,13 @@ def update_user_age_group(user_id: str, age_group: str) -> bool:
     try:
         get_db().table("users").update({"age_group": age_group}).eq("user_id", user_id).execute()
         # ✅ Cache invalidieren nach Write
-        get_user_by_id.clear()
+        invalidate_user(user_id)
         return True
     except Exception as e:
         print(f"Error updating age group: {e}")
         return False
 
-@st.cache_data(ttl=60)
+@tagged_cache(ttl=60, tags=lambda user_id: [user_tag(user_id)])
 def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """Holt einen User anhand der ID.
 
@@ -386,6 +388,8 @@ def delete_user(user_id: str) -> bool:
         ("island_progress", "user_id"),
         ("user_treasures", "user_id"),
         ("bandura_entries", "user_id"),
+        ("bandura_day_bits", "user_id"),
+        ("user_streaks", "user_id"),
         ("activity_log", "user_id"),
         ("learnstrat_progress", "user_id"),
         ("arena_progress", "user_id"),
@@ -463,7 +467,7 @@ def login_user(display_name: str, age_group: str = None, avatar_style: str = Non
     st.session_state._pending_login_cookie = token
 
     # ✅ Cache invalidieren nach Login (User-Daten haben sich geaendert: last_login)
-    get_user_by_id.clear()
+    invalidate_user(user['user_id'])
 
     # Registrierungs-State aufräumen (verhindert Login-Loop auf Schatzkarte)
     for key in ["registration_step", "registration_name", "registration_age", "registration_password",
@@ -874,6 +878,8 @@ def reset_preview_data():
     db.table("users").update({"xp_total": 0, "current_streak": 0, "longest_streak": 0}).eq("user_id", user_id).execute()
     db.table("challenges").delete().eq("user_id", user_id).execute()
     db.table("user_badges").delete().eq("user_id", user_id).execute()
+    clear_streak(user_id, STREAM_CHALLENGE)
+    invalidate_user(user_id)
 
 
 def change_preview_age_group(age_group: str):
@@ -1271,14 +1277,14 @@ def change_password(user_id: str, new_password: str) -> bool:
     try:
         get_db().table("users").update(update_data).eq("user_id", user_id).execute()
         # ✅ Cache invalidieren nach Write
-        get_user_by_id.clear()
+        invalidate_user(user_id)
         return True
     except Exception:
         # Fallback ohne temp_password_plain
         update_data.pop("temp_password_plain", None)
         try:
             get_db().table("users").update(update_data).eq("user_id", user_id).execute()
-            get_user_by_id.clear()
+            invalidate_user(user_id)
             return True
         except Exception as e:
             print(f"Error changing password: {e}")